@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, ReactNode, useEffect } from 'react';
+import React, { createContext, useContext, useState, ReactNode, useEffect, useRef } from 'react';
 
 // Define domain interface based on PyDough's DOMAINS
 export interface Domain {
@@ -41,6 +41,14 @@ interface ConversationTurn {
   content: string;
 }
 
+// A query whose results view shows only its first rows (preview-first execution)
+export interface ResultPreview {
+  queryId: string;
+  rowCount: number | null;
+  loading: boolean;
+  error: string | null;
+}
+
 // New interface for database metadata
 interface DomainMetadata {
   tables: any[];
@@ -90,6 +98,10 @@ interface AppContextProps {
   error: string | null;
   setError: (error: string | null) => void;
   
+  // Preview-first results: /api/query returns the first rows, the full result is fetched after
+  resultPreview: ResultPreview | null;
+  loadFullResult: () => Promise<void>;
+  
   // New properties for Conversation History
   conversationHistory: ConversationTurn[];
   clearConversationHistory: () => void;
@@ -100,6 +112,160 @@ interface AppContextProps {
   langGraphAvailable: boolean;
 }
 
+// What the results view shows for an "execution" block from /api/query or /api/query/<id>/execute
+interface ParsedExecution {
+  sqlResult: string | null;
+  dataResult: string | null;
+  dataFrame: any | null;
+  executionError: string | null;
+}
+
+const parseExecution = (execution: any): ParsedExecution => {
+  let sqlResult: string | null = null;
+  let dataResult: string | null = null;
+  let dataFrame: any | null = null;
+  let executionError: string | null = null;
+
+  const resultData = execution.result_data;
+  const dfJsonValue = resultData?.pandas_df_json; // Safely access pandas_df_json
+
+  console.log('[Non-LG] Checking dfJsonValue. Type:', typeof dfJsonValue, 'Value:', dfJsonValue); // DETAILED LOG
+
+  if (typeof dfJsonValue === 'string' && dfJsonValue.trim() !== '') {
+    console.log("[Non-LG] Attempting to parse non-empty string pandas_df_json:", dfJsonValue);
+    try {
+      const dfObj = JSON.parse(dfJsonValue);
+      console.log("[Non-LG] Successfully parsed pandas_df_json. Parsed dfObj:", dfObj);
+      dataFrame = dfObj;
+    } catch (e) {
+      console.warn('[Non-LG] Failed to parse pandas_df_json. Error:', e, "Raw string type was:", typeof dfJsonValue, "Raw string value was:", dfJsonValue);
+      dataFrame = null;
+    }
+  } else {
+    if (resultData && Object.prototype.hasOwnProperty.call(resultData, 'pandas_df_json')) {
+       console.log("[Non-LG] pandas_df_json was present but was not a non-empty string. Type:", typeof dfJsonValue, "Value:", dfJsonValue);
+    } else if (resultData) {
+       console.log("[Non-LG] pandas_df_json key was not found in execution.result_data.");
+    } else {
+       console.log("[Non-LG] execution.result_data itself was not found.");
+    }
+    dataFrame = null;
+  }
+
+  // More robust SQL extraction - look for it in different places
+  const executionOutput = execution.output || '';
+
+  // 1. Try to extract SQL directly from the output
+  const sqlMatch = executionOutput.match(/SQL Query:([\s\S]*?)(?=Result:|$)/);
+  if (sqlMatch && sqlMatch[1]) {
+    sqlResult = sqlMatch[1].trim();
+  }
+
+  // 2. If no SQL found in output, check if it's directly provided
+  if (!sqlResult && execution.sql) {
+    sqlResult = execution.sql;
+  }
+
+  // 3. Extract results data similarly
+  const dataMatch = executionOutput.match(/Result:([\s\S]*?)(?=$)/);
+  if (dataMatch && dataMatch[1]) {
+    const rawTableData = dataMatch[1].trim();
+    const pdJsonPrefix = 'PD_JSON::';
+    const pdJsonStartIndex = rawTableData.indexOf(pdJsonPrefix);
+
+    if (pdJsonStartIndex !== -1) {
+      // PD_JSON:: found, prioritize parsing this
+      try {
+        let jsonDataString = rawTableData.substring(pdJsonStartIndex + pdJsonPrefix.length);
+        const endMarker = 'PD_JSON_END';
+        const endMarkerIndex = jsonDataString.indexOf(endMarker);
+        if (endMarkerIndex !== -1) {
+            jsonDataString = jsonDataString.substring(0, endMarkerIndex);
+        }
+        jsonDataString = jsonDataString.trim(); // Trim any trailing newlines/whitespace
+
+        const parsedJson = JSON.parse(jsonDataString);
+
+        if (parsedJson.columns && parsedJson.data && Array.isArray(parsedJson.data)) {
+          let tableHtml = '<table class="results-table">';
+          tableHtml += '<thead><tr class="results-header">';
+          parsedJson.columns.forEach((header: string) => {
+            tableHtml += `<th class="results-header-cell">${String(header).trim()}</th>`;
+          });
+          tableHtml += '</tr></thead>';
+          tableHtml += '<tbody>';
+          parsedJson.data.forEach((row: any[]) => {
+            tableHtml += '<tr class="results-row">';
+            if (Array.isArray(row)) {
+              const MAPPED_ROW_LENGTH = parsedJson.columns.length;
+              for (let i = 0; i < MAPPED_ROW_LENGTH; i++) {
+                const cellValue = row[i];
+                tableHtml += `<td class="results-cell">${String(cellValue === null || cellValue === undefined ? '' : cellValue).trim()}</td>`;
+              }
+            } else {
+              tableHtml += `<td class="results-cell" colspan="${parsedJson.columns.length}">${String(row === null || row === undefined ? '' : row).trim()}</td>`;
+            }
+            tableHtml += '</tr>';
+          });
+          tableHtml += '</tbody></table>';
+          dataResult = tableHtml; // Successfully converted PD_JSON to HTML table
+        } else {
+          console.warn('PD_JSON:: string found, but internal structure (columns/data) is not as expected. Displaying raw PD_JSON string segment.', parsedJson);
+          dataResult = rawTableData.substring(pdJsonStartIndex); // Show the PD_JSON part as raw
+        }
+      } catch (e) {
+        console.warn("Failed to parse PD_JSON:: data from execution output. Displaying raw PD_JSON string segment.", e);
+        dataResult = rawTableData.substring(pdJsonStartIndex); // Show the PD_JSON part as raw on error
+      }
+    } else {
+      // PD_JSON:: not found in rawTableData, proceed with plain text table parsing
+      if (rawTableData.includes('\n') && rawTableData.match(/\s{2,}/)) {
+        try {
+          const lines = rawTableData.split('\n').filter((line: string) => line.trim());
+          if (lines.length >= 2) {
+            let tableHtml = '<table class="results-table">';
+            const headerLine = lines[0];
+            tableHtml += '<thead><tr class="results-header">';
+            headerLine.split(/\s{2,}/).forEach((header: string) => {
+              tableHtml += `<th class="results-header-cell">${header.trim()}</th>`;
+            });
+            tableHtml += '</tr></thead>';
+            tableHtml += '<tbody>';
+            lines.slice(1).forEach((line: string) => {
+              tableHtml += '<tr class="results-row">';
+              line.split(/\s{2,}/).forEach((cell: string) => {
+                tableHtml += `<td class="results-cell">${cell.trim()}</td>`;
+              });
+              tableHtml += '</tr>';
+            });
+            tableHtml += '</tbody></table>';
+            dataResult = tableHtml;
+          } else {
+            dataResult = rawTableData;
+          }
+        } catch (e) {
+          console.warn("Failed to format plain text table data:", e);
+          dataResult = rawTableData;
+        }
+      } else {
+        dataResult = rawTableData;
+      }
+    }
+  }
+
+  // 4. Direct result data if available (this might be redundant if PD_JSON was prioritized or plain text table was parsed)
+  if (!dataResult && execution.results) {
+    dataResult = JSON.stringify(execution.results, null, 2);
+  }
+
+  // Handle execution errors
+  if (!execution.success) {
+    executionError = execution.error || "Execution failed without a specific error message";
+  }
+
+  return { sqlResult, dataResult, dataFrame, executionError };
+};
+
 const AppContext = createContext<AppContextProps | undefined>(undefined);
 
 export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) => {
@@ -119,6 +285,9 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
   const [generatedSQL, setGeneratedSQL] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
+  const [resultPreview, setResultPreview] = useState<ResultPreview | null>(null);
+  // query_id of the latest query, so a late full result of an older one is dropped
+  const latestQueryIdRef = useRef<string | null>(null);
   
   // State for Conversation History
   const [conversationHistory, setConversationHistory] = useState<ConversationTurn[]>([]);
@@ -348,6 +517,8 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     setGeneratedCode(null);
     setGeneratedSQL(null);
     setQueryResults(null); // Clear previous results
+    setResultPreview(null);
+    latestQueryIdRef.current = null;
     
     // Add user query to conversation history
     const userTurn: ConversationTurn = { role: 'user', content: query };
@@ -481,141 +652,17 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
           let executionError: string | null = null; // Variable for specific execution error
 
           if (data.execution) { // Check if execution results exist
-            const resultData = data.execution.result_data;
-            const dfJsonValue = resultData?.pandas_df_json; // Safely access pandas_df_json
-
-            console.log('[Non-LG] Checking dfJsonValue. Type:', typeof dfJsonValue, 'Value:', dfJsonValue); // DETAILED LOG
-
-            if (typeof dfJsonValue === 'string' && dfJsonValue.trim() !== '') {
-              console.log("[Non-LG] Attempting to parse non-empty string pandas_df_json:", dfJsonValue);
-              try {
-                const dfObj = JSON.parse(dfJsonValue);
-                console.log("[Non-LG] Successfully parsed pandas_df_json. Parsed dfObj:", dfObj);
-                setSelectedDataFrame(dfObj);
-              } catch (e) {
-                console.warn('[Non-LG] Failed to parse pandas_df_json. Error:', e, "Raw string type was:", typeof dfJsonValue, "Raw string value was:", dfJsonValue);
-                setSelectedDataFrame(null);
-              }
-            } else {
-              if (resultData && Object.prototype.hasOwnProperty.call(resultData, 'pandas_df_json')) {
-                 console.log("[Non-LG] pandas_df_json was present but was not a non-empty string. Type:", typeof dfJsonValue, "Value:", dfJsonValue);
-              } else if (resultData) {
-                 console.log("[Non-LG] pandas_df_json key was not found in data.execution.result_data.");
-              } else {
-                 console.log("[Non-LG] data.execution.result_data itself was not found.");
-              }
-              setSelectedDataFrame(null);
-            }
+            const parsed = parseExecution(data.execution);
+            sqlResult = parsed.sqlResult;
+            dataResult = parsed.dataResult;
+            executionError = parsed.executionError;
+            setSelectedDataFrame(parsed.dataFrame);
 
-            // More robust SQL extraction - look for it in different places
-            const executionOutput = data.execution.output || '';
-            
-            // 1. Try to extract SQL directly from the output
-            const sqlMatch = executionOutput.match(/SQL Query:([\s\S]*?)(?=Result:|$)/);
-            if (sqlMatch && sqlMatch[1]) {
-              sqlResult = sqlMatch[1].trim();
-            }
-            
-            // 2. If no SQL found in output, check if it's directly provided
-            if (!sqlResult && data.execution.sql) {
-              sqlResult = data.execution.sql;
-            }
-            
-            // 3. Extract results data similarly
-            const dataMatch = executionOutput.match(/Result:([\s\S]*?)(?=$)/);
-            if (dataMatch && dataMatch[1]) {
-              const rawTableData = dataMatch[1].trim();
-              const pdJsonPrefix = 'PD_JSON::';
-              const pdJsonStartIndex = rawTableData.indexOf(pdJsonPrefix);
-
-              if (pdJsonStartIndex !== -1) {
-                // PD_JSON:: found, prioritize parsing this
-                try {
-                  let jsonDataString = rawTableData.substring(pdJsonStartIndex + pdJsonPrefix.length);
-                  const endMarker = 'PD_JSON_END';
-                  const endMarkerIndex = jsonDataString.indexOf(endMarker);
-                  if (endMarkerIndex !== -1) {
-                      jsonDataString = jsonDataString.substring(0, endMarkerIndex);
-                  }
-                  jsonDataString = jsonDataString.trim(); // Trim any trailing newlines/whitespace
-
-                  const parsedJson = JSON.parse(jsonDataString);
-
-                  if (parsedJson.columns && parsedJson.data && Array.isArray(parsedJson.data)) {
-                    let tableHtml = '<table class="results-table">';
-                    tableHtml += '<thead><tr class="results-header">';
-                    parsedJson.columns.forEach((header: string) => {
-                      tableHtml += `<th class="results-header-cell">${String(header).trim()}</th>`;
-                    });
-                    tableHtml += '</tr></thead>';
-                    tableHtml += '<tbody>';
-                    parsedJson.data.forEach((row: any[]) => {
-                      tableHtml += '<tr class="results-row">';
-                      if (Array.isArray(row)) {
-                        const MAPPED_ROW_LENGTH = parsedJson.columns.length;
-                        for (let i = 0; i < MAPPED_ROW_LENGTH; i++) {
-                          const cellValue = row[i];
-                          tableHtml += `<td class="results-cell">${String(cellValue === null || cellValue === undefined ? '' : cellValue).trim()}</td>`;
-                        }
-                      } else {
-                        tableHtml += `<td class="results-cell" colspan="${parsedJson.columns.length}">${String(row === null || row === undefined ? '' : row).trim()}</td>`;
-                      }
-                      tableHtml += '</tr>';
-                    });
-                    tableHtml += '</tbody></table>';
-                    dataResult = tableHtml; // Successfully converted PD_JSON to HTML table
-                  } else {
-                    console.warn('PD_JSON:: string found, but internal structure (columns/data) is not as expected. Displaying raw PD_JSON string segment.', parsedJson);
-                    dataResult = rawTableData.substring(pdJsonStartIndex); // Show the PD_JSON part as raw
-                  }
-                } catch (e) {
-                  console.warn("Failed to parse PD_JSON:: data from execution output. Displaying raw PD_JSON string segment.", e);
-                  dataResult = rawTableData.substring(pdJsonStartIndex); // Show the PD_JSON part as raw on error
-                }
-              } else {
-                // PD_JSON:: not found in rawTableData, proceed with plain text table parsing
-                if (rawTableData.includes('\n') && rawTableData.match(/\s{2,}/)) {
-                  try {
-                    const lines = rawTableData.split('\n').filter((line: string) => line.trim());
-                    if (lines.length >= 2) {
-                      let tableHtml = '<table class="results-table">';
-                      const headerLine = lines[0];
-                      tableHtml += '<thead><tr class="results-header">';
-                      headerLine.split(/\s{2,}/).forEach((header: string) => {
-                        tableHtml += `<th class="results-header-cell">${header.trim()}</th>`;
-                      });
-                      tableHtml += '</tr></thead>';
-                      tableHtml += '<tbody>';
-                      lines.slice(1).forEach((line: string) => {
-                        tableHtml += '<tr class="results-row">';
-                        line.split(/\s{2,}/).forEach((cell: string) => {
-                          tableHtml += `<td class="results-cell">${cell.trim()}</td>`;
-                        });
-                        tableHtml += '</tr>';
-                      });
-                      tableHtml += '</tbody></table>';
-                      dataResult = tableHtml;
-                    } else {
-                      dataResult = rawTableData;
-                    }
-                  } catch (e) {
-                    console.warn("Failed to format plain text table data:", e);
-                    dataResult = rawTableData;
-                  }
-                } else {
-                  dataResult = rawTableData;
-                }
-              }
-            }
-            
-            // 4. Direct result data if available (this might be redundant if PD_JSON was prioritized or plain text table was parsed)
-            if (!dataResult && data.execution.results) {
-              dataResult = JSON.stringify(data.execution.results, null, 2);
-            }
-            
-            // Handle execution errors
-            if (!data.execution.success) {
-              executionError = data.execution.error || "Execution failed without a specific error message";
+            // Only the first rows came back: show them now and fetch the full result
+            if (data.execution.truncated && data.query_id) {
+              latestQueryIdRef.current = data.query_id;
+              setResultPreview({ queryId: data.query_id, rowCount: data.execution.row_count ?? null, loading: true, error: null });
+              void fetchFullResult(data.query_id);
             }
           } else { // No data.execution block
             console.log("[Non-LG] data.execution not found."); // DEBUG
@@ -715,9 +762,57 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     }
   };
   
+  // Replace a truncated preview with the query's full result (computed and cached by the server)
+  const fetchFullResult = async (queryId: string) => {
+    const updatePreview = (changes: Partial<ResultPreview>) =>
+      setResultPreview(prev => (prev && prev.queryId === queryId ? { ...prev, ...changes } : prev));
+    updatePreview({ loading: true, error: null });
+    try {
+      const response = await fetch(`${API_BASE_URL}/query/${encodeURIComponent(queryId)}/execute`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({})
+      });
+      const data = await response.json();
+      if (latestQueryIdRef.current !== queryId) {
+        return; // A newer query replaced this one
+      }
+      const execution = data.execution;
+      if (!data.success || !execution || execution.truncated) {
+        updatePreview({
+          loading: false,
+          error: execution?.full_result_error || data.error || execution?.error || 'The full result could not be computed'
+        });
+        return;
+      }
+      const parsed = parseExecution(execution);
+      if (parsed.sqlResult) {
+        setGeneratedSQL(parsed.sqlResult);
+      }
+      setQueryResults(parsed.dataResult);
+      setSelectedDataFrame(parsed.dataFrame);
+      setResultPreview(null);
+    } catch (error: any) {
+      console.error("Error loading full result:", error);
+      if (latestQueryIdRef.current === queryId) {
+        updatePreview({ loading: false, error: error.message || 'Could not connect to backend API.' });
+      }
+    }
+  };
+
+  const loadFullResult = async () => {
+    if (resultPreview) {
+      await fetchFullResult(resultPreview.queryId);
+    }
+  };
+  
   // Clear conversation history
   const clearConversationHistory = () => {
     setConversationHistory([]);
+    setResultPreview(null);
+    latestQueryIdRef.current = null;
     setGeneratedCode(null);
     setGeneratedSQL(null);
     setQueryResults(null);
@@ -761,6 +856,8 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     isLoading,
     error,
     setError,
+    resultPreview,
+    loadFullResult,
     
     // Conversation History properties
     conversationHistory,
@@ -230,11 +230,26 @@ const ConnectionPage: React.FC = () => {
         console.error('Failed to parse API response as JSON:', parseErr);
       }
       
-      // Wait a moment to ensure files are written
-      await new Promise(resolve => setTimeout(resolve, 1000));
-      
-      // Directly fetch with force=true to bypass cache
+      // Generation runs as a background job; poll it until it finishes
+      const jobId = responseData?.job_id;
+      if (jobId) {
+        let job = responseData.job;
+        while (job && (job.state === 'queued' || job.state === 'running')) {
+          await new Promise(resolve => setTimeout(resolve, 1000));
+          const jobResponse = await fetch(`http://localhost:5001/api/databases/generate-metadata/${jobId}`, {
+            cache: 'no-cache' as RequestCache,
+          });
+          job = (await jobResponse.json()).job;
+          console.log(`Metadata job ${jobId}: ${job?.state} (${job?.progress?.percent ?? 0}%)`);
+        }
+        if (job?.state !== 'succeeded') {
+          throw new Error(job?.error || `Metadata generation ${job?.state || 'failed'}`);
+        }
+      }
+
+      // Directly fetch with force=true to bypass cache, and pick up the newly registered domain
       await fetchSchemaStatus(true);
+      await scanDatabases();
     } catch (err: any) {
       console.error('Metadata generation error:', err);
       alert(`Failed to generate metadata: ${err.message}`);
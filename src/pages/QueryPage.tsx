@@ -174,6 +174,8 @@ const QueryPage: React.FC = () => {
     error,
     setError,
     selectedDataFrame,
+    resultPreview,
+    loadFullResult,
     conversationHistory,
     clearConversationHistory,
     useLangGraph,
@@ -605,6 +607,26 @@ const QueryPage: React.FC = () => {
                   </div>
                 </div>
                 
+                {resultPreview && (
+                  <div className="mb-4 flex items-center justify-between rounded-md border border-yellow-200 bg-yellow-50 px-4 py-2 text-sm text-yellow-800">
+                    <span>
+                      Showing the first {resultPreview.rowCount ?? ''} rows.{' '}
+                      {resultPreview.loading
+                        ? 'Loading the full result...'
+                        : `The full result could not be loaded: ${resultPreview.error}`}
+                    </span>
+                    {!resultPreview.loading && (
+                      <button
+                        type="button"
+                        onClick={loadFullResult}
+                        className="inline-flex items-center px-3 py-1.5 border border-yellow-300 shadow-sm text-xs font-medium rounded-md text-yellow-800 bg-white hover:bg-yellow-100 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-yellow-500"
+                      >
+                        <RefreshCw className="h-3.5 w-3.5 mr-1" />
+                        Load full result
+                      </button>
+                    )}
+                  </div>
+                )}
                 {queryResults ? (
                   <QueryResultsDisplay results={queryResults} />
                 ) : (
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Admission control for the API server
+
+Interactive queries from the UI and batch evaluations (process_all_queries
+with --api-url, load tests, benchmarks) share the same Gemini quota and
+executor workers. Every request to a route that calls the LLM or the executor
+takes one of ADMISSION_SLOTS slots for its whole duration, in a priority lane:
+
+- Lanes are served in priority order: when a slot frees up, the oldest
+  request of the highest-priority lane with room gets it.
+- Each lane has its own concurrency cap, so a batch can never occupy the slots
+  interactive requests need (with the defaults, batch takes at most 4 of 16).
+- Each client may have at most CLIENT_MAX_IN_FLIGHT requests running or
+  queued. Clients are told apart by their address: the remote address, or
+  behind PYDOUGH_TRUSTED_PROXIES reverse proxies the address those proxies
+  recorded in X-Forwarded-For.
+- Each lane has a maximum queue depth. Requests beyond it, over their
+  client's limit, or still queued after ADMISSION_QUEUE_TIMEOUT are shed with
+  Overloaded, which the routes turn into 429 with a Retry-After estimated from
+  the queue depth and the lane's recent service time.
+
+Lanes are configured as PYDOUGH_LANES="interactive=16/64,batch=4/128"
+(name=max concurrency/max queue depth, highest priority first).
+
+The X-Client-Id and X-PyDough-Lane headers are set by the client, so they are
+only honoured from trusted callers: the addresses in PYDOUGH_TRUSTED_CALLERS
+(loopback by default, e.g. a batch run on the server's host), or any caller
+behind PYDOUGH_TRUSTED_PROXIES proxies with PYDOUGH_TRUST_PROXY_HEADERS=1
+(the proxies then set or strip these headers). A trusted caller picks its lane
+and may split its limit between client ids; the first lane is the default.
+Other callers run in PYDOUGH_UNTRUSTED_LANE (the first lane by default), or a
+lower-priority lane if they ask for one, and are limited by address.
+
+While a request holds its slot, current_lane() returns its lane, so the
+executor pool (pydough_executor) can serve its tasks by the same priorities.
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+
+# Requests (LLM calls plus executions) running at once, over all lanes
+ADMISSION_SLOTS = int(os.environ.get("PYDOUGH_ADMISSION_SLOTS", 16))
+# name=max concurrency/max queue depth, highest priority first
+LANES_SPEC = os.environ.get("PYDOUGH_LANES", "interactive=16/64,batch=4/128")
+# Requests one client may have running or queued
+CLIENT_MAX_IN_FLIGHT = int(os.environ.get("PYDOUGH_CLIENT_MAX_IN_FLIGHT", 8))
+# Reverse proxies in front of the server whose X-Forwarded-For entries are trusted
+TRUSTED_PROXIES = int(os.environ.get("PYDOUGH_TRUSTED_PROXIES", 0))
+# Caller addresses whose X-Client-Id and X-PyDough-Lane headers are honoured
+TRUSTED_CALLERS = frozenset(
+    address.strip() for address in os.environ.get("PYDOUGH_TRUSTED_CALLERS", "127.0.0.1,::1").split(",") if address.strip()
+)
+# Honour those headers from every caller behind the trusted proxies
+TRUST_PROXY_HEADERS = os.environ.get("PYDOUGH_TRUST_PROXY_HEADERS", "0") == "1"
+# Lane of requests from untrusted callers (empty: the first lane)
+UNTRUSTED_LANE = os.environ.get("PYDOUGH_UNTRUSTED_LANE", "")
+# Seconds a request may wait for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("PYDOUGH_ADMISSION_QUEUE_TIMEOUT", 30))
+# Recent queue waits kept per lane for the percentiles in stats()
+WAIT_SAMPLES = 500
+# Weight of the newest request in a lane's average service time
+SERVICE_TIME_ALPHA = 0.2
+
+LANE_HEADER = "X-PyDough-Lane"
+CLIENT_HEADER = "X-Client-Id"
+FORWARDED_FOR_HEADER = "X-Forwarded-For"
+
+# Lane of the admitted request this thread or task is serving
+_CURRENT_LANE = contextvars.ContextVar("pydough_lane", default=None)
+
+def current_lane():
+    """Lane of the request being served here, or None outside admitted requests."""
+    return _CURRENT_LANE.get()
+
+class Overloaded(Exception):
+    """A request was shed; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, message, lane, reason, retry_after):
+        super().__init__(message)
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+def caller_address(forwarded_for, remote_addr):
+    """The address the TRUSTED_PROXIES nearest proxies saw a request from, else the remote address."""
+    if TRUSTED_PROXIES and forwarded_for:
+        # Each proxy appends the address it received the request from
+        addresses = [address.strip() for address in forwarded_for.split(",") if address.strip()]
+        if addresses:
+            return addresses[max(0, len(addresses) - TRUSTED_PROXIES)]
+    return remote_addr
+
+def trusted_caller(forwarded_for, remote_addr):
+    """True if a request's X-Client-Id and X-PyDough-Lane headers are honoured."""
+    if TRUST_PROXY_HEADERS and TRUSTED_PROXIES:
+        return True
+    return caller_address(forwarded_for, remote_addr) in TRUSTED_CALLERS
+
+def client_key(client_id, forwarded_for, remote_addr):
+    """
+    Key a request's per-client limit is counted under: its caller's address,
+    or the client id a trusted caller sent.
+    """
+    if client_id and trusted_caller(forwarded_for, remote_addr):
+        return client_id
+    return caller_address(forwarded_for, remote_addr)
+
+def parse_lanes(spec):
+    """[(name, max_concurrency, max_queue)] from a PYDOUGH_LANES string."""
+    lanes = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, limits = part.partition("=")
+        concurrency, _, queue = limits.partition("/")
+        lanes.append((name.strip(), int(concurrency), int(queue or 0)))
+    if not lanes:
+        raise ValueError(f"No lanes configured in {spec!r}")
+    return lanes
+
+class _Lane:
+    def __init__(self, name, priority, max_concurrency, max_queue):
+        self.name = name
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.running = 0
+        self.queue = deque()
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.service_seconds = None
+        self.counters = {"admitted": 0, "completed": 0, "queue_full": 0, "client_limit": 0, "queue_timeout": 0}
+
+class _Ticket:
+    """A request's place in a lane: queued until granted, then holding a slot until released."""
+
+    def __init__(self, lane, client):
+        self.lane = lane
+        self.client = client
+        self.enqueued = time.monotonic()
+        self.admitted = None
+        self.granted = False
+        self.event = threading.Event()
+        self.loop = None
+        self.future = None
+        self.lane_token = None
+
+    def wake(self):
+        self.event.set()
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+class AdmissionController:
+    """Priority lanes over a fixed number of slots, with per-client limits and load shedding."""
+
+    def __init__(self, slots=ADMISSION_SLOTS, lanes=None, client_limit=CLIENT_MAX_IN_FLIGHT, queue_timeout=ADMISSION_QUEUE_TIMEOUT, untrusted_lane=UNTRUSTED_LANE):
+        self.slots = slots
+        self.client_limit = client_limit
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._lanes = {}
+        for priority, (name, concurrency, queue) in enumerate(lanes or parse_lanes(LANES_SPEC)):
+            self._lanes[name] = _Lane(name, priority, concurrency, queue)
+        self.default_lane = next(iter(self._lanes))
+        self.untrusted_lane = untrusted_lane or self.default_lane
+        if self.untrusted_lane not in self._lanes:
+            raise ValueError(f"Unknown untrusted lane '{self.untrusted_lane}' (lanes: {', '.join(self._lanes)})")
+        self._in_use = 0
+        self._clients = {}
+
+    def lane_names(self):
+        return list(self._lanes)
+
+    def _retry_after(self, lane):
+        """Seconds until a slot in lane is likely free: queued requests times service time over the lane's concurrency."""
+        service = lane.service_seconds or 1.0
+        concurrency = max(1, min(lane.max_concurrency, self.slots))
+        return max(1, math.ceil((len(lane.queue) + 1) * service / concurrency))
+
+    def _shed(self, lane, reason, message):
+        lane.counters[reason] += 1
+        retry_after = self._retry_after(lane)
+        print(f"🚦 Shedding {lane.name} request ({reason}): {message}; retry after {retry_after}s")
+        raise Overloaded(message, lane.name, reason, retry_after)
+
+    def _lane_for(self, lane_name, trusted):
+        """The lane a request asking for lane_name runs in (see the module docstring)."""
+        if not trusted:
+            lane = self._lanes[self.untrusted_lane]
+            requested = self._lanes.get(lane_name) if lane_name else None
+            # Untrusted callers may only move themselves to a lower priority
+            return requested if requested is not None and requested.priority > lane.priority else lane
+        lane = self._lanes.get(lane_name or self.default_lane)
+        if lane is None:
+            raise ValueError(f"Unknown lane '{lane_name}' (lanes: {', '.join(self._lanes)})")
+        return lane
+
+    def _enqueue(self, lane_name, client, trusted=True):
+        """Queue a request (or shed it) and start whatever can run now. The caller holds self._lock."""
+        lane = self._lane_for(lane_name, trusted)
+        if client is not None and self.client_limit and self._clients.get(client, 0) >= self.client_limit:
+            self._shed(lane, "client_limit", f"Client {client} already has {self.client_limit} requests in flight")
+        if len(lane.queue) >= lane.max_queue and not self._has_room(lane):
+            self._shed(lane, "queue_full", f"Lane {lane.name} has {len(lane.queue)} requests queued")
+        ticket = _Ticket(lane, client)
+        lane.queue.append(ticket)
+        if client is not None:
+            self._clients[client] = self._clients.get(client, 0) + 1
+        self._dispatch()
+        return ticket
+
+    def _has_room(self, lane):
+        return self._in_use < self.slots and lane.running < lane.max_concurrency
+
+    def _dispatch(self):
+        """Grant free slots to queued requests, highest-priority lane first. The caller holds self._lock."""
+        for lane in sorted(self._lanes.values(), key=lambda l: l.priority):
+            while lane.queue and self._has_room(lane):
+                ticket = lane.queue.popleft()
+                ticket.granted = True
+                ticket.admitted = time.monotonic()
+                lane.running += 1
+                self._in_use += 1
+                lane.counters["admitted"] += 1
+                lane.waits.append(ticket.admitted - ticket.enqueued)
+                ticket.wake()
+
+    def _abandon(self, ticket):
+        """Take back a ticket whose wait ended without a slot. Returns True if it had been granted meanwhile."""
+        with self._lock:
+            if ticket.granted:
+                return True
+            ticket.lane.queue.remove(ticket)
+            self._forget_client(ticket.client)
+            return False
+
+    def _forget_client(self, client):
+        if client is not None:
+            self._clients[client] -= 1
+            if not self._clients[client]:
+                del self._clients[client]
+
+    def _timed_out(self, ticket):
+        with self._lock:
+            self._shed(ticket.lane, "queue_timeout", f"No {ticket.lane.name} slot became free within {self.queue_timeout:g}s")
+
+    def _enter_lane(self, ticket):
+        ticket.lane_token = _CURRENT_LANE.set(ticket.lane.name)
+        return ticket
+
+    def release(self, ticket):
+        """Give a granted ticket's slot back and start the next queued request."""
+        if ticket.lane_token is not None:
+            try:
+                _CURRENT_LANE.reset(ticket.lane_token)
+            except ValueError:
+                pass  # Released from another context, which never saw the lane
+            ticket.lane_token = None
+        with self._lock:
+            lane = ticket.lane
+            lane.running -= 1
+            self._in_use -= 1
+            lane.counters["completed"] += 1
+            elapsed = time.monotonic() - ticket.admitted
+            lane.service_seconds = elapsed if lane.service_seconds is None else \
+                (1 - SERVICE_TIME_ALPHA) * lane.service_seconds + SERVICE_TIME_ALPHA * elapsed
+            self._forget_client(ticket.client)
+            self._dispatch()
+
+    def acquire(self, lane=None, client=None, trusted=True):
+        """
+        Wait (blocking the thread) for a slot in lane. Returns the ticket to
+        release(); raises Overloaded. With trusted=False the lane is chosen as
+        for an untrusted caller.
+        """
+        with self._lock:
+            ticket = self._enqueue(lane, client, trusted)
+        if not ticket.event.wait(self.queue_timeout) and not self._abandon(ticket):
+            self._timed_out(ticket)
+        return self._enter_lane(ticket)
+
+    async def acquire_async(self, lane=None, client=None, trusted=True):
+        """acquire() for an event loop: the wait is a future, not a blocked thread."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            ticket = self._enqueue(lane, client, trusted)
+            if not ticket.granted:
+                ticket.loop, ticket.future = loop, loop.create_future()
+        if ticket.granted:
+            return self._enter_lane(ticket)
+        try:
+            await asyncio.wait_for(ticket.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(ticket):
+                self._timed_out(ticket)
+        except asyncio.CancelledError:
+            if self._abandon(ticket):
+                self.release(ticket)
+            raise
+        return self._enter_lane(ticket)
+
+    @contextmanager
+    def admit(self, lane=None, client=None, trusted=True):
+        """Hold a slot in lane for the duration of the with block."""
+        ticket = self.acquire(lane, client, trusted)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def admit_async(self, lane=None, client=None, trusted=True):
+        """admit() for an event loop."""
+        ticket = await self.acquire_async(lane, client, trusted)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        """Slots in use, per-lane running/queued counts, shed counters and queue wait percentiles."""
+        with self._lock:
+            lanes = {}
+            for lane in sorted(self._lanes.values(), key=lambda l: l.priority):
+                waits = sorted(lane.waits)
+                lanes[lane.name] = dict(
+                    lane.counters,
+                    priority=lane.priority,
+                    max_concurrency=lane.max_concurrency,
+                    max_queue=lane.max_queue,
+                    running=lane.running,
+                    queued=len(lane.queue),
+                    shed=lane.counters["queue_full"] + lane.counters["client_limit"] + lane.counters["queue_timeout"],
+                    service_ms=round(lane.service_seconds * 1000, 1) if lane.service_seconds is not None else None,
+                    wait_ms={
+                        "p50": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+                        "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else None,
+                        "max": round(waits[-1] * 1000, 1) if waits else None
+                    }
+                )
+            clients = sorted(self._clients.items(), key=lambda item: -item[1])
+            return {
+                "slots": self.slots,
+                "in_use": self._in_use,
+                "client_limit": self.client_limit,
+                "queue_timeout": self.queue_timeout,
+                "default_lane": self.default_lane,
+                "untrusted_lane": self.untrusted_lane,
+                "lanes": lanes,
+                "clients_in_flight": len(clients),
+                "busiest_clients": dict(clients[:10])
+            }
+
+_CONTROLLER = None
+_CONTROLLER_LOCK = threading.Lock()
+
+def get_admission_controller():
+    """The process-wide controller, configured from the environment on first use."""
+    global _CONTROLLER
+    with _CONTROLLER_LOCK:
+        if _CONTROLLER is None:
+            _CONTROLLER = AdmissionController()
+            print(f"🚦 Admission control: {ADMISSION_SLOTS} slots, lanes {LANES_SPEC}, {CLIENT_MAX_IN_FLIGHT} requests per client")
+        return _CONTROLLER
@@ -13,13 +13,17 @@ import json
 import sys
 import re
 import time
+import threading
+import functools
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-import pandas as pd
 from datetime import datetime
 import traceback # Import traceback
-import subprocess
-from domains import DOMAINS
+from domains import DOMAINS, DOMAIN_CATALOG
+import column_statistics
+import metadata_jobs
+from admission import get_admission_controller, client_key, trusted_caller, Overloaded, LANE_HEADER, CLIENT_HEADER, FORWARDED_FOR_HEADER
+from hedging import get_hedging_stats
 
 # Load environment variables from .env file if it exists
 try:
@@ -41,7 +45,9 @@ except ImportError:
     
 # Create Flask app
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173"]}})  # Enable CORS for frontend server
+# Origins of the frontend dev server (also used by asgi_app)
+CORS_ORIGINS = ["http://localhost:5173", "http://127.0.0.1:5173"]
+CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}})  # Enable CORS for frontend server
 
 # Create a results directory if it doesn't exist
 RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
@@ -59,46 +65,114 @@ if GEMINI_API_KEY:
 # Try to import PyDough processor
 import pydough_query_processor as pqp
 
-# Try to import LangGraph implementation
-try:
-    import langgraph_impl as lgi
-    LANGGRAPH_AVAILABLE = True
-    print("✅ LangGraph implementation available")
-except ImportError as e:
-    LANGGRAPH_AVAILABLE = False
-    print(f"⚠️ Warning: LangGraph implementation not available: {e}")
-    print("LangGraph functionality will be disabled")
-
-# Try to check if LLM API is configured by importing llm
-try:
-    import llm
-    # Check for model availability - attempt both models
-    try:
-        model_code_gen = llm.get_model("gemini-2.5-pro-preview-05-06")
-        print("✅ Successfully configured Gemini 2.5 Pro Preview for code generation")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not load gemini-2.5-pro-preview-05-06: {e}")
-        print("⚠️ Code generation functionality may be limited")
-        
-    # Also check for the flash model for domain detection
+# PyDough processor routes are always served; LLM and executor readiness is
+# reported by the background warm-up below
+PYDOUGH_AVAILABLE = True
+
+# LangGraph (and langchain) are imported on the first /api/query-lg request
+LANGGRAPH_AVAILABLE = None # None until the import has been attempted
+lgi = None
+
+def get_langgraph():
+    """Import the LangGraph implementation on first use. Returns the module or None."""
+    global LANGGRAPH_AVAILABLE, lgi
+    if LANGGRAPH_AVAILABLE is None:
+        try:
+            import langgraph_impl
+            lgi = langgraph_impl
+            LANGGRAPH_AVAILABLE = True
+            print("✅ LangGraph implementation available")
+        except ImportError as e:
+            LANGGRAPH_AVAILABLE = False
+            print(f"⚠️ Warning: LangGraph implementation not available: {e}")
+            print("LangGraph functionality will be disabled")
+    return lgi
+
+# Background warm-up: prompt assets, LLM clients and executor workers
+WARM_UP_STATUS = {"state": "pending", "step": None, "completed": {}, "started_at": None, "finished_at": None}
+_WARM_UP_LOCK = threading.Lock()
+
+def _run_warm_up():
+    global LLM_API_CONFIGURED, LLM_ERROR_MESSAGE
     try:
-        model_domain = llm.get_model("gemini-2.0-flash")
-        print("✅ Successfully configured Gemini 2.0 Flash for domain detection")
+        results = pqp.warm_up(status=WARM_UP_STATUS)
+        llm_result = results.get("llm_clients", {})
+        LLM_API_CONFIGURED = llm_result.get("success", False)
+        if LLM_API_CONFIGURED:
+            errors = llm_result["details"].get("errors") or {}
+            LLM_ERROR_MESSAGE = "; ".join(f"{name}: {error}" for name, error in errors.items()) or None
+            print("✅ LLM API configured successfully")
+        else:
+            LLM_ERROR_MESSAGE = llm_result.get("error")
+            print(f"⚠️ Warning: LLM API not properly configured: {LLM_ERROR_MESSAGE}")
+            print("You need to set Gemini API keys in environment variables.")
+            print("1. Create a .env file in text_to_pydough/ directory with: GEMINI_API_KEY=your_api_key")
+            print("   OR")
+            print("2. Run: source venv/bin/activate && llm keys set gemini")
+        WARM_UP_STATUS["state"] = "ready"
     except Exception as e:
-        print(f"⚠️ Warning: Could not load gemini-2.0-flash: {e}")
-        
-    # If we got here, at least one model is working
-    LLM_API_CONFIGURED = True
-    PYDOUGH_AVAILABLE = True
-    print("✅ LLM API configured successfully")
-except Exception as e:
-    LLM_ERROR_MESSAGE = str(e)
-    PYDOUGH_AVAILABLE = True
-    print(f"⚠️ Warning: LLM API not properly configured: {e}")
-    print("You need to set Gemini API keys in environment variables.")
-    print("1. Create a .env file in text_to_pydough/ directory with: GEMINI_API_KEY=your_api_key")
-    print("   OR")
-    print("2. Run: source venv/bin/activate && llm keys set gemini")
+        print(f"❌ Warm-up failed: {str(e)}")
+        WARM_UP_STATUS["state"] = "failed"
+        WARM_UP_STATUS["error"] = str(e)
+    finally:
+        WARM_UP_STATUS["finished_at"] = datetime.now().isoformat()
+
+def start_warm_up():
+    """Start the background warm-up once; later calls are no-ops."""
+    with _WARM_UP_LOCK:
+        if WARM_UP_STATUS["state"] != "pending":
+            return
+        WARM_UP_STATUS["state"] = "warming"
+        WARM_UP_STATUS["started_at"] = datetime.now().isoformat()
+    threading.Thread(target=_run_warm_up, name="warm-up", daemon=True).start()
+
+def overloaded_response(e):
+    """429 response for a request shed by admission control."""
+    response = jsonify({
+        "success": False,
+        "error": str(e),
+        "lane": e.lane,
+        "reason": e.reason,
+        "retry_after": e.retry_after
+    })
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+def admission_controlled(view):
+    """
+    Run a route that calls the LLM or the executor under admission control:
+    in the lane named by the X-PyDough-Lane header, counted against the
+    client's in-flight limit (see admission.client_key). Both headers are
+    only honoured from trusted callers (see admission.trusted_caller).
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = get_admission_controller()
+        forwarded_for = request.headers.get(FORWARDED_FOR_HEADER)
+        trusted = trusted_caller(forwarded_for, request.remote_addr)
+        client = client_key(request.headers.get(CLIENT_HEADER), forwarded_for, request.remote_addr)
+        try:
+            ticket = controller.acquire(request.headers.get(LANE_HEADER), client, trusted)
+        except Overloaded as e:
+            return overloaded_response(e)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        try:
+            return view(*args, **kwargs)
+        finally:
+            controller.release(ticket)
+    return wrapper
+
+@app.route("/api/ready", methods=["GET"])
+def get_ready():
+    """
+    Readiness probe: 200 once the warm-up has finished, 503 while it is running.
+    The first call starts the warm-up if the server was not started via __main__.
+    """
+    start_warm_up()
+    ready = WARM_UP_STATUS["state"] in ("ready", "failed")
+    body = dict(WARM_UP_STATUS, ready=ready)
+    return jsonify(body), 200 if ready else 503
 
 @app.route("/api/status", methods=["GET"])
 def get_status():
@@ -107,8 +181,9 @@ def get_status():
         "status": "ok",
         "version": "1.0.0",
         "llm_configured": LLM_API_CONFIGURED,
-        "langgraph_available": LANGGRAPH_AVAILABLE if 'LANGGRAPH_AVAILABLE' in globals() else False,
+        "langgraph_available": bool(LANGGRAPH_AVAILABLE),
         "pydough_available": PYDOUGH_AVAILABLE,
+        "ready": WARM_UP_STATUS["state"] in ("ready", "failed"),
         "databases": list(pqp.DOMAINS.keys()) if PYDOUGH_AVAILABLE else [],
         "error": LLM_ERROR_MESSAGE
     }
@@ -234,19 +309,16 @@ def list_databases():
                 ]
             })
             
-        # Get the domains from the PyDough processor
+        # Discovered domains, served from the in-memory catalog
         domains = []
         for domain_name, config in pqp.DOMAINS.items():
-            # Check if database file exists
-            db_path = config['database_file']
-            exists = os.path.exists(db_path)
-            
             domains.append({
                 "name": domain_name,
                 "keywords": config["keywords"],
                 "metadataFile": config["metadata_file"],
-                "databaseFile": db_path,
-                "exists": True  # Always mark as exists for better user experience
+                "databaseFile": config["database_file"],
+                "version": config["version"],
+                "exists": True  # Catalog entries always have their database and metadata files
             })
             
         return jsonify({
@@ -331,7 +403,63 @@ def get_metadata(domain):
         
         return jsonify({
             "success": True,
-            "metadata": metadata
+            "metadata": metadata,
+            "version": pqp.DOMAINS[domain]["asset_versions"]["metadata"]
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+# One statistics refresh at a time; they read whole tables
+_STATISTICS_LOCK = threading.Lock()
+
+@app.route("/api/statistics/<domain>", methods=["GET"])
+def get_statistics(domain):
+    """
+    Get column statistics (row counts, distinct counts, min/max, top values and
+    histograms) for a domain. They are computed on first request; pass refresh=true
+    to refresh changed tables, full=true to recompute all, table=<name> to filter.
+    """
+    try:
+        if domain not in pqp.DOMAINS:
+            return jsonify({
+                "success": False,
+                "error": f"Domain {domain} not found"
+            }), 404
+
+        db_path = pqp.DOMAINS[domain]["database_file"]
+        if not os.path.exists(db_path):
+            return jsonify({
+                "success": False,
+                "error": f"Database file for {domain} not found"
+            }), 404
+
+        refresh = request.args.get("refresh", "false").lower() == "true"
+        full = request.args.get("full", "false").lower() == "true"
+        refreshed = []
+        statistics = None
+        if not (refresh or full):
+            statistics = column_statistics.load_statistics(column_statistics.get_statistics_path(db_path))
+        if statistics is None:
+            with _STATISTICS_LOCK:
+                statistics, refreshed = column_statistics.update_statistics(db_path, full=full)
+
+        table = request.args.get("table")
+        if table:
+            if table not in statistics["tables"]:
+                return jsonify({
+                    "success": False,
+                    "error": f"Table {table} not found in {domain}"
+                }), 404
+            statistics = dict(statistics, tables={table: statistics["tables"][table]})
+
+        return jsonify({
+            "success": True,
+            "domain": domain,
+            "statistics": statistics,
+            "refreshed_tables": refreshed
         })
     except Exception as e:
         return jsonify({
@@ -340,6 +468,7 @@ def get_metadata(domain):
         }), 500
 
 @app.route("/api/detect-domain", methods=["POST"])
+@admission_controlled
 def detect_domain():
     """Detect domain for a natural language query"""
     try:
@@ -368,6 +497,7 @@ def detect_domain():
         }), 500
 
 @app.route("/api/query", methods=["POST"])
+@admission_controlled
 def process_query():
     """Process a natural language query using the PyDough processor."""
     if not PYDOUGH_AVAILABLE:
@@ -386,20 +516,37 @@ def process_query():
     history = data.get("history", None) # Optional: conversation history
     # --- Get execute flag directly from request --- 
     execute_code_flag = data.get("execute", False) 
+    # Lets through queries the cost guard held for confirmation
+    confirm_flag = data.get("confirm", False)
     
     if not query_text:
         return jsonify({"success": False, "error": "Missing 'query_text' in request"}), 400
+
+    try:
+        # Optional execution time budget in seconds (defaults to the domain's budget)
+        timeout = pqp.validate_timeout(data.get("timeout"))
+        # Optional client-chosen id, so the query can be cancelled while it is still running
+        query_id = pqp.validate_query_id(data.get("query_id"))
+        # Preview-first: return the first rows quickly, full result follows via /api/query/<id>/execute
+        preview_rows = (pqp.validate_preview_rows(data.get("preview_rows")) or pqp.PREVIEW_ROWS) if data.get("preview", True) else None
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
         
     print(f"Received query: '{query_text}', Domain hint: {domain}, History: {bool(history)}, Execute: {execute_code_flag}")
     
     try:
         # --- Pass execute flag to the processor --- 
-        result_data = _pqp.process_query(
+        # Identical queries already in flight are shared rather than recomputed
+        result_data = _pqp.process_query_coalesced(
             query_text,
             execute=execute_code_flag, # Pass the flag here
             save_results=True, # Always save results from API calls
             domain=domain,
-            history=history
+            history=history,
+            confirm=confirm_flag,
+            preview_rows=preview_rows,
+            timeout=timeout,
+            query_id=query_id
         )
         
         # Add success flag to the result data before returning
@@ -414,6 +561,9 @@ def process_query():
         print("Returning result from /api/query:", json.dumps(result_data, indent=2, default=str)[:500] + "...") # Log first 500 chars
         return jsonify(result_data)
         
+    except ValueError as e:
+        # The query_id was taken by another request in the meantime
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         print(f"❌ Unhandled Exception in /api/query: {str(e)}")
         print(traceback.format_exc()) # Print full traceback for debugging
@@ -422,6 +572,222 @@ def process_query():
             "error": f"An unexpected server error occurred: {str(e)}"
         }), 500
 
+@app.route("/api/query/<query_id>/execute", methods=["POST"])
+@admission_controlled
+def execute_stored_query(query_id):
+    """Execute (or return the cached full result of) code generated or previewed by an earlier /api/query call."""
+    if not PYDOUGH_AVAILABLE:
+        return jsonify({"success": False, "error": "PyDough processor not available"}), 500
+
+    data = request.get_json(silent=True) or {}
+    try:
+        timeout = pqp.validate_timeout(data.get("timeout"))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    try:
+        result_data = pqp.execute_stored_query(
+            query_id,
+            confirm=data.get("confirm", False),
+            timeout=timeout
+        )
+        return jsonify(result_data)
+    except FileNotFoundError:
+        return jsonify({
+            "success": False,
+            "error": f"Query {query_id} not found"
+        }), 404
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/query/{query_id}/execute: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
+@app.route("/api/query/<query_id>/cancel", methods=["POST"])
+def cancel_query(query_id):
+    """Cancel the running execution of a query; the executor worker stays alive."""
+    if not PYDOUGH_AVAILABLE:
+        return jsonify({"success": False, "error": "PyDough processor not available"}), 500
+
+    try:
+        cancelled = pqp.cancel_query(query_id)
+        return jsonify({
+            "success": True,
+            "query_id": query_id,
+            "cancelled": cancelled,
+            "message": "Cancellation requested" if cancelled else "No running query with this id"
+        })
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/query/{query_id}/cancel: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
+@app.route("/api/executor/stats", methods=["GET"])
+def get_executor_stats():
+    """Executor scheduler state: loaded domains per worker and cache hit rates per domain."""
+    try:
+        from pydough_executor import get_executor_stats as executor_stats
+        stats = executor_stats()
+        if stats is None:
+            return jsonify({"success": True, "running": False})
+        return jsonify(dict(stats, success=True, running=True))
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/executor/stats: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
+@app.route("/api/single-flight/stats", methods=["GET"])
+def get_single_flight_stats():
+    """How many /api/query calls were coalesced with an identical in-flight query."""
+    try:
+        return jsonify(dict(pqp.QUERY_FLIGHTS.stats(), success=True, enabled=pqp.SINGLE_FLIGHT_ENABLED))
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/single-flight/stats: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
+@app.route("/api/admission/stats", methods=["GET"])
+def get_admission_stats():
+    """Admission control state: slots in use, and per lane running/queued requests, shed counts and queue waits."""
+    try:
+        return jsonify(dict(get_admission_controller().stats(), success=True))
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/admission/stats: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
+@app.route("/api/hedging/stats", methods=["GET"])
+def get_hedging_stats_route():
+    """Request hedging settings and, per model, latency percentiles, the hedge threshold and hedge counters."""
+    try:
+        return jsonify(dict(get_hedging_stats(), success=True))
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/hedging/stats: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
+@app.route("/api/explain", methods=["POST"])
+@admission_controlled
+def explain_query():
+    """
+    Dry run a query: return the translated SQL and SQLite query plan without fetching rows.
+    Accepts either pydough_code + domain, a query_id from an earlier /api/query call,
+    or query_text (code is generated first, without execution).
+    """
+    if not PYDOUGH_AVAILABLE:
+        return jsonify({"success": False, "error": "PyDough processor not available"}), 500
+
+    if not request.is_json:
+        return jsonify({"success": False, "error": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    pydough_code = data.get("pydough_code")
+    domain = data.get("domain")
+    query_id = data.get("query_id")
+    query_text = data.get("query_text")
+
+    try:
+        if query_id:
+            try:
+                stored = pqp.load_stored_query(query_id)
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            if stored is None:
+                return jsonify({"success": False, "error": f"Query {query_id} not found"}), 404
+            pydough_code, domain = stored
+
+        if pydough_code:
+            if domain not in pqp.DOMAINS:
+                return jsonify({"success": False, "error": f"Domain {domain} not found"}), 404
+            domain_info = (domain, pqp.DOMAINS[domain]["metadata_file"], pqp.DOMAINS[domain]["database_file"])
+            explain_result = pqp.explain_generated_code(pydough_code, domain_info)
+            explain_result.update({"domain": domain, "pydough_code": pydough_code, "query_id": query_id})
+            return jsonify(explain_result)
+
+        if query_text:
+            result_data = pqp.process_query(query_text, execute=False, save_results=True, domain=domain, explain=True)
+            explain_result = result_data.get("explain") or {
+                "success": False,
+                "error": "PyDough code generation failed, so there is nothing to explain."
+            }
+            explain_result.update({
+                "domain": result_data.get("domain"),
+                "pydough_code": result_data.get("pydough_code"),
+                "query_id": result_data.get("query_id")
+            })
+            return jsonify(explain_result)
+
+        return jsonify({
+            "success": False,
+            "error": "Provide 'pydough_code' and 'domain', 'query_id', or 'query_text'"
+        }), 400
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/explain: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
+@app.route("/api/engines/compare", methods=["POST"])
+@admission_controlled
+def compare_query_engines():
+    """
+    Run a query's SQL on SQLite and DuckDB side by side and check the results match.
+    Accepts pydough_code + domain, or a query_id from an earlier /api/query call.
+    """
+    if not request.is_json:
+        return jsonify({"success": False, "error": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    pydough_code = data.get("pydough_code")
+    domain = data.get("domain")
+    query_id = data.get("query_id")
+
+    try:
+        if query_id:
+            try:
+                stored = pqp.load_stored_query(query_id)
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            if stored is None:
+                return jsonify({"success": False, "error": f"Query {query_id} not found"}), 404
+            pydough_code, domain = stored
+
+        if not pydough_code:
+            return jsonify({"success": False, "error": "Provide 'pydough_code' and 'domain', or 'query_id'"}), 400
+        if domain not in pqp.DOMAINS:
+            return jsonify({"success": False, "error": f"Domain {domain} not found"}), 404
+
+        from pydough_executor import compare_engines
+        domain_info = (domain, pqp.DOMAINS[domain]["metadata_file"], pqp.DOMAINS[domain]["database_file"])
+        result = compare_engines(pydough_code, domain_info)
+        result.update({"domain": domain, "pydough_code": pydough_code, "query_id": query_id})
+        return jsonify(result)
+    except Exception as e:
+        print(f"❌ Unhandled Exception in /api/engines/compare: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"An unexpected server error occurred: {str(e)}"
+        }), 500
+
 @app.route("/api/history", methods=["GET"])
 def get_history():
     """Get query history from saved results"""
@@ -490,6 +856,7 @@ def get_result_file(filename):
     return send_from_directory(RESULTS_DIR, filename)
 
 @app.route("/api/query-lg", methods=["POST"])
+@admission_controlled
 def process_query_langgraph():
     """Process a query using LangGraph implementation."""
     if not PYDOUGH_AVAILABLE:
@@ -498,7 +865,7 @@ def process_query_langgraph():
             "error": "PyDough processor not available"
         }), 500
         
-    if not 'LANGGRAPH_AVAILABLE' in globals() or not LANGGRAPH_AVAILABLE:
+    if get_langgraph() is None:
         return jsonify({
             "success": False,
             "error": "LangGraph implementation not available"
@@ -605,51 +972,24 @@ def process_query_langgraph():
 # --- API: List DBs and schema status (Fortified) ---
 @app.route('/api/databases/status', methods=['GET'])
 def api_databases_status():
-    DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-    result = []
+    """Metadata status of every .db file in data/, from the in-memory domain catalog"""
     try:
-        if not os.path.isdir(DATA_DIR):
+        if not os.path.isdir(DOMAIN_CATALOG.data_dir):
             return jsonify({"error": "Data directory not found", "databases": []}), 500
-        
-        # Get all files in the directory
-        all_files = os.listdir(DATA_DIR)
-        
-        # Find all .db files
-        dbs = [f for f in all_files if f.lower().endswith('.db')]
-        
-        # For each DB, check if metadata files exist (case-insensitive)
-        for db_filename in dbs:
-            base_name = os.path.splitext(db_filename)[0]
-            display_name = base_name
-            base_name_lower = base_name.lower()
-            
-            # Case-insensitive check for JSON metadata - check multiple possible patterns
-            # to support both our new format (basename.json) and legacy formats (_graph.json, etc.)
-            has_json = any(
-                f.lower() == f"{base_name_lower}.json" or
-                f.lower() == f"{base_name_lower}_graph.json" or
-                (f.lower().startswith(base_name_lower) and f.lower().endswith('_graph.json')) or
-                (f.lower().startswith(base_name_lower) and f.lower().endswith('_demo_graph.json'))
-                for f in all_files
-            )
-            
-            # Case-insensitive check for MD file
-            has_md = any(
-                f.lower() == f"{base_name_lower}.md"
-                for f in all_files
-            )
-            
-            # Debug info
-            print(f"DB: {db_filename}, Base: {base_name}, Has JSON: {has_json}, Has MD: {has_md}")
-            
-            result.append({
-                "db_filename": db_filename,
-                "display_name": display_name,
-                "base_name": base_name,
-                "has_json": has_json,
-                "has_md": has_md
-            })
-        
+
+        result = [
+            {
+                "db_filename": entry["db_filename"],
+                "display_name": entry["base_name"],
+                "base_name": entry["base_name"],
+                "domain": name,
+                "has_json": entry["has_json"],
+                "has_md": entry["has_md"],
+                "version": entry["version"],
+                "asset_versions": entry["asset_versions"]
+            }
+            for name, entry in DOMAIN_CATALOG.all_databases().items()
+        ]
         return jsonify(result)
     except Exception as e:
         import traceback
@@ -659,7 +999,11 @@ def api_databases_status():
 
 @app.route('/api/databases/generate-metadata', methods=['POST'])
 def api_generate_metadata():
-    DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+    """
+    Start a background metadata generation job for a database in data/.
+    Returns 202 with the job; poll GET /api/databases/generate-metadata/<job_id>.
+    """
+    DATA_DIR = DOMAIN_CATALOG.data_dir
     data = request.get_json()
     db_filename = data.get('db_filename')
     if not db_filename or not db_filename.endswith('.db'):
@@ -667,55 +1011,51 @@ def api_generate_metadata():
     db_full_path = os.path.join(DATA_DIR, db_filename)
     if not os.path.exists(db_full_path):
         return jsonify({"success": False, "error": "Database file not found"}), 404
-    
-    script_path = os.path.join(os.path.dirname(__file__), 'generate_pydough_metadata.py')
-    python_executable = sys.executable
-    command = [python_executable, script_path, '--db', db_full_path]
-    
-    # Debug: Log the command we're about to run
-    print(f"Running metadata generation command: {' '.join(command)}")
-    
+
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-        
-        # Print stdout for debugging
-        if result.stdout:
-            print(f"Metadata generation stdout: {result.stdout}")
-        
-        # Print stderr if any
-        if result.stderr:
-            print(f"Metadata generation stderr: {result.stderr}")
-            
-        if result.returncode == 0:
-            # Refresh the database scan
-            # Re-check if the files now exist
-            base_name = os.path.splitext(db_filename)[0]
-            base_name_lower = base_name.lower()
-            json_path = os.path.join(DATA_DIR, f"{base_name_lower}.json")
-            md_path = os.path.join(DATA_DIR, f"{base_name_lower}.md")
-            
-            return jsonify({
-                "success": True, 
-                "message": "Metadata generated successfully.",
-                "details": {
-                    "db_path": db_full_path,
-                    "json_path": f"{base_name_lower}.json",
-                    "md_path": f"{base_name_lower}.md",
-                    "json_exists": os.path.exists(json_path),
-                    "md_exists": os.path.exists(md_path)
-                }
-            })
-        else:
-            return jsonify({
-                "success": False, 
-                "error": result.stderr or "Script execution failed.",
-                "stdout": result.stdout,
-                "returncode": result.returncode
-            }), 500
+        # By default only collections whose table definition changed are regenerated
+        job, created = metadata_jobs.start_metadata_job(db_full_path, full=bool(data.get('full')))
+        print(f"Metadata generation job {job['job_id']} for {db_filename} ({'started' if created else 'already running'})")
+        return jsonify({
+            "success": True,
+            "message": "Metadata generation started." if created else "Metadata generation is already running.",
+            "job_id": job["job_id"],
+            "job": job
+        }), 202 if created else 200
     except Exception as e:
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/databases/generate-metadata', methods=['GET'])
+def api_list_metadata_jobs():
+    """List recent metadata generation jobs, newest first."""
+    try:
+        return jsonify({"success": True, "jobs": metadata_jobs.list_metadata_jobs()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/databases/generate-metadata/<job_id>', methods=['GET'])
+def api_get_metadata_job(job_id):
+    """Get a metadata generation job's state and per-table progress."""
+    try:
+        job = metadata_jobs.get_metadata_job(job_id)
+        if job is None:
+            return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+        return jsonify({"success": True, "job": job})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/databases/generate-metadata/<job_id>/cancel', methods=['POST'])
+def api_cancel_metadata_job(job_id):
+    """Cancel a metadata generation job; it stops at the next table boundary."""
+    try:
+        job = metadata_jobs.cancel_metadata_job(job_id)
+        if job is None:
+            return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+        return jsonify({"success": True, "job": job})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 if __name__ == "__main__":
     # Show status message about PyDough availability
     if not PYDOUGH_AVAILABLE:
@@ -724,15 +1064,12 @@ if __name__ == "__main__":
         print("Install required dependencies to enable full functionality:")
         print("  pip install llm>=0.25")
         print("="*80 + "\n")
-    elif not LLM_API_CONFIGURED:
-        print("\n" + "="*80)
-        print("WARNING: Gemini API key not configured")
-        print("To fix this, run the following commands:")
-        print("  cd text_to_pydough")
-        print("  source venv/bin/activate")
-        print("  llm keys set gemini")
-        print("="*80 + "\n")
-    
+    # The Gemini API key check now runs as part of the background warm-up
+
     # Start the Flask app
     port = int(os.environ.get("PORT", 5001))
-    app.run(host="0.0.0.0", port=port, debug=True) 
\ No newline at end of file
+    debug = True
+    # With the reloader on, only the child process that serves requests warms up
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warm_up()
+    app.run(host="0.0.0.0", port=port, debug=debug) 
\ No newline at end of file
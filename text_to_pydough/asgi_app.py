@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ASGI API for PyDough Query Processor
+
+Serves the same routes as the Flask app in app.py. The routes that spend
+their time waiting on the LLM or the executor are native async handlers:
+
+- POST /api/query
+- POST /api/query/<query_id>/execute
+- POST /api/detect-domain
+- POST /api/explain
+- POST /api/engines/compare
+
+They await llm's async model clients and the executor pool's pipes (see
+pydough_query_processor.process_query_async and ExecutorPool.run_async), so an
+in-flight query costs a coroutine rather than a thread, and one process can
+hold hundreds of them. Every other route (metadata, history, databases,
+readiness, /api/query-lg, ...) is the Flask app itself, mounted through a WSGI
+bridge that runs it on a small thread pool, so those routes behave exactly as
+they do under `python app.py`.
+
+Worker model:
+
+- `python asgi_app.py` serves the app with uvicorn; `--workers N` (or
+  PYDOUGH_ASGI_WORKERS) starts N server processes sharing the port.
+- Each server process has one event loop, its own warm-up, and its own pool
+  of PYDOUGH_EXECUTOR_WORKERS executor processes. N server processes
+  therefore run N x PYDOUGH_EXECUTOR_WORKERS executors and hold N copies of
+  the LLM clients and loaded domain sessions.
+- Within a process, LLM calls are not limited: they wait concurrently on the
+  network. Executions run one per executor process; queries waiting for an
+  executor are queued futures, not blocked threads.
+- The Flask routes share PYDOUGH_WSGI_THREADS threads per process.
+
+Size the server processes for CPU (prompt building, response parsing and JSON
+encoding run on the event loop), and the executors for the query load.
+"""
+
+import os
+import json
+import asyncio
+import argparse
+import functools
+import traceback
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+from a2wsgi import WSGIMiddleware
+
+import app as flask_api
+import pydough_query_processor as pqp
+from pydough_executor import compare_engines_async, shutdown_executor_pool
+from admission import get_admission_controller, client_key, trusted_caller, Overloaded, LANE_HEADER, CLIENT_HEADER, FORWARDED_FOR_HEADER
+
+HOST = os.environ.get("PYDOUGH_ASGI_HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", 5001))
+# Server processes, each with its own event loop and executor pool
+ASGI_WORKERS = int(os.environ.get("PYDOUGH_ASGI_WORKERS", 1))
+# Threads per server process for the routes served by the Flask app
+WSGI_THREADS = int(os.environ.get("PYDOUGH_WSGI_THREADS", 10))
+
+class JSONResult(JSONResponse):
+    """JSON response encoded like the saved query records (non-serializable values as strings)."""
+
+    def render(self, content):
+        return json.dumps(content, default=str).encode("utf-8")
+
+def server_error(route, e):
+    print(f"❌ Unhandled Exception in {route}: {str(e)}")
+    print(traceback.format_exc())
+    return JSONResult({
+        "success": False,
+        "error": f"An unexpected server error occurred: {str(e)}"
+    }, status_code=500)
+
+def is_json(request):
+    """Same check as Flask's request.is_json."""
+    mimetype = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    return mimetype == "application/json" or (mimetype.startswith("application/") and mimetype.endswith("+json"))
+
+async def json_body(request):
+    """The request's JSON object, or {} if it has none (like get_json(silent=True))."""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def admission_controlled(handler):
+    """Async counterpart of app.admission_controlled: waiting for a slot does not hold a thread."""
+    @functools.wraps(handler)
+    async def wrapper(request):
+        controller = get_admission_controller()
+        forwarded_for = request.headers.get(FORWARDED_FOR_HEADER)
+        remote_addr = request.client.host if request.client else None
+        trusted = trusted_caller(forwarded_for, remote_addr)
+        client = client_key(request.headers.get(CLIENT_HEADER), forwarded_for, remote_addr)
+        try:
+            ticket = await controller.acquire_async(request.headers.get(LANE_HEADER), client, trusted)
+        except Overloaded as e:
+            return JSONResult({
+                "success": False,
+                "error": str(e),
+                "lane": e.lane,
+                "reason": e.reason,
+                "retry_after": e.retry_after
+            }, status_code=429, headers={"Retry-After": str(e.retry_after)})
+        except ValueError as e:
+            return JSONResult({"success": False, "error": str(e)}, status_code=400)
+        try:
+            return await handler(request)
+        finally:
+            controller.release(ticket)
+    return wrapper
+
+@admission_controlled
+async def detect_domain(request):
+    """Detect domain for a natural language query"""
+    try:
+        data = await request.json()
+        query = data.get("query")
+
+        if not query:
+            return JSONResult({
+                "success": False,
+                "error": "Query is required"
+            }, status_code=400)
+
+        domain_name, metadata_file, db_file = await pqp.detect_domain_async(query)
+
+        return JSONResult({
+            "success": True,
+            "domain": domain_name,
+            "metadataFile": metadata_file,
+            "databaseFile": db_file
+        })
+    except Exception as e:
+        return JSONResult({
+            "success": False,
+            "error": str(e)
+        }, status_code=500)
+
+@admission_controlled
+async def process_query(request):
+    """Process a natural language query using the PyDough processor."""
+    if not is_json(request):
+        return JSONResult({"success": False, "error": "Request must be JSON"}, status_code=400)
+
+    data = await json_body(request)
+    query_text = data.get("query_text")
+    domain = data.get("domain")
+    history = data.get("history", None)
+    execute_code_flag = data.get("execute", False)
+    confirm_flag = data.get("confirm", False)
+
+    if not query_text:
+        return JSONResult({"success": False, "error": "Missing 'query_text' in request"}, status_code=400)
+
+    try:
+        timeout = pqp.validate_timeout(data.get("timeout"))
+        query_id = pqp.validate_query_id(data.get("query_id"))
+        preview_rows = (pqp.validate_preview_rows(data.get("preview_rows")) or pqp.PREVIEW_ROWS) if data.get("preview", True) else None
+    except ValueError as e:
+        return JSONResult({"success": False, "error": str(e)}, status_code=400)
+
+    print(f"Received query: '{query_text}', Domain hint: {domain}, History: {bool(history)}, Execute: {execute_code_flag}")
+
+    try:
+        result_data = await pqp.process_query_coalesced_async(
+            query_text,
+            execute=execute_code_flag,
+            save_results=True,
+            domain=domain,
+            history=history,
+            confirm=confirm_flag,
+            preview_rows=preview_rows,
+            timeout=timeout,
+            query_id=query_id
+        )
+
+        result_data["success"] = True
+        if "error" in result_data:
+            result_data["success"] = False
+            print(f"Error reported by process_query: {result_data['error']}")
+
+        print("Returning result from /api/query:", json.dumps(result_data, indent=2, default=str)[:500] + "...") # Log first 500 chars
+        return JSONResult(result_data)
+    except ValueError as e:
+        # The query_id was taken by another request in the meantime
+        return JSONResult({"success": False, "error": str(e)}, status_code=400)
+    except Exception as e:
+        return server_error("/api/query", e)
+
+@admission_controlled
+async def execute_stored_query(request):
+    """Execute (or return the cached full result of) code generated or previewed by an earlier /api/query call."""
+    query_id = request.path_params["query_id"]
+    data = await json_body(request)
+    try:
+        timeout = pqp.validate_timeout(data.get("timeout"))
+    except ValueError as e:
+        return JSONResult({"success": False, "error": str(e)}, status_code=400)
+    try:
+        result_data = await pqp.execute_stored_query_async(
+            query_id,
+            confirm=data.get("confirm", False),
+            timeout=timeout
+        )
+        return JSONResult(result_data)
+    except FileNotFoundError:
+        return JSONResult({
+            "success": False,
+            "error": f"Query {query_id} not found"
+        }, status_code=404)
+    except Exception as e:
+        return server_error(f"/api/query/{query_id}/execute", e)
+
+@admission_controlled
+async def explain_query(request):
+    """
+    Dry run a query: return the translated SQL and SQLite query plan without fetching rows.
+    Accepts either pydough_code + domain, a query_id from an earlier /api/query call,
+    or query_text (code is generated first, without execution).
+    """
+    if not is_json(request):
+        return JSONResult({"success": False, "error": "Request must be JSON"}, status_code=400)
+
+    data = await json_body(request)
+    pydough_code = data.get("pydough_code")
+    domain = data.get("domain")
+    query_id = data.get("query_id")
+    query_text = data.get("query_text")
+
+    try:
+        if query_id:
+            try:
+                stored = await asyncio.to_thread(pqp.load_stored_query, query_id)
+            except ValueError as e:
+                return JSONResult({"success": False, "error": str(e)}, status_code=400)
+            if stored is None:
+                return JSONResult({"success": False, "error": f"Query {query_id} not found"}, status_code=404)
+            pydough_code, domain = stored
+
+        if pydough_code:
+            if domain not in pqp.DOMAINS:
+                return JSONResult({"success": False, "error": f"Domain {domain} not found"}, status_code=404)
+            domain_info = (domain, pqp.DOMAINS[domain]["metadata_file"], pqp.DOMAINS[domain]["database_file"])
+            explain_result = await pqp.explain_generated_code_async(pydough_code, domain_info)
+            explain_result.update({"domain": domain, "pydough_code": pydough_code, "query_id": query_id})
+            return JSONResult(explain_result)
+
+        if query_text:
+            result_data = await pqp.process_query_async(query_text, execute=False, save_results=True, domain=domain, explain=True)
+            explain_result = result_data.get("explain") or {
+                "success": False,
+                "error": "PyDough code generation failed, so there is nothing to explain."
+            }
+            explain_result.update({
+                "domain": result_data.get("domain"),
+                "pydough_code": result_data.get("pydough_code"),
+                "query_id": result_data.get("query_id")
+            })
+            return JSONResult(explain_result)
+
+        return JSONResult({
+            "success": False,
+            "error": "Provide 'pydough_code' and 'domain', 'query_id', or 'query_text'"
+        }, status_code=400)
+    except Exception as e:
+        return server_error("/api/explain", e)
+
+@admission_controlled
+async def compare_query_engines(request):
+    """
+    Run a query's SQL on SQLite and DuckDB side by side and check the results match.
+    Accepts pydough_code + domain, or a query_id from an earlier /api/query call.
+    """
+    if not is_json(request):
+        return JSONResult({"success": False, "error": "Request must be JSON"}, status_code=400)
+
+    data = await json_body(request)
+    pydough_code = data.get("pydough_code")
+    domain = data.get("domain")
+    query_id = data.get("query_id")
+
+    try:
+        if query_id:
+            try:
+                stored = await asyncio.to_thread(pqp.load_stored_query, query_id)
+            except ValueError as e:
+                return JSONResult({"success": False, "error": str(e)}, status_code=400)
+            if stored is None:
+                return JSONResult({"success": False, "error": f"Query {query_id} not found"}, status_code=404)
+            pydough_code, domain = stored
+
+        if not pydough_code:
+            return JSONResult({"success": False, "error": "Provide 'pydough_code' and 'domain', or 'query_id'"}, status_code=400)
+        if domain not in pqp.DOMAINS:
+            return JSONResult({"success": False, "error": f"Domain {domain} not found"}, status_code=404)
+
+        domain_info = (domain, pqp.DOMAINS[domain]["metadata_file"], pqp.DOMAINS[domain]["database_file"])
+        result = await compare_engines_async(pydough_code, domain_info)
+        result.update({"domain": domain, "pydough_code": pydough_code, "query_id": query_id})
+        return JSONResult(result)
+    except Exception as e:
+        return server_error("/api/engines/compare", e)
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Same background warm-up as `python app.py`; /api/ready reports its progress
+    flask_api.start_warm_up()
+    yield
+    shutdown_executor_pool()
+
+app = Starlette(
+    routes=[
+        Route("/api/query", process_query, methods=["POST"]),
+        Route("/api/query/{query_id}/execute", execute_stored_query, methods=["POST"]),
+        Route("/api/detect-domain", detect_domain, methods=["POST"]),
+        Route("/api/explain", explain_query, methods=["POST"]),
+        Route("/api/engines/compare", compare_query_engines, methods=["POST"]),
+        # Everything else is served by the Flask app
+        Mount("/", app=WSGIMiddleware(flask_api.app, workers=WSGI_THREADS)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=flask_api.CORS_ORIGINS, allow_methods=["*"], allow_headers=["*"])
+    ],
+    lifespan=lifespan
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the PyDough API with uvicorn (async routes, see the module docstring for the worker model)")
+    parser.add_argument("--host", default=HOST, help=f"Interface to bind (default {HOST})")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Port to bind (default {PORT}, or PORT)")
+    parser.add_argument("--workers", type=int, default=ASGI_WORKERS, help="Server processes (default PYDOUGH_ASGI_WORKERS or 1)")
+    parser.add_argument("--log-level", default="info", help="uvicorn log level")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    print(f"🚀 Serving PyDough API on {args.host}:{args.port} with {args.workers} worker process(es)")
+    uvicorn.run(
+        "asgi_app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        # Requests are logged by the handlers themselves
+        access_log=False
+    )
+
+if __name__ == "__main__":
+    main()
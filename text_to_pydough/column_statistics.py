@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Column statistics for domain databases
+
+Every table is read once, in batches, and each column is summarized with
+bounded memory:
+
+- null and non-null counts, and counts per storage class
+- approximate distinct count (exact up to STATS_EXACT_DISTINCT values, then HyperLogLog)
+- min/max of the column's dominant storage class
+- top-k frequent values (lossy counting over at most STATS_TOPK_CAPACITY counters)
+- an equi-depth histogram for numeric and date columns, built from a reservoir sample
+
+Results are stored in a sidecar next to the database (<name>.stats.json). Each
+table's entry records a cheap signature (its columns, row count and largest rowid),
+and only tables whose signature changed are read again on the next refresh.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import random
+import sqlite3
+import hashlib
+import argparse
+import concurrent.futures
+import urllib.request
+
+STATS_VERSION = 1
+# Most frequent values reported per column
+STATS_TOP_K = int(os.environ.get("PYDOUGH_STATS_TOP_K", 10))
+# Counters kept per column while looking for frequent values
+STATS_TOPK_CAPACITY = 2000
+# Buckets per histogram, and values sampled per column to build it
+STATS_HISTOGRAM_BUCKETS = int(os.environ.get("PYDOUGH_STATS_HISTOGRAM_BUCKETS", 20))
+STATS_SAMPLE_ROWS = int(os.environ.get("PYDOUGH_STATS_SAMPLE_ROWS", 10000))
+# Distinct values counted exactly before switching to HyperLogLog
+STATS_EXACT_DISTINCT = 10000
+HLL_PRECISION = 12  # 4096 registers, about 1.6% standard error
+STATS_BATCH_ROWS = 5000
+# Longest text value kept in min/max, top values and histogram bounds
+STATS_MAX_VALUE_LENGTH = 200
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+def get_statistics_path(db_path):
+    # Same naming convention as the generated metadata: basename.stats.json next to the .db file
+    db_filename_no_ext = os.path.splitext(os.path.basename(db_path))[0].lower()
+    return os.path.join(os.path.dirname(db_path) or ".", f"{db_filename_no_ext}.stats.json")
+
+def open_readonly_connection(db_path):
+    uri = "file:" + urllib.request.pathname2url(os.path.abspath(db_path)) + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+class HyperLogLog:
+    """Distinct value estimator over a fixed number of registers."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest(), "little")
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Small range correction (linear counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+def _storage_class(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "real"
+    if isinstance(value, str):
+        return "text"
+    return "blob"
+
+def _json_value(value):
+    # Values as they are written to the sidecar
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str) and len(value) > STATS_MAX_VALUE_LENGTH:
+        return value[:STATS_MAX_VALUE_LENGTH] + "..."
+    return value
+
+class ColumnProfile:
+    """Single-pass, bounded-memory summary of one column."""
+
+    def __init__(self, name, declared_type, seed):
+        self.name = name
+        self.declared_type = declared_type or ""
+        self.null_count = 0
+        self.count = 0
+        self.class_counts = {}
+        self.bounds = {}  # storage class -> [min, max]
+        self.distinct = set()
+        self.hll = None
+        self.counters = {}
+        self.max_dropped = 0
+        self.sample = []
+        self.random = random.Random(seed)
+
+    def add(self, value):
+        if value is None:
+            self.null_count += 1
+            return
+        self.count += 1
+        storage_class = _storage_class(value)
+        self.class_counts[storage_class] = self.class_counts.get(storage_class, 0) + 1
+        bounds = self.bounds.get(storage_class)
+        if bounds is None:
+            self.bounds[storage_class] = [value, value]
+        elif value < bounds[0]:
+            bounds[0] = value
+        elif value > bounds[1]:
+            bounds[1] = value
+
+        if self.hll is None:
+            self.distinct.add(value)
+            if len(self.distinct) > STATS_EXACT_DISTINCT:
+                self.hll = HyperLogLog()
+                for seen in self.distinct:
+                    self.hll.add(seen)
+                self.distinct = None
+        else:
+            self.hll.add(value)
+
+        self.counters[value] = self.counters.get(value, 0) + 1
+        if len(self.counters) > STATS_TOPK_CAPACITY:
+            self._prune_counters()
+
+        # Reservoir sample (algorithm R) for the histogram
+        if len(self.sample) < STATS_SAMPLE_ROWS:
+            self.sample.append(value)
+        else:
+            slot = self.random.randrange(self.count)
+            if slot < STATS_SAMPLE_ROWS:
+                self.sample[slot] = value
+
+    def _prune_counters(self):
+        # Keep the most frequent half; counts of values seen again later are
+        # underestimated by at most max_dropped
+        ranked = sorted(self.counters.items(), key=lambda item: item[1], reverse=True)
+        keep = STATS_TOPK_CAPACITY // 2
+        self.max_dropped = max(self.max_dropped, ranked[keep][1])
+        self.counters = dict(ranked[:keep])
+
+    def dominant_class(self):
+        if not self.class_counts:
+            return None
+        return max(self.class_counts, key=self.class_counts.get)
+
+    def is_date(self, storage_class):
+        declared = self.declared_type.upper()
+        if "DATE" in declared or "TIME" in declared:
+            return True
+        if storage_class != "text" or not self.sample:
+            return False
+        matches = sum(1 for value in self.sample[:100] if isinstance(value, str) and DATE_PATTERN.match(value))
+        return matches >= 0.9 * min(len(self.sample), 100)
+
+    def histogram(self, storage_class):
+        values = sorted(value for value in self.sample if _storage_class(value) == storage_class)
+        if not values:
+            return None
+        class_count = self.class_counts[storage_class]
+        step = len(values) / max(1, min(STATS_HISTOGRAM_BUCKETS, len(values)))
+        buckets = []
+        start = 0
+        while start < len(values):
+            end = min(len(values), max(start + 1, int(round((len(buckets) + 1) * step))))
+            # Runs of one value stay in a single bucket
+            while end < len(values) and values[end] == values[end - 1]:
+                end += 1
+            buckets.append({
+                "lower": values[start],
+                "upper": values[end - 1],
+                "count": (end - start) * class_count / len(values)
+            })
+            start = end
+        buckets[0]["lower"] = self.bounds[storage_class][0]
+        buckets[-1]["upper"] = self.bounds[storage_class][1]
+        for bucket in buckets:
+            bucket["lower"] = _json_value(bucket["lower"])
+            bucket["upper"] = _json_value(bucket["upper"])
+            bucket["count"] = int(round(bucket["count"]))
+        return {"type": "equi_depth", "sampled": len(values) < class_count, "buckets": buckets}
+
+    def to_dict(self):
+        total = self.count + self.null_count
+        storage_class = self.dominant_class()
+        if self.hll is None:
+            distinct, distinct_exact = len(self.distinct), True
+        else:
+            distinct, distinct_exact = min(self.hll.estimate(), self.count), False
+
+        top_values = []
+        ranked = sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:STATS_TOP_K]
+        # Skip top values for key-like columns, where every value appears once
+        if ranked and ranked[0][1] > 1:
+            top_values = [{"value": _json_value(value), "count": count} for value, count in ranked]
+
+        stats = {
+            "declared_type": self.declared_type,
+            "null_count": self.null_count,
+            "null_fraction": round(self.null_count / total, 6) if total else 0.0,
+            "distinct_count": distinct,
+            "distinct_exact": distinct_exact,
+            "storage_classes": self.class_counts,
+            "min": _json_value(self.bounds[storage_class][0]) if storage_class else None,
+            "max": _json_value(self.bounds[storage_class][1]) if storage_class else None,
+            "top_values": top_values,
+            "top_values_exact": self.max_dropped == 0,
+            "histogram": None
+        }
+        if storage_class in ("integer", "real"):
+            stats["histogram"] = self.histogram(storage_class)
+        elif storage_class == "text" and self.is_date(storage_class):
+            stats["histogram"] = self.histogram(storage_class)
+            stats["is_date"] = True
+        return stats
+
+def table_signature(conn, table):
+    """
+    Cheap stand-in for the table's contents: its columns, row count and largest
+    rowid. Updates that keep all three the same need a full refresh.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info('{table}')")
+    parts = [cursor.fetchall()]
+    try:
+        cursor.execute(f'SELECT COUNT(*), MAX(rowid) FROM "{table}"')
+    except sqlite3.OperationalError:
+        # WITHOUT ROWID tables
+        cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+    parts.append(cursor.fetchone())
+    return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+def compute_table_statistics(db_path, table):
+    """Read the table once and return (table, statistics dict). Safe to run in a worker process."""
+    started = time.time()
+    conn = open_readonly_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA table_info('{table}')")
+        columns = cursor.fetchall()  # (cid, name, type, notnull, dflt_value, pk)
+        profiles = [ColumnProfile(col[1], col[2], f"{table}.{col[1]}") for col in columns]
+        select_list = ", ".join(f'"{col[1]}"' for col in columns)
+        cursor.execute(f'SELECT {select_list} FROM "{table}"')
+        row_count = 0
+        while True:
+            rows = cursor.fetchmany(STATS_BATCH_ROWS)
+            if not rows:
+                break
+            row_count += len(rows)
+            for row in rows:
+                for profile, value in zip(profiles, row):
+                    profile.add(value)
+        signature = table_signature(conn, table)
+    finally:
+        conn.close()
+    return table, {
+        "signature": signature,
+        "row_count": row_count,
+        "columns": {profile.name: profile.to_dict() for profile in profiles},
+        "computed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(time.time() - started, 3)
+    }
+
+def load_statistics(stats_path):
+    """Load a statistics sidecar, or None if it is missing or from an older version."""
+    if not os.path.exists(stats_path):
+        return None
+    try:
+        with open(stats_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read statistics from {stats_path}: {e}")
+        return None
+    if data.get("version") != STATS_VERSION:
+        return None
+    return data
+
+def _report(progress, table, state):
+    if progress is not None:
+        progress("statistics", table, state)
+
+def update_statistics(db_path, full=False, pool=None, progress=None):
+    """
+    Refresh the statistics sidecar for a database, re-reading only tables whose
+    signature changed (or every table when full=True). pool is an optional
+    concurrent.futures executor to profile tables in parallel. progress, if given, is
+    called as progress("statistics", table, state) and may raise to abort.
+    Returns (statistics dict, list of refreshed tables).
+    """
+    stats_path = get_statistics_path(db_path)
+    previous = {} if full else (load_statistics(stats_path) or {}).get("tables", {})
+
+    conn = open_readonly_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+        tables = [row[0] for row in cursor.fetchall()]
+        signatures = {table: table_signature(conn, table) for table in tables}
+    finally:
+        conn.close()
+
+    stale = [table for table in tables if previous.get(table, {}).get("signature") != signatures[table]]
+    for table in tables:
+        _report(progress, table, "pending" if table in stale else "unchanged")
+    refreshed = {}
+    if pool is not None and len(stale) > 1:
+        futures = {pool.submit(compute_table_statistics, db_path, table): table for table in stale}
+        try:
+            for table in stale:
+                _report(progress, table, "running")
+            for future in concurrent.futures.as_completed(futures):
+                table, table_stats = future.result()
+                refreshed[table] = table_stats
+                _report(progress, table, "done")
+        finally:
+            for future in futures:
+                future.cancel()
+    else:
+        for table in stale:
+            _report(progress, table, "running")
+            refreshed[table] = compute_table_statistics(db_path, table)[1]
+            _report(progress, table, "done")
+
+    statistics = {
+        "version": STATS_VERSION,
+        "database": os.path.basename(db_path),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tables": {table: refreshed.get(table) or previous[table] for table in tables}
+    }
+    if stale or set(previous) != set(tables) or not os.path.exists(stats_path):
+        with open(stats_path, "w") as f:
+            json.dump(statistics, f, indent=2, default=str)
+        print(f"Saved column statistics to {stats_path} ({len(stale)} of {len(tables)} tables refreshed)")
+    return statistics, stale
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute column statistics for a SQLite database")
+    parser.add_argument("--db", required=True, help="Path to the SQLite database")
+    parser.add_argument("--full", action="store_true", help="Recompute every table")
+    args = parser.parse_args()
+    update_statistics(args.db, full=args.full)
+
+if __name__ == "__main__":
+    main()
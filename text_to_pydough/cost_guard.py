@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cost Guard for generated PyDough queries
+
+Before generated code is executed, its SQL plan is inspected (EXPLAIN QUERY PLAN
+plus table row counts, see pydough_executor) and one of these actions is chosen:
+
+- allow:   the query looks cheap, run it as is
+- limit:   run it, but only fetch the first COST_GUARD_PREVIEW_ROWS rows
+- confirm: don't run it until the caller resends the request with confirm=True
+- refuse:  never run it
+
+Thresholds are compared against the estimated number of rows SQLite will visit
+and can be overridden with environment variables.
+"""
+
+import os
+
+from pydough_executor import explain_pydough_code, explain_pydough_code_async
+
+COST_GUARD_ENABLED = os.environ.get("PYDOUGH_COST_GUARD", "1") != "0"
+# Rows fetched when a query is auto-limited
+COST_GUARD_PREVIEW_ROWS = int(os.environ.get("PYDOUGH_GUARD_PREVIEW_ROWS", 1000))
+# Estimated rows visited above which results are auto-limited
+COST_GUARD_LIMIT_ROWS = int(os.environ.get("PYDOUGH_GUARD_LIMIT_ROWS", 100_000))
+# Estimated rows visited above which the caller must confirm
+COST_GUARD_CONFIRM_ROWS = int(os.environ.get("PYDOUGH_GUARD_CONFIRM_ROWS", 5_000_000))
+# Estimated rows visited above which the query is refused outright
+COST_GUARD_REFUSE_ROWS = int(os.environ.get("PYDOUGH_GUARD_REFUSE_ROWS", 500_000_000))
+
+def decide_action(estimated_rows, confirm=False):
+    """
+    Map an estimated scan size to a guard decision dict with
+    action, reason and max_rows (row limit to apply, or None).
+    """
+    if estimated_rows > COST_GUARD_REFUSE_ROWS:
+        return {
+            "action": "refuse",
+            "reason": f"Query would scan about {estimated_rows:,} rows (limit is {COST_GUARD_REFUSE_ROWS:,}). Add filters to narrow it down.",
+            "max_rows": None
+        }
+    if estimated_rows > COST_GUARD_CONFIRM_ROWS and not confirm:
+        return {
+            "action": "confirm",
+            "reason": f"Query would scan about {estimated_rows:,} rows. Resend with confirm=true to run a limited preview.",
+            "max_rows": None
+        }
+    if estimated_rows > COST_GUARD_LIMIT_ROWS:
+        return {
+            "action": "limit",
+            "reason": f"Query would scan about {estimated_rows:,} rows, so only the first {COST_GUARD_PREVIEW_ROWS:,} result rows are fetched.",
+            "max_rows": COST_GUARD_PREVIEW_ROWS
+        }
+    return {"action": "allow", "reason": None, "max_rows": None}
+
+def check_query_cost(pydough_code, domain_info, confirm=False):
+    """
+    Run the pre-execution guard for generated code.
+    Returns the decision dict plus the plan details it was based on.
+    """
+    if not COST_GUARD_ENABLED:
+        return {"action": "allow", "reason": "Cost guard disabled", "max_rows": None}
+
+    explain_result = explain_pydough_code(pydough_code, domain_info)
+    return decide_from_plan(explain_result, confirm=confirm)
+
+async def check_query_cost_async(pydough_code, domain_info, confirm=False):
+    """check_query_cost for an asyncio event loop."""
+    if not COST_GUARD_ENABLED:
+        return {"action": "allow", "reason": "Cost guard disabled", "max_rows": None}
+
+    explain_result = await explain_pydough_code_async(pydough_code, domain_info)
+    return decide_from_plan(explain_result, confirm=confirm)
+
+def decide_from_plan(explain_result, confirm=False):
+    """Guard decision for an explain result from the executor."""
+    if not explain_result.get("success"):
+        # Let execution surface the real error rather than blocking on the estimate
+        return {
+            "action": "allow",
+            "reason": f"Could not estimate query cost: {explain_result.get('error')}",
+            "max_rows": None
+        }
+
+    estimated_rows = explain_result.get("estimated_rows", 0)
+    decision = decide_action(estimated_rows, confirm=confirm)
+    decision.update({
+        "estimated_rows": estimated_rows,
+        "scanned_tables": explain_result.get("scanned_tables", []),
+        "table_rows": explain_result.get("table_rows", {}),
+        "confirmed": bool(confirm)
+    })
+    return decision
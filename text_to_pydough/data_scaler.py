@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic data scaler
+
+Writes a copy of a domain's database grown 10x to 1000x, so serialization and
+execution can be tested at realistic volume. The copy keeps every original
+row and adds synthesized ones:
+
+- keys: unique columns (the metadata's unique properties, primary keys and
+  unique indexes) continue the original sequence (42 -> 43, "C007" -> "C008",
+  emails get a numbered local part), so they stay unique
+- references: columns joined to another collection's key in the metadata graph
+  (or declared as foreign keys) draw from the parent's original and new keys,
+  so joins keep working and fan-out grows with the parent
+- other columns follow the column statistics (column_statistics.py): the null
+  fraction, the frequent values of low-cardinality columns, and the equi-depth
+  histogram of numeric and date columns; text is resampled from the original rows
+
+Columns are drawn independently, so correlations between columns of a row are
+not kept. Copies go to SCALED_DATA_DIR/x<factor>/ under the original file
+names, together with the metadata JSON and schema description, so
+PYDOUGH_DATA_DIR=data/scaled/x100 serves them as the usual domains. Rows are
+inserted with executemany in batches of SCALER_BATCH_ROWS with journaling and
+syncing off, and indexes are built after the load.
+
+Run `python data_scaler.py --domain Broker --factor 100`.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import datetime
+
+from column_statistics import update_statistics, STATS_TOP_K
+
+SCALED_DATA_DIR = os.environ.get("PYDOUGH_SCALED_DATA_DIR", os.path.join("data", "scaled"))
+MIN_SCALE_FACTOR = 2
+MAX_SCALE_FACTOR = 1000
+# Rows generated and inserted per executemany call
+SCALER_BATCH_ROWS = int(os.environ.get("PYDOUGH_SCALER_BATCH_ROWS", 10000))
+# Original values kept per column for resampling text
+VALUE_POOL_ROWS = 10000
+# Batches in a row that may add no rows (all duplicates of a composite key) before a table is left short
+MAX_EMPTY_BATCHES = 5
+
+KEY_PATTERN = re.compile(r"^(.*?)(\d+)(\D*)$")
+
+def _table_name(table_path):
+    return table_path.split(".")[-1]
+
+def _graph(metadata_file, graph_hint):
+    with open(metadata_file) as f:
+        graphs = json.load(f)
+    graph = next((g for name, g in graphs.items() if name.lower() == graph_hint.lower()), None)
+    if graph is None and len(graphs) == 1:
+        graph = next(iter(graphs.values()))
+    if graph is None:
+        raise ValueError(f"No graph named {graph_hint} in {metadata_file}")
+    return graph
+
+def _is_unique(db_path, table, columns):
+    # Unique properties in the metadata are only trusted when the data agrees
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    conn = sqlite3.connect(db_path)
+    try:
+        duplicate = conn.execute(
+            f'SELECT 1 FROM "{table}" GROUP BY {column_list} HAVING COUNT(*) > 1 LIMIT 1'
+        ).fetchone()
+    finally:
+        conn.close()
+    return duplicate is None
+
+def load_schema(db_path, metadata_file=None, graph_hint=""):
+    """
+    Tables of the database with their columns, unique column sets and
+    references: {table: {"columns", "unique": [[column]], "references": {column: [(table, column)]}}}.
+    Keys and references come from the metadata graph and from the database's
+    own primary keys, unique indexes and foreign keys.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        schema = {}
+        for table in tables:
+            info = conn.execute(f"PRAGMA table_info('{table}')").fetchall()
+            unique = []
+            primary_key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+            if primary_key:
+                unique.append(primary_key)
+            for index in conn.execute(f"PRAGMA index_list('{table}')").fetchall():
+                if index[2]:
+                    columns = [row[2] for row in conn.execute(f"PRAGMA index_info('{index[1]}')")]
+                    if None not in columns and columns not in unique:
+                        unique.append(columns)
+            references = {}
+            for row in conn.execute(f"PRAGMA foreign_key_list('{table}')").fetchall():
+                if row[4]:
+                    references.setdefault(row[3], []).append((row[2], row[4]))
+            schema[table] = {"columns": [row[1] for row in info], "types": {row[1]: row[2] for row in info},
+                             "unique": unique, "references": references}
+    finally:
+        conn.close()
+
+    if not metadata_file:
+        return schema
+    graph = _graph(metadata_file, graph_hint)
+    # collection -> (table, {property: column})
+    collections = {}
+    for name, collection in graph.items():
+        columns = {
+            prop: spec["column_name"] for prop, spec in collection.get("properties", {}).items()
+            if spec.get("type") == "table_column"
+        }
+        collections[name] = (_table_name(collection.get("table_path", name)), columns)
+    for name, collection in graph.items():
+        table, columns = collections[name]
+        if table not in schema:
+            continue
+        for unique in collection.get("unique_properties", []):
+            props = unique if isinstance(unique, list) else [unique]
+            if all(prop in columns for prop in props):
+                column_set = [columns[prop] for prop in props]
+                if column_set not in schema[table]["unique"] and _is_unique(db_path, table, column_set):
+                    schema[table]["unique"].append(column_set)
+    for name, collection in graph.items():
+        table, columns = collections[name]
+        for spec in collection.get("properties", {}).values():
+            if spec.get("type") != "simple_join" or spec.get("other_collection_name") not in collections:
+                continue
+            other_table, other_columns = collections[spec["other_collection_name"]]
+            if table not in schema or other_table not in schema:
+                continue
+            for prop, other_props in spec.get("keys", {}).items():
+                if prop not in columns:
+                    continue
+                for other_prop in other_props:
+                    if other_prop not in other_columns:
+                        continue
+                    left, right = columns[prop], other_columns[other_prop]
+                    # The side whose column is a key is referenced by the other side
+                    if [right] in schema[other_table]["unique"]:
+                        child, parent = (table, left), (other_table, right)
+                    elif [left] in schema[table]["unique"]:
+                        child, parent = (other_table, right), (table, left)
+                    else:
+                        continue
+                    targets = schema[child[0]]["references"].setdefault(child[1], [])
+                    if parent not in targets and parent != child:
+                        targets.append(parent)
+    return schema
+
+def _load_order(schema):
+    # Parents before children; references that form a cycle use the parent's original keys only
+    order, visiting = [], set()
+    def visit(table):
+        if table in order or table in visiting:
+            return
+        visiting.add(table)
+        for targets in schema[table]["references"].values():
+            for parent, _ in targets:
+                visit(parent)
+        visiting.discard(table)
+        order.append(table)
+    for table in schema:
+        visit(table)
+    return order
+
+def _decimals(values):
+    places = 0
+    for value in values:
+        if isinstance(value, float):
+            text = repr(value)
+            if "e" not in text and "." in text:
+                places = max(places, len(text.split(".")[1].rstrip("0")))
+    return min(places, 6)
+
+def _parse_datetime(value):
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", ""))
+    except ValueError:
+        return None
+
+def _format_like(moment, example):
+    example = str(example)
+    if len(example) == 10:
+        return moment.date().isoformat()
+    separator = "T" if "T" in example else " "
+    return moment.isoformat(sep=separator, timespec="microseconds" if "." in example else "seconds")
+
+class KeySequence:
+    """New, unique values of a key column that continue its original values."""
+
+    def __init__(self, values, column):
+        self.seen = set(values)
+        integers = [value for value in values if isinstance(value, int)]
+        self.integer = bool(integers) and len(integers) == len(values)
+        self.next_number = (max(integers) + 1) if self.integer else 1
+        self.template = None
+        if not self.integer:
+            texts = [str(value) for value in values]
+            matches = [KEY_PATTERN.match(text) for text in texts if "@" not in text]
+            if texts and all(matches):
+                # Most common prefix/suffix among the original values, e.g. "C" + "007" + ""
+                shapes = {}
+                for match in matches:
+                    shape = (match.group(1), len(match.group(2)), match.group(3))
+                    shapes[shape] = shapes.get(shape, 0) + 1
+                self.template = max(shapes, key=shapes.get)
+                self.next_number = max(int(match.group(2)) for match in matches) + 1
+        self.examples = [str(value) for value in values] or [column]
+
+    def draw(self, rng):
+        while True:
+            if self.integer:
+                value = self.next_number
+            elif self.template:
+                prefix, width, suffix = self.template
+                value = f"{prefix}{self.next_number:0{width}d}{suffix}"
+            else:
+                example = rng.choice(self.examples)
+                local, at, domain = example.partition("@")
+                value = f"{local}.{self.next_number}{at}{domain}" if at else f"{example}_{self.next_number}"
+            self.next_number += 1
+            if value not in self.seen:
+                self.seen.add(value)
+                return value
+
+class ColumnSampler:
+    """Draws values of one non-key column following its statistics."""
+
+    def __init__(self, column_stats, pool):
+        self.null_fraction = column_stats.get("null_fraction", 0.0) if column_stats else 0.0
+        self.pool = pool
+        self.values = self.cum_weights = None
+        self.buckets = None
+        self.kind = "pool"
+        if not column_stats:
+            return
+        classes = column_stats.get("storage_classes") or {}
+        dominant = max(classes, key=classes.get) if classes else None
+        top = column_stats.get("top_values") or []
+        histogram = (column_stats.get("histogram") or {}).get("buckets")
+        if dominant in ("integer", "real") and top and column_stats.get("distinct_exact") \
+                and column_stats.get("distinct_count", 0) <= min(len(top), STATS_TOP_K):
+            # Low-cardinality codes and flags keep exactly their values and frequencies
+            self.kind = "categorical"
+            self.values = [item["value"] for item in top]
+            self.cum_weights = self._cumulative([item["count"] for item in top])
+        elif dominant in ("integer", "real") and histogram:
+            self.kind = dominant
+            self.decimals = _decimals([bucket["lower"] for bucket in histogram] + [bucket["upper"] for bucket in histogram] + pool[:100])
+            self.buckets = [(bucket["lower"], bucket["upper"]) for bucket in histogram]
+            self.cum_weights = self._cumulative([bucket["count"] for bucket in histogram])
+        elif column_stats.get("is_date") and histogram:
+            bounds = [(_parse_datetime(bucket["lower"]), _parse_datetime(bucket["upper"])) for bucket in histogram]
+            if all(lower and upper for lower, upper in bounds) and pool:
+                self.kind = "date"
+                self.buckets = bounds
+                self.cum_weights = self._cumulative([bucket["count"] for bucket in histogram])
+
+    @staticmethod
+    def _cumulative(weights):
+        total, cumulative = 0, []
+        for weight in weights:
+            total += max(weight, 0)
+            cumulative.append(total)
+        return cumulative if total else None
+
+    def draw(self, rng, count):
+        if self.kind == "categorical" and self.cum_weights:
+            values = rng.choices(self.values, cum_weights=self.cum_weights, k=count)
+        elif self.kind in ("integer", "real", "date") and self.cum_weights:
+            values = []
+            for lower, upper in rng.choices(self.buckets, cum_weights=self.cum_weights, k=count):
+                if self.kind == "date":
+                    moment = lower + (upper - lower) * rng.random()
+                    values.append(_format_like(moment, rng.choice(self.pool)))
+                elif self.kind == "integer":
+                    values.append(rng.randint(lower, upper))
+                else:
+                    values.append(round(rng.uniform(lower, upper), self.decimals))
+        elif self.pool:
+            values = rng.choices(self.pool, k=count)
+        else:
+            values = [None] * count
+        if self.null_fraction:
+            values = [None if rng.random() < self.null_fraction else value for value in values]
+        return values
+
+def _column_pool(conn, table, column, rng):
+    values = [row[0] for row in conn.execute(f'SELECT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL')]
+    if len(values) > VALUE_POOL_ROWS:
+        values = rng.sample(values, VALUE_POOL_ROWS)
+    return values
+
+def scale_database(db_path, output_path, factor, metadata_file=None, graph_hint="", seed=42, overwrite=False):
+    """
+    Write db_path grown `factor` times to output_path (see the module docstring).
+    Returns a report with the original and new row counts per table, the
+    references checked and the seconds taken.
+    """
+    if not MIN_SCALE_FACTOR <= factor <= MAX_SCALE_FACTOR:
+        raise ValueError(f"Scale factor must be between {MIN_SCALE_FACTOR} and {MAX_SCALE_FACTOR}, got {factor}")
+    if os.path.abspath(db_path) == os.path.abspath(output_path):
+        raise ValueError("The scaled copy must be written to a different path than the original database")
+    if os.path.exists(output_path):
+        if not overwrite:
+            raise FileExistsError(f"{output_path} already exists (pass overwrite=True to replace it)")
+        os.remove(output_path)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    started = time.perf_counter()
+    schema = load_schema(db_path, metadata_file, graph_hint)
+    statistics, _ = update_statistics(db_path)
+    # Written to a temporary file so a half-written database is never picked up
+    temp_path = f"{output_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    source = sqlite3.connect(db_path)
+    conn = sqlite3.connect(temp_path)
+    for pragma in ("journal_mode = OFF", "synchronous = OFF", "temp_store = MEMORY", "cache_size = -65536", "locking_mode = EXCLUSIVE"):
+        conn.execute(f"PRAGMA {pragma}")
+    report = {"source": db_path, "path": output_path, "factor": factor, "seed": seed, "tables": {}, "references": []}
+    try:
+        objects = source.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        for kind, _, sql in objects:
+            if kind == "table":
+                conn.execute(sql)
+        conn.execute("ATTACH DATABASE ? AS source", (db_path,))
+        keys = {}  # (table, column) -> values referenced by other tables
+        for table in _load_order(schema):
+            table_started = time.perf_counter()
+            info = schema[table]
+            rng = random.Random(f"{seed}:{table}")
+            columns = info["columns"]
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            with conn:
+                conn.execute(f'INSERT INTO main."{table}" ({column_list}) SELECT {column_list} FROM source."{table}"')
+            original_rows = conn.execute(f'SELECT COUNT(*) FROM main."{table}"').fetchone()[0]
+            target = original_rows * (factor - 1)
+            column_stats = (statistics.get("tables", {}).get(table) or {}).get("columns", {})
+
+            single_keys = {group[0] for group in info["unique"] if len(group) == 1}
+            # Keys that are drawn rather than generated (composite keys, and keys that are also references) are deduplicated
+            composite_keys = [group for group in info["unique"] if len(group) > 1 or info["references"].get(group[0])]
+            generators = {}
+            for column in columns:
+                if column in single_keys and not info["references"].get(column):
+                    values = [row[0] for row in source.execute(f'SELECT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL')]
+                    generators[column] = ("key", KeySequence(values, column))
+                elif info["references"].get(column):
+                    pools = [keys.get(parent) or [row[0] for row in source.execute(
+                        f'SELECT DISTINCT "{parent[1]}" FROM "{parent[0]}" WHERE "{parent[1]}" IS NOT NULL'
+                    )] for parent in info["references"][column]]
+                    pools = [pool for pool in pools if pool]
+                    null_fraction = (column_stats.get(column) or {}).get("null_fraction", 0.0)
+                    generators[column] = ("reference", (pools, null_fraction))
+                else:
+                    generators[column] = ("sample", ColumnSampler(column_stats.get(column), _column_pool(source, table, column, rng)))
+            seen = [
+                set(conn.execute(f'SELECT {", ".join(chr(34) + c + chr(34) for c in group)} FROM main."{table}"').fetchall())
+                for group in composite_keys
+            ]
+            positions = [[columns.index(c) for c in group] for group in composite_keys]
+            referenced = [column for column in columns if any((table, column) in targets
+                          for other in schema.values() for targets in other["references"].values())]
+            new_keys = {column: [] for column in referenced}
+
+            placeholders = ", ".join("?" for _ in columns)
+            insert_sql = f'INSERT INTO main."{table}" ({column_list}) VALUES ({placeholders})'
+            written, empty_batches = 0, 0
+            while written < target and empty_batches < MAX_EMPTY_BATCHES:
+                count = min(SCALER_BATCH_ROWS, target - written)
+                values = []
+                for column in columns:
+                    kind, generator = generators[column]
+                    if kind == "key":
+                        values.append([generator.draw(rng) for _ in range(count)])
+                    elif kind == "reference":
+                        pools, null_fraction = generator
+                        values.append([
+                            None if not pools or (null_fraction and rng.random() < null_fraction)
+                            else rng.choice(rng.choice(pools)) for _ in range(count)
+                        ])
+                    else:
+                        values.append(generator.draw(rng, count))
+                rows = list(zip(*values))
+                if composite_keys:
+                    kept = []
+                    for row in rows:
+                        signatures = [tuple(row[p] for p in group) for group in positions]
+                        if any(signature in group_seen for signature, group_seen in zip(signatures, seen)):
+                            continue
+                        for signature, group_seen in zip(signatures, seen):
+                            group_seen.add(signature)
+                        kept.append(row)
+                    rows = kept
+                if not rows:
+                    empty_batches += 1
+                    continue
+                empty_batches = 0
+                with conn:
+                    conn.executemany(insert_sql, rows)
+                for column in referenced:
+                    position = columns.index(column)
+                    new_keys[column].extend(row[position] for row in rows if row[position] is not None)
+                written += len(rows)
+            for column in referenced:
+                original = [row[0] for row in source.execute(f'SELECT DISTINCT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL')]
+                keys[(table, column)] = original + new_keys[column]
+            if written < target:
+                print(f"⚠️ {table}: only {written} of {target} new rows; its unique keys ran out of combinations")
+            report["tables"][table] = {
+                "original_rows": original_rows,
+                "rows": original_rows + written,
+                "seconds": round(time.perf_counter() - table_started, 2)
+            }
+            print(f"✅ {table}: {original_rows} -> {original_rows + written} rows")
+
+        conn.execute("DETACH DATABASE source")
+        for kind, name, sql in objects:
+            if kind != "table":
+                conn.execute(sql)
+        # Rows of the copy whose reference matches no key of the parent (as a check that keys were kept)
+        for table, info in schema.items():
+            for column, targets in info["references"].items():
+                conditions = " AND ".join(
+                    f'"{column}" NOT IN (SELECT "{parent_column}" FROM "{parent}" WHERE "{parent_column}" IS NOT NULL)'
+                    for parent, parent_column in targets
+                )
+                orphans = conn.execute(f'SELECT COUNT(*) FROM "{table}" WHERE "{column}" IS NOT NULL AND {conditions}').fetchone()[0]
+                report["references"].append({
+                    "table": table, "column": column, "parents": [f"{parent}.{parent_column}" for parent, parent_column in targets],
+                    "orphans": orphans
+                })
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+        source.close()
+    os.replace(temp_path, output_path)
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    report["size_mb"] = round(os.path.getsize(output_path) / (1024 * 1024), 1)
+    return report
+
+def scale_domain(domain, factor, output_dir=SCALED_DATA_DIR, seed=42, overwrite=False):
+    """
+    Scale a catalog domain's database into output_dir/x<factor>/, next to
+    copies of its metadata JSON and schema description.
+    """
+    from domains import DOMAINS
+
+    if domain not in DOMAINS:
+        raise ValueError(f"Unknown domain {domain}. Available: {', '.join(sorted(DOMAINS))}")
+    config = DOMAINS[domain]
+    target_dir = os.path.join(output_dir, f"x{factor}")
+    os.makedirs(target_dir, exist_ok=True)
+    print(f"⏳ Scaling {domain} x{factor} into {target_dir}...")
+    report = scale_database(
+        config["database_file"], os.path.join(target_dir, os.path.basename(config["database_file"])), factor,
+        metadata_file=config.get("metadata_file"), graph_hint=config.get("base_name", domain), seed=seed, overwrite=overwrite
+    )
+    for key in ("metadata_file", "description_file"):
+        if config.get(key) and os.path.exists(config[key]):
+            shutil.copy2(config[key], os.path.join(target_dir, os.path.basename(config[key])))
+    report["domain"] = domain
+    print(f"✅ {domain} x{factor} written to {report['path']} ({report['size_mb']} MB) in {report['seconds']}s")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Grow a domain's database with synthetic rows that follow its statistics")
+    parser.add_argument("--domain", nargs="+", required=True, help="Domains to scale (see domains.py)")
+    parser.add_argument("--factor", type=int, default=10, help=f"Times the original size ({MIN_SCALE_FACTOR} to {MAX_SCALE_FACTOR})")
+    parser.add_argument("--output-dir", default=SCALED_DATA_DIR, help="Directory for the scaled copies")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing copies")
+    parser.add_argument("--report", help="Write the reports to this JSON file")
+    args = parser.parse_args()
+    reports = [scale_domain(domain, args.factor, args.output_dir, args.seed, args.overwrite) for domain in args.domain]
+    for report in reports:
+        orphans = sum(check["orphans"] for check in report["references"])
+        print(f"{report['domain']}: {sum(t['rows'] for t in report['tables'].values())} rows, "
+              f"{len(report['references'])} references checked, {orphans} orphaned values")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Domain catalog
+
+Discovers domains from the data directory instead of a hardcoded list: every
+`.db` file is a domain, matched (case-insensitively) with its metadata JSON
+(`<name>.json`, or a legacy `<name>_graph.json` / `<name>_demo_graph.json`) and
+its markdown description (`<name>.md`). Static settings from domains.py
+(keywords, timeouts, display names) are layered on top.
+
+The scan result is kept in memory. The data directory's mtime is checked at most
+every CATALOG_CHECK_INTERVAL seconds and triggers a rescan when files are added,
+removed or renamed; files are re-stat'ed every CATALOG_REFRESH_INTERVAL seconds
+(or after invalidate()) to pick up files rewritten in place. Every domain gets a
+version string derived from its files' sizes and mtimes.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import collections.abc
+
+# Seconds between checks of the data directory's mtime
+CATALOG_CHECK_INTERVAL = float(os.environ.get("PYDOUGH_CATALOG_CHECK_INTERVAL", 1))
+# Seconds between full rescans that also catch files rewritten in place
+CATALOG_REFRESH_INTERVAL = float(os.environ.get("PYDOUGH_CATALOG_REFRESH_INTERVAL", 10))
+# Keywords derived from collection names for domains without configured keywords
+MAX_DERIVED_KEYWORDS = 15
+
+def asset_version(stats):
+    """Short version string for a set of (path, os.stat_result or None) pairs."""
+    parts = [(path, st.st_size, st.st_mtime_ns) if st else (path, None, None) for path, st in stats]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()[:12]
+
+def domain_keywords(domain_name, collection_names):
+    """Lowercase words from the domain and collection names, e.g. sbDailyPrice -> daily, price."""
+    words = [domain_name.lower()]
+    for name in collection_names:
+        for word in re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])", name):
+            word = word.lower()
+            if len(word) > 2 and word not in words:
+                words.append(word)
+    return words[:MAX_DERIVED_KEYWORDS]
+
+class DomainCatalog:
+    """In-memory index of the domains found in a data directory."""
+
+    def __init__(self, data_dir, settings=None):
+        self.data_dir = data_dir
+        self.settings = settings or {}
+        # Settings by lowercase database file name and domain name, to match discovered files
+        self._settings_by_file = {
+            os.path.basename(config["database_file"]).lower(): name
+            for name, config in self.settings.items() if config.get("database_file")
+        }
+        self._settings_by_name = {name.lower(): name for name in self.settings}
+        self._lock = threading.Lock()
+        self._domains = {}   # name -> entry for every .db file
+        self._usable = {}    # name -> entry for domains with database and metadata
+        self._dir_mtime = None
+        self._checked_at = 0.0
+        self._scanned_at = 0.0
+        self._json_cache = {}  # metadata path -> (version, graph names, collection names)
+        self.scans = 0
+
+    def invalidate(self):
+        """Force a rescan on the next access, e.g. after metadata files were rewritten."""
+        with self._lock:
+            self._dir_mtime = None
+
+    def _refresh_if_needed(self):
+        now = time.monotonic()
+        if self._dir_mtime is not None and now - self._checked_at < CATALOG_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if self._dir_mtime is not None and now - self._checked_at < CATALOG_CHECK_INTERVAL:
+                return
+            try:
+                dir_mtime = os.stat(self.data_dir).st_mtime_ns
+            except OSError:
+                dir_mtime = -1
+            self._checked_at = now
+            if dir_mtime == self._dir_mtime and now - self._scanned_at < CATALOG_REFRESH_INTERVAL:
+                return
+            self._scan(dir_mtime)
+
+    def _scan(self, dir_mtime):
+        files = {}  # lowercase name -> [actual names]
+        stats = {}
+        try:
+            with os.scandir(self.data_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files.setdefault(entry.name.lower(), []).append(entry.name)
+                        stats[entry.name] = entry.stat()
+        except OSError:
+            pass
+
+        # Legacy graph files by name prefix: broker_graph.json, tpch_demo_graph.json, broker_v2_graph.json
+        graph_files = {}
+        for lower, names in files.items():
+            for suffix in ("_demo_graph.json", "_graph.json"):
+                if lower.endswith(suffix):
+                    prefix = lower[:-len(suffix)]
+                    graph_files.setdefault(prefix, names[0])
+                    graph_files.setdefault(prefix.split("_")[0], names[0])
+                    break
+
+        def find(lower_name, preferred):
+            names = files.get(lower_name)
+            if not names:
+                return None
+            return preferred if preferred in names else sorted(names)[0]
+
+        domains = {}
+        for lower, names in sorted(files.items()):
+            if not lower.endswith(".db"):
+                continue
+            for db_filename in names:
+                base = os.path.splitext(db_filename)[0]
+                base_lower = base.lower()
+                json_filename = find(f"{base_lower}.json", f"{base_lower}.json") or graph_files.get(base_lower)
+                md_filename = find(f"{base_lower}.md", f"{base_lower}.md")
+                name = self._settings_by_file.get(lower) or self._settings_by_name.get(base_lower) or base
+                domains[name] = self._make_entry(name, base, db_filename, json_filename, md_filename, stats)
+
+        self._domains = domains
+        self._usable = {name: entry for name, entry in domains.items() if entry["has_json"]}
+        self._dir_mtime = dir_mtime
+        self._scanned_at = time.monotonic()
+        self.scans += 1
+
+    def _make_entry(self, name, base, db_filename, json_filename, md_filename, stats):
+        settings = self.settings.get(name, {})
+        database_file = os.path.join(self.data_dir, db_filename)
+        metadata_file = os.path.join(self.data_dir, json_filename) if json_filename else None
+        description_file = os.path.join(self.data_dir, md_filename) if md_filename else None
+        asset_stats = {
+            "database": (db_filename, stats.get(db_filename)),
+            "metadata": (json_filename, stats.get(json_filename)) if json_filename else (None, None),
+            "description": (md_filename, stats.get(md_filename)) if md_filename else (None, None)
+        }
+        graph_names, collection_names = self._read_metadata(metadata_file, asset_version([asset_stats["metadata"]]))
+        keywords = settings.get("keywords") or domain_keywords(name, collection_names)
+        entry = {
+            "name": name,
+            "base_name": base,
+            "db_filename": db_filename,
+            "keywords": keywords,
+            "metadata_file": metadata_file,
+            "database_file": database_file,
+            "description_file": description_file,
+            "graph_names": graph_names,
+            "collections": collection_names,
+            "has_json": metadata_file is not None,
+            "has_md": description_file is not None,
+            "version": asset_version(asset_stats.values()),
+            "asset_versions": {
+                kind: asset_version([pair]) if pair[0] else None for kind, pair in asset_stats.items()
+            }
+        }
+        for key, value in settings.items():
+            if key not in ("keywords", "metadata_file", "database_file"):
+                entry[key] = value
+        return entry
+
+    def _read_metadata(self, metadata_file, version):
+        # (graph names, collection names of the domain's graph), cached per file version
+        if not metadata_file:
+            return [], []
+        cached = self._json_cache.get(metadata_file)
+        if cached and cached[0] == version:
+            return cached[1], cached[2]
+        try:
+            with open(metadata_file) as f:
+                graphs = json.load(f)
+            if isinstance(graphs, list):
+                # Lists of graphs with a "name" and a list of "collections" each
+                graphs = {
+                    graph.get("name"): {c.get("name"): c for c in graph.get("collections", [])}
+                    for graph in graphs if isinstance(graph, dict)
+                }
+            graph_names = list(graphs) if isinstance(graphs, dict) else []
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read metadata file {metadata_file}: {e}")
+            graphs, graph_names = {}, []
+        # Collections of the graph named after the file, else of the only graph
+        base = os.path.splitext(os.path.basename(metadata_file))[0].lower()
+        graph = next((graphs[g] for g in graph_names if g.lower() == base), None)
+        if graph is None and len(graph_names) == 1:
+            graph = graphs[graph_names[0]]
+        collection_names = list(graph) if isinstance(graph, dict) else []
+        self._json_cache[metadata_file] = (version, graph_names, collection_names)
+        return graph_names, collection_names
+
+    def domains(self):
+        """{name: entry} for domains that have a database and metadata. Never mutated in place."""
+        self._refresh_if_needed()
+        return self._usable
+
+    def all_databases(self):
+        """{name: entry} for every database file, with or without metadata."""
+        self._refresh_if_needed()
+        return self._domains
+
+    def get(self, name):
+        return self.domains().get(name)
+
+    def find_by_database(self, db_path):
+        """Name of the domain backed by db_path (any database, usable or not), or None."""
+        db_abspath = os.path.abspath(db_path)
+        return next(
+            (name for name, entry in self.all_databases().items()
+             if os.path.abspath(entry["database_file"]) == db_abspath),
+            None
+        )
+
+class DomainsView(collections.abc.Mapping):
+    """Read-only dict-like view of a catalog's usable domains (name -> entry)."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __getitem__(self, name):
+        return self.catalog.domains()[name]
+
+    def __iter__(self):
+        return iter(self.catalog.domains())
+
+    def __len__(self):
+        return len(self.catalog.domains())
+
+    # Served from one snapshot, so a rescan during iteration can't drop keys midway
+    def keys(self):
+        return self.catalog.domains().keys()
+
+    def items(self):
+        return self.catalog.domains().items()
+
+    def values(self):
+        return self.catalog.domains().values()
+
+    def __repr__(self):
+        return f"DomainsView({list(self)})"
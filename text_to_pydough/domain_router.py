@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Retrieval-based domain routing
+
+Stage one of domain detection: a local BM25 index over every domain's name,
+keywords, collection names, property/column names and the summary of its schema
+description ranks the domains for a query in microseconds. Only the top
+ROUTER_TOP_K candidates are then offered to the domain detection model (stage
+two, see pydough_query_processor.detect_domain_with_llm), so the prompt stays the
+same size however many databases are in the catalog.
+
+The index follows the domain catalog: a domain's document is rebuilt only when
+its asset version changes.
+
+Run `python domain_router.py --benchmark` to measure shortlist accuracy and
+latency on the labelled queries in queries.csv (add --llm to also run stage two).
+"""
+
+import os
+import re
+import csv
+import json
+import math
+import time
+import argparse
+import threading
+
+from domains import DOMAINS
+
+# Candidate domains passed to the detection model
+ROUTER_TOP_K = int(os.environ.get("PYDOUGH_ROUTER_TOP_K", 3))
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Times each field's terms are repeated in a domain's document
+FIELD_WEIGHTS = {"name": 3, "keywords": 3, "collections": 2, "properties": 1, "summary": 1}
+# Characters of the schema description used when it has no marked summary
+SUMMARY_CHARS = 2000
+
+TOKEN_PATTERN = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+MD_SUMMARY_PATTERN = re.compile(r"<!-- summary -->\n(.*?)\n<!-- /summary -->", re.S)
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its list me of on or show the their them
+there these this those to was were what when where which who whose with all each every find get
+give many much per than that top total number average count name names id ids
+""".split())
+
+def _stem(word):
+    # Just enough to match plurals: companies -> company, addresses -> address, cars -> car
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def tokenize(text):
+    """Lowercase, stemmed terms of a text; camelCase and snake_case names are split into words."""
+    terms = []
+    for word in TOKEN_PATTERN.findall(text or ""):
+        word = word.lower()
+        if len(word) > 1 and word not in STOPWORDS:
+            terms.append(_stem(word))
+    return terms
+
+def _metadata_names(metadata_file, graph_hint):
+    """(collection names, property and column names) of a domain's metadata graph."""
+    try:
+        with open(metadata_file) as f:
+            graphs = json.load(f)
+    except (OSError, ValueError):
+        return [], []
+    if isinstance(graphs, list):
+        # Lists of graphs with a "name" and a list of "collections" each
+        graphs = {
+            graph.get("name"): {c.get("name"): c for c in graph.get("collections", [])}
+            for graph in graphs if isinstance(graph, dict)
+        }
+    if not isinstance(graphs, dict):
+        return [], []
+    graph = next((g for name, g in graphs.items() if str(name).lower() == graph_hint.lower()), None)
+    if graph is None and len(graphs) == 1:
+        graph = next(iter(graphs.values()))
+    if not isinstance(graph, dict):
+        return [], []
+    collections, properties = [], []
+    for collection_name, collection in graph.items():
+        collections.append(str(collection_name))
+        if isinstance(collection, dict):
+            collections.append(collection.get("table_path", collection.get("table path", "")).split(".")[-1])
+            props = collection.get("properties", {})
+            items = props.items() if isinstance(props, dict) else ((p.get("name"), p) for p in props)
+            for prop_name, prop in items:
+                properties.append(str(prop_name))
+                if isinstance(prop, dict):
+                    properties.append(str(prop.get("column_name", prop.get("column name", ""))))
+    return collections, properties
+
+def _description_summary(description_file):
+    if not description_file:
+        return ""
+    try:
+        with open(description_file) as f:
+            text = f.read()
+    except OSError:
+        return ""
+    match = MD_SUMMARY_PATTERN.search(text)
+    return match.group(1) if match else text[:SUMMARY_CHARS]
+
+def domain_document(name, config):
+    """Weighted bag of terms describing a domain."""
+    collections, properties = _metadata_names(config["metadata_file"], config.get("base_name", name))
+    fields = {
+        "name": tokenize(name),
+        "keywords": tokenize(" ".join(config.get("keywords", []))),
+        "collections": tokenize(" ".join(collections)),
+        "properties": tokenize(" ".join(properties)),
+        "summary": tokenize(_description_summary(config.get("description_file")))
+    }
+    counts = {}
+    for field, terms in fields.items():
+        for term in terms:
+            counts[term] = counts.get(term, 0) + FIELD_WEIGHTS[field]
+    return counts
+
+class DomainRouter:
+    """BM25 index over domain documents, rebuilt per domain as catalog versions change."""
+
+    def __init__(self, domains=None):
+        self.domains = DOMAINS if domains is None else domains
+        self._lock = threading.Lock()
+        self._documents = {}  # name -> (version, term counts, length)
+        self._postings = {}   # term -> [(name, count)]
+        self._idf = {}
+        self._avg_length = 1.0
+        self._versions = None
+
+    def _refresh(self):
+        versions = tuple((name, config.get("version")) for name, config in self.domains.items())
+        if versions == self._versions:
+            return
+        with self._lock:
+            if versions == self._versions:
+                return
+            documents = {}
+            for name, version in versions:
+                cached = self._documents.get(name)
+                if cached is not None and cached[0] == version:
+                    documents[name] = cached
+                else:
+                    counts = domain_document(name, self.domains[name])
+                    documents[name] = (version, counts, sum(counts.values()))
+            postings = {}
+            for name, (_, counts, _) in documents.items():
+                for term, count in counts.items():
+                    postings.setdefault(term, []).append((name, count))
+            total = len(documents)
+            self._idf = {
+                term: math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+                for term, entries in postings.items()
+            }
+            self._avg_length = (sum(doc[2] for doc in documents.values()) / total) if total else 1.0
+            self._documents, self._postings = documents, postings
+            self._versions = versions
+
+    def rank(self, query_text):
+        """All domains with a positive score for the query, best first, as [(name, score)]."""
+        self._refresh()
+        scores = {}
+        for term in set(tokenize(query_text)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for name, count in self._postings[term]:
+                length = self._documents[name][2]
+                tf = count * (BM25_K1 + 1) / (count + BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length))
+                scores[name] = scores.get(name, 0.0) + idf * tf
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def shortlist(self, query_text, k=None):
+        """
+        Top-k candidate domains for the query as [(name, score)]. Falls back to
+        the first k domains (score 0) when no domain term matches.
+        """
+        k = k or ROUTER_TOP_K
+        ranked = self.rank(query_text)[:k]
+        if not ranked:
+            ranked = [(name, 0.0) for name in sorted(self.domains)[:k]]
+        return ranked
+
+_ROUTER = None
+_ROUTER_LOCK = threading.Lock()
+
+def get_domain_router():
+    """Process-wide router over DOMAINS."""
+    global _ROUTER
+    with _ROUTER_LOCK:
+        if _ROUTER is None:
+            _ROUTER = DomainRouter()
+        return _ROUTER
+
+def shortlist_domains(query_text, k=None):
+    """Top-k candidate domains for a query, see DomainRouter.shortlist."""
+    return get_domain_router().shortlist(query_text, k)
+
+def load_labelled_queries(path="queries.csv"):
+    """[(category, query)] from queries.csv."""
+    with open(path, encoding="utf-8-sig") as f:
+        return [(row["Category"], row["Query"]) for row in csv.DictReader(f) if row.get("Query")]
+
+def run_benchmark(queries, k=None, use_llm=False):
+    """
+    Shortlist accuracy (top-1 and recall@k) and per-query latency on labelled
+    queries; with use_llm also the accuracy and latency of the full two-stage detection.
+    """
+    k = k or ROUTER_TOP_K
+    router = get_domain_router()
+    router.shortlist("warm up", k)
+    queries = [(category, query) for category, query in queries if category in DOMAINS]
+    report = {"queries": len(queries), "domains": len(DOMAINS), "k": k, "per_category": {}}
+    latencies, top1, recall, misses = [], 0, 0, []
+    for category, query in queries:
+        started = time.perf_counter()
+        candidates = router.shortlist(query, k)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        names = [name for name, _ in candidates]
+        stats = report["per_category"].setdefault(category, {"queries": 0, "top1": 0, "recall_at_k": 0})
+        stats["queries"] += 1
+        if names[:1] == [category]:
+            top1 += 1
+            stats["top1"] += 1
+        if category in names:
+            recall += 1
+            stats["recall_at_k"] += 1
+        else:
+            misses.append({"category": category, "query": query, "shortlist": names})
+    latencies.sort()
+    report.update({
+        "top1_accuracy": round(top1 / len(queries), 4) if queries else None,
+        "recall_at_k": round(recall / len(queries), 4) if queries else None,
+        "latency_us": {
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p50": round(latencies[len(latencies) // 2], 1) if latencies else None,
+            "p95": round(latencies[int(len(latencies) * 0.95)], 1) if latencies else None
+        },
+        "misses": misses
+    })
+
+    if use_llm:
+        from pydough_query_processor import detect_domain_with_llm
+        correct, llm_latencies = 0, []
+        for category, query in queries:
+            started = time.perf_counter()
+            detected = detect_domain_with_llm(query)[0]
+            llm_latencies.append(time.perf_counter() - started)
+            correct += detected == category
+        llm_latencies.sort()
+        report["two_stage"] = {
+            "accuracy": round(correct / len(queries), 4) if queries else None,
+            "latency_s": {
+                "mean": round(sum(llm_latencies) / len(llm_latencies), 3) if llm_latencies else None,
+                "p95": round(llm_latencies[int(len(llm_latencies) * 0.95)], 3) if llm_latencies else None
+            }
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Domain router shortlist and benchmark")
+    parser.add_argument("--query", help="Show the shortlist for one query")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark on the labelled queries")
+    parser.add_argument("--queries", default="queries.csv", help="CSV with Category and Query columns")
+    parser.add_argument("-k", type=int, default=ROUTER_TOP_K, help="Shortlist size")
+    parser.add_argument("--llm", action="store_true", help="Also run the full two-stage detection (calls the model)")
+    parser.add_argument("--output", help="Write the benchmark report to this JSON file")
+    args = parser.parse_args()
+    if args.query:
+        for name, score in shortlist_domains(args.query, args.k):
+            print(f"{score:8.3f}  {name}")
+    if args.benchmark:
+        report = run_benchmark(load_labelled_queries(args.queries), k=args.k, use_llm=args.llm)
+        print(json.dumps({key: value for key, value in report.items() if key != "misses"}, indent=2))
+        print(f"{len(report['misses'])} queries missed by the shortlist")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
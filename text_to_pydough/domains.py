@@ -1,4 +1,20 @@
-DOMAINS = {
+"""
+Domain settings and the domain catalog.
+
+Domains are discovered from the .db/.json/.md files in the data directory (see
+domain_catalog.py). DOMAIN_SETTINGS adds hand-written settings for known
+databases: the domain name, detection keywords, execution timeouts and
+whether to serve the database from an in-memory copy ("in_memory").
+"""
+
+import os
+
+from domain_catalog import DomainCatalog, DomainsView
+
+# Directory scanned for domains, relative to the working directory like the paths below
+DATA_DIR = os.environ.get("PYDOUGH_DATA_DIR", "data")
+
+DOMAIN_SETTINGS = {
     "Broker": {
         "keywords": ["customer", "ticker", "transaction", "stock", "price", "share", "trade", "broker", "exchange"],
         "metadata_file": "data/broker.json",
@@ -22,16 +38,23 @@ DOMAINS = {
     "TPCH": {
         "keywords": ["supplier", "order", "lineitem", "customer", "nation", "region", "part", "partsupp", "tpch"],
         "metadata_file": "data/tpch.json",
-        "database_file": "data/tpch.db"
+        "database_file": "data/tpch.db",
+        "timeout_seconds": 120
     },
     "DepMap": {
         "keywords": ["gene", "dependency", "expression", "mutation", "cell line", "cancer", "depmap"],
         "metadata_file": "data/depmap.json",
-        "database_file": "data/DepMap.db"
+        "database_file": "data/DepMap.db",
+        "timeout_seconds": 180
     },
     "ProteinNetwork": {
         "keywords": ["protein", "interaction", "network", "link", "score", "edge", "node"],
         "metadata_file": "data/proteinnetwork.json",
         "database_file": "data/ProteinNetwork.db"
     }
-} 
\ No newline at end of file
+}
+
+DOMAIN_CATALOG = DomainCatalog(DATA_DIR, DOMAIN_SETTINGS)
+# name -> {"keywords", "metadata_file", "database_file", "version", ...} for every
+# discovered domain with a database and metadata; a read-only, always current view
+DOMAINS = DomainsView(DOMAIN_CATALOG)
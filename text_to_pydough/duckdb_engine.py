@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DuckDB execution engine for analytic queries
+
+SQLite runs the SQL translated by pydough.to_sql one row at a time, which is
+slow for aggregations over large tables. This module runs the same SQL on
+DuckDB's vectorized engine instead, reading the domain's data from either:
+
+- sqlite:  the `.db` file itself, attached read-only through DuckDB's SQLite
+           scanner (needs the sqlite_scanner extension to be installed)
+- parquet: Parquet snapshots of every table, written next to the database
+           and rebuilt whenever the database file changes (core DuckDB only)
+
+choose_engine() routes a query from its SQLite plan: DuckDB for aggregations
+and scans over many rows, SQLite for everything else (point lookups, small
+tables). compare_results() checks that both engines return the same rows.
+
+DuckDB is optional: without the duckdb package every query runs on SQLite.
+Set PYDOUGH_ENGINE to "sqlite" (default), "duckdb" or "auto" (use the router).
+"""
+
+import os
+import re
+import json
+import math
+import sqlite3
+import tempfile
+import threading
+
+# "sqlite", "duckdb" or "auto"
+EXECUTION_ENGINE = os.environ.get("PYDOUGH_ENGINE", "sqlite").lower()
+# Where DuckDB reads the data from: "parquet" snapshots or the "sqlite" file itself
+DUCKDB_SOURCE = os.environ.get("PYDOUGH_DUCKDB_SOURCE", "parquet").lower()
+# Root directory for Parquet snapshots (default: parquet/<domain>/ next to the database)
+DUCKDB_SNAPSHOT_DIR = os.environ.get("PYDOUGH_DUCKDB_SNAPSHOT_DIR")
+# DuckDB threads per connection (each executor worker has its own connection)
+DUCKDB_THREADS = int(os.environ.get("PYDOUGH_DUCKDB_THREADS", 2))
+# Share of a worker's memory limit (RLIMIT_AS) DuckDB may use before spilling to disk
+DUCKDB_MEMORY_FRACTION = float(os.environ.get("PYDOUGH_DUCKDB_MEMORY_FRACTION", 0.5))
+# Where DuckDB spills operators that exceed its memory limit
+DUCKDB_TEMP_DIR = os.environ.get("PYDOUGH_DUCKDB_TEMP_DIR") or os.path.join(tempfile.gettempdir(), "pydough_duckdb")
+# Estimated rows scanned above which aggregating queries are routed to DuckDB
+DUCKDB_AGGREGATE_ROWS = int(os.environ.get("PYDOUGH_DUCKDB_AGGREGATE_ROWS", 100_000))
+# Estimated rows scanned above which any full-scan query is routed to DuckDB
+DUCKDB_SCAN_ROWS = int(os.environ.get("PYDOUGH_DUCKDB_SCAN_ROWS", 1_000_000))
+# Rows copied per batch when writing a Parquet snapshot
+SNAPSHOT_BATCH_ROWS = 100_000
+# Seconds between checks of the stop condition while DuckDB runs a query
+INTERRUPT_POLL_INTERVAL = 0.05
+# Relative tolerance for floating point values in compare_results
+COMPARE_REL_TOLERANCE = 1e-9
+
+ENGINES = ("sqlite", "duckdb", "auto")
+
+_AGGREGATE_PATTERN = re.compile(r"\bGROUP\s+BY\b|\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL)\s*\(", re.IGNORECASE)
+_ORDER_BY_PATTERN = re.compile(r"\bORDER\s+BY\b[^()]*$", re.IGNORECASE | re.S)
+# Quoted literals and identifiers (left alone by adapt_sql), or a LIKE keyword
+_LIKE_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\bLIKE\b", re.IGNORECASE)
+
+def duckdb_available():
+    """True if the duckdb package can be imported."""
+    try:
+        import duckdb  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def choose_engine(sql, scanned_tables, estimated_rows, engine=None):
+    """
+    Pick the engine for a query: returns (engine, reason).
+    scanned_tables and estimated_rows come from the SQLite plan (see
+    pydough_executor.find_full_table_scans / estimate_scanned_rows).
+    """
+    engine = (engine or EXECUTION_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}' (expected one of {', '.join(ENGINES)})")
+    if engine == "sqlite":
+        return "sqlite", "configured"
+    if not duckdb_available():
+        return "sqlite", "duckdb is not installed"
+    if engine == "duckdb":
+        return "duckdb", "configured"
+    if not scanned_tables:
+        return "sqlite", "plan uses indexed lookups only"
+    if _AGGREGATE_PATTERN.search(sql) and estimated_rows >= DUCKDB_AGGREGATE_ROWS:
+        return "duckdb", f"aggregates over ~{estimated_rows:,} scanned rows"
+    if estimated_rows >= DUCKDB_SCAN_ROWS:
+        return "duckdb", f"scans ~{estimated_rows:,} rows"
+    return "sqlite", f"small plan (~{estimated_rows:,} scanned rows)"
+
+def adapt_sql(sql):
+    """
+    SQLite SQL with the semantics DuckDB differs on spelled out: SQLite's LIKE
+    ignores case, so it becomes ILIKE. (Integer division is switched on per
+    connection, see open_connection.)
+    """
+    return _LIKE_PATTERN.sub(lambda m: "ILIKE" if m.group(0).upper() == "LIKE" else m.group(0), sql)
+
+# ---------------------------------------------------------------------------
+# Connections and snapshots
+# ---------------------------------------------------------------------------
+
+def snapshot_dir(domain_name, database_file):
+    """Directory holding the Parquet snapshot of a domain's tables."""
+    root = DUCKDB_SNAPSHOT_DIR or os.path.join(os.path.dirname(os.path.abspath(database_file)), "parquet")
+    return os.path.join(root, domain_name)
+
+def _database_version(database_file):
+    """Size, mtime and the SQLite header's file change counter, which every committed write bumps."""
+    with open(database_file, "rb") as f:
+        st = os.fstat(f.fileno())
+        header = f.read(28)
+    change_counter = int.from_bytes(header[24:28], "big") if len(header) == 28 else 0
+    return f"{st.st_size}-{st.st_mtime_ns}-{change_counter}"
+
+def _duckdb_type(declared_type):
+    """DuckDB column type for a SQLite declared type (SQLite's affinity rules, plus dates)."""
+    declared = (declared_type or "").upper()
+    if "INT" in declared:
+        return "BIGINT"
+    if any(word in declared for word in ("REAL", "FLOA", "DOUB", "NUMERIC", "DECIMAL")):
+        return "DOUBLE"
+    if "BOOL" in declared:
+        return "BOOLEAN"
+    if "TIMESTAMP" in declared or "DATETIME" in declared:
+        return "TIMESTAMP"
+    if declared == "DATE":
+        return "DATE"
+    return "VARCHAR"
+
+def _connect(memory_limit_mb=None):
+    """
+    DuckDB connection with DUCKDB_THREADS threads. With memory_limit_mb (the
+    worker's address space cap), DuckDB keeps to DUCKDB_MEMORY_FRACTION of it
+    and spills to DUCKDB_TEMP_DIR instead of failing with MemoryError; its own
+    default (80% of RAM) ignores the cap.
+    """
+    import duckdb
+
+    config = {"threads": DUCKDB_THREADS}
+    if memory_limit_mb:
+        os.makedirs(DUCKDB_TEMP_DIR, exist_ok=True)
+        config["memory_limit"] = f"{max(64, int(memory_limit_mb * DUCKDB_MEMORY_FRACTION))}MB"
+        config["temp_directory"] = DUCKDB_TEMP_DIR
+    return duckdb.connect(config=config)
+
+def write_parquet_snapshot(domain_name, database_file, tables, should_stop=None, memory_limit_mb=None):
+    """
+    Copy every table of a SQLite database to Parquet, in batches, unless an
+    up-to-date snapshot exists. Returns the snapshot manifest. should_stop()
+    is checked between batches; the copy is abandoned once it returns true.
+    """
+    import pandas as pd
+
+    directory = snapshot_dir(domain_name, database_file)
+    manifest_path = os.path.join(directory, "snapshot.json")
+    version = _database_version(database_file)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("database_version") == version and set(manifest.get("tables", {})) == set(tables):
+            return manifest
+    except (OSError, ValueError):
+        pass
+
+    print(f"⏳ Writing Parquet snapshot of {domain_name} to {directory}")
+    os.makedirs(directory, exist_ok=True)
+    source = sqlite3.connect(f"file:{database_file}?mode=ro", uri=True)
+    duck = _connect(memory_limit_mb)
+    manifest = {"database_version": version, "tables": {}}
+    try:
+        for table in tables:
+            columns = source.execute(f'PRAGMA table_info("{table}")').fetchall()
+            names = [column[1] for column in columns]
+            types = [_duckdb_type(column[2]) for column in columns]
+            column_defs = ", ".join(f'"{name}" {column_type}' for name, column_type in zip(names, types))
+            duck.execute(f'CREATE OR REPLACE TABLE snapshot ({column_defs})')
+            casts = ", ".join(f'CAST("{name}" AS {column_type})' for name, column_type in zip(names, types))
+            cursor = source.execute(f'SELECT * FROM "{table}"')
+            while True:
+                rows = cursor.fetchmany(SNAPSHOT_BATCH_ROWS)
+                if not rows:
+                    break
+                if should_stop is not None and should_stop():
+                    raise RuntimeError(f"Parquet snapshot of {domain_name} interrupted")
+                batch = pd.DataFrame(rows, columns=names)
+                duck.register("batch", batch)
+                duck.execute(f"INSERT INTO snapshot SELECT {casts} FROM batch")
+                duck.unregister("batch")
+            # Written under a temporary name so other workers never read half a file
+            path = os.path.join(directory, f"{table}.parquet")
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            duck.execute(f"COPY snapshot TO '{temp_path}' (FORMAT parquet)")
+            os.replace(temp_path, path)
+            manifest["tables"][table] = {
+                "file": f"{table}.parquet",
+                "rows": duck.execute("SELECT COUNT(*) FROM snapshot").fetchone()[0]
+            }
+    finally:
+        duck.close()
+        source.close()
+    temp_manifest = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_manifest, manifest_path)
+    print(f"✅ Parquet snapshot of {domain_name} written ({len(tables)} tables)")
+    return manifest
+
+def open_connection(domain_name, database_file, tables, source=None, should_stop=None, memory_limit_mb=None):
+    """
+    DuckDB connection in which the domain's tables can be queried by their
+    SQLite names. Returns (connection, snapshot version). memory_limit_mb is
+    the caller's memory cap (see _connect).
+    """
+    source = (source or DUCKDB_SOURCE).lower()
+    connection = _connect(memory_limit_mb)
+    try:
+        # SQLite divides integers with integer division
+        connection.execute("SET integer_division = true")
+        if source == "sqlite":
+            connection.execute(f"ATTACH '{database_file}' AS domain_db (TYPE sqlite, READ_ONLY)")
+            connection.execute("USE domain_db")
+            return connection, _database_version(database_file)
+        if source != "parquet":
+            raise ValueError(f"Unknown DuckDB source '{source}' (expected 'parquet' or 'sqlite')")
+        manifest = write_parquet_snapshot(domain_name, database_file, tables, should_stop, memory_limit_mb)
+        directory = snapshot_dir(domain_name, database_file)
+        for table, info in manifest["tables"].items():
+            path = os.path.join(directory, info["file"])
+            connection.execute(f"CREATE VIEW \"{table}\" AS SELECT * FROM read_parquet('{path}')")
+        return connection, manifest["database_version"]
+    except Exception:
+        connection.close()
+        raise
+
+def run_query(connection, sql, max_rows=None, should_stop=None):
+    """
+    Run SQL on DuckDB and return (columns, rows, truncated). With max_rows set
+    only that many rows are fetched. should_stop() is polled while the query
+    runs; the query is interrupted as soon as it returns true.
+    """
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(INTERRUPT_POLL_INTERVAL):
+            if should_stop():
+                connection.interrupt()
+                return
+
+    sql = adapt_sql(sql)
+    watcher = None
+    if should_stop is not None:
+        watcher = threading.Thread(target=watch, name="duckdb-interrupt", daemon=True)
+        watcher.start()
+    try:
+        if max_rows:
+            cursor = connection.execute(f"SELECT * FROM ({sql}) LIMIT {int(max_rows) + 1}")
+        else:
+            cursor = connection.execute(sql)
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        finished.set()
+        if watcher is not None:
+            watcher.join()
+    truncated = bool(max_rows) and len(rows) > max_rows
+    if truncated:
+        rows = rows[:max_rows]
+    return columns, rows, truncated
+
+# ---------------------------------------------------------------------------
+# Result equivalence
+# ---------------------------------------------------------------------------
+
+def _normalize_value(value):
+    """Comparable form of a value: dates as ISO strings, integral floats as ints, NaN as None."""
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        text = value.isoformat()
+        return text.replace("T", " ").replace(" 00:00:00", "")
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    if hasattr(value, "item"):
+        # numpy and Decimal-like scalars
+        return _normalize_value(value.item())
+    return value
+
+def _values_equal(left, right):
+    if isinstance(left, float) or isinstance(right, float):
+        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
+            return math.isclose(left, right, rel_tol=COMPARE_REL_TOLERANCE, abs_tol=COMPARE_REL_TOLERANCE)
+    return left == right
+
+def _sort_key(row):
+    # Numbers sort by value whatever their type, so 3 and 3.0000001 land in the same place
+    return tuple(
+        (0, value, "") if isinstance(value, (int, float)) else (1, 0, str(value))
+        for value in row
+    )
+
+def compare_results(sql, left, right, max_examples=5):
+    """
+    Compare two (columns, rows) results of the same SQL. Row order only matters
+    when the query ends with ORDER BY. Returns a dict with "equivalent" and,
+    if they differ, the reason and a few differing rows.
+    """
+    left_columns, left_rows = left
+    right_columns, right_rows = right
+    report = {"equivalent": False, "rows": [len(left_rows), len(right_rows)]}
+    if [c.lower() for c in left_columns] != [c.lower() for c in right_columns]:
+        report["reason"] = f"columns differ: {left_columns} vs {right_columns}"
+        return report
+    if len(left_rows) != len(right_rows):
+        report["reason"] = "row counts differ"
+        return report
+    left_rows = [tuple(_normalize_value(value) for value in row) for row in left_rows]
+    right_rows = [tuple(_normalize_value(value) for value in row) for row in right_rows]
+    ordered = bool(_ORDER_BY_PATTERN.search(sql))
+    if not ordered:
+        left_rows.sort(key=_sort_key)
+        right_rows.sort(key=_sort_key)
+    differences = []
+    for index, (left_row, right_row) in enumerate(zip(left_rows, right_rows)):
+        if not all(_values_equal(a, b) for a, b in zip(left_row, right_row)):
+            differences.append({"row": index, "left": list(left_row), "right": list(right_row)})
+            if len(differences) >= max_examples:
+                break
+    if differences:
+        report["reason"] = "values differ" + ("" if ordered else " (rows compared in sorted order)")
+        report["examples"] = differences
+        return report
+    report["equivalent"] = True
+    report["ordered"] = ordered
+    return report
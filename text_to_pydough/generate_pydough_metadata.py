@@ -1,8 +1,19 @@
 import sqlite3
 import json
 import os
+import re
+import hashlib
+import time
+import itertools
+import threading
+import multiprocessing
+import concurrent.futures
+import urllib.request
+import math
 import argparse
 
+from column_statistics import update_statistics, get_statistics_path
+
 # LLM-specific imports
 try:
     import llm
@@ -17,6 +28,41 @@ SCHEMA_JSON = os.path.join(TEMP_DIR, "depmap_schema.json")
 SCHEMA_MD = os.path.join(TEMP_DIR, "depmap_schema.md")
 DB_PATH = "text_to_pydough/data/DepMap.db"
 
+# Uniqueness inference: rows sampled to rule out candidate keys, how many leading
+# columns are tried (alone and as pairs), and seconds of exact checking per table
+UNIQUE_SAMPLE_ROWS = int(os.environ.get("PYDOUGH_METADATA_UNIQUE_SAMPLE", 20000))
+UNIQUE_MAX_COLUMNS = 6
+UNIQUE_TIME_BUDGET = float(os.environ.get("PYDOUGH_METADATA_UNIQUE_BUDGET", 10))
+
+# Processes used to profile tables in parallel
+PROFILE_WORKERS = int(os.environ.get("PYDOUGH_METADATA_WORKERS", min(8, os.cpu_count() or 2)))
+# LLM calls in flight at once, across all databases being documented
+LLM_CONCURRENCY = int(os.environ.get("PYDOUGH_METADATA_LLM_CONCURRENCY", 4))
+_LLM_SEMAPHORE = threading.BoundedSemaphore(LLM_CONCURRENCY)
+# Databases processed at once by --all
+ALL_DB_CONCURRENCY = 4
+# Generated markdown sections, keyed by table fingerprint and collection definition
+MARKDOWN_CACHE_DIRNAME = ".markdown_cache"
+
+# Bump when the generated JSON/MD layout changes so old fingerprints force a full rebuild
+FINGERPRINT_VERSION = 3
+
+# Relationship inference: child values sampled per candidate, the share of them that
+# must be found among the parent keys, and the bloom filter's false positive rate
+RELATIONSHIP_SAMPLE_ROWS = int(os.environ.get("PYDOUGH_METADATA_RELATIONSHIP_SAMPLE", 5000))
+RELATIONSHIP_MIN_CONTAINMENT = 0.99
+BLOOM_FALSE_POSITIVE_RATE = 0.001
+BLOOM_MAX_BITS = 64 * 1024 * 1024  # 8 MB per parent key column
+
+# Markers around the per-collection sections of the domain markdown, so single
+# sections can be regenerated and merged back into the document
+MD_SUMMARY_START = "<!-- summary -->"
+MD_SUMMARY_END = "<!-- /summary -->"
+MD_SECTION_START = "<!-- collection: {name} -->"
+MD_SECTION_END = "<!-- /collection: {name} -->"
+MD_SECTION_PATTERN = re.compile(r"<!-- collection: (\S+) -->\n(.*?)\n<!-- /collection: \1 -->", re.S)
+MD_SUMMARY_PATTERN = re.compile(r"<!-- summary -->\n(.*?)\n<!-- /summary -->", re.S)
+
 # Utility: SQLite type to PyDough type
 def sqlite_to_pydough_type(sqlite_type):
     t = (sqlite_type or "").upper()
@@ -58,119 +104,841 @@ def get_composite_pk_or_unique(conn, table):
                 return unique_cols
     return None  # No composite unique key found
 
-# Helper: Check if a column is unique in the table
-def is_column_unique(conn, table, column):
+# Helper: Column lists of all unique indexes (including single-column ones), smallest first
+def get_unique_indexes(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA index_list('{table}')")
+    unique_indexes = []
+    for idx in cursor.fetchall():
+        if idx[2]:  # 1 if unique
+            cursor.execute(f"PRAGMA index_info('{idx[1]}')")
+            columns = [row[2] for row in cursor.fetchall()]
+            if columns and all(columns):  # Skip indexes on expressions
+                unique_indexes.append(columns)
+    return sorted(unique_indexes, key=len)
+
+# Helper: Candidate keys to test, in order of preference: the first column, the
+# first two columns together, then other leading columns alone and in pairs.
+# Floating point columns are never treated as keys.
+def get_unique_candidates(columns):
+    leading = [col[1] for col in columns if sqlite_to_pydough_type(col[2]) != "float64"][:UNIQUE_MAX_COLUMNS]
+    pairs = [list(pair) for pair in itertools.combinations(leading[:3], 2)]
+    candidates = [[col] for col in leading[:1]] + pairs[:1] + [[col] for col in leading[1:]] + pairs[1:]
+    return candidates
+
+# Helper: Rule out candidates that have duplicates or NULLs in a sample of rows.
+# Returns (surviving candidates, whether the sample covered the whole table)
+def filter_candidates_by_sample(conn, table, candidates, sample_rows=None):
+    sample_rows = sample_rows or UNIQUE_SAMPLE_ROWS
+    columns = sorted({col for candidate in candidates for col in candidate})
+    col_list = ", ".join(f'"{col}"' for col in columns)
+    rows = conn.execute(f'SELECT {col_list} FROM "{table}" LIMIT {sample_rows}').fetchall()
+    positions = {col: i for i, col in enumerate(columns)}
+    survivors = []
+    for candidate in candidates:
+        indexes = [positions[col] for col in candidate]
+        seen = set()
+        unique = True
+        for row in rows:
+            key = tuple(row[i] for i in indexes)
+            if None in key or key in seen:
+                unique = False
+                break
+            seen.add(key)
+        if unique:
+            survivors.append(candidate)
+    return survivors, len(rows) < sample_rows
+
+# Helper: Exact check that columns hold no duplicates and no NULLs. A single column is
+# grouped (streaming over an index when there is one, stopping at the first duplicate);
+# composite keys compare the DISTINCT count with the row count, which sorts less
+def has_duplicates_or_nulls(conn, table, columns):
     cursor = conn.cursor()
+    if len(columns) == 1:
+        col = f'"{columns[0]}"'
+        cursor.execute(f'SELECT 1 FROM "{table}" GROUP BY {col} HAVING COUNT(*) > 1 OR {col} IS NULL LIMIT 1')
+        return cursor.fetchone() is not None
+    null_filter = " OR ".join(f'"{col}" IS NULL' for col in columns)
+    cursor.execute(f'SELECT 1 FROM "{table}" WHERE {null_filter} LIMIT 1')
+    if cursor.fetchone():
+        return True
+    col_list = ", ".join(f'"{col}"' for col in columns)
+    cursor.execute(f'SELECT (SELECT COUNT(*) FROM (SELECT DISTINCT {col_list} FROM "{table}")), (SELECT COUNT(*) FROM "{table}")')
+    distinct_count, total_count = cursor.fetchone()
+    return distinct_count != total_count
+
+# Infer unique_properties: declared keys first (PK, composite or single-column unique
+# indexes), then candidates that survive a sample, confirmed exactly within a time budget
+def infer_unique_properties(conn, table, columns, time_budget=None):
+    time_budget = UNIQUE_TIME_BUDGET if time_budget is None else time_budget
+    composite_key = get_composite_pk_or_unique(conn, table)
+    if composite_key:
+        return composite_key
+    pk_cols = [col[1] for col in columns if col[5] > 0]
+    if pk_cols:
+        return pk_cols
+    unique_indexes = get_unique_indexes(conn, table)
+    if unique_indexes:
+        return unique_indexes[0]
+    if not columns:
+        return ["_placeholder_id_"]
+
+    column_names = [col[1] for col in columns]
+    candidates = get_unique_candidates(columns)
     try:
-        cursor.execute(f"SELECT COUNT(DISTINCT {column}), COUNT(*) FROM {table}")
-        distinct_count, total_count = cursor.fetchone()
-        return distinct_count == total_count
-    except Exception as e:
-        print(f"Warning: Could not check uniqueness for {column} in {table}: {e}")
-        return False
+        survivors, sampled_all = filter_candidates_by_sample(conn, table, candidates)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not sample {table} for uniqueness: {e}")
+        survivors, sampled_all = [], False
 
-def generate_schema(db_path):
-    conn = sqlite3.connect(db_path)
+    if survivors and sampled_all:
+        # The sample was the whole table, so it is already an exact answer
+        return survivors[0]
+
+    deadline = time.monotonic() + time_budget
+    conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 10000)
+    try:
+        for candidate in survivors:
+            try:
+                if not has_duplicates_or_nulls(conn, table, candidate):
+                    return candidate
+            except sqlite3.OperationalError as e:
+                if str(e) != "interrupted":
+                    raise
+                print(f"Warning: Uniqueness check for {table} ran out of its {time_budget:g}s budget, assuming {candidate} from the sample")
+                return candidate
+    finally:
+        conn.set_progress_handler(None, 0)
+
+    # Nothing provably unique: keep the old fallback of the first one or two columns
+    if not survivors:
+        print(f"Warning: No unique column found for {table}, using the leading columns as unique_properties")
+    return column_names[:2]
+
+def get_table_names(conn):
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
-    tables = [row[0] for row in cursor.fetchall()]
+    return [row[0] for row in cursor.fetchall()]
+
+def get_collection_name(table, graph_name):
+    return table if table != graph_name else f"{table}Entries"
+
+# Fingerprint of a table's definition: CREATE statements from sqlite_master,
+# PRAGMA table_info and the index lists. Data changes alone don't change it.
+def table_fingerprint(conn, table):
+    cursor = conn.cursor()
+    parts = []
+    cursor.execute("SELECT type, name, sql FROM sqlite_master WHERE tbl_name = ? ORDER BY type, name", (table,))
+    parts.append(cursor.fetchall())
+    cursor.execute(f"PRAGMA table_info('{table}')")
+    parts.append(cursor.fetchall())
+    cursor.execute(f"PRAGMA index_list('{table}')")
+    indexes = cursor.fetchall()
+    parts.append(indexes)
+    for idx in indexes:
+        cursor.execute(f"PRAGMA index_info('{idx[1]}')")
+        parts.append(cursor.fetchall())
+    return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+def generate_collection(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info('{table}')")
+    columns = cursor.fetchall()  # (cid, name, type, notnull, dflt_value, pk)
+    properties = {}
+    for col in columns:
+        col_name, col_type = col[1], col[2]
+        properties[col_name] = {
+            "type": "table_column",
+            "column_name": col_name,
+            "data_type": sqlite_to_pydough_type(col_type)
+        }
+    unique_properties = infer_unique_properties(conn, table, columns)
+    # Manual override could go here if needed in the future
+    return {
+        "type": "simple_table",
+        "table_path": f"main.{table}",
+        "properties": properties,
+        "unique_properties": unique_properties
+    }
+
+def generate_schema(db_path):
+    conn = sqlite3.connect(db_path)
+    tables = get_table_names(conn)
     if not tables:
         raise Exception(f"No tables found in {db_path}")
     graph_name = os.path.splitext(os.path.basename(db_path))[0]
     schema = {graph_name: {}}
     for table in tables:
-        cursor.execute(f"PRAGMA table_info('{table}')")
-        columns = cursor.fetchall()  # (cid, name, type, notnull, dflt_value, pk)
-        properties = {}
-        for col in columns:
-            col_name, col_type = col[1], col[2]
-            properties[col_name] = {
-                "type": "table_column",
-                "column_name": col_name,
-                "data_type": sqlite_to_pydough_type(col_type)
-            }
-        # Find composite PK or unique index
-        composite_key = get_composite_pk_or_unique(conn, table)
-        if composite_key:
-            unique_properties = composite_key
-        else:
-            # Fallback: all PK columns, or first column, or placeholder
-            pk_cols = [col[1] for col in columns if col[5] > 0]
-            if pk_cols:
-                unique_properties = pk_cols
-            elif columns:
-                first_col = columns[0][1]
-                # Check if first column is unique
-                if is_column_unique(conn, table, first_col):
-                    unique_properties = [first_col]
-                elif len(columns) > 1:
-                    unique_properties = [columns[0][1], columns[1][1]]
-                else:
-                    unique_properties = [first_col]
-            else:
-                unique_properties = ["_placeholder_id_"]
-        # Manual override could go here if needed in the future
-        collection_name = table if table != graph_name else f"{table}Entries"
-        schema[graph_name][collection_name] = {
-            "type": "simple_table",
-            "table_path": f"main.{table}",
-            "properties": properties,
-            "unique_properties": unique_properties
-        }
+        schema[graph_name][get_collection_name(table, graph_name)] = generate_collection(conn, table)
     conn.close()
     return schema
 
+def get_metadata_paths(db_path):
+    # Simple naming convention next to the .db file: basename.json, basename.md, basename.fingerprints.json
+    db_filename_no_ext = os.path.splitext(os.path.basename(db_path))[0].lower()
+    outdir = os.path.dirname(db_path) or "."
+    return (
+        os.path.join(outdir, f"{db_filename_no_ext}.json"),
+        os.path.join(outdir, f"{db_filename_no_ext}.md"),
+        os.path.join(outdir, f"{db_filename_no_ext}.fingerprints.json")
+    )
+
+def load_fingerprints(path):
+    # table -> {"collection", "json", "markdown"}; empty if missing or from an older generator
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read fingerprints from {path}: {e}")
+        return {}
+    if data.get("version") != FINGERPRINT_VERSION:
+        return {}
+    return data.get("tables", {})
+
+def load_relationship_checks(path):
+    # "child.column->parent.column" -> result of the containment check, see infer_relationships
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != FINGERPRINT_VERSION:
+        return {}
+    return data.get("relationship_checks", {})
+
+def save_fingerprints(tables, path, relationship_checks=None):
+    with open(path, "w") as f:
+        json.dump({
+            "version": FINGERPRINT_VERSION,
+            "tables": tables,
+            "relationship_checks": relationship_checks or {}
+        }, f, indent=2)
+    print(f"Saved table fingerprints to {path}")
+
+def load_existing_collections_raw(schema_json_path, graph_name):
+    if not os.path.exists(schema_json_path):
+        return None
+    try:
+        with open(schema_json_path) as f:
+            existing = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return existing.get(graph_name) if isinstance(existing, dict) else None
+
+def load_existing_collections(schema_json_path, graph_name):
+    collections = load_existing_collections_raw(schema_json_path, graph_name)
+    if not isinstance(collections, dict):
+        return {}
+    # Relationships are re-inferred on every run, so only keep the columns
+    for collection in collections.values():
+        properties = collection.get("properties", {})
+        collection["properties"] = {
+            name: prop for name, prop in properties.items() if prop.get("type") == "table_column"
+        }
+    return collections
+
+# Per-process read-only connections used by profiling workers, by database path
+_READONLY_CONNECTIONS = {}
+
+def open_readonly_connection(db_path):
+    uri = "file:" + urllib.request.pathname2url(os.path.abspath(db_path)) + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+def get_readonly_connection(db_path):
+    conn = _READONLY_CONNECTIONS.get(db_path)
+    if conn is None:
+        conn = open_readonly_connection(db_path)
+        _READONLY_CONNECTIONS[db_path] = conn
+    return conn
+
+# Runs in a profiling worker process
+def profile_table(db_path, table):
+    return table, generate_collection(get_readonly_connection(db_path), table)
+
+def create_profile_pool(workers=None):
+    # Spawned (not forked) workers, so the pool is safe to start from threaded servers
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers or PROFILE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+# Helper: Report progress to an optional progress(step, table, state) callback.
+# table is None for events about the whole step. The callback may raise to abort the run.
+def report_progress(progress, step, table, state):
+    if progress is not None:
+        progress(step, table, state)
+
+def profile_tables(db_path, tables, pool=None, progress=None):
+    """
+    Introspect tables into collection definitions, in parallel across a process pool
+    (each worker keeps one read-only connection per database). Returns {table: collection}.
+    """
+    if not tables:
+        return {}
+    if pool is None and len(tables) == 1:
+        # Not worth starting processes for a single table
+        report_progress(progress, "schema", tables[0], "running")
+        profiled = dict([profile_table(db_path, tables[0])])
+        report_progress(progress, "schema", tables[0], "done")
+        return profiled
+    own_pool = pool is None
+    pool = pool or create_profile_pool(min(len(tables), PROFILE_WORKERS))
+    futures = {}
+    try:
+        futures = {pool.submit(profile_table, db_path, table): table for table in tables}
+        for table in tables:
+            report_progress(progress, "schema", table, "running")
+        profiled = {}
+        for future in concurrent.futures.as_completed(futures):
+            table, collection = future.result()
+            profiled[table] = collection
+            report_progress(progress, "schema", table, "done")
+        return profiled
+    finally:
+        # Drop queued tables if the run was aborted
+        for future in futures:
+            future.cancel()
+        if own_pool:
+            pool.shutdown()
+
+def generate_schema_incremental(db_path, schema_json_path, previous, full=False, pool=None, progress=None):
+    """
+    Rebuild the domain schema, re-introspecting only tables whose fingerprint
+    changed since the last run. Returns (schema, fingerprints, changed_tables, removed_tables).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = get_table_names(conn)
+        if not tables:
+            raise Exception(f"No tables found in {db_path}")
+        fingerprints = {table: table_fingerprint(conn, table) for table in tables}
+    finally:
+        conn.close()
+
+    graph_name = os.path.splitext(os.path.basename(db_path))[0]
+    existing = {} if full else load_existing_collections(schema_json_path, graph_name)
+    changed = [
+        table for table in tables
+        if full or previous.get(table, {}).get("json") != fingerprints[table]
+        or get_collection_name(table, graph_name) not in existing
+    ]
+    for table in tables:
+        report_progress(progress, "schema", table, "pending" if table in changed else "unchanged")
+    profiled = profile_tables(db_path, changed, pool=pool, progress=progress)
+
+    collections = {}
+    for table in tables:
+        collection_name = get_collection_name(table, graph_name)
+        collections[collection_name] = profiled[table] if table in profiled else existing[collection_name]
+    removed = [table for table in previous if table not in fingerprints]
+    return {graph_name: collections}, fingerprints, changed, removed
+
+class BloomFilter:
+    """Fixed-size bloom filter used to test whether sampled values exist in a key column."""
+
+    def __init__(self, expected_items, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        expected_items = max(1, expected_items)
+        bits = int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2))
+        self.size = max(64, min(bits, BLOOM_MAX_BITS))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(repr(value).encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+def get_declared_foreign_keys(conn, table):
+    # [(child columns, parent table, parent columns)] from PRAGMA foreign_key_list
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA foreign_key_list('{table}')")
+    keys = {}
+    for fk_id, seq, parent, from_col, to_col, *_ in cursor.fetchall():
+        keys.setdefault(fk_id, (parent, []))[1].append((seq, from_col, to_col))
+    declared = []
+    for parent, pairs in keys.values():
+        pairs.sort()
+        from_cols = [pair[1] for pair in pairs]
+        to_cols = [pair[2] for pair in pairs]
+        if any(col is None for col in to_cols):
+            # References the parent's primary key implicitly
+            cursor.execute(f"PRAGMA table_info('{parent}')")
+            pk = [row[1] for row in sorted(cursor.fetchall(), key=lambda row: row[5]) if row[5] > 0]
+            if len(pk) != len(from_cols):
+                continue
+            to_cols = pk
+        declared.append((from_cols, parent, to_cols))
+    return declared
+
+def _table_name_variants(table):
+    name = table.lower()
+    variants = {name, _singular(name)}
+    if name.endswith("es"):
+        variants.add(name[:-2])
+    return variants
+
+def column_refers_to_key(column, parent_table, parent_key):
+    """Name-based guess whether a column holds references to parent_table.parent_key."""
+    col = column.lower()
+    key = parent_key.lower()
+    if key not in ("id", "_id", "key", "code") and col == key:
+        return True
+    for variant in _table_name_variants(parent_table):
+        if col in (f"{variant}_id", f"{variant}id", f"{variant}_{key.lstrip('_')}"):
+            return True
+    # Prefixed naming, e.g. sbTxCustId referencing sbCustomer.sbCustId
+    prefix_len = len(os.path.commonprefix([col, key]))
+    stem = key[prefix_len:]
+    return len(stem) >= 4 and col.endswith(stem) and col != key
+
+def _sample_column(conn, table, column, limit):
+    cursor = conn.execute(f'SELECT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL LIMIT {int(limit)}')
+    return [row[0] for row in cursor]
+
+def _build_key_bloom(conn, table, column):
+    total = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+    bloom = BloomFilter(total)
+    # Stream the key column; only the filter is kept in memory
+    for (value,) in conn.execute(f'SELECT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL'):
+        bloom.add(value)
+    return bloom
+
+def infer_relationships(db_path, schema, fingerprints, previous_checks=None):
+    """
+    Find child.column -> parent.key references: foreign keys declared in the database,
+    plus columns whose name matches a parent's single-column unique key. Name-matched
+    candidates are confirmed by checking that sampled child values are contained in
+    a bloom filter of the parent keys (no joins). Check results are reused while both
+    tables keep their fingerprints. Returns (relationships, checks).
+    """
+    previous_checks = previous_checks or {}
+    graph_name = next(iter(schema))
+    collections = schema[graph_name]
+    tables = {collection["table_path"].split(".", 1)[1]: name for name, collection in collections.items()}
+    column_types = {
+        table: {prop["column_name"]: prop["data_type"] for prop in collections[name]["properties"].values()
+                if prop.get("type") == "table_column"}
+        for table, name in tables.items()
+    }
+    unique_keys = {table: collections[name]["unique_properties"] for table, name in tables.items()}
+
+    conn = open_readonly_connection(db_path)
+    try:
+        return _infer_relationships(conn, tables, column_types, unique_keys, fingerprints, previous_checks)
+    finally:
+        conn.close()
+
+def _infer_relationships(conn, tables, column_types, unique_keys, fingerprints, previous_checks):
+    relationships = []
+    checks = {}
+    blooms = {}
+    seen = set()
+    for child in tables:
+        declared = get_declared_foreign_keys(conn, child)
+        candidates = [(from_cols, parent, to_cols, "declared") for from_cols, parent, to_cols in declared if parent in tables]
+        for parent in tables:
+            parent_key = unique_keys[parent]
+            if len(parent_key) != 1:
+                continue
+            for column, data_type in column_types[child].items():
+                if parent == child and column == parent_key[0]:
+                    continue
+                if data_type != column_types[parent].get(parent_key[0]):
+                    continue
+                if column_refers_to_key(column, parent, parent_key[0]):
+                    candidates.append(([column], parent, parent_key, "inferred"))
+
+        for from_cols, parent, to_cols, source in candidates:
+            check_key = f"{child}.{','.join(from_cols)}->{parent}.{','.join(to_cols)}"
+            if check_key in seen:
+                continue
+            seen.add(check_key)
+            if source == "declared":
+                checks[check_key] = {"confirmed": True, "source": "declared"}
+            else:
+                check = previous_checks.get(check_key)
+                if not check or check.get("child_fp") != fingerprints.get(child) or check.get("parent_fp") != fingerprints.get(parent):
+                    try:
+                        if parent not in blooms:
+                            blooms[parent] = _build_key_bloom(conn, parent, to_cols[0])
+                        sample = _sample_column(conn, child, from_cols[0], RELATIONSHIP_SAMPLE_ROWS)
+                        contained = sum(1 for value in sample if value in blooms[parent])
+                        containment = contained / len(sample) if sample else 0.0
+                    except sqlite3.Error as e:
+                        print(f"Warning: Could not check {check_key}: {e}")
+                        continue
+                    check = {
+                        "confirmed": bool(sample) and containment >= RELATIONSHIP_MIN_CONTAINMENT,
+                        "source": "inferred",
+                        "containment": round(containment, 4),
+                        "sampled": len(sample),
+                        "child_fp": fingerprints.get(child),
+                        "parent_fp": fingerprints.get(parent)
+                    }
+                checks[check_key] = check
+            if checks[check_key]["confirmed"]:
+                relationships.append({
+                    "child": child, "child_columns": from_cols,
+                    "parent": parent, "parent_columns": to_cols,
+                    "source": source
+                })
+    return relationships, checks
+
+def _singular(name):
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("s") and not name.endswith("ss"):
+        return name[:-1]
+    return name
+
+def _plural(name):
+    if name.endswith("y") and name[-2:-1] not in ("a", "e", "i", "o", "u"):
+        return name[:-1] + "ies"
+    if name.endswith("s"):
+        return name
+    return name + "s"
+
+def _unique_property_name(name, taken):
+    candidate = name
+    suffix = 2
+    while candidate in taken:
+        candidate = f"{name}_{suffix}"
+        suffix += 1
+    taken.add(candidate)
+    return candidate
+
+def add_relationship_properties(schema, relationships):
+    """
+    Emit each relationship as a simple_join on the parent collection (parent -> children)
+    whose reverse_relationship_name names the child -> parent direction.
+    """
+    graph_name = next(iter(schema))
+    collections = schema[graph_name]
+    by_table = {collection["table_path"].split(".", 1)[1]: name for name, collection in collections.items()}
+    taken = {name: set(collection["properties"]) for name, collection in collections.items()}
+    pair_counts = {}
+    for rel in relationships:
+        pair = (rel["child"], rel["parent"])
+        pair_counts[pair] = pair_counts.get(pair, 0) + 1
+
+    for rel in relationships:
+        parent_name = by_table[rel["parent"]]
+        child_name = by_table[rel["child"]]
+        child_collection = collections[child_name]
+        plural = _plural(child_name.lower())
+        if pair_counts[(rel["child"], rel["parent"])] > 1 or rel["child"] == rel["parent"]:
+            # Several references between the same tables: name them after the column
+            column_stem = re.sub(r"_?id$", "", rel["child_columns"][0], flags=re.I).lower() or rel["child_columns"][0].lower()
+            forward = f"{plural}_by_{column_stem}"
+            reverse = column_stem
+        else:
+            forward = plural
+            reverse = _singular(parent_name.lower())
+        forward = _unique_property_name(forward, taken[parent_name])
+        reverse = _unique_property_name(reverse, taken[child_name])
+        collections[parent_name]["properties"][forward] = {
+            "type": "simple_join",
+            "other_collection_name": child_name,
+            # One child per parent when the referencing columns are the child's key
+            "singular": sorted(rel["child_columns"]) == sorted(child_collection["unique_properties"]),
+            "no_collisions": True,
+            "keys": {parent_col: [child_col] for parent_col, child_col in zip(rel["parent_columns"], rel["child_columns"])},
+            "reverse_relationship_name": reverse
+        }
+
 def save_json_schema(schema, path):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w") as f:
         json.dump(schema, f, indent=2)
     print(f"Saved JSON schema to {path}")
 
-def generate_markdown_with_llm(schema_json_path, output_md_path):
+def generate_collection_markdown(collection_name, collection):
+    prompt = f"""
+You are an expert data documentation assistant. Given the following JSON definition of one collection (table) of a SQLite database, write the Markdown documentation section for it, suitable for use by data scientists and LLMs. The section should:
+- Start with the heading "## {collection_name}"
+- Give a short description of the collection
+- Contain a table of columns with types and a clear, concise description for each column
+- Explain the unique_properties and what makes them unique, with any notes about primary keys or lack thereof
+
+Here is the collection definition:
+
+```json
+{json.dumps({collection_name: collection}, indent=2)}
+```
+
+Write only the Markdown section, no extra commentary.
+"""
+    model = llm.get_model(LLM_MODEL_NAME)
+    return model.prompt(prompt, temperature=0.2).text().strip()
+
+def get_markdown_cache_path(cache_dir, collection_name, collection, fingerprint):
+    key = hashlib.sha256(json.dumps(
+        [LLM_MODEL_NAME, collection_name, fingerprint, collection], sort_keys=True
+    ).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.md")
+
+def generate_collection_markdown_cached(collection_name, collection, fingerprint, cache_dir, use_cache=True):
+    # Sections are cached per table fingerprint, so unchanged tables (including the
+    # same table in another database) are not sent to the LLM again
+    cache_path = get_markdown_cache_path(cache_dir, collection_name, collection, fingerprint)
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return f.read()
     if not llm:
-        print("LLM not available. Cannot generate markdown.")
-        return
-    with open(schema_json_path) as f:
-        schema_json = f.read()
+        raise RuntimeError("LLM not available")
+    with _LLM_SEMAPHORE:
+        section = generate_collection_markdown(collection_name, collection)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(section)
+    os.replace(tmp_path, cache_path)
+    return section
+
+def generate_summary_markdown(graph_name, collections):
+    overview = {name: list(collection.get("properties", {})) for name, collection in collections.items()}
     prompt = f"""
-You are an expert data documentation assistant. Given the following JSON schema for a SQLite database, write a comprehensive Markdown documentation file for it, suitable for use by data scientists and LLMs. Your documentation should include:
-- A summary of the database and its collections (tables)
-- For each collection: a description, a table of columns with types and a clear, concise description for each column
-- The unique_properties for each collection, and an explanation of what makes them unique
-- Any notes about primary keys or lack thereof
+You are an expert data documentation assistant. Write the introduction of the Markdown documentation for the SQLite database "{graph_name}". Start with a "# " title, then summarize what the database contains and list its collections (tables) with a one-line description each. Detailed per-collection sections follow separately, so do not document individual columns.
 
-Here is the JSON schema:
+Collections and their columns:
 
 ```json
-{schema_json}
+{json.dumps(overview, indent=2)}
 ```
 
-Write only the Markdown documentation, no extra commentary.
+Write only the Markdown, no extra commentary.
 """
-    print("Sending schema to Gemini 2.5 Pro for Markdown generation...")
     model = llm.get_model(LLM_MODEL_NAME)
-    response = model.prompt(prompt, temperature=0.2).text()
-    with open(output_md_path, "w") as f:
-        f.write(response)
-    print(f"Saved Markdown documentation to {output_md_path}")
+    return model.prompt(prompt, temperature=0.2).text().strip()
+
+def parse_markdown_sections(text):
+    # Returns (summary, {collection_name: section}) from a document written by merge_markdown_sections
+    summary_match = MD_SUMMARY_PATTERN.search(text)
+    summary = summary_match.group(1) if summary_match else None
+    sections = {match.group(1): match.group(2) for match in MD_SECTION_PATTERN.finditer(text)}
+    return summary, sections
+
+def unmarked_markdown(text):
+    # Text of a document outside its generated blocks, e.g. a hand-written schema description
+    return MD_SECTION_PATTERN.sub("", MD_SUMMARY_PATTERN.sub("", text)).strip()
+
+def merge_markdown_sections(summary, sections, order, preamble=None):
+    parts = []
+    if preamble:
+        parts.append(preamble)
+    if summary:
+        parts.append(f"{MD_SUMMARY_START}\n{summary}\n{MD_SUMMARY_END}")
+    for name in order:
+        if name in sections:
+            parts.append(f"{MD_SECTION_START.format(name=name)}\n{sections[name]}\n{MD_SECTION_END.format(name=name)}")
+    return "\n\n".join(parts) + "\n"
+
+def update_markdown_with_llm(schema, table_collections, stale_tables, output_md_path, fingerprints, full=False, progress=None):
+    """
+    Regenerate the markdown sections of the stale tables' collections (in parallel,
+    at most LLM_CONCURRENCY LLM calls at once) and merge them into the domain document.
+    Sections that are missing are generated too, and the summary is rewritten when
+    the set of collections changed. The existing document is only rewritten when
+    something was generated; sections that fail keep their previous text, and
+    text outside the generated blocks (e.g. a hand-written description) is kept.
+    Returns the tables whose section is now up to date.
+    """
+    graph_name = next(iter(schema))
+    collections = schema[graph_name]
+    existing_summary, existing_sections, preamble = None, {}, None
+    if os.path.exists(output_md_path):
+        with open(output_md_path) as f:
+            existing_text = f.read()
+        existing_summary, existing_sections = parse_markdown_sections(existing_text)
+        preamble = unmarked_markdown(existing_text)
+    summary, sections = (None, {}) if full else (existing_summary, dict(existing_sections))
+
+    to_generate = [table for table, name in table_collections.items() if table in stale_tables or name not in sections]
+    collections_changed = set(sections) != set(collections)
+    for table in table_collections:
+        report_progress(progress, "markdown", table, "pending" if table in to_generate else "unchanged")
+    if not to_generate and summary is not None and not collections_changed:
+        print("Markdown documentation is up to date")
+        return list(table_collections)
+    if not llm:
+        print("LLM not available. Markdown documentation left unchanged.")
+        return [table for table in table_collections if table not in to_generate]
+
+    cache_dir = os.path.join(os.path.dirname(output_md_path) or ".", MARKDOWN_CACHE_DIRNAME)
+    up_to_date = [table for table in table_collections if table not in to_generate]
+    refreshed = 0
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=LLM_CONCURRENCY)
+    try:
+        futures = {
+            executor.submit(
+                generate_collection_markdown_cached,
+                table_collections[table], collections[table_collections[table]],
+                fingerprints[table], cache_dir, not full
+            ): table
+            for table in to_generate
+        }
+        for future in concurrent.futures.as_completed(futures):
+            table = futures[future]
+            name = table_collections[table]
+            try:
+                sections[name] = future.result()
+                up_to_date.append(table)
+                refreshed += 1
+                print(f"Markdown section ready for {name}")
+                state = "done"
+            except Exception as e:
+                print(f"Warning: Could not generate Markdown for {name}: {e}")
+                # Keep the previous section, if any, rather than dropping it
+                if name in existing_sections:
+                    sections[name] = existing_sections[name]
+                state = "failed"
+            report_progress(progress, "markdown", table, state)
+        executor.shutdown()
+    finally:
+        # Returns at once if the run was aborted; calls already in flight finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+    summary_refreshed = False
+    if summary is None or collections_changed:
+        report_progress(progress, "markdown", None, "summary")
+        print("Generating Markdown summary...")
+        try:
+            with _LLM_SEMAPHORE:
+                summary = generate_summary_markdown(graph_name, collections)
+            summary_refreshed = True
+        except Exception as e:
+            print(f"Warning: Could not generate Markdown summary: {e}")
+            summary = summary or existing_summary
+
+    if not refreshed and not summary_refreshed:
+        print(f"Warning: No Markdown could be generated; {output_md_path} left unchanged")
+        return up_to_date
+    tmp_path = f"{output_md_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(merge_markdown_sections(summary, sections, list(collections), preamble))
+    os.replace(tmp_path, output_md_path)
+    print(f"Saved Markdown documentation to {output_md_path} ({refreshed} of {len(to_generate)} sections refreshed)")
+    return up_to_date
+
+def generate_metadata(db_path, full=False, pool=None, progress=None):
+    """
+    Generate (or incrementally refresh) the PyDough JSON, markdown and column
+    statistics for a database.
+    Only tables whose schema fingerprint changed since the last run are re-introspected
+    and re-documented; full=True rebuilds everything. pool is an optional process
+    pool (see create_profile_pool) shared between databases. progress, if given, is
+    called as progress(step, table, state) as tables are processed (see report_progress).
+    Returns a summary dict.
+    """
+    schema_json_path, schema_md_path, fingerprint_path = get_metadata_paths(db_path)
+    previous = {} if full else load_fingerprints(fingerprint_path)
+    previous_checks = {} if full else load_relationship_checks(fingerprint_path)
+
+    report_progress(progress, "schema", None, "running")
+    schema, fingerprints, changed, removed = generate_schema_incremental(db_path, schema_json_path, previous, full=full, pool=pool, progress=progress)
+    report_progress(progress, "relationships", None, "running")
+    relationships, relationship_checks = infer_relationships(db_path, schema, fingerprints, previous_checks)
+    add_relationship_properties(schema, relationships)
+    graph_name = next(iter(schema))
+    if schema != {graph_name: load_existing_collections_raw(schema_json_path, graph_name)}:
+        save_json_schema(schema, schema_json_path)
+    print(f"Schema: {len(changed)} collections regenerated, {len(fingerprints) - len(changed)} unchanged, {len(removed)} removed, {len(relationships)} relationships")
+
+    table_collections = {table: get_collection_name(table, graph_name) for table in fingerprints}
+    # Documentation fingerprints also cover relationships and inferred keys, which
+    # depend on other tables and the data as well as the table's own definition
+    doc_fingerprints = {
+        table: hashlib.sha256(
+            (fingerprint + json.dumps(schema[graph_name][table_collections[table]], sort_keys=True)).encode("utf-8")
+        ).hexdigest()
+        for table, fingerprint in fingerprints.items()
+    }
+    # Tables whose markdown was generated from an older definition
+    stale_tables = {table for table, fingerprint in doc_fingerprints.items() if previous.get(table, {}).get("markdown") != fingerprint}
+    report_progress(progress, "markdown", None, "running")
+    documented = update_markdown_with_llm(schema, table_collections, stale_tables, schema_md_path, doc_fingerprints, full=full, progress=progress)
+    documented = set(documented or [])
+
+    save_fingerprints({
+        table: {
+            "collection": table_collections[table],
+            "json": fingerprint,
+            "markdown": doc_fingerprints[table] if table in documented else None
+        }
+        for table, fingerprint in fingerprints.items()
+    }, fingerprint_path, relationship_checks)
+
+    # Column statistics follow the data as well as the schema, so they have their own signatures
+    report_progress(progress, "statistics", None, "running")
+    _, stats_refreshed = update_statistics(db_path, full=full, pool=pool, progress=progress)
+
+    return {
+        "json_path": schema_json_path,
+        "md_path": schema_md_path,
+        "fingerprint_path": fingerprint_path,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": [table for table in fingerprints if table not in changed],
+        "relationships": relationships,
+        "statistics_path": get_statistics_path(db_path),
+        "statistics_refreshed": stats_refreshed,
+        "markdown_missing": [table for table in fingerprints if table not in documented]
+    }
+
+def generate_all_metadata(data_dir, full=False, workers=None):
+    """
+    Generate metadata for every .db file in data_dir, several databases at once,
+    sharing one profiling process pool and the LLM concurrency cap.
+    Returns {db_path: summary dict or {"error": message}}.
+    """
+    db_paths = sorted(
+        os.path.join(data_dir, name) for name in os.listdir(data_dir)
+        if name.lower().endswith(".db")
+    )
+    if not db_paths:
+        print(f"No .db files found in {data_dir}")
+        return {}
+    print(f"Generating metadata for {len(db_paths)} databases in {data_dir}...")
+    results = {}
+    with create_profile_pool(workers) as pool, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=ALL_DB_CONCURRENCY) as executor:
+        futures = {executor.submit(generate_metadata, db_path, full, pool): db_path for db_path in db_paths}
+        for future in concurrent.futures.as_completed(futures):
+            db_path = futures[future]
+            try:
+                results[db_path] = future.result()
+                print(f"Finished {db_path}")
+            except Exception as e:
+                print(f"Error generating metadata for {db_path}: {e}")
+                results[db_path] = {"error": str(e)}
+    return results
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--db", default=DB_PATH, help="Path to SQLite DB (default: DepMap.db)")
+    parser.add_argument("--all", action="store_true", help="Process every .db file in --data-dir concurrently")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"), help="Directory scanned by --all")
+    parser.add_argument("--workers", type=int, default=PROFILE_WORKERS, help="Processes used to profile tables")
+    parser.add_argument("--full", action="store_true", help="Ignore stored fingerprints and regenerate every collection")
     args = parser.parse_args()
-    db_path = args.db
-    db_filename_no_ext = os.path.splitext(os.path.basename(db_path))[0]
-    outdir = os.path.dirname(db_path) or "."
-    # Ensure output directory exists (it should, as it's same as input .db file's dir)
-    os.makedirs(outdir, exist_ok=True) 
-
-    # Use simpler naming convention: basename.json and basename.md
-    schema_json_path = os.path.join(outdir, f"{db_filename_no_ext.lower()}.json")
-    schema_md_path = os.path.join(outdir, f"{db_filename_no_ext.lower()}.md")
-    
-    schema = generate_schema(db_path)
-    save_json_schema(schema, schema_json_path)
-    generate_markdown_with_llm(schema_json_path, schema_md_path)
+    if args.all:
+        results = generate_all_metadata(args.data_dir, full=args.full, workers=args.workers)
+        if any("error" in result for result in results.values()):
+            raise SystemExit(1)
+        return
+    # Output goes next to the input .db file
+    with create_profile_pool(args.workers) as pool:
+        generate_metadata(args.db, full=args.full, pool=pool)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
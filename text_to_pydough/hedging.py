@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Hedged LLM requests
+
+Most Gemini calls finish close to their median latency, but a few take several
+times longer. With PYDOUGH_HEDGING=1, get_llm_model and get_async_llm_model wrap
+each model so that a call still running after an adaptive threshold (the
+PYDOUGH_HEDGE_PERCENTILE of that model's recent latencies, p90 by default) is
+sent a second time. Whichever copy answers first is used.
+
+Every duplicate is paid for, so hedges are limited by a budget:
+PYDOUGH_HEDGE_BUDGET is the number of extra calls allowed per call (0.1 = at
+most 10% more calls). Unused budget accumulates up to HEDGE_BURST hedges.
+Models are not hedged until they have HEDGE_MIN_SAMPLES latencies, and
+failures are not retried: a hedge only races a call that is still running.
+
+A synchronous call blocks its thread, so a call that may be hedged runs on a
+pool thread while the caller waits for the first copy to answer. Calls that
+cannot be hedged (no threshold yet, no budget left) run on the caller's thread.
+The pool never queues: when all PYDOUGH_HEDGE_THREADS threads are busy, the
+call runs on the caller's thread unhedged, and a hedge that finds no free
+thread is skipped.
+
+A HedgeTracker per model records what is needed to tune this:
+
+- recent call latencies and the current threshold;
+- calls, hedges, hedge wins, and hedges skipped for lack of budget or of a
+  free pool thread;
+- the time spent in duplicate calls.
+
+GET /api/hedging/stats reports these counters. The latency samples and
+counters are also saved to PYDOUGH_HEDGE_STATS_FILE, so a restarted server
+starts from the last known thresholds.
+"""
+
+import os
+import json
+import atexit
+import time
+import asyncio
+import threading
+import concurrent.futures
+from collections import deque
+
+HEDGING_ENABLED = os.environ.get("PYDOUGH_HEDGING", "0") == "1"
+# Percentile of a model's recent latencies after which a call is hedged
+HEDGE_PERCENTILE = float(os.environ.get("PYDOUGH_HEDGE_PERCENTILE", 90))
+# Extra (duplicate) calls allowed per call
+HEDGE_BUDGET = float(os.environ.get("PYDOUGH_HEDGE_BUDGET", 0.1))
+# Latencies needed before a model's threshold is trusted
+HEDGE_MIN_SAMPLES = int(os.environ.get("PYDOUGH_HEDGE_MIN_SAMPLES", 20))
+HEDGE_STATS_FILE = os.environ.get("PYDOUGH_HEDGE_STATS_FILE", os.path.join("results", "hedging_stats.json"))
+# Unused budget kept, in hedges
+HEDGE_BURST = 3
+# Recent latencies kept per model
+LATENCY_SAMPLES = 500
+# Recorded calls between two saves of the stats file
+HEDGE_SAVE_EVERY = 25
+# Threads for synchronous calls that may be hedged and their duplicates
+HEDGE_THREADS = int(os.environ.get("PYDOUGH_HEDGE_THREADS", 64))
+
+def _percentile(ordered, percent):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+class HedgeTracker:
+    """Latencies, hedge counters and the extra-call budget of one model."""
+
+    def __init__(self, model_name, samples=None, counters=None):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self.latencies = deque(samples or (), maxlen=LATENCY_SAMPLES)
+        self.credit = 1.0
+        self.counters = {
+            "calls": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "budget_exhausted": 0,
+            "pool_saturated": 0,
+            "errors": 0,
+            "extra_seconds": 0.0
+        }
+        self.counters.update(counters or {})
+        self._threshold = None
+        self._unsaved = 0
+        self._update_threshold()
+
+    def _update_threshold(self):
+        if len(self.latencies) >= HEDGE_MIN_SAMPLES:
+            self._threshold = _percentile(sorted(self.latencies), HEDGE_PERCENTILE)
+
+    def start_call(self):
+        """Count a call and earn its share of budget. Returns the hedge threshold in seconds, or None."""
+        with self._lock:
+            self.counters["calls"] += 1
+            self.credit = min(HEDGE_BURST, self.credit + HEDGE_BUDGET)
+            return self._threshold
+
+    def can_hedge(self):
+        """True if there is budget for a hedge right now (none is spent)."""
+        with self._lock:
+            return self.credit >= 1
+
+    def pool_saturated(self, hedge_spent=False):
+        """Count a call not hedged for lack of a free pool thread, refunding the hedge if it was spent."""
+        with self._lock:
+            self.counters["pool_saturated"] += 1
+            if hedge_spent:
+                self.credit += 1
+                self.counters["hedged"] -= 1
+
+    def try_hedge(self):
+        """Spend one hedge of budget if there is one."""
+        with self._lock:
+            if self.credit < 1:
+                self.counters["budget_exhausted"] += 1
+                return False
+            self.credit -= 1
+            self.counters["hedged"] += 1
+            return True
+
+    def record(self, seconds, duplicate=False, error=False):
+        """Record one finished copy of a call (the original or a duplicate)."""
+        with self._lock:
+            if error:
+                self.counters["errors"] += 1
+            else:
+                self.latencies.append(seconds)
+                self._update_threshold()
+            if duplicate:
+                self.counters["extra_seconds"] += seconds
+            self._unsaved += 1
+            save = self._unsaved >= HEDGE_SAVE_EVERY
+            if save:
+                self._unsaved = 0
+        if save:
+            save_hedge_stats()
+
+    def hedge_won(self):
+        with self._lock:
+            self.counters["hedge_wins"] += 1
+
+    def snapshot(self):
+        """(latency samples, counters) to save."""
+        with self._lock:
+            return list(self.latencies), dict(self.counters)
+
+    def stats(self):
+        with self._lock:
+            ordered = sorted(self.latencies)
+            counters = dict(self.counters)
+            threshold = self._threshold
+            credit = self.credit
+        calls = counters["calls"]
+        stats = dict(
+            counters,
+            model=self.model_name,
+            samples=len(ordered),
+            threshold_ms=round(threshold * 1000, 1) if threshold is not None else None,
+            hedge_rate=round(counters["hedged"] / calls, 4) if calls else None,
+            hedge_win_rate=round(counters["hedge_wins"] / counters["hedged"], 4) if counters["hedged"] else None,
+            budget_credit=round(credit, 3)
+        )
+        stats["extra_seconds"] = round(counters["extra_seconds"], 3)
+        stats["latency_ms"] = {
+            f"p{p}": round(_percentile(ordered, p) * 1000, 1) if ordered else None for p in (50, 90, 99)
+        }
+        return stats
+
+_TRACKERS = {}
+_TRACKERS_LOCK = threading.Lock()
+_SAVE_LOCK = threading.Lock()
+
+def _load_saved_stats():
+    try:
+        with open(HEDGE_STATS_FILE) as f:
+            return json.load(f).get("models", {})
+    except (OSError, ValueError):
+        return {}
+
+def get_hedge_tracker(model_name):
+    """The tracker for model_name, warm-started from HEDGE_STATS_FILE."""
+    with _TRACKERS_LOCK:
+        tracker = _TRACKERS.get(model_name)
+        if tracker is None:
+            if not _TRACKERS:
+                atexit.register(save_hedge_stats)
+            saved = _load_saved_stats().get(model_name, {})
+            tracker = _TRACKERS[model_name] = HedgeTracker(model_name, saved.get("latencies_ms") and [ms / 1000 for ms in saved["latencies_ms"]], saved.get("counters"))
+            if saved:
+                print(f"⏱️ Loaded {len(tracker.latencies)} saved latencies for {model_name}")
+        return tracker
+
+def save_hedge_stats():
+    """Write every model's latency samples and counters to HEDGE_STATS_FILE."""
+    with _TRACKERS_LOCK:
+        trackers = list(_TRACKERS.values())
+    models = {}
+    for tracker in trackers:
+        latencies, counters = tracker.snapshot()
+        models[tracker.model_name] = {"latencies_ms": [round(s * 1000, 1) for s in latencies], "counters": counters}
+    with _SAVE_LOCK:
+        try:
+            directory = os.path.dirname(HEDGE_STATS_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{HEDGE_STATS_FILE}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "models": models}, f, indent=2)
+            os.replace(temp_path, HEDGE_STATS_FILE)
+        except OSError as e:
+            print(f"⚠️ Could not save hedging stats: {str(e)}")
+
+def get_hedging_stats():
+    """Settings plus per-model stats for every model called so far."""
+    with _TRACKERS_LOCK:
+        trackers = list(_TRACKERS.values())
+    return {
+        "enabled": HEDGING_ENABLED,
+        "percentile": HEDGE_PERCENTILE,
+        "budget": HEDGE_BUDGET,
+        "min_samples": HEDGE_MIN_SAMPLES,
+        "models": {tracker.model_name: tracker.stats() for tracker in trackers}
+    }
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+# One per pool thread, so work is only submitted when a thread is free
+_POOL_SLOTS = threading.BoundedSemaphore(HEDGE_THREADS)
+
+def _get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = concurrent.futures.ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix="llm-hedge")
+        return _POOL
+
+def _submit(fn, *args):
+    """Run fn(*args) on a free pool thread. Returns its future, or None if every thread is busy."""
+    if not _POOL_SLOTS.acquire(blocking=False):
+        return None
+    try:
+        future = _get_pool().submit(fn, *args)
+    except Exception:
+        _POOL_SLOTS.release()
+        raise
+    future.add_done_callback(lambda _: _POOL_SLOTS.release())
+    return future
+
+class HedgedModel:
+    """
+    Wraps an llm model: prompt() runs the call (so the response is complete when
+    it returns) and sends a duplicate if it is slower than the model's threshold.
+    """
+
+    def __init__(self, model, model_name):
+        self.model = model
+        self.model_id = getattr(model, "model_id", model_name)
+        self.tracker = get_hedge_tracker(model_name)
+
+    def _call(self, duplicate, prompt, kwargs):
+        started = time.monotonic()
+        try:
+            response = self.model.prompt(prompt, **kwargs)
+            response.text()  # llm responses are lazy; this makes the request
+        except Exception:
+            self.tracker.record(time.monotonic() - started, duplicate, error=True)
+            raise
+        self.tracker.record(time.monotonic() - started, duplicate)
+        return response
+
+    def prompt(self, prompt, **kwargs):
+        threshold = self.tracker.start_call()
+        if threshold is None or not self.tracker.can_hedge():
+            return self._call(False, prompt, kwargs)
+
+        original = _submit(self._call, False, prompt, kwargs)
+        if original is None:
+            self.tracker.pool_saturated()
+            return self._call(False, prompt, kwargs)
+        # The thread was free, so the call started right away and the wait is its own latency
+        try:
+            return original.result(timeout=threshold)
+        except concurrent.futures.TimeoutError:
+            pass
+        if not self.tracker.try_hedge():
+            return original.result()
+
+        duplicate = _submit(self._call, True, prompt, kwargs)
+        if duplicate is None:
+            self.tracker.pool_saturated(hedge_spent=True)
+            return original.result()
+        pending = {original, duplicate}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is duplicate:
+                        self.tracker.hedge_won()
+                    # The slower copy keeps running in the pool and is recorded when it ends
+                    return future.result()
+        # Both copies failed
+        return original.result()
+
+class AsyncHedgedModel(HedgedModel):
+    """HedgedModel for llm async models: the copies are tasks and the slower one is cancelled."""
+
+    def prompt(self, prompt, **kwargs):
+        return _HedgedAsyncResponse(self, prompt, kwargs)
+
+    async def _call_async(self, duplicate, prompt, kwargs):
+        started = time.monotonic()
+        try:
+            text = await self.model.prompt(prompt, **kwargs).text()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.tracker.record(time.monotonic() - started, duplicate, error=True)
+            raise
+        self.tracker.record(time.monotonic() - started, duplicate)
+        return text
+
+    async def hedged_text(self, prompt, kwargs):
+        threshold = self.tracker.start_call()
+        if threshold is None:
+            return await self._call_async(False, prompt, kwargs)
+
+        original = asyncio.ensure_future(self._call_async(False, prompt, kwargs))
+        duplicate = None
+        try:
+            done, _ = await asyncio.wait({original}, timeout=threshold)
+            if done or not self.tracker.try_hedge():
+                return await original
+
+            duplicate = asyncio.ensure_future(self._call_async(True, prompt, kwargs))
+            pending = {original, duplicate}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is duplicate:
+                            self.tracker.hedge_won()
+                        return task.result()
+            # Both copies failed
+            return original.result()
+        finally:
+            for task in (original, duplicate):
+                if task is not None and not task.done():
+                    task.cancel()
+
+class _HedgedAsyncResponse:
+    """Response of AsyncHedgedModel.prompt(): awaiting text() runs the hedged call."""
+
+    def __init__(self, model, prompt, kwargs):
+        self._model = model
+        self._prompt = prompt
+        self._kwargs = kwargs
+        self._text = None
+
+    async def text(self):
+        if self._text is None:
+            self._text = await self._model.hedged_text(self._prompt, self._kwargs)
+        return self._text
@@ -25,12 +25,16 @@ from pydough_query_processor import (
     read_file_content,
     PyDoughResponse, 
     DomainDetection,
+    format_domain_candidates,
+    get_llm_model,
+    CODE_GENERATION_MODEL,
+    DOMAIN_DETECTION_MODEL,
     adapt_and_execute_code,
     execute_pydough_script,
     save_execution_artifacts
 )
 
-import llm
+from domain_router import shortlist_domains
 
 # Define our graph state
 class QueryState(MessagesState):
@@ -55,9 +59,8 @@ def detect_domain_node(state: QueryState) -> Dict:
     
     query_text = last_message.content
 
-    # Build domain list for prompt
-    domain_list = "\n".join([f"{i+1}. {domain} - {', '.join(config['keywords'][:5])}" 
-                          for i, (domain, config) in enumerate(DOMAINS.items())])
+    # Only the domains shortlisted by the local index are offered to the model
+    domain_list = format_domain_candidates(shortlist_domains(query_text))
     
     prompt = f"""
 Identify which database domain this query is asking about:
@@ -69,7 +72,7 @@ Available domains:
 Return the domain name that best matches the query.
 """
     # Use gemini-2.0-flash for efficient domain detection
-    model = llm.get_model("gemini-2.0-flash")
+    model = get_llm_model(DOMAIN_DETECTION_MODEL)
     
     try:
         # Get structured response
@@ -199,7 +202,7 @@ DON'T include any explanations or comments - just provide the working PyDough co
 """
     
     # Use gemini-2.5-pro for code generation
-    model = llm.get_model("gemini-2.5-pro-preview-05-06")
+    model = get_llm_model(CODE_GENERATION_MODEL)
     
     try:
         # Get structured response
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+HTTP load generator for the API server
+
+Replays a request mix drawn from queries.csv against /api/query,
+/api/query-lg, /api/history and /api/metadata/<domain>, in one of two modes:
+
+- closed loop: a fixed number of clients, each sending its next request as soon
+  as the previous one returns (--concurrency 1 8 32 runs one level after the
+  other, to find where throughput stops growing)
+- open loop: requests arrive at a constant rate (--rate, or Poisson arrivals
+  with --poisson) whether or not earlier ones have finished; latency is
+  measured from the scheduled arrival, so queueing in the client counts too
+
+By default the server is started locally (`python app.py`) with the
+deterministic stub model (PYDOUGH_LLM_STUB=1, see stub_llm.py), so results
+measure the server and not Gemini. Server resource usage (CPU, RSS and threads
+of the server and its executor workers, read from /proc) is sampled during
+the run. Every run writes a JSON report with throughput, latency percentiles
+and error rates per endpoint; --compare prints two reports side by side.
+
+Run `python load_test.py --mode closed --concurrency 1 8 32 --duration 30`.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import signal
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from domain_router import load_labelled_queries
+
+LOAD_TEST_DIR = os.path.join("results", "loadtest")
+DEFAULT_PORT = int(os.environ.get("PYDOUGH_LOAD_TEST_PORT", 5057))
+# Request mix: endpoint -> weight
+DEFAULT_MIX = {"query": 70, "query-lg": 10, "history": 10, "metadata": 10}
+REQUEST_TIMEOUT = float(os.environ.get("PYDOUGH_LOAD_TEST_TIMEOUT", 300))
+# Seconds between server resource samples
+SAMPLE_INTERVAL = 0.5
+PERCENTILES = (50, 90, 95, 99)
+
+def parse_mix(text):
+    """'query=70,history=30' -> {"query": 70, "history": 30}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown endpoint {name!r} in mix (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+class RequestMix:
+    """Deterministic sequence of requests drawn from the labelled queries."""
+
+    def __init__(self, queries, mix=None, execute=True, seed=42):
+        self.queries = queries
+        self.domains = sorted({category for category, _ in queries})
+        self.endpoints = list((mix or DEFAULT_MIX).keys())
+        self.weights = list((mix or DEFAULT_MIX).values())
+        self.execute = execute
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def next(self):
+        """(endpoint name, method, path, JSON body or None)."""
+        with self.lock:
+            endpoint = self.random.choices(self.endpoints, weights=self.weights)[0]
+            category, query = self.queries[self.random.randrange(len(self.queries))]
+        if endpoint == "query":
+            return endpoint, "POST", "/api/query", {"query_text": query, "execute": self.execute}
+        if endpoint == "query-lg":
+            return endpoint, "POST", "/api/query-lg", {"query": query, "execute": self.execute}
+        if endpoint == "history":
+            return endpoint, "GET", "/api/history", None
+        return endpoint, "GET", f"/api/metadata/{category}", None
+
+def request_headers(lane=None, client=None):
+    """Headers naming the admission lane and the client (see admission.py)."""
+    headers = {"Content-Type": "application/json"}
+    if lane:
+        headers["X-PyDough-Lane"] = lane
+    if client:
+        headers["X-Client-Id"] = client
+    return headers
+
+def send(base_url, method, path, body, timeout=REQUEST_TIMEOUT, headers=None):
+    """(HTTP status or None, application success flag, error text)."""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method, headers=headers or request_headers())
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload, status = e.read(), e.code
+    except Exception as e:
+        return None, False, f"{type(e).__name__}: {e}"
+    try:
+        parsed = json.loads(payload)
+    except ValueError:
+        return status, status < 400, None
+    if not isinstance(parsed, dict):
+        return status, status < 400, None
+    success, error = parsed.get("success", status < 400), parsed.get("error")
+    # Generated code that failed to run counts as an application error too
+    execution = parsed.get("execution")
+    if success and isinstance(execution, dict) and execution.get("success") is False:
+        success, error = False, execution.get("error") or "execution failed"
+    return status, bool(success), error
+
+class Recorder:
+    """Per-request outcomes of one run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []  # (endpoint, started offset, latency seconds, status, success, error)
+        self.started = time.perf_counter()
+
+    def add(self, endpoint, started, latency, status, success, error):
+        with self.lock:
+            self.records.append((endpoint, started - self.started, latency, status, success, error))
+
+def _percentile(values, p):
+    if not values:
+        return None
+    # Nearest rank
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def summarize(records, elapsed):
+    """Throughput, latency percentiles (ms) and error rates, overall and per endpoint."""
+    def block(rows):
+        latencies = [row[2] * 1000 for row in rows]
+        http_errors = sum(1 for row in rows if row[3] is not None and row[3] >= 400)
+        transport_errors = sum(1 for row in rows if row[3] is None)
+        app_errors = sum(1 for row in rows if row[3] is not None and row[3] < 400 and not row[4])
+        statuses = {}
+        for row in rows:
+            statuses[str(row[3])] = statuses.get(str(row[3]), 0) + 1
+        errors = {}
+        for row in rows:
+            if row[5] and len(errors) < 5:
+                errors[str(row[5])[:200]] = errors.get(str(row[5])[:200], 0) + 1
+        return {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 3) if elapsed else None,
+            "latency_ms": dict(
+                {f"p{p}": round(_percentile(latencies, p), 1) if latencies else None for p in PERCENTILES},
+                mean=round(sum(latencies) / len(latencies), 1) if latencies else None,
+                max=round(max(latencies), 1) if latencies else None
+            ),
+            "error_rate": round((http_errors + transport_errors) / len(rows), 4) if rows else None,
+            "app_error_rate": round(app_errors / len(rows), 4) if rows else None,
+            "http_errors": http_errors,
+            "transport_errors": transport_errors,
+            "app_errors": app_errors,
+            "status_codes": statuses,
+            "sample_errors": errors
+        }
+    endpoints = sorted({row[0] for row in records})
+    timeline = {}
+    for row in records:
+        second = int(row[1] + row[2])
+        entry = timeline.setdefault(second, {"completed": 0, "errors": 0})
+        entry["completed"] += 1
+        entry["errors"] += int(row[3] is None or row[3] >= 400)
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": block(records),
+        "endpoints": {name: block([row for row in records if row[0] == name]) for name in endpoints},
+        "timeline": [dict(second=second, **timeline[second]) for second in sorted(timeline)]
+    }
+
+def _process_tree(pid):
+    # pid and all its descendants, from /proc
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+                children.setdefault(parent, []).append(int(entry))
+            except (OSError, ValueError, IndexError):
+                continue
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+def _process_usage(pid):
+    # (cpu seconds, rss bytes, threads) of one process
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    return (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * page, int(fields[17])
+
+class ResourceSampler:
+    """Samples CPU, RSS and threads of a server process tree in the background (Linux only)."""
+
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        cpu = rss = threads = processes = 0
+        for pid in _process_tree(self.pid):
+            try:
+                process_cpu, process_rss, process_threads = _process_usage(pid)
+            except (OSError, ValueError, IndexError):
+                continue
+            cpu += process_cpu
+            rss += process_rss
+            threads += process_threads
+            processes += 1
+        return time.perf_counter(), cpu, rss, threads, processes
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append(self._sample())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.pid and os.path.isdir(f"/proc/{self.pid}"):
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Summary of the samples taken since start()."""
+        self._stop.set()
+        if self._thread is None:
+            return None
+        self._thread.join()
+        self.samples.append(self._sample())
+        if len(self.samples) < 2:
+            return None
+        first, last = self.samples[0], self.samples[-1]
+        cpu_percent = [
+            100 * (b[1] - a[1]) / (b[0] - a[0])
+            for a, b in zip(self.samples, self.samples[1:]) if b[0] > a[0]
+        ]
+        return {
+            "samples": len(self.samples),
+            "cpu_seconds": round(last[1] - first[1], 2),
+            "cpu_percent_mean": round(100 * (last[1] - first[1]) / (last[0] - first[0]), 1),
+            "cpu_percent_max": round(max(cpu_percent), 1) if cpu_percent else None,
+            "rss_mb_peak": round(max(sample[2] for sample in self.samples) / (1024 * 1024), 1),
+            "rss_mb_end": round(last[2] / (1024 * 1024), 1),
+            "threads_peak": max(sample[3] for sample in self.samples),
+            "processes_peak": max(sample[4] for sample in self.samples)
+        }
+
+def run_closed_loop(base_url, request_mix, concurrency, duration=None, requests=None, think_time=0.0, lane=None):
+    """
+    concurrency clients sending back to back until duration seconds or requests
+    requests are done. Each client has its own X-Client-Id; lane sets X-PyDough-Lane
+    (both honoured only from the server's PYDOUGH_TRUSTED_CALLERS).
+    """
+    recorder = Recorder()
+    deadline = recorder.started + duration if duration else None
+    counter = {"sent": 0}
+    counter_lock = threading.Lock()
+
+    def client(index):
+        headers = request_headers(lane, f"loadtest-{os.getpid()}-{index}")
+        while True:
+            with counter_lock:
+                if requests is not None and counter["sent"] >= requests:
+                    return
+                counter["sent"] += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            endpoint, method, path, body = request_mix.next()
+            started = time.perf_counter()
+            status, success, error = send(base_url, method, path, body, headers=headers)
+            recorder.add(endpoint, started, time.perf_counter() - started, status, success, error)
+            if think_time:
+                time.sleep(think_time)
+
+    threads = [threading.Thread(target=client, args=(i,), name=f"client-{i}", daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - recorder.started
+
+def run_open_loop(base_url, request_mix, rate, duration, poisson=False, max_in_flight=1000, seed=42, lane=None):
+    """
+    Requests arriving at `rate` per second for `duration` seconds, up to
+    max_in_flight at once. Every request is a client of its own, which the
+    server only honours if this host is one of its PYDOUGH_TRUSTED_CALLERS;
+    otherwise all requests share this host's per-client limit.
+    """
+    recorder = Recorder()
+    arrivals = random.Random(seed)
+    in_flight = threading.Semaphore(max_in_flight)
+    dropped = {"count": 0}
+
+    def fire(endpoint, method, path, body, scheduled, number):
+        try:
+            status, success, error = send(base_url, method, path, body, headers=request_headers(lane, f"loadtest-{os.getpid()}-{number}"))
+            recorder.add(endpoint, scheduled, time.perf_counter() - scheduled, status, success, error)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="open-loop") as pool:
+        scheduled = recorder.started
+        end = recorder.started + duration
+        number = 0
+        while scheduled < end:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint, method, path, body = request_mix.next()
+            number += 1
+            if in_flight.acquire(blocking=False):
+                pool.submit(fire, endpoint, method, path, body, scheduled, number)
+            else:
+                # More requests outstanding than the client allows: counted, not sent
+                dropped["count"] += 1
+                recorder.add(endpoint, scheduled, 0.0, None, False, "client in-flight limit reached")
+            scheduled += arrivals.expovariate(rate) if poisson else 1.0 / rate
+    return recorder, time.perf_counter() - recorder.started, dropped["count"]
+
+# Server entry point per --app
+SERVER_SCRIPTS = {"flask": "app.py", "asgi": "asgi_app.py"}
+
+def start_server(port, env_overrides=None, log_path=None, server_app="flask"):
+    """Start the API server (app.py, or asgi_app.py) on port with the stub model. Returns the Popen (its own process group)."""
+    env = dict(os.environ, PORT=str(port), PYDOUGH_LLM_STUB="1")
+    env.update(env_overrides or {})
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPTS[server_app]], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+    )
+    return process
+
+def wait_until_ready(base_url, timeout=180, process=None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before becoming ready")
+        status, _, _ = send(base_url, "GET", "/api/ready", None, timeout=5)
+        if status == 200:
+            return
+        time.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} was not ready after {timeout}s")
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+def run_load_test(args):
+    queries = load_labelled_queries(args.queries)
+    if args.categories:
+        queries = [(category, query) for category, query in queries if category in args.categories]
+    if not queries:
+        raise ValueError("No queries to replay")
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+
+    process = None
+    base_url = args.url.rstrip("/") if args.url else f"http://127.0.0.1:{args.port}"
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if not args.url:
+        log_path = os.path.join(args.output_dir, f"server_{stamp}.log")
+        print(f"⏳ Starting {args.app} server on port {args.port} with the stub model (log: {log_path})...")
+        process = start_server(args.port, log_path=log_path, server_app=args.app)
+    server_pid = process.pid if process else args.server_pid
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "mode": args.mode,
+        "url": base_url,
+        "mix": mix,
+        "execute": not args.no_execute,
+        "seed": args.seed,
+        "lane": args.lane,
+        "stub_model": process is not None,
+        "app": args.app if process is not None else None,
+        "runs": []
+    }
+    try:
+        wait_until_ready(base_url, process=process)
+        print("✅ Server ready")
+        levels = args.concurrency if args.mode == "closed" else args.rate
+        for level in levels:
+            request_mix = RequestMix(queries, mix, execute=not args.no_execute, seed=args.seed)
+            sampler = ResourceSampler(server_pid).start()
+            print(f"🚀 {args.mode} loop, {'concurrency' if args.mode == 'closed' else 'rate'} {level:g}...")
+            if args.mode == "closed":
+                recorder, elapsed = run_closed_loop(
+                    base_url, request_mix, int(level), duration=args.duration, requests=args.requests, think_time=args.think_time, lane=args.lane
+                )
+                run = {"concurrency": int(level)}
+            else:
+                recorder, elapsed, dropped = run_open_loop(
+                    base_url, request_mix, level, args.duration, poisson=args.poisson, max_in_flight=args.max_in_flight, seed=args.seed, lane=args.lane
+                )
+                run = {"rate": level, "poisson": args.poisson, "dropped": dropped}
+            run.update(summarize(recorder.records, elapsed))
+            run["server"] = sampler.stop()
+            overall = run["overall"]
+            print(f"   {overall['requests']} requests, {overall['throughput_rps']} req/s, "
+                  f"p50 {overall['latency_ms']['p50']} ms, p99 {overall['latency_ms']['p99']} ms, "
+                  f"errors {overall['error_rate']}, app errors {overall['app_error_rate']}")
+            report["runs"].append(run)
+    finally:
+        if process is not None:
+            stop_server(process)
+    report["finished_at"] = datetime.now().isoformat()
+    output = args.output or os.path.join(args.output_dir, f"loadtest_{args.mode}_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Load test report saved to {output}")
+    return report
+
+def compare_reports(old_path, new_path):
+    """Print throughput, p50/p99 latency and error rate of two reports' runs side by side."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    key = "concurrency" if old.get("mode") == "closed" else "rate"
+    new_runs = {run.get(key): run for run in new.get("runs", [])}
+    print(f"{key:>12} | {'req/s':>17} | {'p50 ms':>19} | {'p99 ms':>19} | {'errors':>15}")
+    for run in old.get("runs", []):
+        other = new_runs.get(run.get(key))
+        if other is None:
+            continue
+        a, b = run["overall"], other["overall"]
+        print(f"{run.get(key):>12} | {a['throughput_rps']:>7} -> {b['throughput_rps']:<7} | "
+              f"{a['latency_ms']['p50']:>8} -> {b['latency_ms']['p50']:<8} | "
+              f"{a['latency_ms']['p99']:>8} -> {b['latency_ms']['p99']:<8} | "
+              f"{a['error_rate']:>6} -> {b['error_rate']:<6}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API server with a query mix from queries.csv")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="Closed loop (fixed clients) or open loop (fixed arrival rate)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8], help="Clients per closed-loop run (one run per value)")
+    parser.add_argument("--rate", type=float, nargs="+", default=[5.0], help="Requests per second per open-loop run (one run per value)")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of evenly spaced ones (open loop)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Requests the open-loop client keeps outstanding at most")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per run")
+    parser.add_argument("--requests", type=int, help="Stop a closed-loop run after this many requests")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds each closed-loop client waits between requests")
+    parser.add_argument("--mix", help="Endpoint weights, e.g. query=70,query-lg=10,history=10,metadata=10")
+    parser.add_argument("--queries", default="queries.csv", help="CSV with Category and Query columns")
+    parser.add_argument("--categories", nargs="+", help="Only replay queries of these categories")
+    parser.add_argument("--no-execute", action="store_true", help="Generate code without executing it")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the request sequence")
+    parser.add_argument("--lane", help="Admission lane to send requests in (X-PyDough-Lane), e.g. batch")
+    parser.add_argument("--url", help="Test a running server instead of starting one (it should use PYDOUGH_LLM_STUB=1)")
+    parser.add_argument("--server-pid", type=int, help="PID of the running server, to sample its resource usage")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port for the started server")
+    parser.add_argument("--app", choices=sorted(SERVER_SCRIPTS), default="flask", help="Server to start: the Flask app or the async ASGI app")
+    parser.add_argument("--output-dir", default=LOAD_TEST_DIR, help="Directory for reports and server logs")
+    parser.add_argument("--output", help="Report file (default: <output-dir>/loadtest_<mode>_<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two saved reports and exit")
+    args = parser.parse_args()
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+    run_load_test(args)
+
+if __name__ == "__main__":
+    main()
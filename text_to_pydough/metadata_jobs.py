@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background metadata generation jobs
+
+Metadata generation (table profiling, relationship inference, LLM documentation
+and column statistics, see generate_pydough_metadata.generate_metadata) runs in
+this process on a small thread pool, sharing one profiling process pool between
+jobs. Each job reports per-table progress for every step, can be cancelled
+between tables, and on success makes the domain catalog pick up the database.
+"""
+
+import os
+import uuid
+import atexit
+import threading
+import traceback
+import collections
+import concurrent.futures
+from datetime import datetime
+
+from domains import DOMAINS, DOMAIN_CATALOG
+
+# Metadata generation jobs running at once
+METADATA_JOB_WORKERS = int(os.environ.get("PYDOUGH_METADATA_JOB_WORKERS", 2))
+# Finished jobs kept for polling
+METADATA_JOB_HISTORY = 50
+
+# Steps with per-table progress, in the order they run
+JOB_STEPS = ("schema", "markdown", "statistics")
+# Per-table states that count as finished
+FINISHED_STATES = ("done", "unchanged", "failed")
+
+class MetadataJobCancelled(Exception):
+    """Raised from the progress callback to stop a cancelled job."""
+
+_JOBS = collections.OrderedDict()
+_JOBS_LOCK = threading.Lock()
+_JOB_EXECUTOR = None
+_PROFILE_POOL = None
+
+def _now():
+    return datetime.now().isoformat()
+
+def _get_executors():
+    """Start the job threads and the shared profiling process pool on first use."""
+    global _JOB_EXECUTOR, _PROFILE_POOL
+    with _JOBS_LOCK:
+        if _JOB_EXECUTOR is None:
+            # Imported here: generate_pydough_metadata loads the llm package
+            import generate_pydough_metadata
+            _JOB_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+                max_workers=METADATA_JOB_WORKERS, thread_name_prefix="metadata-job"
+            )
+            _PROFILE_POOL = generate_pydough_metadata.create_profile_pool()
+        return _JOB_EXECUTOR, _PROFILE_POOL
+
+def shutdown_metadata_jobs():
+    """Cancel running jobs and stop the pools."""
+    global _JOB_EXECUTOR, _PROFILE_POOL
+    for job in list(_JOBS.values()):
+        job["cancel_event"].set()
+    if _JOB_EXECUTOR is not None:
+        _JOB_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _JOB_EXECUTOR = None
+    if _PROFILE_POOL is not None:
+        _PROFILE_POOL.shutdown(wait=False, cancel_futures=True)
+        _PROFILE_POOL = None
+
+atexit.register(shutdown_metadata_jobs)
+
+def job_summary(job):
+    """JSON-friendly view of a job, with overall progress across all steps."""
+    finished = sum(
+        1 for steps in job["tables"].values() for step in JOB_STEPS
+        if steps.get(step) in FINISHED_STATES
+    )
+    total = len(job["tables"]) * len(JOB_STEPS)
+    summary = {key: value for key, value in job.items() if key != "cancel_event"}
+    # Copied so the summary can be serialized while the job keeps updating
+    summary["tables"] = {table: dict(steps) for table, steps in job["tables"].items()}
+    summary["progress"] = {
+        "finished": finished,
+        "total": total,
+        "percent": round(100 * finished / total, 1) if total else 0.0
+    }
+    return summary
+
+def _make_progress_callback(job):
+    def progress(step, table, state):
+        with _JOBS_LOCK:
+            if job["cancel_event"].is_set():
+                raise MetadataJobCancelled()
+            if table is None:
+                job["step"] = step
+            else:
+                job["tables"].setdefault(table, dict.fromkeys(JOB_STEPS, "pending"))[step] = state
+            job["updated_at"] = _now()
+    return progress
+
+def register_generated_domain(db_path, report):
+    """
+    Make the domain catalog pick up a database whose metadata was just generated,
+    and have executor workers drop any copy of it they loaded. Returns the domain name.
+    """
+    from pydough_executor import unload_domains
+
+    DOMAIN_CATALOG.invalidate()
+    domain_name = DOMAIN_CATALOG.find_by_database(db_path)
+    if domain_name is None or domain_name not in DOMAINS:
+        raise RuntimeError(f"Generated metadata for {db_path} was not found in {DOMAIN_CATALOG.data_dir}")
+    unload_domains([domain_name])
+    print(f"✅ Domain {domain_name} is available (version {DOMAINS[domain_name]['version']})")
+    return domain_name
+
+def _run_job(job, pool):
+    import generate_pydough_metadata
+
+    with _JOBS_LOCK:
+        if job["cancel_event"].is_set():
+            # Cancelled while queued
+            return
+        job["state"] = "running"
+        job["started_at"] = _now()
+    print(f"⏳ Metadata job {job['job_id']} started for {job['db_filename']}")
+    try:
+        report = generate_pydough_metadata.generate_metadata(
+            job["db_path"], full=job["full"], pool=pool, progress=_make_progress_callback(job)
+        )
+        domain_name = register_generated_domain(job["db_path"], report)
+        with _JOBS_LOCK:
+            job["state"] = "succeeded"
+            job["domain"] = domain_name
+            job["result"] = report
+        print(f"✅ Metadata job {job['job_id']} finished")
+    except MetadataJobCancelled:
+        with _JOBS_LOCK:
+            job["state"] = "cancelled"
+        print(f"🛑 Metadata job {job['job_id']} cancelled")
+    except Exception as e:
+        traceback.print_exc()
+        with _JOBS_LOCK:
+            job["state"] = "failed"
+            job["error"] = str(e)
+        print(f"❌ Metadata job {job['job_id']} failed: {e}")
+    finally:
+        with _JOBS_LOCK:
+            job["step"] = None
+            job["finished_at"] = _now()
+
+def start_metadata_job(db_path, full=False):
+    """
+    Start generating metadata for db_path in the background.
+    Returns (job summary, created); if a job for the same database is still
+    queued or running, that job is returned instead with created=False.
+    """
+    executor, pool = _get_executors()
+    db_abspath = os.path.abspath(db_path)
+    with _JOBS_LOCK:
+        for job in _JOBS.values():
+            if job["db_path"] == db_abspath and job["state"] in ("queued", "running"):
+                return job_summary(job), False
+        job = {
+            "job_id": uuid.uuid4().hex[:12],
+            "db_path": db_abspath,
+            "db_filename": os.path.basename(db_path),
+            "full": bool(full),
+            "state": "queued",
+            "step": None,
+            "tables": {},
+            "domain": None,
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "updated_at": None,
+            "finished_at": None,
+            "cancel_event": threading.Event()
+        }
+        _JOBS[job["job_id"]] = job
+        # Forget the oldest finished jobs
+        finished = [job_id for job_id, old in _JOBS.items() if old["finished_at"]]
+        for job_id in finished[:max(0, len(_JOBS) - METADATA_JOB_HISTORY)]:
+            del _JOBS[job_id]
+        summary = job_summary(job)
+    executor.submit(_run_job, job, pool)
+    return summary, True
+
+def get_metadata_job(job_id):
+    """Summary of a job, or None if it is unknown."""
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        return job_summary(job) if job else None
+
+def list_metadata_jobs():
+    """Summaries of all known jobs, newest first, without their result reports."""
+    with _JOBS_LOCK:
+        return [
+            {key: value for key, value in job_summary(job).items() if key not in ("result", "tables")}
+            for job in reversed(_JOBS.values())
+        ]
+
+def cancel_metadata_job(job_id):
+    """
+    Ask a job to stop; it stops at the next table boundary. Returns the job
+    summary, or None if the job is unknown.
+    """
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        if job is None:
+            return None
+        if job["state"] == "queued":
+            job["state"] = "cancelled"
+            job["finished_at"] = _now()
+        if job["state"] == "running":
+            job["cancel_requested"] = True
+        job["cancel_event"].set()
+        return job_summary(job)
@@ -0,0 +1,1409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PyDough Executor
+
+Pool of long-lived worker processes that keep PyDough metadata graphs and
+SQLite connections loaded between requests. Generated PyDough code is sent to
+an idle worker, which translates it to SQL (and runs it against the domain
+database) without paying interpreter start-up and import costs every time.
+
+Every task runs under a time budget. Workers check it (and a per-worker cancel
+flag the parent can raise) from SQLite's progress handler, so a slow or
+cancelled statement is interrupted cooperatively and the worker keeps its
+loaded sessions. Killing the worker is only the fallback when it stops
+answering altogether.
+
+Workers also run under optional RLIMIT_AS / per-task RLIMIT_CPU caps, report
+the memory each task used, and are recycled after a number of tasks or once
+their resident memory passes a watermark.
+
+Each worker keeps its loaded domain sessions in an LRU bounded by a memory
+budget. The pool schedules every task on a worker that already has its domain
+loaded, and only spills over to a cold worker when the warm ones are busy with
+a queue of work for that domain. Hit rates per domain are kept for reporting.
+
+Executions can also run on DuckDB (see duckdb_engine): per task, per
+PYDOUGH_ENGINE, or chosen by the router from the SQLite plan.
+
+Small databases are copied into an in-memory SQLite database once per worker
+(sqlite3 backup API) and served from there; the copy is refreshed when the
+file's fingerprint changes.
+
+The pool can also be awaited from an asyncio event loop (ExecutorPool.run_async
+and the *_async functions below): waiting for an idle worker and for the
+worker's reply on its pipe then holds no thread, so one process can keep many
+queries in flight while the workers are busy.
+"""
+
+import os
+import re
+import sqlite3
+import textwrap
+import threading
+import traceback
+import multiprocessing
+import atexit
+import asyncio
+import time
+import signal
+import tracemalloc
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from duckdb_engine import EXECUTION_ENGINE, choose_engine
+from admission import LANES_SPEC, parse_lanes, current_lane
+
+try:
+    import resource
+except ImportError:
+    resource = None # Not available on Windows; limits and RSS tracking are skipped
+
+# Number of warm worker processes in the pool
+EXECUTOR_POOL_SIZE = int(os.environ.get("PYDOUGH_EXECUTOR_WORKERS", 2))
+# Default time budget in seconds for one task (overridable per domain and per request)
+EXECUTOR_TASK_TIMEOUT = float(os.environ.get("PYDOUGH_EXECUTOR_TIMEOUT", 60))
+# Extra seconds a worker gets to report an interrupted statement before it is killed
+EXECUTOR_KILL_GRACE = float(os.environ.get("PYDOUGH_EXECUTOR_KILL_GRACE", 5))
+# SQLite virtual machine instructions between two budget/cancel checks
+PROGRESS_HANDLER_INTERVAL = 10_000
+# Address space cap per worker in MB (RLIMIT_AS, 0 disables)
+WORKER_MEMORY_LIMIT_MB = int(os.environ.get("PYDOUGH_WORKER_MEMORY_LIMIT_MB", 4096))
+# CPU seconds one task may use (RLIMIT_CPU, 0 disables)
+WORKER_CPU_LIMIT_SECONDS = int(os.environ.get("PYDOUGH_WORKER_CPU_LIMIT", 120))
+# Recycle a worker after this many tasks (0 disables)
+WORKER_MAX_TASKS = int(os.environ.get("PYDOUGH_WORKER_MAX_TASKS", 500))
+# Recycle a worker once its resident memory exceeds this many MB (0 disables)
+WORKER_RSS_WATERMARK_MB = int(os.environ.get("PYDOUGH_WORKER_RSS_WATERMARK_MB", 2048))
+# Trace Python allocations in workers to report per-task peaks. Off by default:
+# tracing slows every allocation down noticeably.
+WORKER_TRACEMALLOC = os.environ.get("PYDOUGH_WORKER_TRACEMALLOC", "0") == "1"
+# Memory in MB a worker may spend on loaded domain sessions before evicting the
+# least recently used ones, and the most sessions it keeps (0 disables either)
+WORKER_SESSION_BUDGET_MB = int(os.environ.get("PYDOUGH_WORKER_SESSION_BUDGET_MB", 1024))
+WORKER_MAX_SESSIONS = int(os.environ.get("PYDOUGH_WORKER_MAX_SESSIONS", 32))
+# Seconds a task waits for a busy worker that has its domain loaded before it
+# spills over to a cold worker (it spills at once if more tasks are queued for the domain)
+EXECUTOR_AFFINITY_WAIT = float(os.environ.get("PYDOUGH_EXECUTOR_AFFINITY_WAIT_MS", 250)) / 1000
+# Workers each domain is preloaded on by warm_executor_pool (0 loads every domain everywhere)
+EXECUTOR_WARM_REPLICAS = int(os.environ.get("PYDOUGH_EXECUTOR_WARM_REPLICAS", 1))
+# Smallest memory charged to a session, covering SQLite's page cache
+SESSION_MIN_MB = 2.0
+# Serve domains from an in-memory copy unless their "in_memory" setting in
+# DOMAIN_SETTINGS says otherwise; databases larger than the threshold (MB) always stay on disk
+IN_MEMORY_DEFAULT = os.environ.get("PYDOUGH_IN_MEMORY", "1") != "0"
+IN_MEMORY_MAX_MB = float(os.environ.get("PYDOUGH_IN_MEMORY_MAX_MB", 64))
+# Workers the tasks of an admission lane may hold at once, e.g. "batch=1"
+# (lanes not listed are unlimited; a cap never takes the last worker of a larger pool)
+EXECUTOR_LANE_LIMITS = os.environ.get("PYDOUGH_EXECUTOR_LANES", "batch=1")
+
+# ---------------------------------------------------------------------------
+# Query plan helpers (pure functions, usable from both parent and workers)
+# ---------------------------------------------------------------------------
+
+# Matches "FROM main.table AS alias" / "JOIN table alias" / ", table alias" in translated SQL
+_TABLE_ALIAS_PATTERN = re.compile(
+    r'(?:\bFROM|\bJOIN|,)\s+(?:main\.)?"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?',
+    re.IGNORECASE
+)
+# Matches both the modern ("SCAN t") and legacy ("SCAN TABLE t") plan formats
+_SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(?:main\.)?(\S+)')
+# Plan nodes that name a subquery rather than a base table
+_SUBQUERY_PATTERN = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\S+)')
+
+def build_plan_tree(plan_rows):
+    """Turn flat EXPLAIN QUERY PLAN rows (id, parent, notused, detail) into a nested tree."""
+    nodes = {}
+    roots = []
+    for row in plan_rows:
+        node_id, parent_id, detail = row[0], row[1], row[3]
+        node = {"id": node_id, "detail": detail, "children": []}
+        nodes[node_id] = node
+        parent = nodes.get(parent_id)
+        if parent is not None:
+            parent["children"].append(node)
+        else:
+            roots.append(node)
+    return roots
+
+def resolve_table_aliases(sql):
+    """Map each alias (and table name) used in FROM/JOIN clauses to its base table."""
+    aliases = {}
+    for table, alias in _TABLE_ALIAS_PATTERN.findall(sql or ""):
+        aliases[table] = table
+        if alias and alias.upper() not in ("WHERE", "ON", "JOIN", "LEFT", "INNER", "CROSS", "GROUP", "ORDER", "LIMIT"):
+            aliases[alias] = table
+    return aliases
+
+def _iter_full_scans(plan_rows, sql=None, table_names=None):
+    """
+    Yield (plan_row, table) for every plan step that reads a base table with a full scan.
+    Scans of subqueries, co-routines and constant rows are ignored.
+    """
+    subqueries = set()
+    for row in plan_rows:
+        match = _SUBQUERY_PATTERN.match(row[3])
+        if match:
+            subqueries.add(match.group(1))
+
+    aliases = resolve_table_aliases(sql)
+    known_tables = {name.lower(): name for name in (table_names or [])}
+    for row in plan_rows:
+        match = _SCAN_PATTERN.match(row[3])
+        if not match:
+            continue
+        target = match.group(1)
+        if target == "CONSTANT" or target in subqueries:
+            continue
+        table = aliases.get(target, target)
+        if known_tables and table.lower() not in known_tables:
+            continue
+        yield row, known_tables.get(table.lower(), table)
+
+def find_full_table_scans(plan_rows, sql=None, table_names=None):
+    """Return the base tables that the plan reads with a full scan."""
+    scanned = []
+    for _, table in _iter_full_scans(plan_rows, sql, table_names):
+        if table not in scanned:
+            scanned.append(table)
+    return scanned
+
+def estimate_scanned_rows(plan_rows, row_counts, sql=None):
+    """
+    Rough estimate of the rows SQLite will visit for a plan.
+    Full scans under the same parent are nested loops, so their row counts are
+    multiplied (this is what makes unfiltered cross joins explode); separate
+    loops are added together. Indexed SEARCH steps are treated as cheap.
+    """
+    loops = {}
+    for row, table in _iter_full_scans(plan_rows, sql, row_counts.keys()):
+        parent_id = row[1]
+        loops[parent_id] = loops.get(parent_id, 1) * max(1, row_counts.get(table, 0))
+    return sum(loops.values())
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+# Per-worker LRU of loaded domains: domain name -> {"session", "connection", "tables", "version", "memory_mb"}
+_SESSIONS = OrderedDict()
+# Whether the current task found its domain loaded, and the domains it evicted
+_SESSION_EVENTS = {"hit": None, "evicted": []}
+# Cancel flag shared with the parent (set in _worker_main)
+_CANCEL_EVENT = None
+# Monotonic deadline of the task currently running in this worker, if any
+_TASK_DEADLINE = None
+# Set by the SIGXCPU handler when the running task used up its CPU allowance
+_CPU_EXCEEDED = False
+
+class TaskInterrupted(Exception):
+    """Raised in a worker when the running task was cancelled or ran out of time."""
+
+def _progress_check():
+    """SQLite progress handler: a non-zero return aborts the running statement."""
+    if _CANCEL_EVENT is not None and _CANCEL_EVENT.is_set():
+        return 1
+    if _CPU_EXCEEDED:
+        return 1
+    if _TASK_DEADLINE is not None and time.monotonic() > _TASK_DEADLINE:
+        return 1
+    return 0
+
+def _check_interrupted():
+    """Raise TaskInterrupted between steps of a task if it was cancelled or is over budget."""
+    if _CANCEL_EVENT is not None and _CANCEL_EVENT.is_set():
+        raise TaskInterrupted("cancelled")
+    if _CPU_EXCEEDED:
+        raise TaskInterrupted("cpu_limit")
+    if _TASK_DEADLINE is not None and time.monotonic() > _TASK_DEADLINE:
+        raise TaskInterrupted("timed_out")
+
+def _metadata_version(metadata_file, database_file):
+    """(path, size, mtime) of the domain's files; a cached session is reloaded when it changes."""
+    version = []
+    for path in (metadata_file, database_file):
+        try:
+            st = os.stat(path)
+            version.append((path, st.st_size, st.st_mtime_ns if path == metadata_file else None))
+        except OSError:
+            version.append((path, None, None))
+    return tuple(version)
+
+def _database_fingerprint(database_file):
+    """
+    (size, mtime, file change counter) of a database file. The change counter
+    in the SQLite header is bumped by every committed write, even one that
+    leaves size and mtime as they were.
+    """
+    try:
+        with open(database_file, "rb") as f:
+            st = os.fstat(f.fileno())
+            header = f.read(28)
+    except OSError:
+        return None
+    change_counter = int.from_bytes(header[24:28], "big") if len(header) == 28 else None
+    return (st.st_size, st.st_mtime_ns, change_counter)
+
+def _use_in_memory(domain_name, database_file):
+    """Whether a domain is served from an in-memory copy: its setting, then the size threshold."""
+    from domains import DOMAIN_SETTINGS
+
+    if not DOMAIN_SETTINGS.get(domain_name, {}).get("in_memory", IN_MEMORY_DEFAULT):
+        return False
+    try:
+        size_mb = os.path.getsize(database_file) / (1024 * 1024)
+    except OSError:
+        return False
+    return size_mb <= IN_MEMORY_MAX_MB
+
+def _open_database(database_file, in_memory):
+    """SQLite connection for executions: the file itself, or an in-memory copy made with the backup API."""
+    if in_memory:
+        source = sqlite3.connect(f"file:{database_file}?mode=ro", uri=True)
+        connection = sqlite3.connect(":memory:")
+        try:
+            source.backup(connection)
+        finally:
+            source.close()
+    else:
+        connection = sqlite3.connect(database_file)
+    connection.set_progress_handler(_progress_check, PROGRESS_HANDLER_INTERVAL)
+    return connection
+
+def _refresh_database_state(cached):
+    """
+    Drop what a session derived from its database if the file changed since:
+    the in-memory copy is made again, and the DuckDB connection (with its
+    Parquet snapshot) is reopened on next use.
+    """
+    fingerprint = _database_fingerprint(cached["database_file"])
+    if fingerprint == cached["fingerprint"]:
+        return
+    print(f"🔄 {cached['name']} database changed, refreshing its cached copies")
+    if cached["in_memory"]:
+        cached["connection"].close()
+        cached["connection"] = _open_database(cached["database_file"], True)
+    if cached["duckdb"] is not None:
+        cached["duckdb"].close()
+        cached["duckdb"] = None
+    cached["fingerprint"] = fingerprint
+    cached["row_counts"] = None
+    cached["tables"] = _list_tables(cached["connection"])
+
+def _list_tables(connection):
+    return [row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+    )]
+
+def _resolve_graph_name(metadata_file, domain_name):
+    """Graph in the metadata file for a domain: same name, same name ignoring case, or the only graph."""
+    import json
+
+    with open(metadata_file) as f:
+        graphs = json.load(f)
+    # {name: graph} files, or lists of graphs with a "name" each
+    graph_names = list(graphs) if isinstance(graphs, dict) else [graph.get("name") for graph in graphs]
+    if domain_name in graph_names:
+        return domain_name
+    matches = [name for name in graph_names if name.lower() == domain_name.lower()]
+    if matches:
+        return matches[0]
+    if len(graph_names) == 1:
+        return graph_names[0]
+    return domain_name
+
+def _get_domain_session(domain_name, metadata_file, database_file):
+    """
+    Load (once per worker) the metadata graph and SQLite connection for a domain.
+    Reloaded when the metadata file is rewritten or the files move; in-memory
+    copies and DuckDB snapshots of the database are refreshed when it changes.
+    """
+    version = _metadata_version(metadata_file, database_file)
+    cached = _SESSIONS.get(domain_name)
+    if cached is not None:
+        if cached["version"] == version:
+            _SESSIONS.move_to_end(domain_name)
+            _SESSION_EVENTS["hit"] = True
+            _refresh_database_state(cached)
+            return cached
+        _close_session(cached)
+        del _SESSIONS[domain_name]
+    _SESSION_EVENTS["hit"] = False
+
+    import pydough
+
+    rss_before = _read_proc_status_mb("VmRSS")
+    session = pydough.PyDoughSession()
+    session.load_metadata_graph(metadata_file, _resolve_graph_name(metadata_file, domain_name))
+    # The session's own connection only fixes the SQL dialect; statements are
+    # run on a separate connection the executor controls directly
+    session.connect_database("sqlite", database=database_file)
+    in_memory = _use_in_memory(domain_name, database_file)
+    fingerprint = _database_fingerprint(database_file)
+    connection = _open_database(database_file, in_memory)
+    tables = _list_tables(connection)
+    rss_after = _read_proc_status_mb("VmRSS")
+    memory_mb = max(SESSION_MIN_MB, (rss_after - rss_before) if rss_before and rss_after else 0)
+    cached = {
+        "name": domain_name, "database_file": database_file, "session": session, "connection": connection,
+        "tables": tables, "version": version, "memory_mb": memory_mb, "duckdb": None,
+        "in_memory": in_memory, "fingerprint": fingerprint
+    }
+    _SESSIONS[domain_name] = cached
+    _evict_sessions(keep=domain_name)
+    return cached
+
+def _close_session(cached):
+    cached["connection"].close()
+    if cached["duckdb"] is not None:
+        cached["duckdb"].close()
+
+def _get_duckdb_connection(domain_session):
+    """DuckDB connection over the domain's data, opened once per session (see duckdb_engine)."""
+    if domain_session["duckdb"] is None:
+        import duckdb_engine
+        # Tracing every row copied into a Parquet snapshot makes the copy many times slower
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.stop()
+        try:
+            connection, _ = duckdb_engine.open_connection(
+                domain_session["name"], domain_session["database_file"], domain_session["tables"],
+                should_stop=_progress_check, memory_limit_mb=WORKER_MEMORY_LIMIT_MB if resource is not None else None
+            )
+        finally:
+            if tracing:
+                tracemalloc.start()
+        domain_session["duckdb"] = connection
+    return domain_session["duckdb"]
+
+def _evict_sessions(keep=None):
+    """Drop least recently used sessions until the worker is within its session budget."""
+    def over_budget():
+        if WORKER_MAX_SESSIONS and len(_SESSIONS) > WORKER_MAX_SESSIONS:
+            return True
+        used = sum(cached["memory_mb"] for cached in _SESSIONS.values())
+        return bool(WORKER_SESSION_BUDGET_MB) and used > WORKER_SESSION_BUDGET_MB
+
+    while len(_SESSIONS) > 1 and over_budget():
+        domain_name = next(name for name in _SESSIONS if name != keep)
+        _close_session(_SESSIONS.pop(domain_name))
+        _SESSION_EVENTS["evicted"].append(domain_name)
+
+def _session_report():
+    """Loaded domains (least recently used first) and what the current task did to them."""
+    return {
+        "loaded": list(_SESSIONS),
+        "in_memory": [name for name, cached in _SESSIONS.items() if cached["in_memory"]],
+        "memory_mb": round(sum(cached["memory_mb"] for cached in _SESSIONS.values()), 1),
+        "hit": _SESSION_EVENTS["hit"],
+        "evicted": list(_SESSION_EVENTS["evicted"])
+    }
+
+def _table_row_counts(domain_session):
+    """
+    Row count per table, computed once per worker and domain.
+    Uses ANALYZE statistics from sqlite_stat1 when present, COUNT(*) otherwise.
+    """
+    row_counts = domain_session.get("row_counts")
+    if row_counts is not None:
+        return row_counts
+
+    connection = domain_session["connection"]
+    row_counts = {}
+    try:
+        for table, stat in connection.execute("SELECT tbl, stat FROM sqlite_stat1"):
+            # The first number of every stat entry is the table's row count
+            row_counts[table] = max(row_counts.get(table, 0), int(stat.split()[0]))
+    except sqlite3.Error:
+        pass # No ANALYZE statistics in this database
+    for table in domain_session["tables"]:
+        if table not in row_counts:
+            row_counts[table] = connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+    domain_session["row_counts"] = row_counts
+    return row_counts
+
+def _translate_to_sql(pydough_code, domain_session, **sql_options):
+    """Evaluate generated PyDough code in the domain's graph and translate it to SQL."""
+    import pydough
+
+    session = domain_session["session"]
+    clean_code = textwrap.dedent(pydough_code.strip())
+    node = pydough.from_string(clean_code, answer_variable="result", metadata=session.metadata)
+    return pydough.to_sql(node, session=session, **sql_options)
+
+def _task_explain(payload):
+    """Translate PyDough code to SQL and return SQLite's query plan without running it."""
+    domain_session = _get_domain_session(*payload["domain_info"])
+    sql = _translate_to_sql(payload["pydough_code"], domain_session)
+    _check_interrupted()
+    plan_rows = domain_session["connection"].execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    scanned_tables = find_full_table_scans(plan_rows, sql, domain_session["tables"])
+    row_counts = _table_row_counts(domain_session)
+    estimated_rows = estimate_scanned_rows(plan_rows, row_counts, sql)
+    engine, engine_reason = choose_engine(sql, scanned_tables, estimated_rows, engine="auto")
+    return {
+        "success": True,
+        "sql": sql,
+        "plan": build_plan_tree(plan_rows),
+        "full_table_scan": bool(scanned_tables),
+        "scanned_tables": scanned_tables,
+        "table_rows": {table: row_counts.get(table) for table in scanned_tables},
+        "estimated_rows": estimated_rows,
+        "engine": {"name": engine, "reason": engine_reason}
+    }
+
+def _route_query(domain_session, sql, engine):
+    """(engine, reason) for running sql; "auto" asks the router using SQLite's plan."""
+    if engine != "auto":
+        return choose_engine(sql, [], 0, engine=engine)
+    plan_rows = domain_session["connection"].execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    row_counts = _table_row_counts(domain_session)
+    scanned_tables = find_full_table_scans(plan_rows, sql, domain_session["tables"])
+    return choose_engine(sql, scanned_tables, estimate_scanned_rows(plan_rows, row_counts, sql), engine="auto")
+
+def _run_sqlite(domain_session, sql, max_rows=None):
+    """(columns, rows, truncated) of sql on the domain's SQLite connection."""
+    if max_rows:
+        # Ask for one extra row so we can tell whether the result was cut off
+        cursor = domain_session["connection"].execute(f"SELECT * FROM ({sql}) LIMIT {int(max_rows) + 1}")
+    else:
+        cursor = domain_session["connection"].execute(sql)
+    columns = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+    truncated = bool(max_rows) and len(rows) > max_rows
+    if truncated:
+        rows = rows[:max_rows]
+    return columns, rows, truncated
+
+def _run_duckdb(domain_session, sql, max_rows=None):
+    """(columns, rows, truncated) of sql on DuckDB; interrupted like SQLite on cancel or timeout."""
+    import duckdb_engine
+    try:
+        return duckdb_engine.run_query(_get_duckdb_connection(domain_session), sql, max_rows, should_stop=_progress_check)
+    except Exception:
+        _check_interrupted()
+        raise
+
+def _task_execute(payload):
+    """
+    Translate PyDough code to SQL and run it on the domain database.
+    With max_rows set, at most that many rows are fetched and "truncated"
+    reports whether the full result has more. The engine ("sqlite", "duckdb"
+    or "auto") comes from the payload or PYDOUGH_ENGINE; if DuckDB fails the
+    query is rerun on SQLite.
+    """
+    import pandas as pd
+
+    domain_session = _get_domain_session(*payload["domain_info"])
+    sql = _translate_to_sql(payload["pydough_code"], domain_session)
+    _check_interrupted()
+    max_rows = payload.get("max_rows")
+
+    engine, engine_reason = _route_query(domain_session, sql, (payload.get("engine") or EXECUTION_ENGINE).lower())
+    engine_error = None
+    started = time.perf_counter()
+    if engine == "duckdb":
+        try:
+            columns, rows, truncated = _run_duckdb(domain_session, sql, max_rows)
+        except TaskInterrupted:
+            raise
+        except Exception as e:
+            engine_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ DuckDB could not run the query, falling back to SQLite: {engine_error}")
+            engine = "sqlite"
+            started = time.perf_counter()
+    if engine == "sqlite":
+        columns, rows, truncated = _run_sqlite(domain_session, sql, max_rows)
+    engine_seconds = time.perf_counter() - started
+
+    df_result = pd.DataFrame(rows, columns=columns)
+    pandas_df_json_string = None
+    if not df_result.empty:
+        pandas_df_json_string = df_result.to_json(orient="split", date_format="iso", default_handler=str)
+
+    # Same layout as the adapted scripts print, which the frontend parses for the SQL tab
+    output = f"\nSQL Query:\n{sql}\n\nResult:\n{df_result.head(10)}\n"
+    return {
+        "success": True,
+        "sql": sql,
+        "output": output,
+        "pandas_df_json_string": pandas_df_json_string,
+        "row_count": len(df_result),
+        "truncated": truncated,
+        "engine": {"name": engine, "reason": engine_reason, "seconds": round(engine_seconds, 4), "fallback_error": engine_error}
+    }
+
+def _task_compare(payload):
+    """
+    Run the translated SQL on both SQLite and DuckDB and check that the results
+    are equivalent, timing each engine.
+    """
+    import duckdb_engine
+
+    domain_session = _get_domain_session(*payload["domain_info"])
+    sql = _translate_to_sql(payload["pydough_code"], domain_session)
+    _check_interrupted()
+    results = {}
+    timings = {}
+    errors = {}
+    try:
+        # Opened up front so a Parquet snapshot build is not counted as query time
+        _get_duckdb_connection(domain_session)
+    except TaskInterrupted:
+        raise
+    except Exception as e:
+        _check_interrupted()
+        errors["duckdb"] = f"{type(e).__name__}: {e}"
+    for engine, run in (("sqlite", _run_sqlite), ("duckdb", _run_duckdb)):
+        if engine in errors:
+            continue
+        started = time.perf_counter()
+        try:
+            columns, rows, _ = run(domain_session, sql)
+            results[engine] = (columns, rows)
+        except TaskInterrupted:
+            raise
+        except Exception as e:
+            errors[engine] = f"{type(e).__name__}: {e}"
+        timings[engine] = round(time.perf_counter() - started, 4)
+    comparison = None
+    if len(results) == 2:
+        comparison = duckdb_engine.compare_results(sql, results["sqlite"], results["duckdb"])
+    return {
+        "success": comparison is not None,
+        "error": "; ".join(f"{engine}: {error}" for engine, error in errors.items()) or None,
+        "sql": sql,
+        "seconds": timings,
+        "speedup": round(timings["sqlite"] / timings["duckdb"], 2) if comparison and timings["duckdb"] else None,
+        "comparison": comparison,
+        "routed_engine": dict(zip(("name", "reason"), _route_query(domain_session, sql, "auto")))
+    }
+
+def _task_warm(payload):
+    """Preload domain sessions (metadata graph and connection) and pandas before the first request."""
+    import pandas  # noqa: F401 - imported for its start-up cost only
+
+    loaded = []
+    errors = {}
+    for domain_info in payload.get("domains", []):
+        try:
+            _get_domain_session(*domain_info)
+            loaded.append(domain_info[0])
+        except Exception as e:
+            errors[domain_info[0]] = f"{type(e).__name__}: {e}"
+    return {"success": not errors, "pid": os.getpid(), "loaded": loaded, "errors": errors}
+
+def _task_ping(payload):
+    """Health check used to confirm a worker is alive."""
+    return {"success": True, "pid": os.getpid(), "domains": sorted(_SESSIONS)}
+
+def _task_unload(payload):
+    """Drop cached sessions so the next task reloads the domains' metadata and database."""
+    for domain_name in payload["domains"]:
+        cached = _SESSIONS.pop(domain_name, None)
+        if cached is not None:
+            _close_session(cached)
+    return {"success": True, "pid": os.getpid(), "domains": sorted(_SESSIONS)}
+
+# Task name -> handler run inside the worker process
+_TASKS = {
+    "explain": _task_explain,
+    "execute": _task_execute,
+    "compare": _task_compare,
+    "warm": _task_warm,
+    "unload": _task_unload,
+    "ping": _task_ping,
+}
+
+def _on_cpu_limit(signum, frame):
+    """SIGXCPU handler: flag the task so the progress handler stops it."""
+    global _CPU_EXCEEDED
+    _CPU_EXCEEDED = True
+
+def _apply_worker_limits():
+    """Install the address space cap and the CPU limit signal handler for this worker."""
+    if resource is None:
+        return
+    if WORKER_MEMORY_LIMIT_MB:
+        limit = WORKER_MEMORY_LIMIT_MB * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    if WORKER_CPU_LIMIT_SECONDS:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+def _cpu_seconds():
+    """CPU time used by this process so far."""
+    if resource is None:
+        return time.process_time()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _read_proc_status_mb(field):
+    """Read a memory field (e.g. VmRSS, VmHWM) from /proc/self/status in MB, or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS counter (Linux only) so it covers a single task."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _begin_task_accounting():
+    """Start per-task memory/CPU accounting and arm the per-task CPU limit."""
+    global _CPU_EXCEEDED
+    _CPU_EXCEEDED = False
+    peak_reset = _reset_peak_rss()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    cpu_start = _cpu_seconds()
+    if resource is not None and WORKER_CPU_LIMIT_SECONDS:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(cpu_start) + WORKER_CPU_LIMIT_SECONDS + 1
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    return {"cpu_start": cpu_start, "peak_reset": peak_reset}
+
+def _end_task_accounting(accounting):
+    """Disarm the CPU limit and return the memory/CPU used by the task."""
+    if resource is not None and WORKER_CPU_LIMIT_SECONDS:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+    rss_mb = _read_proc_status_mb("VmRSS")
+    peak_rss_mb = _read_proc_status_mb("VmHWM") if accounting["peak_reset"] else None
+    if peak_rss_mb is None and resource is not None:
+        # Lifetime peak of the worker (ru_maxrss is in KB on Linux)
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    tracemalloc_peak_mb = None
+    if tracemalloc.is_tracing():
+        tracemalloc_peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    return {
+        "rss_mb": round(rss_mb, 1) if rss_mb is not None else None,
+        "peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+        "tracemalloc_peak_mb": round(tracemalloc_peak_mb, 1) if tracemalloc_peak_mb is not None else None,
+        "cpu_seconds": round(_cpu_seconds() - accounting["cpu_start"], 3)
+    }
+
+def _interrupted_result(reason, timeout):
+    """Result dict for a task that was stopped cooperatively."""
+    if reason == "cancelled":
+        error = "Execution cancelled"
+    elif reason == "cpu_limit":
+        error = f"Execution stopped after using {WORKER_CPU_LIMIT_SECONDS} seconds of CPU time"
+    else:
+        error = f"Execution timed out after {timeout:g} seconds"
+    return {
+        "success": False,
+        "error": error,
+        "cancelled": reason == "cancelled",
+        "timed_out": reason in ("timed_out", "cpu_limit")
+    }
+
+def _worker_main(conn, cancel_event=None):
+    """Worker loop: receive (task_name, payload) messages and reply with a result dict."""
+    global _CANCEL_EVENT, _TASK_DEADLINE
+    _CANCEL_EVENT = cancel_event
+    _apply_worker_limits()
+    if WORKER_TRACEMALLOC:
+        tracemalloc.start()
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        task_name, payload = message
+        handler = _TASKS.get(task_name)
+        timeout = payload.get("timeout")
+        _TASK_DEADLINE = time.monotonic() + timeout if timeout else None
+        _SESSION_EVENTS["hit"] = None
+        _SESSION_EVENTS["evicted"] = []
+        accounting = _begin_task_accounting()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown executor task: {task_name}")
+            result = handler(payload)
+        except TaskInterrupted as e:
+            result = _interrupted_result(str(e), timeout)
+        except sqlite3.OperationalError as e:
+            if str(e) == "interrupted":
+                # Aborted by _progress_check: tell cancellation and the limits apart
+                if cancel_event is not None and cancel_event.is_set():
+                    reason = "cancelled"
+                elif _CPU_EXCEEDED:
+                    reason = "cpu_limit"
+                else:
+                    reason = "timed_out"
+                result = _interrupted_result(reason, timeout)
+            else:
+                result = {
+                    "success": False,
+                    "error": f"{type(e).__name__}: {e}",
+                    "traceback": traceback.format_exc()
+                }
+        except MemoryError:
+            result = {
+                "success": False,
+                "error": f"Execution ran out of memory (worker limit is {WORKER_MEMORY_LIMIT_MB} MB)",
+                "out_of_memory": True
+            }
+        except Exception as e:
+            result = {
+                "success": False,
+                "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc()
+            }
+        finally:
+            _TASK_DEADLINE = None
+        result["memory"] = _end_task_accounting(accounting)
+        result["sessions"] = _session_report()
+        conn.send(result)
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+
+class _WorkerHandle:
+    """Parent-side handle for one worker process and its pipe."""
+
+    def __init__(self, ctx, index):
+        parent_conn, child_conn = ctx.Pipe()
+        self.index = index
+        # Raised by the parent to interrupt the task this worker is running
+        self.cancel_event = ctx.Event()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.cancel_event),
+            name=f"pydough-executor-{index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.tasks_completed = 0
+        # Domains the worker reported loaded after its last task, least recently used first
+        self.domains = []
+        self.in_memory_domains = []
+        self.session_memory_mb = 0.0
+        # Admission lane of the task the worker is checked out for
+        self.lane = None
+
+    def stop(self, force=False):
+        """Ask the worker to exit, killing it if it does not (or if force is set)."""
+        if not force:
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=2)
+            except (OSError, EOFError):
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=2)
+        self.conn.close()
+
+class ExecutorPool:
+    """
+    Fixed-size pool of warm executor processes.
+
+    run() is blocking and thread-safe: each call checks out an idle worker,
+    sends it one task and waits for the reply, so Flask request threads can
+    share the pool directly. run_async() does the same from an event loop,
+    waiting on the worker's pipe instead of a thread. Tasks started with a
+    job_id can be stopped from another thread with cancel(job_id).
+
+    Tasks for a domain go to a worker that already has it loaded. If all such
+    workers are busy, the task waits up to EXECUTOR_AFFINITY_WAIT for one of
+    them, and spills over to the idle worker holding the fewest domains once
+    that time has passed or more tasks for the domain are waiting than there
+    are warm workers.
+
+    Tasks also carry the admission lane of the request they serve (see
+    admission.current_lane). An idle worker goes to the highest-priority lane
+    with tasks waiting, and a lane listed in PYDOUGH_EXECUTOR_LANES never holds
+    more workers than its cap, so batch executions cannot occupy the whole pool.
+    """
+
+    def __init__(self, size=EXECUTOR_POOL_SIZE):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._cond = threading.Condition()
+        self._next_index = 0
+        self._closed = False
+        self._workers = []
+        self._idle = []
+        # job_id -> worker running it (None while still waiting for a worker),
+        # and job ids cancelled before they got one
+        self._running = {}
+        self._cancelled = set()
+        self._broadcast_lock = threading.Lock()
+        # Tasks waiting for a worker per domain, and scheduling counters per domain
+        self._waiting = {}
+        self._domain_stats = {}
+        # (loop, future) of run_async() calls waiting for an idle worker
+        self._async_waiters = []
+        # Lane priorities (0 = highest), worker caps, and workers held / tasks waiting per lane
+        lanes = [name for name, _, _ in parse_lanes(LANES_SPEC)]
+        self._default_lane = lanes[0]
+        self._lane_priority = {name: priority for priority, name in enumerate(lanes)}
+        self._lane_limits = {
+            name: max(1, min(limit, size - 1)) for name, limit, _ in parse_lanes(EXECUTOR_LANE_LIMITS)
+        } if EXECUTOR_LANE_LIMITS.strip() else {}
+        self._lane_running = {}
+        self._lane_waiting = {}
+        for _ in range(max(1, size)):
+            self._idle.append(self._start_worker())
+
+    def _start_worker(self):
+        worker = _WorkerHandle(self._ctx, self._next_index)
+        self._next_index += 1
+        self._workers.append(worker)
+        return worker
+
+    def _lane_blocked(self, lane):
+        """Whether lane must leave idle workers alone: it is at its cap, or a higher-priority lane is waiting."""
+        limit = self._lane_limits.get(lane)
+        if limit is not None and self._lane_running.get(lane, 0) >= limit:
+            return True
+        priority = self._lane_priority.get(lane, len(self._lane_priority))
+        return any(
+            waiting and self._lane_priority.get(other, len(self._lane_priority)) < priority
+            for other, waiting in self._lane_waiting.items()
+        )
+
+    def _check_out(self, worker, lane):
+        self._idle.remove(worker)
+        worker.lane = lane
+        self._lane_running[lane] = self._lane_running.get(lane, 0) + 1
+        return worker
+
+    def _check_in(self, worker):
+        """Forget the lane a worker was checked out for; the caller holds self._cond."""
+        if worker.lane is not None:
+            self._lane_running[worker.lane] -= 1
+            worker.lane = None
+
+    def _select(self, domain, waited, lane=None):
+        """
+        Pick an idle worker for domain; the caller holds self._cond. Returns
+        ((worker, placement), None), or (None, wait) with the seconds to wait
+        before trying again (None: until a worker is released).
+        Placement is "warm", "cold" (no worker had the domain), "spill" (warm
+        workers were busy) or None without a domain.
+        """
+        lane = lane or self._default_lane
+        if not self._idle or self._lane_blocked(lane):
+            return None, None
+        if domain is None:
+            return (self._check_out(self._idle[-1], lane), None), None
+        warm = [worker for worker in self._idle if domain in worker.domains]
+        if warm:
+            return (self._check_out(warm[-1], lane), "warm"), None
+        holders = sum(1 for worker in self._workers if domain in worker.domains)
+        if not holders or self._waiting.get(domain, 0) > holders or waited >= EXECUTOR_AFFINITY_WAIT:
+            worker = min(self._idle, key=lambda w: len(w.domains))
+            return (self._check_out(worker, lane), "spill" if holders else "cold"), None
+        return None, EXECUTOR_AFFINITY_WAIT - waited
+
+    def _add_waiting(self, domain, delta, lane=None):
+        lane = lane or self._default_lane
+        self._lane_waiting[lane] = self._lane_waiting.get(lane, 0) + delta
+        if not self._lane_waiting[lane]:
+            del self._lane_waiting[lane]
+            # Lower-priority tasks may now take the workers they were leaving alone
+            self._notify_waiters()
+        if domain is None:
+            return
+        self._waiting[domain] = self._waiting.get(domain, 0) + delta
+        if not self._waiting[domain]:
+            del self._waiting[domain]
+
+    def _acquire(self, domain=None, lane=None):
+        """
+        Check out an idle worker for a task of lane, preferring one that has
+        domain loaded. Returns (worker, placement) (see _select).
+        """
+        with self._cond:
+            started = time.monotonic()
+            self._add_waiting(domain, 1, lane)
+            try:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Executor pool has been shut down")
+                    choice, wait = self._select(domain, time.monotonic() - started, lane)
+                    if choice is not None:
+                        return choice
+                    self._cond.wait(wait)
+            finally:
+                self._add_waiting(domain, -1, lane)
+
+    async def _acquire_async(self, domain=None, lane=None):
+        """_acquire for the event loop: waits on a future instead of blocking the thread."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        with self._cond:
+            self._add_waiting(domain, 1, lane)
+        try:
+            while True:
+                with self._cond:
+                    if self._closed:
+                        raise RuntimeError("Executor pool has been shut down")
+                    choice, wait = self._select(domain, time.monotonic() - started, lane)
+                    if choice is not None:
+                        return choice
+                    waiter = (loop, loop.create_future())
+                    self._async_waiters.append(waiter)
+                try:
+                    await asyncio.wait_for(waiter[1], wait)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._cond:
+                        if waiter in self._async_waiters:
+                            self._async_waiters.remove(waiter)
+        finally:
+            with self._cond:
+                self._add_waiting(domain, -1, lane)
+
+    def _notify_waiters(self):
+        """Wake every blocked and awaiting acquirer; the caller holds self._cond."""
+        self._cond.notify_all()
+        for loop, future in self._async_waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        self._async_waiters.clear()
+
+    def _release(self, worker):
+        with self._cond:
+            self._check_in(worker)
+            self._idle.append(worker)
+            # Waiters want different domains, so all of them re-check the idle workers
+            self._notify_waiters()
+
+    def _replace(self, worker, force=True):
+        """Stop a worker (killing it if force is set) and put a fresh one in its place."""
+        worker.stop(force=force)
+        with self._cond:
+            self._check_in(worker)
+            self._workers.remove(worker)
+            if not self._closed:
+                self._idle.append(self._start_worker())
+                self._notify_waiters()
+
+    def _recycle_reason(self, worker, result):
+        """Why a worker should be replaced after returning result, or None to keep it."""
+        if result.get("out_of_memory"):
+            return "ran out of memory"
+        if WORKER_MAX_TASKS and worker.tasks_completed >= WORKER_MAX_TASKS:
+            return f"completed {worker.tasks_completed} tasks"
+        rss_mb = (result.get("memory") or {}).get("rss_mb")
+        if WORKER_RSS_WATERMARK_MB and rss_mb and rss_mb > WORKER_RSS_WATERMARK_MB:
+            return f"uses {rss_mb:.0f} MB (watermark {WORKER_RSS_WATERMARK_MB} MB)"
+        return None
+
+    def cancel(self, job_id):
+        """
+        Interrupt the task running under job_id (or drop it if it is still
+        waiting for a worker). Returns True if a matching task was found.
+        """
+        with self._cond:
+            if job_id not in self._running:
+                return False
+            worker = self._running[job_id]
+            if worker is None:
+                self._cancelled.add(job_id)
+            else:
+                worker.cancel_event.set()
+            return True
+
+    def run(self, task_name, payload, timeout=EXECUTOR_TASK_TIMEOUT, job_id=None, lane=None):
+        """
+        Run a task on an idle worker and return its result dict. lane is the
+        admission lane the task is served in (default: the current request's).
+
+        The worker stops the task itself once timeout seconds have passed;
+        it is only killed and replaced if it does not answer within
+        EXECUTOR_KILL_GRACE seconds after that.
+        """
+        timeout = timeout or EXECUTOR_TASK_TIMEOUT
+        domain = payload["domain_info"][0] if payload.get("domain_info") else None
+        if job_id is not None:
+            with self._cond:
+                self._running[job_id] = None
+        try:
+            worker, placement = self._acquire(domain, lane or current_lane())
+        except RuntimeError:
+            with self._cond:
+                self._running.pop(job_id, None)
+                self._cancelled.discard(job_id)
+            raise
+        with self._cond:
+            if not self._claim(worker, job_id):
+                return _interrupted_result("cancelled", timeout)
+        try:
+            return self._run_on_worker(worker, task_name, payload, timeout, domain, placement)
+        finally:
+            if job_id is not None:
+                with self._cond:
+                    self._running.pop(job_id, None)
+
+    async def run_async(self, task_name, payload, timeout=EXECUTOR_TASK_TIMEOUT, job_id=None, lane=None):
+        """
+        Awaitable run(): waiting for a worker and for its reply does not block
+        the event loop. If the awaiting task is cancelled while the worker runs,
+        the worker's task is cancelled too and its reply is collected by a
+        background thread before the worker is reused.
+        """
+        timeout = timeout or EXECUTOR_TASK_TIMEOUT
+        domain = payload["domain_info"][0] if payload.get("domain_info") else None
+        if job_id is not None:
+            with self._cond:
+                self._running[job_id] = None
+        try:
+            worker, placement = await self._acquire_async(domain, lane or current_lane())
+        except BaseException:
+            with self._cond:
+                self._running.pop(job_id, None)
+                self._cancelled.discard(job_id)
+            raise
+        with self._cond:
+            if not self._claim(worker, job_id):
+                return _interrupted_result("cancelled", timeout)
+        try:
+            return await self._run_on_worker_async(worker, task_name, payload, timeout, domain, placement)
+        finally:
+            if job_id is not None:
+                with self._cond:
+                    self._running.pop(job_id, None)
+
+    def _claim(self, worker, job_id):
+        """
+        Mark a checked-out worker as running job_id; the caller holds self._cond.
+        Returns False (and gives the worker back) if the job was cancelled while waiting.
+        """
+        if job_id is not None and job_id in self._cancelled:
+            self._cancelled.discard(job_id)
+            self._running.pop(job_id, None)
+            self._check_in(worker)
+            self._idle.append(worker)
+            self._notify_waiters()
+            return False
+        # The worker is idle, so no task can be interrupted by clearing the flag here
+        worker.cancel_event.clear()
+        if job_id is not None:
+            self._running[job_id] = worker
+        return True
+
+    def _record_sessions(self, worker, result, domain=None, placement=None):
+        """Track the domains a worker reports loaded and update the domain's scheduling counters."""
+        sessions = result.get("sessions")
+        with self._cond:
+            if sessions is not None:
+                worker.domains = sessions["loaded"]
+                worker.in_memory_domains = sessions["in_memory"]
+                worker.session_memory_mb = sessions["memory_mb"]
+                for evicted in sessions["evicted"]:
+                    self._stats_for(evicted)["evictions"] += 1
+            if domain is None:
+                return
+            stats = self._stats_for(domain)
+            stats["requests"] += 1
+            if placement == "spill":
+                stats["spills"] += 1
+            hit = sessions.get("hit") if sessions else None
+            if hit is not None:
+                stats["hits" if hit else "loads"] += 1
+
+    def _stats_for(self, domain):
+        return self._domain_stats.setdefault(
+            domain, {"requests": 0, "hits": 0, "loads": 0, "spills": 0, "evictions": 0}
+        )
+
+    def _run_on_worker(self, worker, task_name, payload, timeout, domain=None, placement=None):
+        """Send one task to a checked-out worker, wait for the reply, then release (or replace) the worker."""
+        try:
+            worker.conn.send((task_name, dict(payload, timeout=timeout)))
+        except (EOFError, OSError) as e:
+            return self._worker_died(worker, e)
+        return self._finish_on_worker(worker, task_name, timeout, domain, placement)
+
+    async def _run_on_worker_async(self, worker, task_name, payload, timeout, domain=None, placement=None):
+        """_run_on_worker for the event loop: the reply is awaited on the worker's pipe."""
+        try:
+            worker.conn.send((task_name, dict(payload, timeout=timeout)))
+        except (EOFError, OSError) as e:
+            return self._worker_died(worker, e)
+        try:
+            ready = await _wait_readable(worker.conn, timeout + EXECUTOR_KILL_GRACE)
+        except asyncio.CancelledError:
+            # Stop the task, and keep the worker out of the pool until its reply is read
+            worker.cancel_event.set()
+            threading.Thread(
+                target=self._finish_on_worker,
+                args=(worker, task_name, timeout, domain, placement),
+                name=f"executor-drain-{worker.index}",
+                daemon=True
+            ).start()
+            raise
+        # Reading a large reply blocks until all of it has arrived, and replacing
+        # (or recycling) the worker joins the old process: do both off the event loop
+        return await asyncio.to_thread(self._finish_on_worker, worker, task_name, timeout, domain, placement, ready)
+
+    def _finish_on_worker(self, worker, task_name, timeout, domain=None, placement=None, ready=None):
+        """
+        Wait for the reply to the task a worker is running (unless ready says
+        whether it arrived), then release (or replace) the worker.
+        """
+        try:
+            if ready is None:
+                ready = worker.conn.poll(timeout + EXECUTOR_KILL_GRACE)
+            if not ready:
+                print(f"❌ Executor task '{task_name}' did not stop within its {timeout:g} second budget, restarting worker")
+                self._replace(worker)
+                worker = None
+                return _interrupted_result("timed_out", timeout)
+            result = worker.conn.recv()
+            worker.tasks_completed += 1
+            self._record_sessions(worker, result, domain, placement)
+            if result.get("cancelled"):
+                print(f"🛑 Executor task '{task_name}' cancelled")
+            elif result.get("timed_out"):
+                print(f"⏱️ Executor task '{task_name}' stopped: {result.get('error')}")
+            recycle_reason = self._recycle_reason(worker, result)
+            if recycle_reason:
+                print(f"♻️ Recycling executor worker {worker.index}: {recycle_reason}")
+                self._replace(worker, force=False)
+                worker = None
+            return result
+        except (EOFError, OSError) as e:
+            died, worker = worker, None
+            return self._worker_died(died, e)
+        finally:
+            if worker is not None:
+                self._release(worker)
+
+    def _worker_died(self, worker, error):
+        """Replace a worker whose pipe broke and return the failed task's result."""
+        print(f"❌ Executor worker {worker.index} died: {error}")
+        self._replace(worker)
+        return {"success": False, "error": f"Executor worker died: {error}"}
+
+    def broadcast(self, task_name, payload, timeout=EXECUTOR_TASK_TIMEOUT, payloads=None):
+        """
+        Run a task once on every worker (e.g. to preload sessions) and return
+        the list of results. Waits until each worker is idle. With payloads
+        (a function of the worker's position and the worker count) every
+        worker gets its own payload instead.
+        """
+        with self._broadcast_lock:
+            with self._cond:
+                count = len(self._workers)
+            # Check out every worker first so the same one is not picked twice
+            workers = [self._acquire()[0] for _ in range(count)]
+            for worker in workers:
+                worker.cancel_event.clear()
+            results = [None] * len(workers)
+
+            def run_one(position, worker):
+                worker_payload = payloads(position, count) if payloads else payload
+                results[position] = self._run_on_worker(worker, task_name, worker_payload, timeout)
+
+            threads = [threading.Thread(target=run_one, args=item) for item in enumerate(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return results
+
+    def stats(self):
+        """Loaded domains per worker and scheduling counters (with hit rates) per domain."""
+        with self._cond:
+            workers = [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid,
+                    "idle": worker in self._idle,
+                    "tasks_completed": worker.tasks_completed,
+                    "domains": list(worker.domains),
+                    "in_memory_domains": list(worker.in_memory_domains),
+                    "session_memory_mb": worker.session_memory_mb
+                }
+                for worker in self._workers
+            ]
+            domains = {}
+            for domain, counters in sorted(self._domain_stats.items()):
+                stats = dict(counters)
+                stats["hit_rate"] = round(counters["hits"] / counters["requests"], 4) if counters["requests"] else None
+                stats["loaded_on"] = [worker.index for worker in self._workers if domain in worker.domains]
+                stats["waiting"] = self._waiting.get(domain, 0)
+                domains[domain] = stats
+            lanes = {
+                lane: {
+                    "workers": self._lane_running.get(lane, 0),
+                    "waiting": self._lane_waiting.get(lane, 0),
+                    "max_workers": self._lane_limits.get(lane)
+                }
+                for lane in sorted(set(self._lane_priority) | set(self._lane_running), key=lambda l: self._lane_priority.get(l, len(self._lane_priority)))
+            }
+            requests = sum(counters["requests"] for counters in self._domain_stats.values())
+            hits = sum(counters["hits"] for counters in self._domain_stats.values())
+        return {
+            "workers": workers,
+            "domains": domains,
+            "lanes": lanes,
+            "requests": requests,
+            "hit_rate": round(hits / requests, 4) if requests else None,
+            "session_budget_mb": WORKER_SESSION_BUDGET_MB,
+            "max_sessions": WORKER_MAX_SESSIONS,
+            "affinity_wait_ms": EXECUTOR_AFFINITY_WAIT * 1000,
+            "in_memory_max_mb": IN_MEMORY_MAX_MB
+        }
+
+    def shutdown(self):
+        """Stop all workers."""
+        with self._cond:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+            self._idle.clear()
+            self._notify_waiters()
+        for worker in workers:
+            worker.stop()
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+async def _wait_readable(conn, timeout):
+    """Wait until a reply can be read from conn, for at most timeout seconds. Returns False on timeout."""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    try:
+        loop.add_reader(conn.fileno(), _resolve, ready)
+    except NotImplementedError:
+        # Event loops without reader callbacks (e.g. the Windows proactor loop)
+        return await asyncio.to_thread(conn.poll, timeout)
+    try:
+        await asyncio.wait_for(ready, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        loop.remove_reader(conn.fileno())
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_executor_pool():
+    """Return the process-wide executor pool, starting it on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            print(f"⏳ Starting PyDough executor pool with {EXECUTOR_POOL_SIZE} workers...")
+            _POOL = ExecutorPool(EXECUTOR_POOL_SIZE)
+        return _POOL
+
+def shutdown_executor_pool():
+    """Stop the process-wide executor pool if it was started."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown()
+            _POOL = None
+
+atexit.register(shutdown_executor_pool)
+
+def cancel_execution(job_id):
+    """Cancel the executor task started under job_id. Returns True if it was running."""
+    return get_executor_pool().cancel(job_id)
+
+def warm_executor_pool(domain_infos, timeout=EXECUTOR_TASK_TIMEOUT, replicas=EXECUTOR_WARM_REPLICAS):
+    """
+    Start the pool and have the workers load the given domains
+    ((name, metadata_file, database_file) tuples). Each domain is loaded on
+    `replicas` workers, spread round-robin (0 loads every domain on every
+    worker); the scheduler sends its tasks there. Returns one result per worker.
+    """
+    domain_infos = [tuple(domain_info) for domain_info in domain_infos]
+
+    def payload_for(position, count):
+        copies = min(replicas, count) if replicas else count
+        return {"domains": [
+            domain_info for i, domain_info in enumerate(domain_infos)
+            if (position - i) % count < copies
+        ]}
+
+    return get_executor_pool().broadcast("warm", None, timeout=timeout, payloads=payload_for)
+
+def get_executor_stats():
+    """Scheduler statistics of the executor pool, or None if it was never started."""
+    with _POOL_LOCK:
+        pool = _POOL
+    return pool.stats() if pool is not None else None
+
+def unload_domains(domain_names, timeout=EXECUTOR_TASK_TIMEOUT):
+    """
+    Make every worker drop its loaded sessions for the given domains, e.g. after
+    their metadata was regenerated. Does nothing if the pool was never started.
+    """
+    with _POOL_LOCK:
+        pool = _POOL
+    if pool is None:
+        return []
+    return pool.broadcast("unload", {"domains": list(domain_names)}, timeout=timeout)
+
+def explain_pydough_code(pydough_code, domain_info, timeout=EXECUTOR_TASK_TIMEOUT):
+    """
+    Dry run: translate PyDough code to SQL and get SQLite's EXPLAIN QUERY PLAN
+    for it in a warm worker, without materializing any rows.
+    Returns a dict with sql, plan (tree), full_table_scan and scanned_tables.
+    """
+    payload = {"pydough_code": pydough_code, "domain_info": tuple(domain_info)}
+    return get_executor_pool().run("explain", payload, timeout=timeout)
+
+def execute_pydough_code(pydough_code, domain_info, max_rows=None, timeout=EXECUTOR_TASK_TIMEOUT, job_id=None, engine=None):
+    """
+    Run PyDough code in a warm worker and return its result as a pandas JSON string.
+    With max_rows set only the first max_rows rows are fetched ("truncated" tells
+    whether more exist). Pass a job_id to be able to cancel_execution() it.
+    engine ("sqlite", "duckdb" or "auto") overrides PYDOUGH_ENGINE.
+    """
+    payload = {"pydough_code": pydough_code, "domain_info": tuple(domain_info), "max_rows": max_rows, "engine": engine}
+    return get_executor_pool().run("execute", payload, timeout=timeout, job_id=job_id)
+
+async def explain_pydough_code_async(pydough_code, domain_info, timeout=EXECUTOR_TASK_TIMEOUT):
+    """explain_pydough_code for an asyncio event loop."""
+    payload = {"pydough_code": pydough_code, "domain_info": tuple(domain_info)}
+    return await get_executor_pool().run_async("explain", payload, timeout=timeout)
+
+async def execute_pydough_code_async(pydough_code, domain_info, max_rows=None, timeout=EXECUTOR_TASK_TIMEOUT, job_id=None, engine=None):
+    """execute_pydough_code for an asyncio event loop."""
+    payload = {"pydough_code": pydough_code, "domain_info": tuple(domain_info), "max_rows": max_rows, "engine": engine}
+    return await get_executor_pool().run_async("execute", payload, timeout=timeout, job_id=job_id)
+
+def compare_engines(pydough_code, domain_info, timeout=EXECUTOR_TASK_TIMEOUT):
+    """
+    Run PyDough code's SQL on SQLite and DuckDB side by side in a worker.
+    Returns the timings, the router's choice and the result comparison
+    ("comparison.equivalent").
+    """
+    payload = {"pydough_code": pydough_code, "domain_info": tuple(domain_info)}
+    return get_executor_pool().run("compare", payload, timeout=timeout)
+
+async def compare_engines_async(pydough_code, domain_info, timeout=EXECUTOR_TASK_TIMEOUT):
+    """compare_engines for an asyncio event loop."""
+    payload = {"pydough_code": pydough_code, "domain_info": tuple(domain_info)}
+    return await get_executor_pool().run_async("compare", payload, timeout=timeout)
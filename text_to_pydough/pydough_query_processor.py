@@ -12,28 +12,48 @@ import csv
 import os
 import re
 import json
+import math
 import time
-import pandas as pd
 import subprocess
 import argparse
 from datetime import datetime
-from tqdm import tqdm
 from typing import Optional, List, Dict
 import sys # Add sys import
+import asyncio
+import threading
 from domains import DOMAINS
+from domain_router import shortlist_domains, get_domain_router
+from pydough_executor import explain_pydough_code, execute_pydough_code, explain_pydough_code_async, execute_pydough_code_async, cancel_execution, warm_executor_pool, EXECUTOR_TASK_TIMEOUT
+from cost_guard import check_query_cost, check_query_cost_async
+from stub_llm import LLM_STUB, StubModel, AsyncStubModel
 import textwrap
-
-# Make sure llm package and pydantic are installed
-try:
-    import llm
-    from pydantic import BaseModel
-    import pydough
-except ImportError:
-    print("Installing required packages...")
-    subprocess.run(["pip", "install", "llm", "llm-gemini", "pandas", "tqdm", "pydantic", "pydough"], check=True)
-    import llm
-    from pydantic import BaseModel
-    import pydough
+import hashlib
+import copy
+from single_flight import SingleFlight
+from hedging import HEDGING_ENABLED, HedgedModel, AsyncHedgedModel
+
+from pydantic import BaseModel
+
+# llm (and its plugins), pandas, tqdm and pydough are imported on first use, so
+# importing this module stays fast; pydough and pandas are only needed inside
+# the executor workers and the generated scripts.
+llm = None
+
+# Models used for code generation and domain detection
+CODE_GENERATION_MODEL = "gemini-2.5-pro-preview-05-06"
+DOMAIN_DETECTION_MODEL = "gemini-2.0-flash"
+
+# Rows returned by preview-first execution (interactive API requests)
+PREVIEW_ROWS = int(os.environ.get("PYDOUGH_PREVIEW_ROWS", 100))
+# Compute the full result behind a truncated preview right away instead of on demand.
+# Off by default: it runs every truncated query a second time on the executor pool.
+FULL_RESULT_IN_BACKGROUND = os.environ.get("PYDOUGH_BACKGROUND_FULL_RESULT", "0") == "1"
+# Let concurrent identical API queries share one computation (see process_query_coalesced)
+SINGLE_FLIGHT_ENABLED = os.environ.get("PYDOUGH_SINGLE_FLIGHT", "1") != "0"
+# Longest execution time budget a request may ask for, in seconds
+MAX_REQUEST_TIMEOUT = float(os.environ.get("PYDOUGH_MAX_REQUEST_TIMEOUT", 600))
+# Client-supplied query ids name result files, so only these characters are allowed
+QUERY_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
 
 # Define Pydantic model for structured LLM output
 class PyDoughResponse(BaseModel):
@@ -48,6 +68,54 @@ class DomainDetection(BaseModel):
     # confidence: float = 1.0  # Temporarily commenting out
     # reasoning: Optional[str] = None # Temporarily commenting out
 
+# Loaded llm model clients, keyed by model name
+_LLM_MODELS = {}
+_LLM_LOCK = threading.Lock()
+
+def get_llm_model(model_name):
+    """Return the llm model client for model_name, importing llm and loading the model once."""
+    global llm
+    with _LLM_LOCK:
+        model = _LLM_MODELS.get(model_name)
+        if model is None:
+            if LLM_STUB:
+                # Deterministic stand-in for load tests (see stub_llm.py)
+                model = StubModel(model_name)
+            else:
+                if llm is None:
+                    import llm as llm_module
+                    llm = llm_module
+                model = llm.get_model(model_name)
+            if HEDGING_ENABLED:
+                # Duplicate calls slower than the model's usual latency (see hedging.py)
+                model = HedgedModel(model, model_name)
+            _LLM_MODELS[model_name] = model
+        return model
+
+# Async llm model clients (awaited by the ASGI app), keyed by model name
+_ASYNC_LLM_MODELS = {}
+
+def get_async_llm_model(model_name):
+    """
+    Return llm's async client for model_name: prompt() returns a response
+    whose text() is awaited, so the event loop is free while the model works.
+    """
+    global llm
+    with _LLM_LOCK:
+        model = _ASYNC_LLM_MODELS.get(model_name)
+        if model is None:
+            if LLM_STUB:
+                model = AsyncStubModel(model_name)
+            else:
+                if llm is None:
+                    import llm as llm_module
+                    llm = llm_module
+                model = llm.get_async_model(model_name)
+            if HEDGING_ENABLED:
+                model = AsyncHedgedModel(model, model_name)
+            _ASYNC_LLM_MODELS[model_name] = model
+        return model
+
 def check_requirements():
     """Check that all required files and dependencies are available."""
     print("\n--- Checking Requirements ---")
@@ -78,7 +146,7 @@ def check_requirements():
     
     # Configure gemini-2.5-pro-preview-05-06 model
     try:
-        model = llm.get_model("gemini-2.5-pro-05-06")
+        model = get_llm_model("gemini-2.5-pro-05-06")
         print("✅ Successfully loaded Gemini model")
     except Exception as e:
         print(f"❌ Error loading Gemini model: {str(e)}")
@@ -168,6 +236,29 @@ def read_file_content(file_path):
         print(f"❌ Error reading {file_path}: {str(e)}")
         return ""
 
+# Prompt assets (cheatsheet, schema descriptions) by path: (mtime, content)
+_PROMPT_ASSETS = {}
+
+def read_prompt_asset(file_path):
+    """Like read_file_content, but cached in memory until the file changes."""
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        return read_file_content(file_path)
+    cached = _PROMPT_ASSETS.get(file_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    content = read_file_content(file_path)
+    _PROMPT_ASSETS[file_path] = (mtime, content)
+    return content
+
+def get_schema_description_path(domain_name):
+    """Path of a domain's markdown schema description."""
+    config = DOMAINS.get(domain_name)
+    if config and config.get("description_file"):
+        return config["description_file"]
+    return os.path.join("data", f"{domain_name.lower()}.md")
+
 def keyword_based_detect_domain(query_text):
     """
     Detect the domain/database schema using keyword matching.
@@ -188,8 +279,8 @@ def keyword_based_detect_domain(query_text):
     
     # Get domain with highest score, default to Broker if no matches
     if not domain_scores or max(domain_scores.values()) == 0:
-        print("⚠️ Could not detect domain from query, defaulting to Broker")
-        selected_domain = "Broker"
+        selected_domain = "Broker" if "Broker" in DOMAINS or not DOMAINS else next(iter(DOMAINS))
+        print(f"⚠️ Could not detect domain from query, defaulting to {selected_domain}")
     else:
         selected_domain = max(domain_scores.items(), key=lambda x: x[1])[0]
     
@@ -203,20 +294,50 @@ def keyword_based_detect_domain(query_text):
         selected_config["database_file"]
     )
 
-def detect_domain_with_llm(query_text):
+def format_domain_candidates(candidates):
+    """Numbered list of candidate domains with keywords and collections, for the detection prompt."""
+    lines = []
+    for i, (domain, _) in enumerate(candidates):
+        config = DOMAINS[domain]
+        line = f"{i+1}. {domain} - {', '.join(config['keywords'][:5])}"
+        if config.get("collections"):
+            line += f" (collections: {', '.join(config['collections'][:8])})"
+        lines.append(line)
+    return "\n".join(lines)
+
+def retrieval_detect_domain(query_text):
     """
-    Detect domain using LLM with structured output.
-    Returns a tuple of (domain_name, metadata_file, database_file)
+    Pick the best-ranked domain from the local index, or fall back to keyword
+    matching when no indexed term matches. Returns (domain_name, metadata_file, database_file).
     """
-    try:
-        # Use gemini-2.0-flash for efficient domain detection
-        model = llm.get_model("gemini-2.0-flash")
-        
-        # Build domain list for prompt
-        domain_list = "\n".join([f"{i+1}. {domain} - {', '.join(config['keywords'][:5])}" 
-                              for i, (domain, config) in enumerate(DOMAINS.items())])
-        
-        prompt = f"""
+    ranked = get_domain_router().rank(query_text)
+    if not ranked:
+        return keyword_based_detect_domain(query_text)
+    selected_domain = ranked[0][0]
+    print(f"🔍 Detected domain (index): {selected_domain}")
+    return _domain_tuple(selected_domain)
+
+def _domain_tuple(domain_name):
+    return (domain_name, DOMAINS[domain_name]["metadata_file"], DOMAINS[domain_name]["database_file"])
+
+def _shortlist_for_detection(query_text):
+    """
+    Stage one of detection: shortlist candidate domains from the local index.
+    Returns (candidates, domain_info), with domain_info set when only one candidate is left.
+    """
+    candidates = shortlist_domains(query_text)
+    print(f"[Domain Detection Shortlist]: {', '.join(f'{name} ({score:.2f})' for name, score in candidates)}")
+    if len(candidates) == 1:
+        detected_domain = candidates[0][0]
+        print(f"🔍 Detected domain (only candidate): {detected_domain}")
+        return candidates, _domain_tuple(detected_domain)
+    return candidates, None
+
+def create_detection_prompt(query_text, candidates):
+    """Prompt asking the LLM to choose among the shortlisted domains."""
+    domain_list = format_domain_candidates(candidates)
+    
+    prompt = f"""
 Identify which database domain this query is asking about:
 "{query_text}"
 
@@ -225,36 +346,51 @@ Available domains:
 
 Return the domain name that best matches the query.
 """
-        print(f"[Domain Detection LLM Prompt]:\n{prompt}\n") # Log the prompt
+    print(f"[Domain Detection LLM Prompt]:\n{prompt}\n") # Log the prompt
+    return prompt
+
+def _parse_detection_response(query_text, response_text):
+    """Map the LLM's structured detection answer to domain info, falling back to the index's best domain."""
+    print(f"[Domain Detection LLM Raw Response]: {response_text}") # Log raw response
+    data = json.loads(response_text)
+    
+    detected_domain = data["domain"]
+    confidence = data.get("confidence", 0.0)
+    reasoning = data.get("reasoning", "")
+    print(f"[Domain Detection Parsed LLM Response]: Domain='{detected_domain}', Confidence={confidence}, Reasoning='{reasoning}'") # Log parsed
+    
+    # Check if detected domain exists in our configuration
+    if detected_domain in DOMAINS:
+        print(f"🔍 Detected domain (LLM): {detected_domain} (confidence: {confidence:.2f})")
+        if reasoning:
+            print(f"   Reasoning: {reasoning}")
+        return _domain_tuple(detected_domain)
+    else:
+        print(f"⚠️ LLM detected unknown domain: '{detected_domain}', falling back to the best shortlisted domain")
+        return retrieval_detect_domain(query_text)
+
+def detect_domain_with_llm(query_text):
+    """
+    Detect domain in two stages: shortlist candidates from the local domain index
+    (domain_router), then let the LLM choose among them with structured output.
+    Returns a tuple of (domain_name, metadata_file, database_file)
+    """
+    try:
+        # Stage one: shortlist candidate domains from the local index
+        candidates, domain_info = _shortlist_for_detection(query_text)
+        if domain_info:
+            return domain_info
+
+        # Stage two: use gemini-2.0-flash to pick among the candidates
+        model = get_llm_model(DOMAIN_DETECTION_MODEL)
+        prompt = create_detection_prompt(query_text, candidates)
         # Get structured response
         response = model.prompt(prompt, schema=DomainDetection, temperature=0.01)
-        response_text = response.text()
-        print(f"[Domain Detection LLM Raw Response]: {response_text}") # Log raw response
-        data = json.loads(response_text)
-        
-        detected_domain = data["domain"]
-        confidence = data.get("confidence", 0.0)
-        reasoning = data.get("reasoning", "")
-        print(f"[Domain Detection Parsed LLM Response]: Domain='{detected_domain}', Confidence={confidence}, Reasoning='{reasoning}'") # Log parsed
-        
-        # Check if detected domain exists in our configuration
-        if detected_domain in DOMAINS:
-            print(f"🔍 Detected domain (LLM): {detected_domain} (confidence: {confidence:.2f})")
-            if reasoning:
-                print(f"   Reasoning: {reasoning}")
-                
-            return (
-                detected_domain,
-                DOMAINS[detected_domain]["metadata_file"],
-                DOMAINS[detected_domain]["database_file"]
-            )
-        else:
-            print(f"⚠️ LLM detected unknown domain: '{detected_domain}', falling back to keyword matching")
-            return keyword_based_detect_domain(query_text)
+        return _parse_detection_response(query_text, response.text())
             
     except Exception as e:
-        print(f"⚠️ LLM domain detection failed: {str(e)}, falling back to keyword matching")
-        return keyword_based_detect_domain(query_text)
+        print(f"⚠️ LLM domain detection failed: {str(e)}, falling back to the best shortlisted domain")
+        return retrieval_detect_domain(query_text)
 
 def detect_domain(query_text):
     """
@@ -263,6 +399,22 @@ def detect_domain(query_text):
     """
     return detect_domain_with_llm(query_text)
 
+async def detect_domain_async(query_text):
+    """detect_domain for an asyncio event loop: the LLM call is awaited."""
+    try:
+        candidates, domain_info = _shortlist_for_detection(query_text)
+        if domain_info:
+            return domain_info
+
+        model = get_async_llm_model(DOMAIN_DETECTION_MODEL)
+        prompt = create_detection_prompt(query_text, candidates)
+        response = model.prompt(prompt, schema=DomainDetection, temperature=0.01)
+        return _parse_detection_response(query_text, await response.text())
+
+    except Exception as e:
+        print(f"⚠️ LLM domain detection failed: {str(e)}, falling back to the best shortlisted domain")
+        return retrieval_detect_domain(query_text)
+
 def create_prompt(query, cheatsheet_content, schema_content, domain_name="Broker"):
     """Create a prompt for the LLM with examples."""
     
@@ -366,16 +518,13 @@ def extract_pydough_code(response):
     
     return None
 
-def review_code_with_llm(code, model=None):
-    """Send the generated code to LLM for review and improvement."""
-    if model is None:
-        model = llm.get_model("gemini-2.5-pro-preview-05-06")
-    
-    # Define a Pydantic model for code review response
-    class CodeReviewResponse(BaseModel):
-        reviewed_code: str
-    
-    prompt = f"""
+class CodeReviewResponse(BaseModel):
+    """Structured response of the code review prompt."""
+    reviewed_code: str
+
+def create_review_prompt(code):
+    """Prompt asking the LLM to review and fix generated PyDough code."""
+    return f"""
 Review and improve this PyDough code to ensure it is syntactically correct and follows best practices.
 Fix any potential issues and return only the corrected code.
 
@@ -389,21 +538,29 @@ Ensure the code:
 3. Assigns the final result to a variable named 'result'
 4. Has no syntax errors
 """
+
+def _ensure_result_assignment(code):
+    """Make sure code assigns its final value to 'result'."""
+    if not re.search(r'\bresult\s*=', code):
+        if code.startswith('return '):
+            code = code.replace('return ', 'result = ', 1)
+        else:
+            code = f"result = {code}"
+    return code
+
+def review_code_with_llm(code, model=None):
+    """Send the generated code to LLM for review and improvement."""
+    if model is None:
+        model = get_llm_model(CODE_GENERATION_MODEL)
+    
+    prompt = create_review_prompt(code)
     
     print("⏳ Sending code to LLM for review and improvement...")
     try:
         # Use schema parameter for structured output
         response = model.prompt(prompt, schema=CodeReviewResponse, temperature=0.01)
         review_data = json.loads(response.text())
-        clean_response = review_data["reviewed_code"]
-        
-        # Ensure result assignment
-        if not re.search(r'\bresult\s*=', clean_response):
-            if clean_response.startswith('return '):
-                clean_response = clean_response.replace('return ', 'result = ', 1)
-            else:
-                clean_response = f"result = {clean_response}"
-        
+        clean_response = _ensure_result_assignment(review_data["reviewed_code"])
         print("✅ Code review complete")
         return clean_response
     except Exception as e:
@@ -413,8 +570,31 @@ Ensure the code:
         response_text = str(model.prompt(prompt, temperature=0.01))
         return extract_pydough_code(response_text) or code
 
-def adapt_and_execute_code(pydough_code, output_file_name, domain_info=None):
-    """Adapt and execute the PyDough code."""
+async def review_code_with_llm_async(code, model=None):
+    """review_code_with_llm for an asyncio event loop."""
+    if model is None:
+        model = get_async_llm_model(CODE_GENERATION_MODEL)
+
+    prompt = create_review_prompt(code)
+
+    print("⏳ Sending code to LLM for review and improvement...")
+    try:
+        response = model.prompt(prompt, schema=CodeReviewResponse, temperature=0.01)
+        review_data = json.loads(await response.text())
+        clean_response = _ensure_result_assignment(review_data["reviewed_code"])
+        print("✅ Code review complete")
+        return clean_response
+    except Exception as e:
+        print(f"⚠️ Structured output failed for code review: {str(e)}")
+        print("Falling back to regex extraction...")
+        response_text = await model.prompt(prompt, temperature=0.01).text()
+        return extract_pydough_code(response_text) or code
+
+def adapt_and_execute_code(pydough_code, output_file_name, domain_info=None, max_rows=None):
+    """
+    Adapt and execute the PyDough code.
+    If max_rows is set, the translated SQL is wrapped in a LIMIT so at most that many rows are fetched.
+    """
     
     # If domain_info not provided, use default Broker
     if domain_info is None:
@@ -434,6 +614,16 @@ def adapt_and_execute_code(pydough_code, output_file_name, domain_info=None):
     clean_code = textwrap.dedent(pydough_code.strip())
     indented_code = textwrap.indent(clean_code, '    ')
 
+    if max_rows:
+        # Cost guard asked for a preview: fetch only the first max_rows rows
+        fetch_code = f"""import sqlite3
+limited_sql = f"SELECT * FROM ({{pydough.to_sql(result_val)}}) LIMIT {int(max_rows)}"
+limited_conn = sqlite3.connect(\"{database_file}\")
+df_result = pd.read_sql_query(limited_sql, limited_conn)
+limited_conn.close()"""
+    else:
+        fetch_code = "df_result = pydough.to_df(result_val)"
+
     adapted_code = f"""
 import pydough
 import pandas as pd # Ensure pandas is imported
@@ -453,7 +643,7 @@ result_val = func()
 # print(f\"[DEBUG ADAPT] Type of result_val: {{type(result_val)}}\") # DEBUG PRINT
 # print(f\"[DEBUG ADAPT] result_val itself: {{str(result_val)[:500]}}\") # DEBUG PRINT (first 500 chars)
 
-df_result = pydough.to_df(result_val)
+{fetch_code}
 # print(f\"[DEBUG ADAPT] Type of df_result after pydough.to_df: {{type(df_result)}}\") # DEBUG PRINT
 
 print("\\nSQL Query:")
@@ -613,19 +803,677 @@ def save_execution_artifacts(execution_result, base_filename):
     else:
         print("ℹ️ Execution result present, but no standard output or error field to save.")
 
-def process_query(query_text, execute=False, save_results=True, model=None, use_code_review=False, domain=None, history: Optional[List[Dict[str, str]]] = None):
-    """Process a single query through the LLM, potentially using conversation history."""
+def validate_timeout(timeout):
+    """
+    A request's timeout as seconds, or None if it gave none. Raises ValueError
+    unless it is a number greater than 0 and at most MAX_REQUEST_TIMEOUT.
+    """
+    if timeout is None or timeout == "":
+        return None
+    try:
+        if isinstance(timeout, bool):
+            raise ValueError
+        seconds = float(timeout)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timeout {timeout!r}: expected a number of seconds")
+    if not math.isfinite(seconds) or seconds <= 0 or seconds > MAX_REQUEST_TIMEOUT:
+        raise ValueError(f"Invalid timeout {timeout!r}: must be greater than 0 and at most {MAX_REQUEST_TIMEOUT:g} seconds")
+    return seconds
+
+def validate_preview_rows(preview_rows):
+    """
+    A request's preview size in rows, or None if it gave none. Raises
+    ValueError unless it is a positive integer.
+    """
+    if preview_rows is None:
+        return None
+    if isinstance(preview_rows, bool) or not isinstance(preview_rows, int) or preview_rows <= 0:
+        raise ValueError(f"Invalid preview_rows {preview_rows!r}: expected a positive integer")
+    return preview_rows
+
+def validate_query_id(query_id):
+    """
+    A client-supplied query id, or None if it gave none. Raises ValueError if
+    it is not 1-64 letters, digits, "_" or "-", or is already in use.
+    """
+    if query_id is None or query_id == "":
+        return None
+    _check_query_id(query_id)
+    if _query_id_in_use(query_id):
+        raise ValueError(f"query_id {query_id} is already in use")
+    return query_id
+
+def get_timeout_budget(domain_name, timeout=None):
+    """
+    Seconds an execution may run: the per-request timeout if given, else the
+    domain's "timeout_seconds" from DOMAINS, else the executor default.
+    Raises ValueError for an invalid timeout (see validate_timeout).
+    """
+    timeout = validate_timeout(timeout)
+    if timeout:
+        return timeout
+    return float(DOMAINS.get(domain_name, {}).get("timeout_seconds", EXECUTOR_TASK_TIMEOUT))
+
+# Queries being processed, keyed by query_id: {"cancelled": bool}
+_ACTIVE_QUERIES = {}
+# Coalesced requests waiting on another request's run: query_id -> flight key
+_QUERY_FLIGHT_KEYS = {}
+# query_id of the request computing each in-flight key
+_FLIGHT_QUERY_IDS = {}
+_ACTIVE_QUERIES_LOCK = threading.Lock()
+
+def new_query_id():
+    return datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+
+def _check_query_id(query_id):
+    if not isinstance(query_id, str) or not QUERY_ID_PATTERN.match(query_id):
+        raise ValueError(f"Invalid query_id {query_id!r}: use 1-64 letters, digits, '_' or '-'")
+
+def _query_id_in_use(query_id):
+    with _ACTIVE_QUERIES_LOCK:
+        if query_id in _ACTIVE_QUERIES or query_id in _QUERY_FLIGHT_KEYS:
+            return True
+    return os.path.exists(get_query_result_path(query_id))
+
+def _claim_query_id(query_id):
+    """Register a query as being processed, under a new id if none is given. Returns the id."""
+    if query_id is None:
+        query_id = new_query_id()
+    else:
+        _check_query_id(query_id)
+    with _ACTIVE_QUERIES_LOCK:
+        if query_id in _ACTIVE_QUERIES or os.path.exists(get_query_result_path(query_id)):
+            raise ValueError(f"query_id {query_id} is already in use")
+        _ACTIVE_QUERIES[query_id] = {"cancelled": False}
+    return query_id
+
+def _release_query_id(query_id):
+    with _ACTIVE_QUERIES_LOCK:
+        _ACTIVE_QUERIES.pop(query_id, None)
+
+def query_cancelled(query_id):
+    """True if cancel_query was called for a query still being processed."""
+    with _ACTIVE_QUERIES_LOCK:
+        return bool(_ACTIVE_QUERIES.get(query_id, {}).get("cancelled"))
+
+def cancel_query(query_id):
+    """
+    Cancel a query. A query still generating its code is stopped before it
+    executes; a running (or queued) execution is interrupted. query_id may be
+    one the client supplied to process_query, so a query can be cancelled
+    before its response arrives. For coalesced requests the shared run is
+    cancelled. Returns True if the query was found.
+    """
+    with _ACTIVE_QUERIES_LOCK:
+        flight_key = _QUERY_FLIGHT_KEYS.get(query_id)
+        if query_id not in _ACTIVE_QUERIES and flight_key is not None:
+            query_id = _FLIGHT_QUERY_IDS.get(flight_key, query_id)
+        active = _ACTIVE_QUERIES.get(query_id)
+        if active is not None:
+            active["cancelled"] = True
+    cancelled = cancel_execution(query_id) or active is not None
+    if cancelled:
+        print(f"🛑 Cancellation requested for query {query_id}")
+    return cancelled
+
+def _cancelled_execution(timeout):
+    print("🛑 Query cancelled before execution")
+    return {
+        "success": False,
+        "output": None,
+        "error": "Execution cancelled",
+        "result_data": {},
+        "timeout": timeout,
+        "cancelled": True,
+        "timed_out": False
+    }
+
+def execute_generated_code(pydough_code, domain_info, save_results=True, confirm=False, preview_rows=None, timeout=None, job_id=None):
+    """
+    Run already-generated PyDough code in a warm executor worker, returning the execution details dict.
+    The cost guard runs first; its decision is reported under "cost_guard".
+    With preview_rows set only that many rows are fetched; "truncated" tells whether more exist.
+    The run is interrupted after its timeout budget (see get_timeout_budget) or when
+    cancel_query(job_id) is called; the worker stays alive either way.
+    """
+    domain_name = domain_info[0]
+    timeout = get_timeout_budget(domain_name, timeout)
+
+    # Pre-execution cost guard: may limit, hold for confirmation, or refuse the query
+    guard = check_query_cost(pydough_code, domain_info, confirm=confirm)
+    blocked = _blocked_by_guard(guard)
+    if blocked:
+        return blocked
+
+    if job_id is not None and query_cancelled(job_id):
+        return _cancelled_execution(timeout)
+
+    max_rows, is_preview = _prepare_execution(pydough_code, domain_info, guard, preview_rows)
+    execution_result = execute_pydough_code(pydough_code, domain_info, max_rows=max_rows, timeout=timeout, job_id=job_id)
+    return _execution_details(execution_result, domain_name, guard, is_preview, timeout, save_results)
+
+async def execute_generated_code_async(pydough_code, domain_info, save_results=True, confirm=False, preview_rows=None, timeout=None, job_id=None):
+    """
+    execute_generated_code for an asyncio event loop: the guard's plan and the
+    execution are awaited, and the file writes run on a thread.
+    """
+    domain_name = domain_info[0]
+    timeout = get_timeout_budget(domain_name, timeout)
+
+    guard = await check_query_cost_async(pydough_code, domain_info, confirm=confirm)
+    blocked = _blocked_by_guard(guard)
+    if blocked:
+        return blocked
+
+    if job_id is not None and query_cancelled(job_id):
+        return _cancelled_execution(timeout)
+
+    # Script and artifact writes run on a thread, off the event loop
+    max_rows, is_preview = await asyncio.to_thread(_prepare_execution, pydough_code, domain_info, guard, preview_rows)
+    execution_result = await execute_pydough_code_async(pydough_code, domain_info, max_rows=max_rows, timeout=timeout, job_id=job_id)
+    return await asyncio.to_thread(_execution_details, execution_result, domain_name, guard, is_preview, timeout, save_results)
+
+def _blocked_by_guard(guard):
+    """Execution details for a query the cost guard holds or refuses, or None if it may run."""
+    if guard["action"] != "allow":
+        print(f"🛡️ Cost guard action: {guard['action']} - {guard['reason']}")
+    if guard["action"] in ("confirm", "refuse"):
+        return {
+            "success": False,
+            "output": None,
+            "error": guard["reason"],
+            "result_data": {},
+            "cost_guard": guard
+        }
+    return None
+
+def _prepare_execution(pydough_code, domain_info, guard, preview_rows):
+    """Pick the row limit for a run and save its script. Returns (max_rows, is_preview)."""
+    domain_name = domain_info[0]
+    max_rows = guard.get("max_rows")
+    is_preview = bool(preview_rows) and (not max_rows or preview_rows < max_rows)
+    if is_preview:
+        max_rows = preview_rows
+
+    # Keep a runnable copy of the adapted script alongside the other artifacts
+    adapt_and_execute_code(pydough_code, f"{domain_name}_query_{time.time()}.py", domain_info, max_rows=guard.get("max_rows"))
+
+    print(f"\n🔄 Executing PyDough code for domain: {domain_name}" + (f" (preview of {max_rows} rows)..." if is_preview else "..."))
+    return max_rows, is_preview
+
+def _execution_details(execution_result, domain_name, guard, is_preview, timeout, save_results):
+    """Turn an executor result into the execution details dict stored with the query."""
+    if execution_result.get("success"):
+        engine = (execution_result.get("engine") or {}).get("name", "sqlite")
+        print(f"✅ Execution successful on {engine} ({execution_result.get('row_count')} rows{', truncated' if execution_result.get('truncated') else ''})")
+    else:
+        print(f"❌ Execution failed: {execution_result.get('error')}")
+    memory = execution_result.get("memory") or {}
+    if memory.get("peak_rss_mb") is not None:
+        allocations = f", Python allocations peak {memory['tracemalloc_peak_mb']} MB" if memory.get("tracemalloc_peak_mb") is not None else ""
+        print(f"📊 Worker memory: peak RSS {memory['peak_rss_mb']} MB{allocations}, CPU {memory.get('cpu_seconds')}s")
+
+    current_execution_details = {
+        "success": execution_result.get("success", False),
+        "output": execution_result.get("output"),
+        "error": execution_result.get("error"),
+        "result_data": {},
+        "sql": execution_result.get("sql"),
+        "row_count": execution_result.get("row_count"),
+        "truncated": execution_result.get("truncated", False),
+        "is_preview": is_preview,
+        "cost_guard": guard,
+        "timeout": timeout,
+        "cancelled": execution_result.get("cancelled", False),
+        "timed_out": execution_result.get("timed_out", False),
+        "memory": execution_result.get("memory"),
+        "engine": execution_result.get("engine")
+    }
+
+    # Ensure pandas_df_json is robustly handled
+    raw_json_str = execution_result.get("pandas_df_json_string")
+    if raw_json_str: # True if raw_json_str is a non-empty string
+        current_execution_details["result_data"]["pandas_df_json"] = raw_json_str
+    else: # Covers cases where raw_json_str is None or "" (empty result)
+        current_execution_details["result_data"]["pandas_df_json"] = None
+
+    if save_results:
+        # Save execution artifacts using the helper function
+        save_execution_artifacts(execution_result, f"{domain_name}_query_{time.time()}")
+
+    return current_execution_details
+
+def explain_generated_code(pydough_code, domain_info):
+    """Translate generated PyDough code to SQL and fetch its query plan without executing it."""
+    print(f"\n🔎 Explaining PyDough code for domain: {domain_info[0]}...")
+    return _report_explain(explain_pydough_code(pydough_code, domain_info))
+
+async def explain_generated_code_async(pydough_code, domain_info):
+    """explain_generated_code for an asyncio event loop."""
+    print(f"\n🔎 Explaining PyDough code for domain: {domain_info[0]}...")
+    return _report_explain(await explain_pydough_code_async(pydough_code, domain_info))
+
+def _report_explain(explain_result):
+    if explain_result.get("success"):
+        print("\nSQL Query:")
+        print(explain_result["sql"])
+        if explain_result.get("full_table_scan"):
+            print(f"⚠️ Plan performs full table scans on: {', '.join(explain_result['scanned_tables'])}")
+    else:
+        print(f"❌ Explain failed: {explain_result.get('error')}")
+    return explain_result
+
+def get_query_result_path(query_id):
+    """Return the path of the saved JSON record for a processed query."""
+    return os.path.join("results", f"query_result_{query_id}.json")
+
+# Background full-result computations still running, keyed by query_id
+_FULL_RESULT_JOBS = {}
+# Serializes rewrites of the saved query records (the result cache)
+_RESULT_RECORD_LOCK = threading.Lock()
+
+def _needs_full_result(execution_details):
+    """True if the stored execution is missing, failed, or only a truncated preview."""
+    if not execution_details or not execution_details.get("success"):
+        return True
+    return bool(execution_details.get("is_preview") and execution_details.get("truncated"))
+
+def _compute_and_store_result(query_id, confirm=False, timeout=None):
+    """Execute a stored query's code in full and write the result into its record."""
+    pydough_code, domain_info = _load_stored_code(query_id)
+    execution_details = execute_generated_code(pydough_code, domain_info, confirm=confirm, timeout=timeout, job_id=query_id)
+    return _store_execution(query_id, execution_details)
+
+async def _compute_and_store_result_async(query_id, confirm=False, timeout=None):
+    """_compute_and_store_result for an asyncio event loop."""
+    pydough_code, domain_info = await asyncio.to_thread(_load_stored_code, query_id)
+    execution_details = await execute_generated_code_async(pydough_code, domain_info, confirm=confirm, timeout=timeout, job_id=query_id)
+    return await asyncio.to_thread(_store_execution, query_id, execution_details)
+
+def _read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def load_stored_query(query_id):
+    """
+    (pydough_code, domain) saved for an earlier query, or None if there is no record.
+    Raises ValueError for a malformed query_id, since it names the record's file.
+    """
+    _check_query_id(query_id)
+    result_file_path = get_query_result_path(query_id)
+    if not os.path.exists(result_file_path):
+        return None
+    result_data = _read_json(result_file_path)
+    return result_data.get("pydough_code"), result_data.get("domain")
+
+def _load_stored_code(query_id):
+    """(pydough_code, domain_info) saved in a query's record."""
+    with open(get_query_result_path(query_id), 'r') as f:
+        result_data = json.load(f)
+
+    domain_name = result_data.get("domain", "Unknown")
+    if domain_name not in DOMAINS:
+        raise ValueError(f"Unknown domain: {domain_name}")
+    return result_data["pydough_code"], _domain_tuple(domain_name)
+
+def _store_execution(query_id, execution_details):
+    """Write execution details into a query's record and return the updated record."""
+    result_file_path = get_query_result_path(query_id)
+    with _RESULT_RECORD_LOCK:
+        with open(result_file_path, 'r') as f:
+            result_data = json.load(f)
+        previous_details = result_data.get("execution")
+        if not execution_details.get("success") and previous_details and previous_details.get("success"):
+            # e.g. the full run was cancelled or timed out: keep serving the stored preview
+            previous_details["full_result_error"] = execution_details.get("error")
+            execution_details = previous_details
+        result_data["execution"] = execution_details
+        result_data["executed_at"] = datetime.now().isoformat()
+        with open(result_file_path, 'w') as f:
+            json.dump(result_data, f, indent=2, default=str)
+    print(f"💾 Execution result cached in {result_file_path}")
+    return result_data
+
+def schedule_full_result(query_id, confirm=False, timeout=None):
+    """Compute the full result of a previewed query in a background thread."""
+    def run():
+        try:
+            _compute_and_store_result(query_id, confirm=confirm, timeout=timeout)
+        except Exception as e:
+            print(f"❌ Background full result for {query_id} failed: {str(e)}")
+        finally:
+            _FULL_RESULT_JOBS.pop(query_id, None)
+
+    thread = threading.Thread(target=run, name=f"full-result-{query_id}", daemon=True)
+    _FULL_RESULT_JOBS[query_id] = thread
+    thread.start()
+    return thread
+
+def execute_stored_query(query_id, confirm=False, timeout=None):
+    """
+    Execute the PyDough code stored for a previously generated query.
+
+    The execution result is cached in the query's JSON record, so only the first
+    call actually runs the code; later calls return the stored result. If only a
+    truncated preview is stored, the full result is computed (or, if a background
+    computation is already running, awaited) and cached.
+    confirm=True lets through queries the cost guard held for confirmation.
+    timeout overrides the domain's execution time budget.
+    Raises FileNotFoundError if no record exists for query_id.
+    """
+    result_file_path = get_query_result_path(query_id)
+    if not os.path.exists(result_file_path):
+        raise FileNotFoundError(f"No stored query found for id {query_id}")
+
+    background_job = _FULL_RESULT_JOBS.get(query_id)
+    if background_job is not None:
+        print(f"⏳ Waiting for background full result of query {query_id}...")
+        background_job.join()
+
+    with open(result_file_path, 'r') as f:
+        result_data = json.load(f)
+
+    if result_data.get("pydough_code") and _needs_full_result(result_data.get("execution")):
+        result_data = _compute_and_store_result(query_id, confirm=confirm, timeout=timeout)
+    elif result_data.get("pydough_code"):
+        print(f"ℹ️ Returning cached execution result for query {query_id}")
+    return _stored_query_response(query_id, result_data)
+
+async def execute_stored_query_async(query_id, confirm=False, timeout=None):
+    """execute_stored_query for an asyncio event loop."""
+    result_file_path = get_query_result_path(query_id)
+    if not os.path.exists(result_file_path):
+        raise FileNotFoundError(f"No stored query found for id {query_id}")
+
+    background_job = _FULL_RESULT_JOBS.get(query_id)
+    if background_job is not None:
+        print(f"⏳ Waiting for background full result of query {query_id}...")
+        await asyncio.to_thread(background_job.join)
+
+    result_data = await asyncio.to_thread(_read_json, result_file_path)
+
+    if result_data.get("pydough_code") and _needs_full_result(result_data.get("execution")):
+        result_data = await _compute_and_store_result_async(query_id, confirm=confirm, timeout=timeout)
+    elif result_data.get("pydough_code"):
+        print(f"ℹ️ Returning cached execution result for query {query_id}")
+    return _stored_query_response(query_id, result_data)
+
+def _stored_query_response(query_id, result_data):
+    """Response of execute_stored_query for a query record."""
+    pydough_code = result_data.get("pydough_code")
+    domain_name = result_data.get("domain", "Unknown")
+    execution_details = result_data.get("execution")
+
+    if not pydough_code:
+        execution_details = {
+            "success": False,
+            "error": "No generated PyDough code is stored for this query, so it cannot be executed.",
+            "output": None,
+            "result_data": {}
+        }
+
+    return {
+        "success": bool(pydough_code) and execution_details.get("success", False),
+        "query_id": query_id,
+        "query": result_data.get("query"),
+        "domain": domain_name,
+        "pydough_code": pydough_code,
+        "pydoughCode": pydough_code, # Frontend expects this
+        "explanation": result_data.get("explanation"),
+        "timestamp": result_data.get("timestamp"),
+        "execution": execution_details
+    }
+
+def get_available_domain_infos():
+    """(name, metadata_file, database_file) for every domain whose files are present."""
+    return [
+        (name, config["metadata_file"], config["database_file"])
+        for name, config in DOMAINS.items()
+        if os.path.exists(config["metadata_file"]) and os.path.exists(config["database_file"])
+    ]
+
+def _warm_prompt_assets():
+    """Read the cheatsheet and every domain's schema description into the prompt asset cache."""
+    paths = ['cheatsheet.md'] + [get_schema_description_path(name) for name in DOMAINS]
+    loaded = [path for path in paths if os.path.exists(path) and read_prompt_asset(path)]
+    return {"loaded": loaded}
+
+def _warm_llm_clients():
+    """Import llm and load the code generation and domain detection models."""
+    loaded = []
+    errors = {}
+    for model_name in (CODE_GENERATION_MODEL, DOMAIN_DETECTION_MODEL):
+        try:
+            get_llm_model(model_name)
+            loaded.append(model_name)
+        except Exception as e:
+            errors[model_name] = str(e)
+    if not loaded:
+        raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+    return {"loaded": loaded, "errors": errors}
+
+def _warm_executor():
+    """Start the executor workers and spread every available domain over them."""
+    domain_infos = get_available_domain_infos()
+    results = warm_executor_pool(domain_infos)
+    errors = {}
+    for result in results:
+        errors.update(result.get("errors") or {})
+        if not result.get("success") and result.get("error"):
+            errors["worker"] = result["error"]
+    return {"workers": len(results), "domains": [info[0] for info in domain_infos], "errors": errors}
+
+def warm_up(status=None):
+    """
+    Preload what the first query would otherwise pay for: prompt assets, LLM
+    clients, and executor workers holding the available domains' metadata graphs.
+    Progress is recorded in the optional status dict ("step" running now and
+    "completed" step -> result). Returns the per-step results.
+    """
+    status = status if status is not None else {}
+    status.setdefault("completed", {})
+    steps = [
+        ("prompt_assets", _warm_prompt_assets),
+        ("llm_clients", _warm_llm_clients),
+        ("executor", _warm_executor),
+    ]
+    for step, warm in steps:
+        status["step"] = step
+        print(f"⏳ Warm-up: {step}...")
+        started = time.time()
+        try:
+            step_result = {"success": True, "details": warm()}
+        except Exception as e:
+            print(f"⚠️ Warm-up step {step} failed: {str(e)}")
+            step_result = {"success": False, "error": str(e)}
+        step_result["seconds"] = round(time.time() - started, 2)
+        status["completed"][step] = step_result
+    status["step"] = None
+    print("✅ Warm-up finished")
+    return status["completed"]
+
+def load_prompt_context(domain_name):
+    """(cheatsheet, schema description) text for a domain's generation prompt."""
+    cheatsheet_content = read_prompt_asset('cheatsheet.md')
+    schema_content = ""
+    schema_file_path = get_schema_description_path(domain_name)
+
+    print(f"INFO: Attempting to load schema description file: {schema_file_path}")
+    if os.path.exists(schema_file_path):
+        schema_content = read_prompt_asset(schema_file_path)
+        if schema_content:
+            print(f"INFO: Successfully loaded schema description from {schema_file_path}")
+        else:
+            print(f"WARNING: Schema file {schema_file_path} was found but is empty.")
+    else:
+        print(f"WARNING: Schema description file not found: {schema_file_path}. Proceeding without specific schema markdown.")
+    return cheatsheet_content, schema_content
+
+def create_generation_prompt(query_text, cheatsheet_content, schema_content, domain_name, history=None):
+    """create_prompt, with the conversation history (if any) placed before the current user query."""
+    base_prompt_structure = create_prompt(query_text, cheatsheet_content, schema_content, domain_name)
+    if not history:
+        return base_prompt_structure
+
+    history_string = ""
+    for turn in history:
+        role = turn.get('role', 'unknown').capitalize()
+        content = turn.get('content', '')
+        history_string += f"{role}: {content}\\n\\n"
+
+    # Assuming create_prompt starts with the task description
+    prompt_parts = base_prompt_structure.split("# User Query", 1)
+    if len(prompt_parts) == 2:
+        task_description = prompt_parts[0]
+        rest_of_prompt = prompt_parts[1].split(query_text, 1)[1] # Get part after original query
+        return f"{task_description}# Conversation History\n{history_string}# Current User Query\n{query_text}{rest_of_prompt}"
+    # Fallback if split fails
+    print("⚠️ Could not inject history smoothly, prepending instead.")
+    return f"# Conversation History\n{history_string}\n---\n\n{base_prompt_structure}"
+
+def _response_text(response):
+    """Raw text of a (synchronous) llm response."""
+    try:
+        if hasattr(response, 'text') and callable(response.text):
+            return response.text()
+        elif hasattr(response, 'content'):
+            return str(response.content)
+        return str(response)
+    except Exception as log_e:
+        return f"[Error getting raw text: {log_e}]"
+
+def parse_generation_response(raw_response_text, response=None):
+    """
+    (pydough_code, explanation) from a structured generation response: the JSON
+    in its raw text first, then the JSON fields of the response object (if
+    given), then a regex over the raw text.
+    """
+    pydough_code = None
+    explanation = None
+
+    if raw_response_text and '{' in raw_response_text:
+        try:
+            json_text = raw_response_text
+            if not json_text.strip().startswith('{'):
+                json_start = json_text.find('{')
+                json_text = json_text[json_start:]
+            
+            parsed_json = json.loads(json_text)
+            pydough_code = parsed_json.get("code")
+            explanation = parsed_json.get("explanation")
+        except json.JSONDecodeError:
+            pass # Continue to other approaches
+
+    if response is not None and not pydough_code and hasattr(response, 'response_json'):
+        try:
+            if isinstance(response.response_json, dict):
+                pydough_code = response.response_json.get("code")
+                explanation = response.response_json.get("explanation")
+            elif isinstance(response.response_json, str):
+                parsed_json = json.loads(response.response_json)
+                pydough_code = parsed_json.get("code")
+                explanation = parsed_json.get("explanation")
+        except Exception:
+            pass
+
+    if response is not None and not pydough_code:
+        if hasattr(response, 'json') and callable(response.json):
+            try:
+                json_data = response.json()
+                if isinstance(json_data, dict):
+                    pydough_code = json_data.get("code")
+                    explanation = json_data.get("explanation")
+            except Exception:
+                pass
+        
+        if not pydough_code and hasattr(response, 'code'):
+            pydough_code = response.code
+        if not explanation and hasattr(response, 'explanation'):
+            explanation = response.explanation
+
+    if not pydough_code and raw_response_text:
+        # Regex extraction as last resort
+        code_match = re.search(r'"code"\\s*:\\s*"(.*?)"(?:,|\\})', raw_response_text, re.DOTALL)
+        if code_match:
+            extracted_code = code_match.group(1)
+            extracted_code = extracted_code.replace("\\\\n", "\\n").replace('\\\\"', '"').replace("\\\\\\\\", "\\\\")
+            pydough_code = extracted_code
+
+    return pydough_code, explanation
+
+def generate_pydough_code(model, query_text, domain_name, cheatsheet_content, schema_content, history=None, result_data=None):
+    """
+    Ask the LLM for PyDough code with structured output. With history the
+    conversation is included; if that fails a stateless prompt is used, and
+    if structured output fails the code is extracted from a plain response.
+    Returns (pydough_code, explanation); the raw response is recorded in
+    result_data["llm_response"].
+    """
+    result_data = result_data if result_data is not None else {}
+    if history:
+        try:
+            prompt = create_generation_prompt(query_text, cheatsheet_content, schema_content, domain_name, history)
+            response = model.prompt(prompt, schema=PyDoughResponse, temperature=0.01)
+            raw_response_text = _response_text(response)
+            result_data["llm_response"] = f"Structured response (stateless): {raw_response_text}"
+            return parse_generation_response(raw_response_text, response)
+        except Exception as e:
+            print(f"⚠️ Error using formatted history prompt: {str(e)}")
+            print("⚠️ Falling back to stateless prompt...")
+
+    prompt = create_prompt(query_text, cheatsheet_content, schema_content, domain_name)
+    try:
+        response = model.prompt(prompt, schema=PyDoughResponse, temperature=0.01) # Gets structured response object
+        raw_response_text = _response_text(response)
+        parsed = parse_generation_response(raw_response_text, response)
+        result_data["llm_response"] = f"Structured response (stateless): {raw_response_text}"
+        return parsed
+    except Exception as e:
+        print(f"⚠️ Structured output failed (stateless): {str(e)}")
+        print("Falling back to regex extraction...")
+        response = model.prompt(prompt, temperature=0.01)
+        result_data["llm_response"] = str(response)
+        print("\n🤖 LLM Response (unstructured):")
+        print(response)
+        return extract_pydough_code(str(response)), None
+
+async def generate_pydough_code_async(model, query_text, domain_name, cheatsheet_content, schema_content, history=None, result_data=None):
+    """generate_pydough_code with an async llm model: every call is awaited."""
+    result_data = result_data if result_data is not None else {}
+    if history:
+        try:
+            prompt = create_generation_prompt(query_text, cheatsheet_content, schema_content, domain_name, history)
+            raw_response_text = await model.prompt(prompt, schema=PyDoughResponse, temperature=0.01).text()
+            result_data["llm_response"] = f"Structured response (stateless): {raw_response_text}"
+            return parse_generation_response(raw_response_text)
+        except Exception as e:
+            print(f"⚠️ Error using formatted history prompt: {str(e)}")
+            print("⚠️ Falling back to stateless prompt...")
+
+    prompt = create_prompt(query_text, cheatsheet_content, schema_content, domain_name)
+    try:
+        raw_response_text = await model.prompt(prompt, schema=PyDoughResponse, temperature=0.01).text()
+        parsed = parse_generation_response(raw_response_text)
+        result_data["llm_response"] = f"Structured response (stateless): {raw_response_text}"
+        return parsed
+    except Exception as e:
+        print(f"⚠️ Structured output failed (stateless): {str(e)}")
+        print("Falling back to regex extraction...")
+        response_text = await model.prompt(prompt, temperature=0.01).text()
+        result_data["llm_response"] = response_text
+        print("\n🤖 LLM Response (unstructured):")
+        print(response_text)
+        return extract_pydough_code(response_text), None
+
+def _start_query(query_text, history, query_id=None):
+    """Register a new query (see _claim_query_id), log it and create its result record."""
+    query_id = _claim_query_id(query_id)
     print(f"\nProcessing query: {query_text}")
     if history:
         print(f"Using conversation history with {len(history)} turns.")
     print("-" * 80)
-
-    # If model not provided, get it
-    if model is None:
-        model_name = "gemini-2.5-pro-preview-05-06"
-        model = llm.get_model(model_name)
-
-    result_data = {
+    return {
+        "query_id": query_id,
         "query": query_text,
         "timestamp": datetime.now().isoformat(),
         "execution": None,
@@ -633,350 +1481,166 @@ def process_query(query_text, execute=False, save_results=True, model=None, use_
         "history_used": bool(history)
     }
 
-    adapted_code_content = None
+def _forced_domain_info(domain):
+    if domain in DOMAINS:
+        return _domain_tuple(domain)
+    raise ValueError(f"Unknown domain: {domain}")
+
+def _record_generated_code(result_data, pydough_code, explanation):
+    result_data["pydough_code"] = pydough_code
+    if explanation:
+        result_data["explanation"] = explanation
+    if pydough_code:
+        print("\n📄 Generated PyDough Code:")
+        print(pydough_code)
+    else:
+        print("\n❌ No PyDough code found in the response")
+
+def _record_review(result_data, pydough_code, reviewed_code):
+    """Keep the reviewed code if the review changed it. Returns the code to use."""
+    if reviewed_code and reviewed_code != pydough_code:
+        print("\n📝 Improved PyDough Code after Review:")
+        print(reviewed_code)
+        result_data["reviewed_code"] = reviewed_code
+        return reviewed_code
+    return pydough_code
+
+def _record_query_error(result_data, e):
+    print(f"\n❌ Error processing query: {str(e)}")
+    result_data["error"] = str(e)
+    # Ensure 'success' is false if an error occurred during processing,
+    # even if execution wasn't the part that failed.
+    if "execution" not in result_data or not result_data["execution"]:
+        result_data["execution"] = {"success": False, "error": str(e), "result_data": {}}
+    else:
+        # If execution details exist, ensure its success is false and error is set
+        current_exec = result_data["execution"]
+        current_exec["success"] = False
+        if "error" not in current_exec or not current_exec["error"]: # Don't overwrite existing specific error
+             current_exec["error"] = str(e)
+        result_data["execution"] = current_exec
+
+def process_query(query_text, execute=False, save_results=True, model=None, use_code_review=False, domain=None, history: Optional[List[Dict[str, str]]] = None, explain=False, confirm=False, preview_rows=None, timeout=None, query_id=None):
+    """
+    Process a single query through the LLM, potentially using conversation history.
+    With explain=True the generated code is also translated to SQL and its query plan
+    is returned under "explain" (a dry run that materializes no rows).
+    confirm=True runs queries that the cost guard would otherwise hold for confirmation.
+    With preview_rows set, execution returns only the first rows quickly (flagged
+    "truncated"); the full result is then computed into the saved record on demand
+    via execute_stored_query (or in the background with PYDOUGH_BACKGROUND_FULL_RESULT=1).
+    timeout overrides the domain's execution time budget; the run can be stopped
+    early with cancel_query(result["query_id"]). query_id, if given, is used instead
+    of a generated id, so a caller can cancel the query while it is still running.
+    Raises ValueError if query_id is invalid or already in use.
+    """
+    # If model not provided, get it
+    if model is None:
+        model = get_llm_model(CODE_GENERATION_MODEL)
+
+    result_data = _start_query(query_text, history, query_id)
+
     domain_name = "Unknown"
     pydough_code = None
     explanation = None
 
     try:
         # 1. Detect domain (based on current query)
-        if domain is None:
-            domain_info = detect_domain(query_text)
-        else:
-            if domain in DOMAINS:
-                domain_info = (domain, DOMAINS[domain]["metadata_file"], DOMAINS[domain]["database_file"])
-            else:
-                raise ValueError(f"Unknown domain: {domain}")
-        domain_name, metadata_file, database_file = domain_info
+        domain_info = detect_domain(query_text) if domain is None else _forced_domain_info(domain)
+        domain_name = domain_info[0]
         result_data["domain"] = domain_name
 
         # 2. Read contextual files
-        cheatsheet_content = read_file_content('cheatsheet.md')
-        schema_content = ""
-        schema_file_path = os.path.join("data", f"{domain_name.lower()}.md")
-
-        print(f"INFO: Attempting to load schema description file: {schema_file_path}")
-        if os.path.exists(schema_file_path):
-            schema_content = read_file_content(schema_file_path)
-            if schema_content:
-                print(f"INFO: Successfully loaded schema description from {schema_file_path}")
-            else:
-                print(f"WARNING: Schema file {schema_file_path} was found but is empty.")
-        else:
-            print(f"WARNING: Schema description file not found: {schema_file_path}. Proceeding without specific schema markdown.")
+        cheatsheet_content, schema_content = load_prompt_context(domain_name)
 
         # 3. Generate PyDough code
         print("⏳ Generating PyDough code...")
-        if history:
-            # --- Format History into Prompt --- 
-            try:
-                history_string = ""
-                for turn in history:
-                    role = turn.get('role', 'unknown').capitalize()
-                    content = turn.get('content', '')
-                    history_string += f"{role}: {content}\\n\\n"
-                
-                # Construct the prompt with history
-                # Use the standard prompt creation but prepend the history
-                base_prompt_structure = create_prompt(query_text, cheatsheet_content, schema_content, domain_name)
-                # A simple way to inject history - might need refinement based on how create_prompt is structured
-                # Assuming create_prompt starts with the task description
-                prompt_parts = base_prompt_structure.split("# User Query", 1)
-                if len(prompt_parts) == 2:
-                   task_description = prompt_parts[0]
-                   rest_of_prompt = prompt_parts[1].split(query_text, 1)[1] # Get part after original query
-                   full_prompt_with_history = f"{task_description}# Conversation History\n{history_string}# Current User Query\n{query_text}{rest_of_prompt}"
-                else: # Fallback if split fails
-                    print("⚠️ Could not inject history smoothly, prepending instead.")
-                    full_prompt_with_history = f"# Conversation History\n{history_string}\n---\n\n{base_prompt_structure}"
-                
-                # Call model.prompt with the combined history + current query prompt
-                response = model.prompt(full_prompt_with_history, schema=PyDoughResponse, temperature=0.01)
-                
-                # --- DETAILED INSPECTION OF RESPONSE OBJECT ---
-                # print(f"[DEBUG] Type of response object: {type(response)}")
-                # print(f"[DEBUG] Attributes of response object: {dir(response)}")
-                # try:
-                    # print(f"[DEBUG] response.code: {getattr(response, 'code', 'N/A')}")
-                    # print(f"[DEBUG] response.explanation: {getattr(response, 'explanation', 'N/A')}")
-                    # if hasattr(response, 'data'):
-                        # print(f"[DEBUG] response.data: {response.data}")
-                    # if hasattr(response, 'dict') and callable(response.dict):
-                        # print(f"[DEBUG] response.dict(): {response.dict()}")
-                    # if hasattr(response, 'model_dump') and callable(response.model_dump): # For Pydantic v2
-                        # print(f"[DEBUG] response.model_dump(): {response.model_dump()}")
-                # except Exception as inspect_e:
-                    # print(f"[DEBUG] Error during response inspection: {inspect_e}")
-                # --- END DETAILED INSPECTION ---
-                
-                pydough_code = None
-                explanation = None
-                raw_response_text = None
-                
-                try:
-                    if hasattr(response, 'text') and callable(response.text):
-                        raw_response_text = response.text()
-                    elif hasattr(response, 'content'):
-                        raw_response_text = str(response.content)
-                    else:
-                        raw_response_text = str(response)
-                except Exception as log_e:
-                    raw_response_text = f"[Error getting raw text: {log_e}]"
-                
-                # print(f"[DEBUG] Raw response text: {raw_response_text}")
-
-                if raw_response_text and '{' in raw_response_text:
-                    try:
-                        json_text = raw_response_text
-                        if not json_text.strip().startswith('{'):
-                            json_start = json_text.find('{')
-                            json_text = json_text[json_start:]
-                        
-                        parsed_json = json.loads(json_text)
-                        # print(f"[DEBUG] Successfully parsed raw response text as JSON: {parsed_json}")
-                        pydough_code = parsed_json.get("code")
-                        explanation = parsed_json.get("explanation")
-                        
-                        # if pydough_code:
-                            # print(f"[DEBUG] Successfully extracted code from parsed JSON")
-                    except json.JSONDecodeError as e:
-                        # print(f"[DEBUG] Failed to parse raw text as JSON: {e}")
-                        pass # Continue to other approaches
-                
-                if not pydough_code and hasattr(response, 'response_json'):
-                    # print(f"[DEBUG] response.response_json found, type: {type(response.response_json)}, value: {response.response_json}")
-                    try:
-                        if isinstance(response.response_json, dict):
-                            pydough_code = response.response_json.get("code")
-                            explanation = response.response_json.get("explanation")
-                        elif response.response_json is not None:
-                            try:
-                                if isinstance(response.response_json, str):
-                                    parsed_json = json.loads(response.response_json)
-                                    pydough_code = parsed_json.get("code")
-                                    explanation = parsed_json.get("explanation")
-                            except json.JSONDecodeError:
-                                # print("[DEBUG] response.response_json is a string but not valid JSON")
-                                pass
-                    except Exception as e:
-                        # print(f"[DEBUG] Error accessing response.response_json: {e}")
-                        pass
-                
-                if not pydough_code:
-                    if hasattr(response, 'json') and callable(response.json):
-                        try:
-                            json_data = response.json()
-                            # print(f"[DEBUG] response.json() returned: {json_data}")
-                            if isinstance(json_data, dict):
-                                pydough_code = json_data.get("code")
-                                explanation = json_data.get("explanation")
-                        except Exception as e:
-                            # print(f"[DEBUG] Error calling response.json(): {e}")
-                            pass
-                    
-                    if not pydough_code and hasattr(response, 'code'):
-                        pydough_code = response.code
-                    if not explanation and hasattr(response, 'explanation'):
-                        explanation = response.explanation
-                    
-                    if not pydough_code and raw_response_text:
-                        # print("[DEBUG] Attempting regex extraction as last resort")
-                        code_match = re.search(r'"code"\\s*:\\s*"(.*?)"(?:,|\\})', raw_response_text, re.DOTALL)
-                        if code_match:
-                            extracted_code = code_match.group(1)
-                            extracted_code = extracted_code.replace("\\\\n", "\\n").replace('\\\\"', '"').replace("\\\\\\\\", "\\\\")
-                            pydough_code = extracted_code
-                            # print(f"[DEBUG] Extracted code via regex: {pydough_code[:50]}...")
-                
-                # print(f"[DEBUG] Final pydough_code: {pydough_code if pydough_code else 'None'}")
-                
-                result_data["llm_response"] = f"Structured response (stateless): {raw_response_text}"
-            
-            except Exception as e:
-                print(f"⚠️ Error using formatted history prompt: {str(e)}")
-                print("⚠️ Falling back to stateless prompt...")
-                # Fallback to stateless mode if history formatting/call fails
-                history = None # Ensure the stateless block runs
-
-        if not history: # Runs if history is None initially OR if history prompt failed
-             # --- Stateless Prompt (No History or Fallback) ---
-             try:
-                 prompt = create_prompt(query_text, cheatsheet_content, schema_content, domain_name)
-                 response = model.prompt(prompt, schema=PyDoughResponse, temperature=0.01) # Gets structured response object
-                 
-                 # --- DETAILED INSPECTION OF RESPONSE OBJECT ---
-                 # print(f"[DEBUG] Type of response object: {type(response)}")
-                 # print(f"[DEBUG] Attributes of response object: {dir(response)}")
-                 # try:
-                     # print(f"[DEBUG] response.code: {getattr(response, 'code', 'N/A')}")
-                     # print(f"[DEBUG] response.explanation: {getattr(response, 'explanation', 'N/A')}")
-                     # if hasattr(response, 'data'):
-                         # print(f"[DEBUG] response.data: {response.data}")
-                     # if hasattr(response, 'dict') and callable(response.dict):
-                         # print(f"[DEBUG] response.dict(): {response.dict()}")
-                     # if hasattr(response, 'model_dump') and callable(response.model_dump): # For Pydantic v2
-                         # print(f"[DEBUG] response.model_dump(): {response.model_dump()}")
-                 # except Exception as inspect_e:
-                     # print(f"[DEBUG] Error during response inspection: {inspect_e}")
-                 # --- END DETAILED INSPECTION ---
-
-                 pydough_code = None
-                 explanation = None
-                 raw_response_text = None
-                 
-                 try:
-                     if hasattr(response, 'text') and callable(response.text):
-                         raw_response_text = response.text()
-                     elif hasattr(response, 'content'):
-                         raw_response_text = str(response.content)
-                     else:
-                         raw_response_text = str(response)
-                 except Exception as log_e:
-                     raw_response_text = f"[Error getting raw text: {log_e}]"
-                 
-                 # print(f"[DEBUG] Raw response text: {raw_response_text}")
-
-                 if raw_response_text and '{' in raw_response_text:
-                     try:
-                         json_text = raw_response_text
-                         if not json_text.strip().startswith('{'):
-                             json_start = json_text.find('{')
-                             json_text = json_text[json_start:]
-                         
-                         parsed_json = json.loads(json_text)
-                         # print(f"[DEBUG] Successfully parsed raw response text as JSON: {parsed_json}")
-                         pydough_code = parsed_json.get("code")
-                         explanation = parsed_json.get("explanation")
-                         
-                         # if pydough_code:
-                             # print(f"[DEBUG] Successfully extracted code from parsed JSON")
-                     except json.JSONDecodeError as e:
-                         # print(f"[DEBUG] Failed to parse raw text as JSON: {e}")
-                         pass # Continue to other approaches
-                 
-                 if not pydough_code and hasattr(response, 'response_json'):
-                     # print(f"[DEBUG] response.response_json found, type: {type(response.response_json)}, value: {response.response_json}")
-                     try:
-                         if isinstance(response.response_json, dict):
-                             pydough_code = response.response_json.get("code")
-                             explanation = response.response_json.get("explanation")
-                         elif response.response_json is not None:
-                             try:
-                                 if isinstance(response.response_json, str):
-                                     parsed_json = json.loads(response.response_json)
-                                     pydough_code = parsed_json.get("code")
-                                     explanation = parsed_json.get("explanation")
-                             except json.JSONDecodeError:
-                                 # print("[DEBUG] response.response_json is a string but not valid JSON")
-                                 pass
-                     except Exception as e:
-                         # print(f"[DEBUG] Error accessing response.response_json: {e}")
-                         pass
-                
-                 if not pydough_code:
-                     if hasattr(response, 'json') and callable(response.json):
-                         try:
-                             json_data = response.json()
-                             # print(f"[DEBUG] response.json() returned: {json_data}")
-                             if isinstance(json_data, dict):
-                                 pydough_code = json_data.get("code")
-                                 explanation = json_data.get("explanation")
-                         except Exception as e:
-                             # print(f"[DEBUG] Error calling response.json(): {e}")
-                             pass
-                     
-                     if not pydough_code and hasattr(response, 'code'):
-                         pydough_code = response.code
-                     if not explanation and hasattr(response, 'explanation'):
-                         explanation = response.explanation
-                 
-                 if not pydough_code and raw_response_text:
-                     # print("[DEBUG] Attempting regex extraction as last resort")
-                     code_match = re.search(r'"code"\\s*:\\s*"(.*?)"(?:,|\\})', raw_response_text, re.DOTALL)
-                     if code_match:
-                         extracted_code = code_match.group(1)
-                         extracted_code = extracted_code.replace("\\\\n", "\\n").replace('\\\\"', '"').replace("\\\\\\\\", "\\\\")
-                         pydough_code = extracted_code
-                         # print(f"[DEBUG] Extracted code via regex: {pydough_code[:50]}...")
-                 
-                 # print(f"[DEBUG] Final pydough_code: {pydough_code if pydough_code else 'None'}")
-                 
-                 result_data["llm_response"] = f"Structured response (stateless): {raw_response_text}"
-             except Exception as e:
-                 print(f"⚠️ Structured output failed (stateless): {str(e)}")
-                 print("Falling back to regex extraction...")
-                 prompt = create_prompt(query_text, cheatsheet_content, schema_content, domain_name)
-                 response = model.prompt(prompt, temperature=0.01)
-                 result_data["llm_response"] = str(response)
-                 print("\n🤖 LLM Response (unstructured):")
-                 print(response)
-                 pydough_code = extract_pydough_code(str(response))
-
-        # Update results with generated code and explanation (if any)
-        result_data["pydough_code"] = pydough_code
-        if explanation:
-            result_data["explanation"] = explanation
-
-        # 4. Post-processing, Execution, Saving (remains largely the same)
-        if pydough_code:
-            print("\n📄 Generated PyDough Code:")
-            print(pydough_code)
+        pydough_code, explanation = generate_pydough_code(model, query_text, domain_name, cheatsheet_content, schema_content, history, result_data)
+        _record_generated_code(result_data, pydough_code, explanation)
 
-            # Optional code review
+        # 4. Review, explain and execute
+        if pydough_code:
             if use_code_review:
-                # Code review likely shouldn't use conversation history directly
-                # Pass the specific model instance if needed
-                review_model = llm.get_model(model_name) # Get a fresh instance if needed
-                reviewed_code = review_code_with_llm(pydough_code, model=review_model) 
-                if reviewed_code and reviewed_code != pydough_code:
-                    print("\n📝 Improved PyDough Code after Review:")
-                    print(reviewed_code)
-                    pydough_code = reviewed_code
-                    result_data["reviewed_code"] = reviewed_code
-
-            # Adapt code for execution
-            print("\n🔄 Adapting and executing PyDough code for domain: {domain_name}...")
-            adapted_code_content, script_path = adapt_and_execute_code(pydough_code, f"{domain_name}_query_{time.time()}.py", domain_info)
-            execution_result = execute_pydough_script(script_path)
-            
-            current_execution_details = {
-                "success": execution_result.get("success", False),
-                "output": execution_result.get("output"),
-                "error": execution_result.get("error"),
-                "result_data": {} 
-            }
+                # Code review doesn't use the conversation history
+                review_model = get_llm_model(CODE_GENERATION_MODEL)
+                pydough_code = _record_review(result_data, pydough_code, review_code_with_llm(pydough_code, model=review_model))
 
-            # Ensure pandas_df_json is robustly handled
-            raw_json_str = execution_result.get("pandas_df_json_string")
-            if raw_json_str: # True if raw_json_str is a non-empty string
-                current_execution_details["result_data"]["pandas_df_json"] = raw_json_str
-            else: # Covers cases where raw_json_str is None (e.g. from PD_JSON::null) or "" (e.g. from PD_JSON:: <empty>)
-                current_execution_details["result_data"]["pandas_df_json"] = None
-            
-            result_data["execution"] = current_execution_details
+            if explain:
+                result_data["explain"] = explain_generated_code(pydough_code, domain_info)
 
-            if save_results:
-                # Save execution artifacts using the helper function
-                save_execution_artifacts(execution_result, f"{domain_name}_query_{time.time()}")
+            if execute:
+                result_data["execution"] = execute_generated_code(pydough_code, domain_info, save_results=save_results, confirm=confirm, preview_rows=preview_rows, timeout=timeout, job_id=result_data["query_id"])
+            else:
+                # Generation-only request: execution is deferred until the client
+                # asks for it through execute_stored_query (/api/query/<id>/execute)
+                print("\n⏭️ Skipping execution (execute=False); results will be computed on demand")
 
-        else:
-            print("\n❌ No PyDough code found in the response")
+    except Exception as e:
+        _record_query_error(result_data, e)
+    except BaseException:
+        _release_query_id(result_data["query_id"])
+        raise
+
+    try:
+        return _finish_query(result_data, query_text, domain_name, pydough_code, explanation, execute, save_results, confirm, timeout)
+    finally:
+        _release_query_id(result_data["query_id"])
+
+async def process_query_async(query_text, execute=False, save_results=True, model=None, use_code_review=False, domain=None, history: Optional[List[Dict[str, str]]] = None, explain=False, confirm=False, preview_rows=None, timeout=None, query_id=None):
+    """
+    process_query for an asyncio event loop (used by asgi_app): the LLM calls go
+    through llm's async models and the executor is awaited over its pipes, so
+    waiting on either holds no thread; result and artifact files are written
+    on a thread. Takes the same arguments and returns the same response;
+    model, if given, must be an async llm model.
+    """
+    if model is None:
+        model = get_async_llm_model(CODE_GENERATION_MODEL)
+
+    result_data = _start_query(query_text, history, query_id)
+
+    domain_name = "Unknown"
+    pydough_code = None
+    explanation = None
+
+    try:
+        domain_info = await detect_domain_async(query_text) if domain is None else _forced_domain_info(domain)
+        domain_name = domain_info[0]
+        result_data["domain"] = domain_name
+
+        cheatsheet_content, schema_content = load_prompt_context(domain_name)
+
+        print("⏳ Generating PyDough code...")
+        pydough_code, explanation = await generate_pydough_code_async(model, query_text, domain_name, cheatsheet_content, schema_content, history, result_data)
+        _record_generated_code(result_data, pydough_code, explanation)
+
+        if pydough_code:
+            if use_code_review:
+                review_model = get_async_llm_model(CODE_GENERATION_MODEL)
+                pydough_code = _record_review(result_data, pydough_code, await review_code_with_llm_async(pydough_code, model=review_model))
+
+            if explain:
+                result_data["explain"] = await explain_generated_code_async(pydough_code, domain_info)
+
+            if execute:
+                result_data["execution"] = await execute_generated_code_async(pydough_code, domain_info, save_results=save_results, confirm=confirm, preview_rows=preview_rows, timeout=timeout, job_id=result_data["query_id"])
+            else:
+                print("\n⏭️ Skipping execution (execute=False); results will be computed on demand")
 
     except Exception as e:
-        print(f"\n❌ Error processing query: {str(e)}")
-        result_data["error"] = str(e)
-        # Ensure 'success' is false if an error occurred during processing,
-        # even if execution wasn't the part that failed.
-        if "execution" not in result_data or not result_data["execution"]:
-            result_data["execution"] = {"success": False, "error": str(e), "result_data": {}}
-        else:
-            # If execution details exist, ensure its success is false and error is set
-            current_exec = result_data["execution"]
-            current_exec["success"] = False
-            if "error" not in current_exec or not current_exec["error"]: # Don't overwrite existing specific error
-                 current_exec["error"] = str(e)
-            result_data["execution"] = current_exec
+        _record_query_error(result_data, e)
+    except BaseException:
+        _release_query_id(result_data["query_id"])
+        raise
+
+    try:
+        # The record and artifacts are written on a thread, off the event loop
+        return await asyncio.to_thread(_finish_query, result_data, query_text, domain_name, pydough_code, explanation, execute, save_results, confirm, timeout)
+    finally:
+        _release_query_id(result_data["query_id"])
 
+def _finish_query(result_data, query_text, domain_name, pydough_code, explanation, execute, save_results, confirm, timeout):
+    """Save a processed query's record and artifacts, and build the response returned to callers."""
     # 5. Save results if requested
     if save_results:
         os.makedirs("results", exist_ok=True)
@@ -985,7 +1649,7 @@ def process_query(query_text, execute=False, save_results=True, model=None, use_
         base_filename = result_data.get("query_id", f"unknown_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
 
         # Save comprehensive JSON results
-        result_file_path = os.path.join("results", f"query_result_{base_filename}.json")
+        result_file_path = get_query_result_path(base_filename)
         with open(result_file_path, 'w') as f:\
             # Use default=str to handle potential non-serializable types like datetime
             json.dump(result_data, f, indent=2, default=str) 
@@ -995,6 +1659,11 @@ def process_query(query_text, execute=False, save_results=True, model=None, use_
         if execute and result_data.get("execution"):
             save_execution_artifacts(result_data["execution"], base_filename)
 
+        # A truncated preview was returned: fill in the full result behind it
+        if FULL_RESULT_IN_BACKGROUND and execute and pydough_code and result_data.get("execution") \
+                and result_data["execution"].get("is_preview") and result_data["execution"].get("truncated"):
+            schedule_full_result(result_data["query_id"], confirm=confirm, timeout=timeout)
+
         if result_data.get("output_file") and os.path.exists(result_data.get("output_file")):
              print(f"ℹ️ Generated Python code is at {result_data['output_file']}")
         elif result_data.get("adapted_code"):
@@ -1005,11 +1674,13 @@ def process_query(query_text, execute=False, save_results=True, model=None, use_
         # If execution was not requested, just return the generated code
         return {
             "success": True if pydough_code else False, # Success of generation
+            "query_id": result_data["query_id"], # Use with /api/query/<id>/execute to run later
             "query": query_text,
             "domain": domain_name,
             "pydough_code": pydough_code,
             "pydoughCode": pydough_code,
             "explanation": explanation,
+            "explain": result_data.get("explain"),
             "timestamp": result_data["timestamp"], # Use timestamp from result_data
         }
     else:
@@ -1034,17 +1705,172 @@ def process_query(query_text, execute=False, save_results=True, model=None, use_
         return {
             # Overall success of the operation: code must be generated, and if execution happened, it must be successful.
             "success": bool(pydough_code) and final_execution_details.get("success", False),
+            "query_id": result_data["query_id"],
             "query": query_text,
             "domain": domain_name,
             "pydough_code": pydough_code,
             "pydoughCode": pydough_code, # Frontend expects this
             "explanation": explanation,
+            "explain": result_data.get("explain"),
             "timestamp": result_data["timestamp"], # Use timestamp from result_data
             "execution": final_execution_details
         }
 
-def process_all_queries(queries, max_queries=None, execute=False, save_results=True, use_code_review=False, domain=None):
-    """Process multiple queries."""
+# Identical /api/query requests in flight at the same time
+QUERY_FLIGHTS = SingleFlight("process_query")
+
+def normalize_query_text(query_text):
+    """Query text as compared for coalescing: case-folded, whitespace collapsed, trailing punctuation dropped."""
+    return re.sub(r"\s+", " ", query_text or "").strip().rstrip("?.!;").strip().casefold()
+
+def query_flight_key(query_text, domain=None, history=None, execute=False, **options):
+    """
+    Single-flight key of a query request: normalized text, domain, a hash of
+    the conversation history and the execute flag, plus any other option that
+    changes the result (confirm, preview_rows, timeout, ...).
+    """
+    history_hash = hashlib.sha256(json.dumps(history or [], sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    extra = json.dumps(options, sort_keys=True, default=str)
+    return (normalize_query_text(query_text), domain or "", history_hash, bool(execute), extra)
+
+def _coalesced_response(result, shared):
+    # Every caller, the leader included, gets its own copy: callers annotate the
+    # response, and followers may still be copying it while the leader's caller does
+    result = copy.deepcopy(result)
+    if shared:
+        result["coalesced"] = True
+    return result
+
+def _join_flight(key, query_id):
+    """
+    Register a coalesced request under its query_id (a new one if none is given)
+    so cancel_query finds the run it waits on. Returns the id.
+    """
+    if query_id is None:
+        query_id = new_query_id()
+    else:
+        _check_query_id(query_id)
+    with _ACTIVE_QUERIES_LOCK:
+        if query_id in _QUERY_FLIGHT_KEYS:
+            raise ValueError(f"query_id {query_id} is already in use")
+        _QUERY_FLIGHT_KEYS[query_id] = key
+    return query_id
+
+def _leave_flight(query_id):
+    with _ACTIVE_QUERIES_LOCK:
+        _QUERY_FLIGHT_KEYS.pop(query_id, None)
+
+def _lead_flight(key, query_id, *args, **kwargs):
+    """Run process_query for a flight's leader, recording its query_id as the flight's."""
+    with _ACTIVE_QUERIES_LOCK:
+        _FLIGHT_QUERY_IDS[key] = query_id
+    try:
+        return process_query(*args, query_id=query_id, **kwargs)
+    finally:
+        with _ACTIVE_QUERIES_LOCK:
+            _FLIGHT_QUERY_IDS.pop(key, None)
+
+async def _lead_flight_async(key, query_id, *args, **kwargs):
+    with _ACTIVE_QUERIES_LOCK:
+        _FLIGHT_QUERY_IDS[key] = query_id
+    try:
+        return await process_query_async(*args, query_id=query_id, **kwargs)
+    finally:
+        with _ACTIVE_QUERIES_LOCK:
+            _FLIGHT_QUERY_IDS.pop(key, None)
+
+def process_query_coalesced(query_text, execute=False, domain=None, history=None, query_id=None, **options):
+    """
+    process_query for concurrent API requests: while a request with the same
+    query_flight_key is being processed, identical ones wait for it and get a
+    copy of its response (flagged "coalesced") instead of calling the LLM and
+    the executor again. Disabled with PYDOUGH_SINGLE_FLIGHT=0.
+    query_id is not part of the key: cancelling any request of a coalesced
+    group cancels the run they share, and followers get the leader's query_id.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return process_query(query_text, execute=execute, domain=domain, history=history, query_id=query_id, **options)
+    key = query_flight_key(query_text, domain, history, execute, **options)
+    query_id = _join_flight(key, query_id)
+    try:
+        result, shared = QUERY_FLIGHTS.do(key, _lead_flight, key, query_id, query_text, execute=execute, domain=domain, history=history, **options)
+    finally:
+        _leave_flight(query_id)
+    if shared:
+        print(f"🔗 Coalesced with an identical in-flight query: {query_text}")
+    return _coalesced_response(result, shared)
+
+async def process_query_coalesced_async(query_text, execute=False, domain=None, history=None, query_id=None, **options):
+    """process_query_coalesced for an asyncio event loop."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return await process_query_async(query_text, execute=execute, domain=domain, history=history, query_id=query_id, **options)
+    key = query_flight_key(query_text, domain, history, execute, **options)
+    query_id = _join_flight(key, query_id)
+    try:
+        result, shared = await QUERY_FLIGHTS.do_async(key, _lead_flight_async, key, query_id, query_text, execute=execute, domain=domain, history=history, **options)
+    finally:
+        _leave_flight(query_id)
+    if shared:
+        print(f"🔗 Coalesced with an identical in-flight query: {query_text}")
+    return _coalesced_response(result, shared)
+
+# Times a batch query submitted to the API is retried after a 429
+BATCH_MAX_RETRIES = int(os.environ.get("PYDOUGH_BATCH_MAX_RETRIES", 20))
+# API server batch runs go through by default, if one is running there
+BATCH_API_URL = os.environ.get("PYDOUGH_API_URL", f"http://localhost:{os.environ.get('PORT', 5001)}")
+
+def api_server_running(api_url, timeout=1.0):
+    """True if an API server answers /api/status at api_url."""
+    import urllib.request
+    import urllib.error
+
+    try:
+        with urllib.request.urlopen(api_url.rstrip("/") + "/api/status", timeout=timeout):
+            return True
+    except urllib.error.HTTPError:
+        # It answered, just not with 200
+        return True
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+def submit_query_to_api(api_url, query_text, execute=False, domain=None, lane="batch", client_id=None):
+    """
+    Process a query through a running API server's /api/query in an admission
+    lane (see admission.py), waiting out 429 responses for their Retry-After.
+    Returns the response like process_query's.
+    """
+    import urllib.request
+    import urllib.error
+
+    body = json.dumps({"query_text": query_text, "execute": execute, "domain": domain, "preview": False}).encode("utf-8")
+    headers = {"Content-Type": "application/json", "X-PyDough-Lane": lane}
+    if client_id:
+        headers["X-Client-Id"] = client_id
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+        req = urllib.request.Request(api_url.rstrip("/") + "/api/query", data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(req) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            if e.code != 429 or attempt == BATCH_MAX_RETRIES:
+                try:
+                    return json.loads(payload)
+                except ValueError:
+                    return {"success": False, "error": f"HTTP {e.code}", "query": query_text}
+            retry_after = float(e.headers.get("Retry-After") or 1)
+            print(f"🚦 Server is busy ({lane} lane), retrying in {retry_after:g}s...")
+            time.sleep(retry_after)
+
+def process_all_queries(queries, max_queries=None, execute=False, save_results=True, use_code_review=False, domain=None, explain=False, api_url=None, lane="batch", in_process=False):
+    """
+    Process multiple queries. By default they are sent to the API server at
+    api_url (BATCH_API_URL if not given) in the given admission lane, so a
+    batch shares the server's LLM quota and executors with interactive users
+    without crowding them out (code review and explain are not available that
+    way). Without api_url and no server running at BATCH_API_URL, or with
+    in_process, they are processed here instead.
+    """
     results = []
     summary = {
         "total": 0,
@@ -1056,14 +1882,35 @@ def process_all_queries(queries, max_queries=None, execute=False, save_results=T
     if max_queries is not None:
         queries = queries[:max_queries]
     
-    # Get the model once for all queries
-    model = llm.get_model("gemini-2.5-pro-preview-05-06")
+    from tqdm import tqdm
+
+    if in_process:
+        if api_server_running(api_url or BATCH_API_URL):
+            print(f"⚠️ An API server is running at {api_url or BATCH_API_URL}; this batch bypasses its admission lanes and competes with its users for the LLM quota")
+        api_url = None
+    elif not api_url:
+        if api_server_running(BATCH_API_URL):
+            api_url = BATCH_API_URL
+        else:
+            print(f"ℹ️ No API server at {BATCH_API_URL}, processing the batch in this process")
+
+    if api_url:
+        if use_code_review or explain:
+            print("⚠️ Code review and explain are not available through the API and are skipped")
+        model = None
+        client_id = f"batch-{os.getpid()}"
+    else:
+        # Get the model once for all queries
+        model = get_llm_model(CODE_GENERATION_MODEL)
     
-    print(f"⏳ Processing {len(queries)} queries...")
+    print(f"⏳ Processing {len(queries)} queries" + (f" through {api_url} ({lane} lane)..." if api_url else "..."))
     
     for i, query in enumerate(tqdm(queries)):
         print(f"\n--- Query {i+1}/{len(queries)} ---")
-        result = process_query(query, execute=execute, save_results=save_results, model=model, use_code_review=use_code_review, domain=domain)
+        if api_url:
+            result = submit_query_to_api(api_url, query, execute=execute, domain=domain, lane=lane, client_id=client_id)
+        else:
+            result = process_query(query, execute=execute, save_results=save_results, model=model, use_code_review=use_code_review, domain=domain, explain=explain)
         results.append(result)
         
         # Update summary statistics
@@ -1273,10 +2120,14 @@ def main():
     parser.add_argument('--execute', '-e', action='store_true', help='Execute the generated PyDough code')
     parser.add_argument('--interactive', '-i', action='store_true', help='Run in interactive mode')
     parser.add_argument('--review', action='store_true', help='Enable LLM code review (disabled by default)')
+    parser.add_argument('--explain', action='store_true', help='Dry run: show the translated SQL and SQLite query plan without fetching rows')
     parser.add_argument('--domain', '-d', type=str, choices=['auto'] + list(DOMAINS.keys()), 
                       default='auto', help='Specify database domain to use')
     parser.add_argument('--run-file', '-r', type=str, help='Execute an existing PyDough Python file (e.g., results/code_query.py)')
     parser.add_argument('--list-categories', '-l', action='store_true', help='List all available query categories')
+    parser.add_argument('--api-url', type=str, help=f'API server batch queries are sent to (default: {BATCH_API_URL} if it is running, else they are processed here)')
+    parser.add_argument('--in-process', action='store_true', help='Process batch queries here even if an API server is running')
+    parser.add_argument('--lane', type=str, default='batch', help='Admission lane for batches sent to the API server (default: batch)')
     
     args = parser.parse_args()
     
@@ -1335,7 +2186,7 @@ def main():
     if args.interactive:
         interactive_mode() # interactive_mode handles its own domain logic
     elif args.query:
-        process_query(args.query, execute=args.execute, use_code_review=use_code_review, domain=domain_arg)
+        process_query(args.query, execute=args.execute, use_code_review=use_code_review, domain=domain_arg, explain=args.explain)
     elif args.category:
         # Process queries from a specific category
         category_queries = get_queries(args.category)
@@ -1350,7 +2201,11 @@ def main():
                 queries_to_process, 
                 execute=args.execute, 
                 use_code_review=use_code_review,
-                domain=domain_arg or args.category # Use category as domain hint if auto-detect is enabled
+                domain=domain_arg or args.category, # Use category as domain hint if auto-detect is enabled
+                explain=args.explain,
+                api_url=args.api_url,
+                lane=args.lane,
+                in_process=args.in_process
             )
         else:
             print(f"No queries found for category '{args.category}'. Exiting.")
@@ -1359,7 +2214,8 @@ def main():
         broker_queries = get_queries("Broker")
         if broker_queries:
             process_all_queries(broker_queries, max_queries=args.batch, execute=args.execute, 
-                              use_code_review=use_code_review, domain=domain_arg)
+                              use_code_review=use_code_review, domain=domain_arg, explain=args.explain,
+                              api_url=args.api_url, lane=args.lane, in_process=args.in_process)
         else:
             print("No broker queries found. Exiting.")
     else:
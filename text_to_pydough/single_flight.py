@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Single-flight request coalescing
+
+When several identical requests arrive while the first one is still being
+computed (e.g. a dashboard refreshed by many users, or a client retrying), a
+SingleFlight group runs the computation once: later callers with the same key
+wait for the first one and share its result (or its exception). Once the
+computation finishes the key is forgotten, so nothing is cached beyond the
+lifetime of a flight.
+
+do() is for threads (Flask routes), do_async() for an asyncio event loop
+(asgi_app). In the async version the computation runs as its own task, so a
+caller that disconnects does not cancel it for the others.
+
+Counters of calls, computations and coalesced calls are kept per group.
+"""
+
+import time
+import asyncio
+import threading
+
+class _Flight:
+    """One in-flight computation shared by every caller with its key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.started = time.monotonic()
+
+class SingleFlight:
+    """Group of keyed computations; concurrent calls with the same key share one run."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._tasks = {}
+        self._stats = {
+            "calls": 0,
+            "computations": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "max_waiters": 0,
+            "saved_seconds": 0.0
+        }
+
+    def _joined(self, flight_waiters):
+        """Count a call that joined an existing flight; the caller holds self._lock."""
+        self._stats["calls"] += 1
+        self._stats["coalesced"] += 1
+        self._stats["max_waiters"] = max(self._stats["max_waiters"], flight_waiters)
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) unless a call with key is already running, in
+        which case wait for it. Returns (result, shared), shared being True for
+        callers that got another call's result.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            shared = flight is not None
+            if shared:
+                flight.waiters += 1
+                self._joined(flight.waiters)
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats["calls"] += 1
+                self._stats["computations"] += 1
+        if shared:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            self._finish(key, flight)
+            flight.done.set()
+
+    async def do_async(self, key, coroutine_fn, *args, **kwargs):
+        """do() for an event loop: coroutine_fn(*args, **kwargs) is awaited once per key."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._tasks.get(key)
+            if entry is not None and entry[0] is loop:
+                _, task, flight = entry
+                flight.waiters += 1
+                self._joined(flight.waiters)
+                shared = True
+            else:
+                flight = _Flight()
+                task = loop.create_task(self._run_async(key, flight, coroutine_fn, *args, **kwargs))
+                self._tasks[key] = (loop, task, flight)
+                self._stats["calls"] += 1
+                self._stats["computations"] += 1
+                shared = False
+        # shield: a caller going away must not cancel the computation the others wait for
+        return await asyncio.shield(task), shared
+
+    async def _run_async(self, key, flight, coroutine_fn, *args, **kwargs):
+        try:
+            return await coroutine_fn(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                entry = self._tasks.get(key)
+                if entry is not None and entry[2] is flight:
+                    del self._tasks[key]
+                self._stats["saved_seconds"] += flight.waiters * (time.monotonic() - flight.started)
+
+    def _finish(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            # Upper bound: every waiter would otherwise have run the whole computation
+            self._stats["saved_seconds"] += flight.waiters * (time.monotonic() - flight.started)
+
+    def stats(self):
+        """Counters plus the share of calls that were coalesced and the flights running now."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights) + len(self._tasks)
+            stats["waiting"] = sum(f.waiters for f in self._flights.values()) + sum(entry[2].waiters for entry in self._tasks.values())
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        stats["coalesced_rate"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else None
+        stats["name"] = self.name
+        return stats
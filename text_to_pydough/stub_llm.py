@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deterministic stand-in for the Gemini models
+
+With PYDOUGH_LLM_STUB=1, pydough_query_processor.get_llm_model returns a
+StubModel instead of an llm client, so load tests (see load_test.py) exercise
+the server without an API key, quota or network variance. A stub answers
+prompt(text, schema=...) like the llm models do:
+
+- domain detection: the first candidate domain listed in the prompt
+- code generation: a CALCULATE over a few columns of one of the domain's
+  collections, chosen from a hash of the prompt
+- code review: the reviewed code, unchanged
+- anything else: a short fixed text
+
+Each call sleeps for a latency drawn from a log-normal distribution around
+the model's median (PYDOUGH_STUB_LLM_LATENCY_MS for code generation,
+PYDOUGH_STUB_DETECTION_LATENCY_MS for domain detection). The answer depends
+only on the prompt, and the latency on the prompt and how often it was sent
+before, so reruns see the same workload while a repeated (e.g. hedged) call
+gets a fresh latency.
+AsyncStubModel stands in for llm's async models and sleeps with asyncio.
+"""
+
+import os
+import asyncio
+import re
+import json
+import math
+import time
+import random
+import hashlib
+
+LLM_STUB = os.environ.get("PYDOUGH_LLM_STUB", "0") == "1"
+# Median latency per call, in milliseconds
+STUB_LATENCY_MS = float(os.environ.get("PYDOUGH_STUB_LLM_LATENCY_MS", 1500))
+STUB_DETECTION_LATENCY_MS = float(os.environ.get("PYDOUGH_STUB_DETECTION_LATENCY_MS", 300))
+# Spread of the log-normal latency distribution (0 = always the median)
+STUB_LATENCY_SIGMA = float(os.environ.get("PYDOUGH_STUB_LATENCY_SIGMA", 0.5))
+# Columns selected by generated code
+STUB_COLUMNS = 4
+
+CANDIDATE_PATTERN = re.compile(r"^\s*\d+\.\s+(\S+)\s+-", re.M)
+DOMAIN_PATTERN = re.compile(r"PyDough code for a (\S+) database")
+CODE_BLOCK_PATTERN = re.compile(r"```python\n(.*?)```", re.S)
+
+def _collections(domain):
+    """[(collection, [column properties])] of a domain's metadata graph."""
+    from domains import DOMAINS
+
+    if domain not in DOMAINS:
+        return []
+    config = DOMAINS[domain]
+    try:
+        with open(config["metadata_file"]) as f:
+            graphs = json.load(f)
+    except (OSError, ValueError):
+        return []
+    hint = config.get("base_name", domain).lower()
+    if isinstance(graphs, list):
+        graph = next((g for g in graphs if str(g.get("name", "")).lower() == hint), graphs[0] if graphs else {})
+        return [
+            (c["name"], [p["name"] for p in c.get("properties", []) if p.get("type") == "table column"])
+            for c in graph.get("collections", [])
+        ]
+    graph = next((g for name, g in graphs.items() if name.lower() == hint), None)
+    if graph is None:
+        graph = next(iter(graphs.values()), {})
+    return [
+        (name, [prop for prop, spec in c.get("properties", {}).items() if spec.get("type") == "table_column"])
+        for name, c in graph.items()
+    ]
+
+class StubResponse:
+    """Response with the parts of the llm Response API the processor uses."""
+
+    def __init__(self, text):
+        self._text = text
+
+    def text(self):
+        return self._text
+
+    def __str__(self):
+        return self._text
+
+class StubModel:
+    """Deterministic model with the llm model's prompt() signature."""
+
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.calls = 0
+        self._attempts = {}
+
+    def _median_ms(self, schema):
+        fields = getattr(schema, "model_fields", {}) or {}
+        return STUB_DETECTION_LATENCY_MS if "domain" in fields else STUB_LATENCY_MS
+
+    def _answer(self, prompt, schema):
+        """(latency in seconds, response text) for a prompt."""
+        self.calls += 1
+        digest = hashlib.sha256(f"{self.model_id}\n{prompt}".encode("utf-8")).digest()
+        attempt = self._attempts[digest] = self._attempts.get(digest, -1) + 1
+        rng = random.Random(digest)
+        deviation = rng.gauss(0, 1)
+        if attempt:
+            deviation = random.Random(digest + attempt.to_bytes(4, "big")).gauss(0, 1)
+        latency = self._median_ms(schema) * math.exp(STUB_LATENCY_SIGMA * deviation) / 1000
+
+        fields = getattr(schema, "model_fields", {}) or {}
+        if "domain" in fields:
+            candidates = CANDIDATE_PATTERN.findall(prompt)
+            return latency, json.dumps({"domain": candidates[0] if candidates else ""})
+        if "code" in fields:
+            match = DOMAIN_PATTERN.search(prompt)
+            collections = [(name, props) for name, props in _collections(match.group(1) if match else "") if props]
+            if collections:
+                name, props = collections[rng.randrange(len(collections))]
+                code = f"result = {name}.CALCULATE({', '.join(props[:STUB_COLUMNS])})"
+            else:
+                code = "result = None"
+            return latency, json.dumps({"code": code, "explanation": "Generated by the stub model."})
+        if "reviewed_code" in fields:
+            # Reviews approve the code unchanged
+            match = CODE_BLOCK_PATTERN.search(prompt)
+            return latency, json.dumps({"reviewed_code": match.group(1).strip() if match else ""})
+        return latency, "Stub model response."
+
+    def prompt(self, prompt, schema=None, **options):
+        latency, text = self._answer(prompt, schema)
+        time.sleep(latency)
+        return StubResponse(text)
+
+class AsyncStubResponse:
+    """Response with the parts of the llm AsyncResponse API the processor uses."""
+
+    def __init__(self, model, prompt, schema):
+        self._model = model
+        self._prompt = prompt
+        self._schema = schema
+        self._text = None
+
+    async def text(self):
+        if self._text is None:
+            latency, self._text = self._model._answer(self._prompt, self._schema)
+            await asyncio.sleep(latency)
+        return self._text
+
+    def __await__(self):
+        return self._resolve().__await__()
+
+    async def _resolve(self):
+        await self.text()
+        return self
+
+class AsyncStubModel(StubModel):
+    """StubModel with the llm async model's prompt() API: the response is awaited."""
+
+    def prompt(self, prompt, schema=None, **options):
+        return AsyncStubResponse(self, prompt, schema)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""Unittest for admission control (priority lanes, per-client limits, load shedding)."""
+
+import time
+import asyncio
+import threading
+import unittest
+
+from admission import AdmissionController, Overloaded
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll condition() until it is true; fail after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.005)
+
+
+def controller(slots=1, client_limit=8, queue_timeout=5.0, **kwargs):
+    """A controller with an interactive and a batch lane, each queueing at most 2."""
+    return AdmissionController(slots=slots, lanes=[("interactive", 4, 2), ("batch", 4, 2)], client_limit=client_limit, queue_timeout=queue_timeout, **kwargs)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    """Tests AdmissionController from threads."""
+
+    def queue_request(self, admission, lane, client, granted):
+        """Start a thread that acquires a slot in lane, notes it in granted and releases it."""
+        def request():
+            ticket = admission.acquire(lane, client)
+            granted.append(lane)
+            admission.release(ticket)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        return thread
+
+    def test_higher_priority_lane_is_served_first(self):
+        """A freed slot goes to the interactive lane even if a batch request queued earlier."""
+        admission = controller()
+        holder = admission.acquire("batch", "holder")
+        granted = []
+        threads = [self.queue_request(admission, "batch", "a", granted)]
+        wait_for(lambda: admission.stats()["lanes"]["batch"]["queued"] == 1)
+        threads.append(self.queue_request(admission, "interactive", "b", granted))
+        wait_for(lambda: admission.stats()["lanes"]["interactive"]["queued"] == 1)
+
+        admission.release(holder)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(granted, ["interactive", "batch"])
+
+    def test_lane_concurrency_cap(self):
+        """A lane never runs more requests than its cap, even with free slots."""
+        admission = AdmissionController(slots=4, lanes=[("interactive", 4, 2), ("batch", 1, 2)], queue_timeout=0.05)
+        ticket = admission.acquire("batch")
+        with self.assertRaises(Overloaded):
+            admission.acquire("batch")
+        with admission.admit("interactive"):
+            self.assertEqual(admission.stats()["in_use"], 2)
+        admission.release(ticket)
+
+    def test_per_client_limit(self):
+        """A client over its in-flight limit is shed; other clients are not affected."""
+        admission = controller(slots=4, client_limit=2)
+        tickets = [admission.acquire("interactive", "alice") for _ in range(2)]
+        with self.assertRaises(Overloaded) as shed:
+            admission.acquire("interactive", "alice")
+        self.assertEqual(shed.exception.reason, "client_limit")
+        self.assertEqual(shed.exception.lane, "interactive")
+        with admission.admit("interactive", "bob"):
+            pass
+
+        admission.release(tickets.pop())
+        tickets.append(admission.acquire("interactive", "alice"))
+        for ticket in tickets:
+            admission.release(ticket)
+        self.assertEqual(admission.stats()["clients_in_flight"], 0)
+        self.assertEqual(admission.stats()["lanes"]["interactive"]["client_limit"], 1)
+
+    def test_shed_at_max_queue_depth(self):
+        """With its queue full a lane sheds new requests, with a Retry-After from the queue depth."""
+        admission = controller()
+        holder = admission.acquire("interactive")
+        granted = []
+        threads = [self.queue_request(admission, "interactive", None, granted) for _ in range(2)]
+        wait_for(lambda: admission.stats()["lanes"]["interactive"]["queued"] == 2)
+
+        with self.assertRaises(Overloaded) as shed:
+            admission.acquire("interactive")
+        self.assertEqual(shed.exception.reason, "queue_full")
+        # No service time measured yet: 1s per request, (2 queued + 1) over 1 slot
+        self.assertEqual(shed.exception.retry_after, 3)
+
+        admission.release(holder)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(granted), 2)
+        self.assertEqual(admission.stats()["lanes"]["interactive"]["queue_full"], 1)
+
+    def test_shed_at_queue_timeout(self):
+        """A request still queued after queue_timeout is shed and leaves the queue."""
+        admission = controller(queue_timeout=0.05)
+        holder = admission.acquire("interactive")
+        with self.assertRaises(Overloaded) as shed:
+            admission.acquire("interactive", "alice")
+        self.assertEqual(shed.exception.reason, "queue_timeout")
+        self.assertEqual(shed.exception.retry_after, 1)
+
+        stats = admission.stats()
+        self.assertEqual(stats["lanes"]["interactive"]["queued"], 0)
+        self.assertEqual(stats["lanes"]["interactive"]["queue_timeout"], 1)
+        self.assertNotIn("alice", stats["busiest_clients"])
+        admission.release(holder)
+
+    def test_retry_after_follows_service_time(self):
+        """Retry-After scales with the lane's measured service time."""
+        admission = controller(queue_timeout=0.05)
+        admission._lanes["interactive"].service_seconds = 4.0
+        holder = admission.acquire("interactive")
+        with self.assertRaises(Overloaded) as shed:
+            admission.acquire("interactive")
+        self.assertEqual(shed.exception.retry_after, 4)
+        admission.release(holder)
+
+    def test_slot_released_on_exception(self):
+        """admit() gives the slot and the client's count back when the block raises."""
+        admission = controller()
+        with self.assertRaises(RuntimeError):
+            with admission.admit("interactive", "alice"):
+                raise RuntimeError("boom")
+        stats = admission.stats()
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["clients_in_flight"], 0)
+        self.assertEqual(stats["lanes"]["interactive"]["completed"], 1)
+        with admission.admit("interactive", "alice"):
+            pass
+
+    def test_unknown_lane(self):
+        """A trusted caller naming an unknown lane gets ValueError."""
+        with self.assertRaises(ValueError):
+            controller().acquire("nightly")
+
+    def test_untrusted_callers_cannot_raise_their_priority(self):
+        """Untrusted callers run in the untrusted lane unless they ask for a lower one."""
+        admission = controller(untrusted_lane="batch")
+        for requested, lane in [(None, "batch"), ("interactive", "batch"), ("nightly", "batch"), ("batch", "batch")]:
+            with admission.admit(requested, trusted=False) as ticket:
+                self.assertEqual(ticket.lane.name, lane)
+        admission = controller()
+        with admission.admit("batch", trusted=False) as ticket:
+            self.assertEqual(ticket.lane.name, "batch")
+
+
+class AdmissionControllerAsyncTest(unittest.TestCase):
+    """Tests AdmissionController on an event loop."""
+
+    def test_higher_priority_lane_is_served_first(self):
+        """Queued coroutines are granted slots by lane priority."""
+        admission = controller()
+        granted = []
+
+        async def request(lane):
+            async with admission.admit_async(lane):
+                granted.append(lane)
+
+        async def main():
+            holder = await admission.acquire_async("batch")
+            batch = asyncio.ensure_future(request("batch"))
+            await asyncio.sleep(0.01)
+            interactive = asyncio.ensure_future(request("interactive"))
+            await asyncio.sleep(0.01)
+            admission.release(holder)
+            await asyncio.gather(batch, interactive)
+
+        asyncio.run(main())
+        self.assertEqual(granted, ["interactive", "batch"])
+
+    def test_shed_at_queue_timeout(self):
+        """acquire_async sheds after queue_timeout like acquire."""
+        admission = controller(queue_timeout=0.05)
+
+        async def main():
+            holder = await admission.acquire_async("interactive")
+            try:
+                await admission.acquire_async("interactive", "alice")
+            finally:
+                admission.release(holder)
+
+        with self.assertRaises(Overloaded) as shed:
+            asyncio.run(main())
+        self.assertEqual(shed.exception.reason, "queue_timeout")
+        self.assertEqual(admission.stats()["clients_in_flight"], 0)
+
+    def test_slot_released_on_exception(self):
+        """admit_async() gives the slot back when the block raises or is cancelled."""
+        admission = controller()
+
+        async def failing():
+            async with admission.admit_async("interactive", "alice"):
+                raise RuntimeError("boom")
+
+        async def cancelled():
+            holder = await admission.acquire_async("interactive")
+            waiter = asyncio.ensure_future(admission.acquire_async("interactive", "bob"))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            admission.release(holder)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(failing())
+        asyncio.run(cancelled())
+        stats = admission.stats()
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["lanes"]["interactive"]["queued"], 0)
+        self.assertEqual(stats["clients_in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
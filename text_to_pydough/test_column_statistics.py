@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""Unittest for column statistics (distinct counts, top values, histograms, refreshes)."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import column_statistics
+from column_statistics import ColumnProfile, HyperLogLog, update_statistics
+
+
+def profile_of(values, declared_type="", name="col"):
+    """A ColumnProfile with values added."""
+    profile = ColumnProfile(name, declared_type, name)
+    for value in values:
+        profile.add(value)
+    return profile
+
+
+class DistinctCountTest(unittest.TestCase):
+    """Tests exact and HyperLogLog distinct counts."""
+
+    def test_hyperloglog_estimate(self):
+        """HyperLogLog stays within a few standard errors for small and large cardinalities."""
+        for distinct in (50, 20000):
+            with self.subTest(distinct=distinct):
+                hll = HyperLogLog()
+                for value in range(distinct):
+                    hll.add(f"v{value}")
+                    hll.add(f"v{value}")
+                self.assertAlmostEqual(hll.estimate(), distinct, delta=distinct * 0.05)
+
+    def test_exact_until_threshold(self):
+        """Distinct values are counted exactly up to STATS_EXACT_DISTINCT."""
+        with mock.patch.object(column_statistics, "STATS_EXACT_DISTINCT", 100):
+            stats = profile_of(list(range(100)) * 3 + [None]).to_dict()
+        self.assertEqual((stats["distinct_count"], stats["distinct_exact"]), (100, True))
+        self.assertEqual(stats["null_count"], 1)
+
+    def test_switch_to_hyperloglog(self):
+        """Past the threshold the exact set is replaced by a HyperLogLog estimate."""
+        with mock.patch.object(column_statistics, "STATS_EXACT_DISTINCT", 100):
+            profile = profile_of(range(5000))
+            stats = profile.to_dict()
+        self.assertIsNone(profile.distinct)
+        self.assertFalse(stats["distinct_exact"])
+        self.assertAlmostEqual(stats["distinct_count"], 5000, delta=250)
+        self.assertLessEqual(stats["distinct_count"], 5000)
+
+
+class TopValuesTest(unittest.TestCase):
+    """Tests the bounded top-k counters."""
+
+    def test_exact_top_values(self):
+        """Without pruning the counts are exact."""
+        stats = profile_of(["a"] * 5 + ["b"] * 3 + ["c"]).to_dict()
+        self.assertEqual(stats["top_values"][:2], [{"value": "a", "count": 5}, {"value": "b", "count": 3}])
+        self.assertTrue(stats["top_values_exact"])
+
+    def test_key_like_column_has_no_top_values(self):
+        """Columns where every value appears once report no top values."""
+        self.assertEqual(profile_of(range(50)).to_dict()["top_values"], [])
+
+    def test_pruned_counters(self):
+        """Past STATS_TOPK_CAPACITY counters the rarest are dropped and top_values_exact turns false."""
+        values = ["a"] * 50 + ["b"] * 30 + [f"rare{i}" for i in range(100)]
+        with mock.patch.object(column_statistics, "STATS_TOPK_CAPACITY", 10):
+            profile = profile_of(values)
+            stats = profile.to_dict()
+        self.assertLessEqual(len(profile.counters), 10)
+        self.assertFalse(stats["top_values_exact"])
+        self.assertEqual(stats["top_values"][:2], [{"value": "a", "count": 50}, {"value": "b", "count": 30}])
+
+
+class HistogramTest(unittest.TestCase):
+    """Tests the equi-depth histograms."""
+
+    def test_numeric_histogram(self):
+        """Numeric columns get equi-depth buckets spanning min to max."""
+        with mock.patch.object(column_statistics, "STATS_HISTOGRAM_BUCKETS", 4):
+            histogram = profile_of(range(1, 1001)).to_dict()["histogram"]
+        self.assertEqual(histogram["type"], "equi_depth")
+        self.assertFalse(histogram["sampled"])
+        self.assertEqual([bucket["count"] for bucket in histogram["buckets"]], [250] * 4)
+        self.assertEqual((histogram["buckets"][0]["lower"], histogram["buckets"][-1]["upper"]), (1, 1000))
+
+    def test_runs_stay_in_one_bucket(self):
+        """A frequent value is never split across buckets."""
+        with mock.patch.object(column_statistics, "STATS_HISTOGRAM_BUCKETS", 4):
+            histogram = profile_of([1.0] * 900 + [float(i) for i in range(2, 102)]).to_dict()["histogram"]
+        first = histogram["buckets"][0]
+        self.assertEqual((first["lower"], first["upper"], first["count"]), (1.0, 1.0, 900))
+        self.assertEqual(sum(bucket["count"] for bucket in histogram["buckets"]), 1000)
+
+    def test_sampled_histogram(self):
+        """Built from a reservoir sample, bucket counts are scaled to the column's row count."""
+        with mock.patch.object(column_statistics, "STATS_SAMPLE_ROWS", 100):
+            histogram = profile_of(range(10000)).to_dict()["histogram"]
+        self.assertTrue(histogram["sampled"])
+        self.assertAlmostEqual(sum(bucket["count"] for bucket in histogram["buckets"]), 10000, delta=len(histogram["buckets"]))
+        self.assertEqual((histogram["buckets"][0]["lower"], histogram["buckets"][-1]["upper"]), (0, 9999))
+
+    def test_date_text_histogram(self):
+        """Text columns holding dates get a histogram and is_date; other text columns do not."""
+        dates = [f"2024-{month:02}-{day:02}" for month in range(1, 13) for day in range(1, 29)]
+        stats = profile_of(dates, declared_type="TEXT").to_dict()
+        self.assertTrue(stats["is_date"])
+        self.assertEqual((stats["histogram"]["buckets"][0]["lower"], stats["histogram"]["buckets"][-1]["upper"]), ("2024-01-01", "2024-12-28"))
+
+        self.assertTrue(profile_of(["not a date"], declared_type="DATETIME").to_dict()["is_date"])
+        names = profile_of(["alice", "bob", "carol"], declared_type="TEXT").to_dict()
+        self.assertIsNone(names["histogram"])
+        self.assertNotIn("is_date", names)
+
+
+class UpdateStatisticsTest(unittest.TestCase):
+    """Tests that refreshes only re-read tables whose signature changed."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, "Shop.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);
+                CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, placed TEXT);
+                INSERT INTO customers VALUES (1, 'alice'), (2, 'bob');
+                INSERT INTO orders VALUES (1, 1, '2024-01-01'), (2, 2, '2024-01-02');
+            """)
+        conn.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unchanged_tables_skipped(self):
+        """Only tables whose columns, row count or largest rowid changed are profiled again."""
+        statistics, stale = update_statistics(self.db_path)
+        self.assertEqual(sorted(stale), ["customers", "orders"])
+        self.assertTrue(os.path.exists(column_statistics.get_statistics_path(self.db_path)))
+
+        with mock.patch.object(column_statistics, "compute_table_statistics") as compute:
+            _, stale = update_statistics(self.db_path)
+        self.assertEqual(stale, [])
+        compute.assert_not_called()
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO orders VALUES (3, 1, '2024-01-03')")
+        conn.close()
+        refreshed, stale = update_statistics(self.db_path)
+        self.assertEqual(stale, ["orders"])
+        self.assertEqual(refreshed["tables"]["orders"]["row_count"], 3)
+        self.assertEqual(refreshed["tables"]["customers"], statistics["tables"]["customers"])
+
+        _, stale = update_statistics(self.db_path, full=True)
+        self.assertEqual(sorted(stale), ["customers", "orders"])
+
+
+if __name__ == "__main__":
+    unittest.main()
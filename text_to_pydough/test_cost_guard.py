@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""Unittest for the cost guard's decisions."""
+
+import asyncio
+import unittest
+from unittest import mock
+
+import cost_guard
+from cost_guard import decide_action, decide_from_plan, COST_GUARD_PREVIEW_ROWS, COST_GUARD_LIMIT_ROWS, COST_GUARD_CONFIRM_ROWS, COST_GUARD_REFUSE_ROWS
+
+
+class DecideActionTest(unittest.TestCase):
+    """Tests the thresholds of decide_action and decide_from_plan."""
+
+    # (estimated rows, confirm, expected action, expected max_rows)
+    CASES = [
+        (0, False, "allow", None),
+        (COST_GUARD_LIMIT_ROWS, False, "allow", None),
+        (COST_GUARD_LIMIT_ROWS + 1, False, "limit", COST_GUARD_PREVIEW_ROWS),
+        (COST_GUARD_CONFIRM_ROWS, False, "limit", COST_GUARD_PREVIEW_ROWS),
+        (COST_GUARD_CONFIRM_ROWS + 1, False, "confirm", None),
+        (COST_GUARD_CONFIRM_ROWS + 1, True, "limit", COST_GUARD_PREVIEW_ROWS),
+        (COST_GUARD_REFUSE_ROWS, False, "confirm", None),
+        (COST_GUARD_REFUSE_ROWS, True, "limit", COST_GUARD_PREVIEW_ROWS),
+        (COST_GUARD_REFUSE_ROWS + 1, False, "refuse", None),
+        (COST_GUARD_REFUSE_ROWS + 1, True, "refuse", None),
+    ]
+
+    def test_decide_action(self):
+        """Each threshold band maps to its action, with confirm only lifting the confirm band."""
+        for estimated_rows, confirm, action, max_rows in self.CASES:
+            with self.subTest(estimated_rows=estimated_rows, confirm=confirm):
+                decision = decide_action(estimated_rows, confirm=confirm)
+                self.assertEqual(decision["action"], action)
+                self.assertEqual(decision["max_rows"], max_rows)
+                if action == "allow":
+                    self.assertIsNone(decision["reason"])
+                else:
+                    self.assertIn(f"{estimated_rows:,}", decision["reason"])
+
+    def test_decide_from_plan(self):
+        """A successful plan is decided on its estimate, and the plan details are kept."""
+        for estimated_rows, confirm, action, max_rows in self.CASES:
+            with self.subTest(estimated_rows=estimated_rows, confirm=confirm):
+                plan = {"success": True, "estimated_rows": estimated_rows, "scanned_tables": ["sbTransaction"], "table_rows": {"sbTransaction": estimated_rows}}
+                decision = decide_from_plan(plan, confirm=confirm)
+                self.assertEqual((decision["action"], decision["max_rows"]), (action, max_rows))
+                self.assertEqual(decision["estimated_rows"], estimated_rows)
+                self.assertEqual(decision["scanned_tables"], ["sbTransaction"])
+                self.assertEqual(decision["confirmed"], confirm)
+
+    def test_explain_failure_allows(self):
+        """When the plan cannot be explained the query is allowed, so execution reports the real error."""
+        decision = decide_from_plan({"success": False, "error": "no such column: sbFoo"})
+        self.assertEqual(decision["action"], "allow")
+        self.assertIsNone(decision["max_rows"])
+        self.assertIn("no such column: sbFoo", decision["reason"])
+
+    def test_check_query_cost_explain_failure_allows(self):
+        """check_query_cost and check_query_cost_async fall back to allow when explaining fails."""
+        failed = {"success": False, "error": "Timed out"}
+
+        async def explain_async(pydough_code, domain_info):
+            return failed
+
+        with mock.patch.object(cost_guard, "COST_GUARD_ENABLED", True), \
+                mock.patch.object(cost_guard, "explain_pydough_code", return_value=failed), \
+                mock.patch.object(cost_guard, "explain_pydough_code_async", explain_async):
+            decisions = [
+                cost_guard.check_query_cost("result = Broker.Customers", {}),
+                asyncio.run(cost_guard.check_query_cost_async("result = Broker.Customers", {}))
+            ]
+        for decision in decisions:
+            self.assertEqual(decision["action"], "allow")
+            self.assertIn("Timed out", decision["reason"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+"""Unittest for the metadata generator's schema inference on small SQLite tables."""
+
+import sqlite3
+import unittest
+from unittest import mock
+
+import generate_pydough_metadata as metadata
+
+
+def table_columns(conn, table):
+    """PRAGMA table_info rows of table, as infer_unique_properties expects them."""
+    return conn.execute(f"PRAGMA table_info('{table}')").fetchall()
+
+
+class InferUniquePropertiesTest(unittest.TestCase):
+    """Tests infer_unique_properties on in-memory tables."""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def infer(self, table, **kwargs):
+        """infer_unique_properties for a table of self.conn."""
+        return metadata.infer_unique_properties(self.conn, table, table_columns(self.conn, table), **kwargs)
+
+    def test_declared_primary_keys(self):
+        """Declared single and composite primary keys are used as declared."""
+        self.conn.executescript("""
+            CREATE TABLE customers (name TEXT, id INTEGER PRIMARY KEY);
+            CREATE TABLE holdings (customer_id INTEGER, ticker TEXT, shares REAL, PRIMARY KEY (customer_id, ticker));
+        """)
+        self.assertEqual(self.infer("customers"), ["id"])
+        self.assertEqual(self.infer("holdings"), ["customer_id", "ticker"])
+
+    def test_declared_unique_indexes(self):
+        """Without a primary key the smallest unique index is used, composite ones first."""
+        self.conn.executescript("""
+            CREATE TABLE tickers (name TEXT, symbol TEXT, exchange TEXT);
+            CREATE UNIQUE INDEX tickers_symbol ON tickers (symbol);
+            CREATE TABLE listings (name TEXT, symbol TEXT, exchange TEXT);
+            CREATE UNIQUE INDEX listings_symbol_exchange ON listings (symbol, exchange);
+        """)
+        self.assertEqual(self.infer("tickers"), ["symbol"])
+        self.assertEqual(self.infer("listings"), ["symbol", "exchange"])
+
+    def test_sample_rules_out_candidates(self):
+        """Candidates with duplicates or NULLs in the sample are skipped."""
+        self.conn.executescript("""
+            CREATE TABLE trades (side TEXT, venue TEXT, price REAL, trade_id INTEGER, note TEXT);
+            INSERT INTO trades VALUES ('buy', 'x', 1.5, 1, NULL), ('buy', 'x', 2.5, 2, NULL), ('sell', 'y', 3.5, 3, 'late');
+        """)
+        candidates = metadata.get_unique_candidates(table_columns(self.conn, "trades"))
+        self.assertNotIn(["price"], candidates)
+        survivors, sampled_all = metadata.filter_candidates_by_sample(self.conn, "trades", candidates)
+        self.assertTrue(sampled_all)
+        self.assertNotIn(["side"], survivors)
+        self.assertNotIn(["side", "venue"], survivors)
+        self.assertNotIn(["note"], survivors)
+        self.assertEqual(self.infer("trades"), ["trade_id"])
+
+    def test_exact_check_beyond_the_sample(self):
+        """When the sample is only part of the table, the exact check rejects candidates duplicated later on."""
+        self.conn.execute("CREATE TABLE events (code INTEGER, seq INTEGER)")
+        self.conn.executemany("INSERT INTO events VALUES (?, ?)", [(i % 50, i) for i in range(100)])
+        with mock.patch.object(metadata, "UNIQUE_SAMPLE_ROWS", 10):
+            survivors, sampled_all = metadata.filter_candidates_by_sample(self.conn, "events", [["code"], ["seq"]])
+            self.assertEqual((survivors, sampled_all), ([["code"], ["seq"]], False))
+            # ["code"] is rejected, so the next candidate, the leading pair, is confirmed
+            self.assertEqual(self.infer("events", time_budget=10), ["code", "seq"])
+
+    def test_budget_exhausted(self):
+        """When the exact check runs out of time the first candidate surviving the sample is assumed."""
+        self.conn.execute("CREATE TABLE events (code INTEGER, seq INTEGER)")
+        self.conn.executemany("INSERT INTO events VALUES (?, ?)", [(i % 20000, i) for i in range(40000)])
+        with mock.patch.object(metadata, "UNIQUE_SAMPLE_ROWS", 10):
+            self.assertEqual(self.infer("events", time_budget=0), ["code"])
+        # The progress handler is removed again, so later queries are not interrupted
+        self.assertIs(metadata.has_duplicates_or_nulls(self.conn, "events", ["code"]), True)
+
+    def test_no_unique_candidate(self):
+        """Without any unique candidate the leading two columns are used."""
+        self.conn.executescript("""
+            CREATE TABLE readings (sensor TEXT, value REAL, unit TEXT);
+            INSERT INTO readings VALUES ('a', 1.0, 'c'), ('a', 2.0, 'c');
+        """)
+        self.assertEqual(self.infer("readings"), ["sensor", "value"])
+
+
+class InferRelationshipsTest(unittest.TestCase):
+    """Tests relationship inference (declared keys, name matches, bloom filter containment)."""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript("""
+            CREATE TABLE sbCustomer (sbCustId TEXT PRIMARY KEY, sbCustName TEXT);
+            CREATE TABLE sbTicker (sbTickerId TEXT PRIMARY KEY, sbTickerSymbol TEXT);
+            CREATE TABLE sbTransaction (sbTxId TEXT PRIMARY KEY, sbTxCustId TEXT, sbTxTickerId TEXT, sbTxNote TEXT);
+            CREATE TABLE sbWatchlist (owner TEXT REFERENCES sbCustomer (sbCustId), symbol TEXT);
+        """)
+        self.conn.executemany("INSERT INTO sbCustomer VALUES (?, ?)", [(f"C{i:03}", f"Customer {i}") for i in range(50)])
+        self.conn.executemany("INSERT INTO sbTicker VALUES (?, ?)", [(f"T{i:03}", f"SYM{i}") for i in range(5)])
+        # Every customer reference exists, most ticker references do not
+        self.conn.executemany("INSERT INTO sbTransaction VALUES (?, ?, ?, ?)", [(f"X{i:04}", f"C{i % 50:03}", f"T{i % 40:03}", "note") for i in range(200)])
+        self.conn.executemany("INSERT INTO sbWatchlist VALUES (?, ?)", [("C001", "SYM1"), ("C999", "SYM2")])
+        self.fingerprints = {table: metadata.table_fingerprint(self.conn, table) for table in self.tables()}
+
+    def tearDown(self):
+        self.conn.close()
+
+    def tables(self):
+        """Tables of the test database."""
+        return ["sbCustomer", "sbTicker", "sbTransaction", "sbWatchlist"]
+
+    def infer(self, previous_checks=None, fingerprints=None):
+        """_infer_relationships over every table, keyed by their declared or first columns."""
+        tables = {table: table for table in self.tables()}
+        column_types = {
+            table: {col[1]: metadata.sqlite_to_pydough_type(col[2]) for col in table_columns(self.conn, table)}
+            for table in tables
+        }
+        unique_keys = {table: metadata.infer_unique_properties(self.conn, table, table_columns(self.conn, table)) for table in tables}
+        relationships, checks = metadata._infer_relationships(
+            self.conn, tables, column_types, unique_keys, fingerprints or self.fingerprints, previous_checks or {}
+        )
+        return {(r["child"], tuple(r["child_columns"]), r["parent"], tuple(r["parent_columns"])): r["source"] for r in relationships}, checks
+
+    def test_column_refers_to_key(self):
+        """Name matching covers id suffixes and prefixed names, and ignores short stems."""
+        cases = [
+            ("sbTxCustId", "sbCustomer", "sbCustId", True),
+            ("customer_id", "customers", "id", True),
+            ("categoryid", "categories", "id", True),
+            ("sbTxTickerId", "sbTicker", "sbTickerId", True),
+            ("sbTxId", "sbTicker", "sbTickerId", False),
+            ("sbTxNote", "sbCustomer", "sbCustId", False),
+            ("id", "orders", "id", False),
+            ("valid", "orders", "id", False),
+        ]
+        for column, parent_table, parent_key, expected in cases:
+            with self.subTest(column=column, parent=parent_table):
+                self.assertIs(metadata.column_refers_to_key(column, parent_table, parent_key), expected)
+
+    def test_bloom_filter(self):
+        """Added values are always found; others only at about the false positive rate."""
+        bloom = metadata.BloomFilter(1000)
+        for value in range(1000):
+            bloom.add(f"C{value}")
+        self.assertTrue(all(f"C{value}" in bloom for value in range(1000)))
+        false_positives = sum(1 for value in range(1000, 11000) if f"C{value}" in bloom)
+        self.assertLess(false_positives, 10000 * metadata.BLOOM_FALSE_POSITIVE_RATE * 5)
+        self.assertEqual(metadata.BloomFilter(0).size, 64)
+
+    def test_declared_foreign_keys(self):
+        """Declared foreign keys are used without a containment check, even with orphan rows."""
+        self.assertEqual(metadata.get_declared_foreign_keys(self.conn, "sbWatchlist"), [(["owner"], "sbCustomer", ["sbCustId"])])
+        relationships, checks = self.infer()
+        self.assertEqual(relationships[("sbWatchlist", ("owner",), "sbCustomer", ("sbCustId",))], "declared")
+        self.assertEqual(checks["sbWatchlist.owner->sbCustomer.sbCustId"], {"confirmed": True, "source": "declared"})
+
+    def test_prefixed_name_match_confirmed(self):
+        """sbTxCustId is matched to sbCustomer.sbCustId by name and confirmed by containment."""
+        relationships, checks = self.infer()
+        self.assertEqual(relationships[("sbTransaction", ("sbTxCustId",), "sbCustomer", ("sbCustId",))], "inferred")
+        check = checks["sbTransaction.sbTxCustId->sbCustomer.sbCustId"]
+        self.assertEqual((check["containment"], check["sampled"]), (1.0, 200))
+
+    def test_containment_rejects_name_match(self):
+        """A name match whose values are mostly missing from the parent is not a relationship."""
+        relationships, checks = self.infer()
+        self.assertNotIn(("sbTransaction", ("sbTxTickerId",), "sbTicker", ("sbTickerId",)), relationships)
+        check = checks["sbTransaction.sbTxTickerId->sbTicker.sbTickerId"]
+        self.assertFalse(check["confirmed"])
+        self.assertLess(check["containment"], metadata.RELATIONSHIP_MIN_CONTAINMENT)
+        self.assertFalse(any(child == "sbTransaction" and columns == ("sbTxNote",) for child, columns, _, _ in relationships))
+
+    def test_checks_reused_while_fingerprints_unchanged(self):
+        """Cached checks are reused until the child's or parent's fingerprint changes."""
+        _, checks = self.infer()
+        key = ("sbTransaction", ("sbTxCustId",), "sbCustomer", ("sbCustId",))
+        # Data changes alone leave the fingerprints, and so the cached check, as they were
+        self.conn.execute("DELETE FROM sbCustomer")
+        relationships, reused = self.infer(previous_checks=checks)
+        self.assertIn(key, relationships)
+        self.assertEqual(reused["sbTransaction.sbTxCustId->sbCustomer.sbCustId"], checks["sbTransaction.sbTxCustId->sbCustomer.sbCustId"])
+
+        changed = dict(self.fingerprints, sbCustomer="changed")
+        relationships, rechecked = self.infer(previous_checks=checks, fingerprints=changed)
+        self.assertNotIn(key, relationships)
+        self.assertEqual(rechecked["sbTransaction.sbTxCustId->sbCustomer.sbCustId"]["parent_fp"], "changed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+"""Unittest for single-flight request coalescing."""
+
+import time
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from single_flight import SingleFlight
+import pydough_query_processor as pqp
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll condition() until it is true; fail after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.005)
+
+
+class SingleFlightTest(unittest.TestCase):
+    """Tests SingleFlight.do from threads."""
+
+    def run_callers(self, group, key, fn, callers):
+        """Call group.do(key, fn) from callers threads; returns their (result, shared) or exception."""
+        outcomes = [None] * callers
+
+        def call(index):
+            try:
+                outcomes[index] = group.do(key, fn)
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, outcomes
+
+    def test_concurrent_identical_keys_share_one_call(self):
+        """Callers arriving while a key is in flight wait for it instead of calling again."""
+        group = SingleFlight("test")
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {"rows": [1, 2, 3]}
+
+        threads, outcomes = self.run_callers(group, "key", compute, 4)
+        wait_for(lambda: group.stats()["waiting"] == 3)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in outcomes], [{"rows": [1, 2, 3]}] * 4)
+        self.assertEqual(sorted(shared for _, shared in outcomes), [False, True, True, True])
+        stats = group.stats()
+        self.assertEqual((stats["calls"], stats["computations"], stats["coalesced"]), (4, 1, 3))
+
+    def test_leader_exception_reaches_every_follower(self):
+        """An exception raised by the computation is raised in every caller."""
+        group = SingleFlight("test")
+        release = threading.Event()
+
+        def compute():
+            release.wait(5)
+            raise RuntimeError("boom")
+
+        threads, outcomes = self.run_callers(group, "key", compute, 3)
+        wait_for(lambda: group.stats()["waiting"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertTrue(all(isinstance(outcome, RuntimeError) for outcome in outcomes))
+        self.assertEqual(group.stats()["errors"], 1)
+
+    def test_key_expires_when_the_call_finishes(self):
+        """Nothing is cached: a call after the flight has finished computes again."""
+        group = SingleFlight("test")
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(group.do("key", compute), (1, False))
+        self.assertEqual(group.stats()["in_flight"], 0)
+        self.assertEqual(group.do("key", compute), (2, False))
+
+        with self.assertRaises(ValueError):
+            group.do("key", lambda: int("not a number"))
+        self.assertEqual(group.do("key", compute), (3, False))
+
+
+class SingleFlightAsyncTest(unittest.TestCase):
+    """Tests SingleFlight.do_async on an event loop."""
+
+    def test_concurrent_identical_keys_share_one_call(self):
+        """Coroutines awaiting the same key while it is in flight share one run."""
+        group = SingleFlight("test")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"rows": [1, 2, 3]}
+
+        async def main():
+            return await asyncio.gather(*(group.do_async("key", compute) for _ in range(4)))
+
+        outcomes = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in outcomes], [{"rows": [1, 2, 3]}] * 4)
+        self.assertEqual([shared for _, shared in outcomes], [False, True, True, True])
+
+    def test_leader_exception_reaches_every_follower(self):
+        """An exception raised by the coroutine is raised in every awaiting caller."""
+        group = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("boom")
+
+        async def main():
+            return await asyncio.gather(*(group.do_async("key", compute) for _ in range(3)), return_exceptions=True)
+
+        outcomes = asyncio.run(main())
+        self.assertTrue(all(isinstance(outcome, RuntimeError) for outcome in outcomes))
+        self.assertEqual(group.stats()["errors"], 1)
+
+    def test_key_expires_when_the_call_finishes(self):
+        """A call after the flight has finished computes again."""
+        group = SingleFlight("test")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return len(calls)
+
+        async def main():
+            first = await group.do_async("key", compute)
+            in_flight = group.stats()["in_flight"]
+            second = await group.do_async("key", compute)
+            return first, in_flight, second
+
+        self.assertEqual(asyncio.run(main()), ((1, False), 0, (2, False)))
+
+
+class CoalescedQueryTest(unittest.TestCase):
+    """Tests that coalesced /api/query callers get independent responses."""
+
+    def response(self):
+        """A fresh process_query response with nested data."""
+        return {"success": True, "query_id": "leader", "execution": {"result_data": {"rows": [[1], [2]]}}}
+
+    def test_each_caller_gets_an_independent_copy(self):
+        """Mutating one caller's response changes neither the others nor the leader's."""
+        release = threading.Event()
+        computed = []
+
+        def fake_process_query(*args, **kwargs):
+            computed.append(self.response())
+            release.wait(5)
+            return computed[-1]
+
+        results = [None] * 3
+
+        def call(index):
+            results[index] = pqp.process_query_coalesced("List all customers", domain="Broker")
+
+        with mock.patch.object(pqp, "process_query", fake_process_query):
+            threads = [threading.Thread(target=call, args=(i,)) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            wait_for(lambda: pqp.QUERY_FLIGHTS.stats()["waiting"] == 2)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(sum(1 for result in results if result.get("coalesced")), 2)
+        results[0]["execution"]["result_data"]["rows"].append([3])
+        for result in results[1:] + computed:
+            self.assertEqual(result["execution"]["result_data"]["rows"], [[1], [2]])
+
+    def test_each_async_caller_gets_an_independent_copy(self):
+        """The same for process_query_coalesced_async."""
+        computed = []
+
+        async def fake_process_query_async(*args, **kwargs):
+            computed.append(self.response())
+            await asyncio.sleep(0.05)
+            return computed[-1]
+
+        async def main():
+            return await asyncio.gather(*(pqp.process_query_coalesced_async("List all customers", domain="Broker") for _ in range(3)))
+
+        with mock.patch.object(pqp, "process_query_async", fake_process_query_async):
+            results = asyncio.run(main())
+
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(sum(1 for result in results if result.get("coalesced")), 2)
+        results[0]["execution"]["result_data"]["rows"].append([3])
+        for result in results[1:] + computed:
+            self.assertEqual(result["execution"]["result_data"]["rows"], [[1], [2]])
+
+
+if __name__ == "__main__":
+    unittest.main()
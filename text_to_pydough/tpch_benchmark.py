@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+TPC-H scale-factor benchmark
+
+Generates TPC-H databases (see tpch_generator) at one or more scale factors and
+runs the 22 TPC-H questions through the execution layer (pydough_executor),
+reporting the latency of every query at every scale factor.
+
+Each question is stored as a natural-language / PyDough pair. The PyDough code
+is written against TPCH_GRAPH, a metadata graph for the generated databases
+with the relationships the questions need (the TPCH domain's data/tpch.json
+has none), which is written next to the databases. With --nl the natural
+language questions are instead sent through the whole pipeline
+(pydough_query_processor.process_query) against the TPCH domain, which needs
+data/tpch.db and a configured LLM.
+
+Run `python tpch_benchmark.py --scale-factors 0.01 0.1 --repeat 3`.
+"""
+
+import os
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+from tpch_generator import generate_tpch, TABLES
+
+# Directory for the generated databases and their metadata graph
+BENCHMARK_DATA_DIR = os.environ.get("PYDOUGH_TPCH_BENCHMARK_DIR", os.path.join("data", "tpch_benchmark"))
+GRAPH_NAME = "TPCH"
+GRAPH_FILENAME = "tpch_benchmark_graph.json"
+# Seconds each query may run
+QUERY_TIMEOUT = float(os.environ.get("PYDOUGH_TPCH_QUERY_TIMEOUT", 600))
+
+# Collection -> (table, unique properties, {property: column})
+TPCH_COLLECTIONS = {
+    "regions": ("REGION", ["key"], {"key": "R_REGIONKEY", "name": "R_NAME", "comment": "R_COMMENT"}),
+    "nations": ("NATION", ["key"], {
+        "key": "N_NATIONKEY", "name": "N_NAME", "region_key": "N_REGIONKEY", "comment": "N_COMMENT"
+    }),
+    "parts": ("PART", ["key"], {
+        "key": "P_PARTKEY", "name": "P_NAME", "manufacturer": "P_MFGR", "brand": "P_BRAND", "part_type": "P_TYPE",
+        "size": "P_SIZE", "container": "P_CONTAINER", "retail_price": "P_RETAILPRICE", "comment": "P_COMMENT"
+    }),
+    "suppliers": ("SUPPLIER", ["key"], {
+        "key": "S_SUPPKEY", "name": "S_NAME", "address": "S_ADDRESS", "nation_key": "S_NATIONKEY",
+        "phone": "S_PHONE", "account_balance": "S_ACCTBAL", "comment": "S_COMMENT"
+    }),
+    "supply_records": ("PARTSUPP", [["part_key", "supplier_key"]], {
+        "part_key": "PS_PARTKEY", "supplier_key": "PS_SUPPKEY", "available_quantity": "PS_AVAILQTY",
+        "supply_cost": "PS_SUPPLYCOST", "comment": "PS_COMMENT"
+    }),
+    "customers": ("CUSTOMER", ["key"], {
+        "key": "C_CUSTKEY", "name": "C_NAME", "address": "C_ADDRESS", "nation_key": "C_NATIONKEY",
+        "phone": "C_PHONE", "account_balance": "C_ACCTBAL", "market_segment": "C_MKTSEGMENT", "comment": "C_COMMENT"
+    }),
+    "orders": ("ORDERS", ["key"], {
+        "key": "O_ORDERKEY", "customer_key": "O_CUSTKEY", "order_status": "O_ORDERSTATUS",
+        "total_price": "O_TOTALPRICE", "order_date": "O_ORDERDATE", "order_priority": "O_ORDERPRIORITY",
+        "clerk": "O_CLERK", "ship_priority": "O_SHIPPRIORITY", "comment": "O_COMMENT"
+    }),
+    "lines": ("LINEITEM", [["order_key", "line_number"]], {
+        "order_key": "L_ORDERKEY", "part_key": "L_PARTKEY", "supplier_key": "L_SUPPKEY",
+        "line_number": "L_LINENUMBER", "quantity": "L_QUANTITY", "extended_price": "L_EXTENDEDPRICE",
+        "discount": "L_DISCOUNT", "tax": "L_TAX", "return_flag": "L_RETURNFLAG", "status": "L_LINESTATUS",
+        "ship_date": "L_SHIPDATE", "commit_date": "L_COMMITDATE", "receipt_date": "L_RECEIPTDATE",
+        "ship_instruct": "L_SHIPINSTRUCT", "ship_mode": "L_SHIPMODE", "comment": "L_COMMENT"
+    })
+}
+# (parent, property, child, {parent property: [child property]}, reverse property on the child)
+TPCH_RELATIONSHIPS = [
+    ("regions", "nations", "nations", {"key": ["region_key"]}, "region"),
+    ("nations", "suppliers", "suppliers", {"key": ["nation_key"]}, "nation"),
+    ("nations", "customers", "customers", {"key": ["nation_key"]}, "nation"),
+    ("parts", "supply_records", "supply_records", {"key": ["part_key"]}, "part"),
+    ("suppliers", "supply_records", "supply_records", {"key": ["supplier_key"]}, "supplier"),
+    ("customers", "orders", "orders", {"key": ["customer_key"]}, "customer"),
+    ("orders", "lines", "lines", {"key": ["order_key"]}, "order"),
+    ("parts", "lines", "lines", {"key": ["part_key"]}, "part"),
+    ("suppliers", "lines", "lines", {"key": ["supplier_key"]}, "supplier"),
+    ("supply_records", "lines", "lines", {"part_key": ["part_key"], "supplier_key": ["supplier_key"]}, "part_and_supplier")
+]
+_DATA_TYPES = {"INTEGER": "int64", "REAL": "float64", "TEXT": "string", "DATE": "date"}
+
+def tpch_metadata_graph():
+    """Metadata graph for the generated databases, in the same layout as the domains' JSON files."""
+    collections = {}
+    for name, (table, unique, properties) in TPCH_COLLECTIONS.items():
+        column_types = dict(TABLES[table])
+        collections[name] = {
+            "type": "simple_table",
+            "table_path": f"main.{table}",
+            "unique_properties": unique,
+            "properties": {
+                prop: {"type": "table_column", "column_name": column, "data_type": _DATA_TYPES[column_types[column]]}
+                for prop, column in properties.items()
+            }
+        }
+    for parent, prop, child, keys, reverse in TPCH_RELATIONSHIPS:
+        collections[parent]["properties"][prop] = {
+            "type": "simple_join",
+            "other_collection_name": child,
+            "singular": False,
+            "no_collisions": True,
+            "keys": keys,
+            "reverse_relationship_name": reverse
+        }
+    return {GRAPH_NAME: collections}
+
+# (question number, natural-language question, PyDough code). Validation
+# parameters follow the specification; {fraction} is Q11's 0.0001 / SF.
+TPCH_QUERIES = [
+    (1, "For line items shipped by 1998-09-02, what are the total and average quantity, base price, discounted price, charge and discount, and the line count, for each return flag and line status?", """
+result = lines.WHERE(ship_date <= "1998-09-02").PARTITION(name="groups", by=(return_flag, status)).CALCULATE(
+    L_RETURNFLAG=return_flag,
+    L_LINESTATUS=status,
+    SUM_QTY=SUM(lines.quantity),
+    SUM_BASE_PRICE=SUM(lines.extended_price),
+    SUM_DISC_PRICE=SUM(lines.extended_price * (1 - lines.discount)),
+    SUM_CHARGE=SUM(lines.extended_price * (1 - lines.discount) * (1 + lines.tax)),
+    AVG_QTY=AVG(lines.quantity),
+    AVG_PRICE=AVG(lines.extended_price),
+    AVG_DISC=AVG(lines.discount),
+    COUNT_ORDER=COUNT(lines)
+).ORDER_BY(L_RETURNFLAG.ASC(), L_LINESTATUS.ASC())
+"""),
+    (2, "Which European suppliers offer size 15 brass parts at the lowest supply cost in the region? Show the 100 with the highest account balance.", """
+result = parts.WHERE((size == 15) & ENDSWITH(part_type, "BRASS")).CALCULATE(
+    p_key=key,
+    p_mfgr=manufacturer,
+    best_cost=MIN(supply_records.WHERE(supplier.nation.region.name == "EUROPE").supply_cost)
+).supply_records.WHERE((supply_cost == best_cost) & (supplier.nation.region.name == "EUROPE")).CALCULATE(
+    S_ACCTBAL=supplier.account_balance,
+    S_NAME=supplier.name,
+    N_NAME=supplier.nation.name,
+    P_PARTKEY=p_key,
+    P_MFGR=p_mfgr,
+    S_ADDRESS=supplier.address,
+    S_PHONE=supplier.phone,
+    S_COMMENT=supplier.comment
+).TOP_K(100, by=(S_ACCTBAL.DESC(), N_NAME.ASC(), S_NAME.ASC(), P_PARTKEY.ASC()))
+"""),
+    (3, "What are the 10 unshipped orders with the highest revenue for customers in the BUILDING segment as of 1995-03-15?", """
+open_lines = lines.WHERE(ship_date > "1995-03-15").CALCULATE(revenue=extended_price * (1 - discount))
+result = orders.WHERE((customer.market_segment == "BUILDING") & (order_date < "1995-03-15") & HAS(open_lines)).CALCULATE(
+    L_ORDERKEY=key,
+    REVENUE=SUM(open_lines.revenue),
+    O_ORDERDATE=order_date,
+    O_SHIPPRIORITY=ship_priority
+).TOP_K(10, by=(REVENUE.DESC(), O_ORDERDATE.ASC(), L_ORDERKEY.ASC()))
+"""),
+    (4, "How many orders placed in the third quarter of 1993 had at least one line item received after its commit date, per order priority?", """
+result = orders.WHERE(
+    (order_date >= "1993-07-01") & (order_date < "1993-10-01") & HAS(lines.WHERE(commit_date < receipt_date))
+).PARTITION(name="priorities", by=order_priority).CALCULATE(
+    O_ORDERPRIORITY=order_priority,
+    ORDER_COUNT=COUNT(orders)
+).ORDER_BY(O_ORDERPRIORITY.ASC())
+"""),
+    (5, "What was the 1994 revenue from local suppliers for each nation in ASIA, where customer and supplier are in the same nation?", """
+result = nations.WHERE(region.name == "ASIA").CALCULATE(nation_name=name).CALCULATE(
+    N_NAME=nation_name,
+    REVENUE=SUM(
+        customers.orders.WHERE((order_date >= "1994-01-01") & (order_date < "1995-01-01"))
+        .lines.WHERE(supplier.nation.name == nation_name)
+        .CALCULATE(revenue=extended_price * (1 - discount)).revenue
+    )
+).ORDER_BY(REVENUE.DESC())
+"""),
+    (6, "How much revenue would eliminating discounts between 5% and 7% on 1994 line items with quantity under 24 have added?", """
+result = TPCH.CALCULATE(
+    REVENUE=SUM(lines.WHERE(
+        (ship_date >= "1994-01-01") & (ship_date < "1995-01-01") & (discount >= 0.05) & (discount <= 0.07) & (quantity < 24)
+    ).CALCULATE(revenue=extended_price * discount).revenue)
+)
+"""),
+    (7, "What was the value of goods shipped between FRANCE and GERMANY in each direction in 1995 and 1996, per year?", """
+result = lines.WHERE((ship_date >= "1995-01-01") & (ship_date <= "1996-12-31")).CALCULATE(
+    supp_nation=supplier.nation.name,
+    cust_nation=order.customer.nation.name,
+    l_year=YEAR(ship_date),
+    volume=extended_price * (1 - discount)
+).WHERE(
+    ((supp_nation == "FRANCE") & (cust_nation == "GERMANY")) | ((supp_nation == "GERMANY") & (cust_nation == "FRANCE"))
+).PARTITION(name="groups", by=(supp_nation, cust_nation, l_year)).CALCULATE(
+    SUPP_NATION=supp_nation,
+    CUST_NATION=cust_nation,
+    L_YEAR=l_year,
+    REVENUE=SUM(lines.volume)
+).ORDER_BY(SUPP_NATION.ASC(), CUST_NATION.ASC(), L_YEAR.ASC())
+"""),
+    (8, "What was BRAZIL's market share of ECONOMY ANODIZED STEEL sales in the AMERICA region in 1995 and 1996?", """
+result = lines.WHERE(
+    (part.part_type == "ECONOMY ANODIZED STEEL") & (order.order_date >= "1995-01-01") & (order.order_date <= "1996-12-31")
+    & (order.customer.nation.region.name == "AMERICA")
+).CALCULATE(
+    o_year=YEAR(order.order_date),
+    volume=extended_price * (1 - discount),
+    brazil_volume=IFF(supplier.nation.name == "BRAZIL", extended_price * (1 - discount), 0)
+).PARTITION(name="years", by=o_year).CALCULATE(
+    O_YEAR=o_year,
+    MKT_SHARE=SUM(lines.brazil_volume) / SUM(lines.volume)
+).ORDER_BY(O_YEAR.ASC())
+"""),
+    (9, "What was the profit on parts with 'green' in their name, per supplier nation and year?", """
+result = lines.WHERE(CONTAINS(part.name, "green")).CALCULATE(
+    nation_name=supplier.nation.name,
+    o_year=YEAR(order.order_date),
+    amount=extended_price * (1 - discount) - part_and_supplier.supply_cost * quantity
+).PARTITION(name="groups", by=(nation_name, o_year)).CALCULATE(
+    NATION=nation_name,
+    O_YEAR=o_year,
+    AMOUNT=SUM(lines.amount)
+).ORDER_BY(NATION.ASC(), O_YEAR.DESC())
+"""),
+    (10, "Which 20 customers lost the most revenue to returned items on orders placed in the fourth quarter of 1993?", """
+returned = orders.WHERE((order_date >= "1993-10-01") & (order_date < "1994-01-01")).lines.WHERE(return_flag == "R")
+result = customers.WHERE(HAS(returned)).CALCULATE(
+    C_CUSTKEY=key,
+    C_NAME=name,
+    REVENUE=SUM(returned.CALCULATE(revenue=extended_price * (1 - discount)).revenue),
+    C_ACCTBAL=account_balance,
+    N_NAME=nation.name,
+    C_ADDRESS=address,
+    C_PHONE=phone,
+    C_COMMENT=comment
+).TOP_K(20, by=(REVENUE.DESC(), C_CUSTKEY.ASC()))
+"""),
+    (11, "Which parts make up a significant share of the stock value held by suppliers in GERMANY?", """
+german_stock = supply_records.WHERE(supplier.nation.name == "GERMANY").CALCULATE(value=supply_cost * available_quantity)
+result = TPCH.CALCULATE(min_value=SUM(german_stock.value) * {fraction}).parts.CALCULATE(
+    PS_PARTKEY=key,
+    VALUE=SUM(supply_records.WHERE(supplier.nation.name == "GERMANY").CALCULATE(value=supply_cost * available_quantity).value)
+).WHERE(VALUE > min_value).ORDER_BY(VALUE.DESC())
+"""),
+    (12, "For MAIL and SHIP line items received in 1994 after their commit date, how many belonged to high and to low priority orders?", """
+result = lines.WHERE(
+    ISIN(ship_mode, ("MAIL", "SHIP")) & (ship_date < commit_date) & (commit_date < receipt_date)
+    & (receipt_date >= "1994-01-01") & (receipt_date < "1995-01-01")
+).CALCULATE(
+    high=IFF(ISIN(order.order_priority, ("1-URGENT", "2-HIGH")), 1, 0)
+).PARTITION(name="modes", by=ship_mode).CALCULATE(
+    L_SHIPMODE=ship_mode,
+    HIGH_LINE_COUNT=SUM(lines.high),
+    LOW_LINE_COUNT=COUNT(lines) - SUM(lines.high)
+).ORDER_BY(L_SHIPMODE.ASC())
+"""),
+    (13, "How many customers have each number of orders, not counting orders whose comment mentions special requests?", """
+result = customers.CALCULATE(
+    num_orders=COUNT(orders.WHERE(~LIKE(comment, "%special%requests%")))
+).PARTITION(name="counts", by=num_orders).CALCULATE(
+    C_COUNT=num_orders,
+    CUSTDIST=COUNT(customers)
+).ORDER_BY(CUSTDIST.DESC(), C_COUNT.DESC())
+"""),
+    (14, "What percentage of September 1995 revenue came from promotional parts?", """
+september = lines.WHERE((ship_date >= "1995-09-01") & (ship_date < "1995-10-01")).CALCULATE(
+    revenue=extended_price * (1 - discount),
+    promo_revenue=IFF(STARTSWITH(part.part_type, "PROMO"), extended_price * (1 - discount), 0)
+)
+result = TPCH.CALCULATE(PROMO_REVENUE=100.0 * SUM(september.promo_revenue) / SUM(september.revenue))
+"""),
+    (15, "Which supplier had the highest revenue in the first quarter of 1996?", """
+result = suppliers.CALCULATE(
+    S_SUPPKEY=key,
+    S_NAME=name,
+    S_ADDRESS=address,
+    S_PHONE=phone,
+    TOTAL_REVENUE=SUM(lines.WHERE((ship_date >= "1996-01-01") & (ship_date < "1996-04-01")).CALCULATE(
+        revenue=extended_price * (1 - discount)
+    ).revenue)
+).TOP_K(1, by=(TOTAL_REVENUE.DESC(), S_SUPPKEY.ASC()))
+"""),
+    (16, "How many suppliers without customer complaints can supply parts of each brand, type and size, excluding Brand#45 and MEDIUM POLISHED types, for sizes 49, 14, 23, 45, 19, 3, 36 and 9?", """
+result = parts.WHERE(
+    (brand != "Brand#45") & ~STARTSWITH(part_type, "MEDIUM POLISHED") & ISIN(size, (49, 14, 23, 45, 19, 3, 36, 9))
+).CALCULATE(p_brand=brand, p_type=part_type, p_size=size).supply_records.WHERE(
+    ~LIKE(supplier.comment, "%Customer%Complaints%")
+).PARTITION(name="groups", by=(p_brand, p_type, p_size)).CALCULATE(
+    P_BRAND=p_brand,
+    P_TYPE=p_type,
+    P_SIZE=p_size,
+    SUPPLIER_CNT=NDISTINCT(supply_records.supplier_key)
+).ORDER_BY(SUPPLIER_CNT.DESC(), P_BRAND.ASC(), P_TYPE.ASC(), P_SIZE.ASC())
+"""),
+    (17, "What is the average yearly revenue lost if orders for Brand#23 MED BOX parts under 20% of the part's average quantity were no longer filled?", """
+result = TPCH.CALCULATE(
+    AVG_YEARLY=SUM(
+        parts.WHERE((brand == "Brand#23") & (container == "MED BOX")).CALCULATE(avg_quantity=AVG(lines.quantity))
+        .lines.WHERE(quantity < 0.2 * avg_quantity).extended_price
+    ) / 7.0
+)
+"""),
+    (18, "Which orders with more than 300 units in total are the largest, with their customers?", """
+result = orders.CALCULATE(
+    C_NAME=customer.name,
+    C_CUSTKEY=customer.key,
+    O_ORDERKEY=key,
+    O_ORDERDATE=order_date,
+    O_TOTALPRICE=total_price,
+    TOTAL_QUANTITY=SUM(lines.quantity)
+).WHERE(TOTAL_QUANTITY > 300).TOP_K(100, by=(O_TOTALPRICE.DESC(), O_ORDERDATE.ASC()))
+"""),
+    (19, "What was the discounted revenue from air-shipped, hand-delivered line items of three brand, container and size combinations?", """
+result = TPCH.CALCULATE(REVENUE=SUM(lines.CALCULATE(
+    p_brand=part.brand, p_container=part.container, p_size=part.size
+).WHERE(
+    ISIN(ship_mode, ("AIR", "AIR REG")) & (ship_instruct == "DELIVER IN PERSON") & (
+        ((p_brand == "Brand#12") & ISIN(p_container, ("SM CASE", "SM BOX", "SM PACK", "SM PKG"))
+         & (quantity >= 1) & (quantity <= 11) & (p_size >= 1) & (p_size <= 5))
+        | ((p_brand == "Brand#23") & ISIN(p_container, ("MED BAG", "MED BOX", "MED PKG", "MED PACK"))
+           & (quantity >= 10) & (quantity <= 20) & (p_size >= 1) & (p_size <= 10))
+        | ((p_brand == "Brand#34") & ISIN(p_container, ("LG CASE", "LG BOX", "LG PACK", "LG PKG"))
+           & (quantity >= 20) & (quantity <= 30) & (p_size >= 1) & (p_size <= 15))
+    )
+).CALCULATE(revenue=extended_price * (1 - discount)).revenue))
+"""),
+    (20, "Which suppliers in CANADA have more than half of the 1994 shipped quantity of some 'forest' part still in stock?", """
+result = suppliers.WHERE((nation.name == "CANADA") & HAS(supply_records.WHERE(
+    STARTSWITH(part.name, "forest")
+    & (available_quantity > 0.5 * SUM(lines.WHERE((ship_date >= "1994-01-01") & (ship_date < "1995-01-01")).quantity))
+))).CALCULATE(S_NAME=name, S_ADDRESS=address).ORDER_BY(S_NAME.ASC())
+"""),
+    (21, "Which suppliers in SAUDI ARABIA were the only late supplier on multi-supplier orders that have been fulfilled?", """
+result = suppliers.WHERE(nation.name == "SAUDI ARABIA").CALCULATE(supplier_name=name, late_supplier=key).CALCULATE(
+    S_NAME=supplier_name,
+    NUMWAIT=COUNT(lines.WHERE(receipt_date > commit_date).order.WHERE(
+        (order_status == "F")
+        & HAS(lines.WHERE(supplier_key != late_supplier))
+        & HASNOT(lines.WHERE((supplier_key != late_supplier) & (receipt_date > commit_date)))
+    ))
+).WHERE(NUMWAIT > 0).TOP_K(100, by=(NUMWAIT.DESC(), S_NAME.ASC()))
+"""),
+    (22, "How many customers in country codes 13, 31, 23, 29, 30, 18 and 17 have an above-average positive balance but no orders, and what is their total balance?", """
+country_customers = customers.CALCULATE(country_code=phone[:2]).WHERE(
+    ISIN(country_code, ("13", "31", "23", "29", "30", "18", "17"))
+)
+result = TPCH.CALCULATE(
+    avg_balance=AVG(country_customers.WHERE(account_balance > 0.0).account_balance)
+).customers.CALCULATE(country_code=phone[:2]).WHERE(
+    ISIN(country_code, ("13", "31", "23", "29", "30", "18", "17")) & (account_balance > avg_balance) & HASNOT(orders)
+).PARTITION(name="countries", by=country_code).CALCULATE(
+    CNTRYCODE=country_code,
+    NUMCUST=COUNT(customers),
+    TOTACCTBAL=SUM(customers.account_balance)
+).ORDER_BY(CNTRYCODE.ASC())
+"""),
+]
+
+def query_code(number, scale_factor):
+    """PyDough code of a TPC-H question with its scale-dependent parameters filled in."""
+    code = next(code for n, _, code in TPCH_QUERIES if n == number)
+    return code.replace("{fraction}", repr(0.0001 / scale_factor)).strip()
+
+def prepare_scale_factor(scale_factor, data_dir=BENCHMARK_DATA_DIR, regenerate=False):
+    """Generate (unless present) the database for a scale factor. Returns its domain_info tuple."""
+    os.makedirs(data_dir, exist_ok=True)
+    graph_path = os.path.join(data_dir, GRAPH_FILENAME)
+    with open(graph_path, "w") as f:
+        json.dump(tpch_metadata_graph(), f, indent=2)
+    db_path = os.path.join(data_dir, f"tpch_sf{scale_factor:g}.db")
+    if regenerate or not os.path.exists(db_path):
+        print(f"⏳ Generating TPC-H at scale factor {scale_factor:g}...")
+        report = generate_tpch(db_path, scale_factor, overwrite=True)
+        print(f"✅ Generated {db_path} ({report['size_mb']} MB) in {report['seconds']}s")
+    return (f"TPCH_sf{scale_factor:g}", graph_path, db_path)
+
+def _latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        "min": round(latencies[0], 2),
+        "median": round(statistics.median(latencies), 2),
+        "max": round(latencies[-1], 2)
+    } if latencies else None
+
+def run_query(domain_info, number, scale_factor, repeat=3, engine=None, timeout=QUERY_TIMEOUT):
+    """
+    Run one question `repeat` times after an untimed first run (which loads the
+    domain and warms caches) and return its latencies in milliseconds.
+    """
+    from pydough_executor import execute_pydough_code
+
+    code = query_code(number, scale_factor)
+    started = time.perf_counter()
+    first = execute_pydough_code(code, domain_info, timeout=timeout, engine=engine)
+    cold_ms = (time.perf_counter() - started) * 1000
+    record = {"query": number, "success": bool(first.get("success")), "cold_ms": round(cold_ms, 2)}
+    if not first.get("success"):
+        record["error"] = first.get("error")
+        return record
+
+    latencies, sql_latencies = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = execute_pydough_code(code, domain_info, timeout=timeout, engine=engine)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if not result.get("success"):
+            record.update({"success": False, "error": result.get("error")})
+            break
+        sql_latencies.append(((result.get("engine") or {}).get("seconds") or 0) * 1000)
+    record.update({
+        "rows": first.get("row_count"),
+        "engine": (first.get("engine") or {}).get("name"),
+        "latency_ms": _latency_summary(latencies),
+        "sql_ms": _latency_summary(sql_latencies)
+    })
+    return record
+
+def run_natural_language_query(number, question, repeat=1):
+    """Send a question through the full pipeline (domain TPCH) and time it."""
+    import pydough_query_processor as pqp
+
+    latencies, record = [], {"query": number, "question": question}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = pqp.process_query(question, execute=True, save_results=False, domain="TPCH")
+        latencies.append((time.perf_counter() - started) * 1000)
+        execution = result.get("execution") or {}
+        record.update({
+            "success": bool(result.get("success") and execution.get("success")),
+            "error": result.get("error") or execution.get("error"),
+            "rows": execution.get("row_count"),
+            "pydough_code": result.get("pydough_code")
+        })
+    record["latency_ms"] = _latency_summary(latencies)
+    return record
+
+def run_benchmark(scale_factors, repeat=3, queries=None, engine=None, data_dir=BENCHMARK_DATA_DIR,
+                  regenerate=False, natural_language=False):
+    """Latency of every selected question at every scale factor, as a JSON-friendly report."""
+    from tpch_generator import table_rows
+
+    numbers = queries or [number for number, _, _ in TPCH_QUERIES]
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "mode": "natural_language" if natural_language else "pydough",
+        "engine": engine,
+        "repeat": repeat,
+        "scale_factors": []
+    }
+    if natural_language:
+        questions = {number: question for number, question, _ in TPCH_QUERIES}
+        results = []
+        for number in numbers:
+            record = run_natural_language_query(number, questions[number], repeat)
+            print(f"Q{number:<2} {'✅' if record['success'] else '❌'} {record['latency_ms']['median']:>10.1f} ms")
+            results.append(record)
+        report["scale_factors"].append({"scale_factor": None, "queries": results})
+        return report
+
+    for scale_factor in scale_factors:
+        domain_info = prepare_scale_factor(scale_factor, data_dir, regenerate)
+        print(f"\n📊 Scale factor {scale_factor:g} ({os.path.getsize(domain_info[2]) / (1024 * 1024):.1f} MB)")
+        results = []
+        for number in numbers:
+            record = run_query(domain_info, number, scale_factor, repeat, engine)
+            if record["success"]:
+                print(f"Q{number:<2} ✅ {record['latency_ms']['median']:>10.1f} ms  ({record['rows']} rows, {record['engine']})")
+            else:
+                print(f"Q{number:<2} ❌ {record.get('error')}")
+            results.append(record)
+        succeeded = [record for record in results if record["success"]]
+        report["scale_factors"].append({
+            "scale_factor": scale_factor,
+            "database": domain_info[2],
+            "rows": table_rows(scale_factor),
+            "queries": results,
+            "succeeded": len(succeeded),
+            "total_median_ms": round(sum(record["latency_ms"]["median"] for record in succeeded), 2)
+        })
+    report["finished_at"] = datetime.now().isoformat()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="TPC-H scale-factor benchmark of the execution layer")
+    parser.add_argument("--scale-factors", type=float, nargs="+", default=[0.01], help="Scale factors to run (0.01 to 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query (after one untimed run)")
+    parser.add_argument("--queries", type=int, nargs="+", help="Question numbers to run (default: all 22)")
+    parser.add_argument("--engine", choices=["sqlite", "duckdb", "auto"], help="Execution engine (default: PYDOUGH_ENGINE)")
+    parser.add_argument("--data-dir", default=BENCHMARK_DATA_DIR, help="Directory for the generated databases")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate databases that already exist")
+    parser.add_argument("--nl", action="store_true", help="Send the natural-language questions through the full pipeline instead")
+    parser.add_argument("--output", help="Write the report to this JSON file (default: results/tpch_benchmark_<time>.json)")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.scale_factors, repeat=args.repeat, queries=args.queries, engine=args.engine,
+        data_dir=args.data_dir, regenerate=args.regenerate, natural_language=args.nl
+    )
+    output = args.output or os.path.join("results", f"tpch_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Benchmark report saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+TPC-H data generator
+
+Writes a TPC-H database in SQLite (the TPCH domain's data/tpch.db layout: upper
+case table and column names) at scale factors from 0.01 to 1, using NumPy
+instead of the C dbgen tool. Row counts, key ranges, value domains and the
+correlations the 22 queries depend on (part/supplier pairs, order status from
+line status, return flags from receipt dates, customers without orders) follow
+the TPC-H specification. Comments are drawn from a fixed pool of generated
+sentences rather than dbgen's text grammar.
+
+Orders and their line items are generated in chunks of ORDER_CHUNK orders and
+written with executemany inside one transaction (journal and sync turned off),
+so memory stays bounded and output is reproducible for a given seed.
+
+Run `python tpch_generator.py --sf 0.1 --output data/tpch.db`.
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import datetime
+
+import numpy as np
+
+# Rows per scale factor 1 (REGION and NATION are fixed)
+BASE_ROWS = {"SUPPLIER": 10_000, "PART": 200_000, "CUSTOMER": 150_000, "ORDERS": 1_500_000}
+SCALE_FACTORS = (0.01, 0.1, 1)
+MIN_SCALE_FACTOR = 0.01
+MAX_SCALE_FACTOR = 1
+# Orders (with their line items) generated and inserted per chunk
+ORDER_CHUNK = 50_000
+# Distinct comment strings drawn from
+COMMENT_POOL_SIZE = 20_000
+
+START_DATE = datetime.date(1992, 1, 1)
+CURRENT_DATE = datetime.date(1995, 6, 17)
+END_DATE = datetime.date(1998, 12, 31)
+
+REGIONS = ["AFRICA", "AMERICA", "ASIA", "EUROPE", "MIDDLE EAST"]
+# (name, region key)
+NATIONS = [
+    ("ALGERIA", 0), ("ARGENTINA", 1), ("BRAZIL", 1), ("CANADA", 1), ("EGYPT", 4),
+    ("ETHIOPIA", 0), ("FRANCE", 3), ("GERMANY", 3), ("INDIA", 2), ("INDONESIA", 2),
+    ("IRAN", 4), ("IRAQ", 4), ("JAPAN", 2), ("JORDAN", 4), ("KENYA", 0),
+    ("MOROCCO", 0), ("MOZAMBIQUE", 0), ("PERU", 1), ("CHINA", 2), ("ROMANIA", 3),
+    ("SAUDI ARABIA", 4), ("VIETNAM", 2), ("RUSSIA", 3), ("UNITED KINGDOM", 3), ("UNITED STATES", 1)
+]
+PART_COLORS = """
+almond antique aquamarine azure beige bisque black blanched blue blush brown burlywood burnished
+chartreuse chiffon chocolate coral cornflower cornsilk cream cyan dark deep dim dodger drab
+firebrick floral forest frosted gainsboro ghost goldenrod green grey honeydew hot indian ivory
+khaki lace lavender lawn lemon light lime linen magenta maroon medium metallic midnight mint
+misty moccasin navajo navy olive orange orchid pale papaya peach peru pink plum powder puff
+purple red rose rosy royal saddle salmon sandy seashell sienna sky slate smoke snow spring
+steel tan thistle tomato turquoise violet wheat white yellow
+""".split()
+TYPE_SYLLABLES = (
+    ["STANDARD", "SMALL", "MEDIUM", "LARGE", "ECONOMY", "PROMO"],
+    ["ANODIZED", "BURNISHED", "PLATED", "POLISHED", "BRUSHED"],
+    ["TIN", "NICKEL", "BRASS", "STEEL", "COPPER"]
+)
+CONTAINER_SYLLABLES = (
+    ["SM", "LG", "MED", "JUMBO", "WRAP"],
+    ["CASE", "BOX", "BAG", "JAR", "PKG", "PACK", "CAN", "DRUM"]
+)
+SEGMENTS = ["AUTOMOBILE", "BUILDING", "FURNITURE", "MACHINERY", "HOUSEHOLD"]
+PRIORITIES = ["1-URGENT", "2-HIGH", "3-MEDIUM", "4-NOT SPECIFIED", "5-LOW"]
+INSTRUCTIONS = ["DELIVER IN PERSON", "COLLECT COD", "NONE", "TAKE BACK RETURN"]
+SHIP_MODES = ["REG AIR", "AIR", "RAIL", "SHIP", "TRUCK", "MAIL", "FOB"]
+COMMENT_WORDS = """
+furiously quickly carefully blithely slyly fluffily ironic final regular express special pending
+bold even silent unusual ruthless requests deposits packages accounts instructions theodolites
+pinto beans foxes ideas dependencies excuses platelets asymptotes courts dolphins multipliers
+sauternes warthogs frets dinos attainments somas tithes waters sheaves escapades sleep wake are
+cajole haggle nag use boost affix detect integrate maintain nod was lose sublate solve thrash
+promise engage hinder print x-ray breach eat grow impress mold poach serve run dazzle snooze
+doze unwind kindle play hang believe doubt about above according across after against along
+""".split()
+
+TABLES = {
+    "REGION": [("R_REGIONKEY", "INTEGER"), ("R_NAME", "TEXT"), ("R_COMMENT", "TEXT")],
+    "NATION": [("N_NATIONKEY", "INTEGER"), ("N_NAME", "TEXT"), ("N_REGIONKEY", "INTEGER"), ("N_COMMENT", "TEXT")],
+    "PART": [
+        ("P_PARTKEY", "INTEGER"), ("P_NAME", "TEXT"), ("P_MFGR", "TEXT"), ("P_BRAND", "TEXT"), ("P_TYPE", "TEXT"),
+        ("P_SIZE", "INTEGER"), ("P_CONTAINER", "TEXT"), ("P_RETAILPRICE", "REAL"), ("P_COMMENT", "TEXT")
+    ],
+    "SUPPLIER": [
+        ("S_SUPPKEY", "INTEGER"), ("S_NAME", "TEXT"), ("S_ADDRESS", "TEXT"), ("S_NATIONKEY", "INTEGER"),
+        ("S_PHONE", "TEXT"), ("S_ACCTBAL", "REAL"), ("S_COMMENT", "TEXT")
+    ],
+    "PARTSUPP": [
+        ("PS_PARTKEY", "INTEGER"), ("PS_SUPPKEY", "INTEGER"), ("PS_AVAILQTY", "INTEGER"),
+        ("PS_SUPPLYCOST", "REAL"), ("PS_COMMENT", "TEXT")
+    ],
+    "CUSTOMER": [
+        ("C_CUSTKEY", "INTEGER"), ("C_NAME", "TEXT"), ("C_ADDRESS", "TEXT"), ("C_NATIONKEY", "INTEGER"),
+        ("C_PHONE", "TEXT"), ("C_ACCTBAL", "REAL"), ("C_MKTSEGMENT", "TEXT"), ("C_COMMENT", "TEXT")
+    ],
+    "ORDERS": [
+        ("O_ORDERKEY", "INTEGER"), ("O_CUSTKEY", "INTEGER"), ("O_ORDERSTATUS", "TEXT"), ("O_TOTALPRICE", "REAL"),
+        ("O_ORDERDATE", "DATE"), ("O_ORDERPRIORITY", "TEXT"), ("O_CLERK", "TEXT"), ("O_SHIPPRIORITY", "INTEGER"),
+        ("O_COMMENT", "TEXT")
+    ],
+    "LINEITEM": [
+        ("L_ORDERKEY", "INTEGER"), ("L_PARTKEY", "INTEGER"), ("L_SUPPKEY", "INTEGER"), ("L_LINENUMBER", "INTEGER"),
+        ("L_QUANTITY", "REAL"), ("L_EXTENDEDPRICE", "REAL"), ("L_DISCOUNT", "REAL"), ("L_TAX", "REAL"),
+        ("L_RETURNFLAG", "TEXT"), ("L_LINESTATUS", "TEXT"), ("L_SHIPDATE", "DATE"), ("L_COMMITDATE", "DATE"),
+        ("L_RECEIPTDATE", "DATE"), ("L_SHIPINSTRUCT", "TEXT"), ("L_SHIPMODE", "TEXT"), ("L_COMMENT", "TEXT")
+    ]
+}
+# Indexes created after loading: primary keys and the foreign keys the queries join on
+INDEXES = {
+    "REGION": [("R_REGIONKEY",)],
+    "NATION": [("N_NATIONKEY",)],
+    "PART": [("P_PARTKEY",)],
+    "SUPPLIER": [("S_SUPPKEY",)],
+    "PARTSUPP": [("PS_PARTKEY", "PS_SUPPKEY"), ("PS_SUPPKEY",)],
+    "CUSTOMER": [("C_CUSTKEY",)],
+    "ORDERS": [("O_ORDERKEY",), ("O_CUSTKEY",)],
+    "LINEITEM": [("L_ORDERKEY", "L_LINENUMBER"), ("L_PARTKEY", "L_SUPPKEY")]
+}
+
+def table_rows(scale_factor):
+    """Rows per table at a scale factor (LINEITEM is about 4 per order)."""
+    rows = {name: max(1, int(base * scale_factor)) for name, base in BASE_ROWS.items()}
+    rows.update({"REGION": len(REGIONS), "NATION": len(NATIONS), "PARTSUPP": 4 * rows["PART"]})
+    return rows
+
+def _comment_pool(rng, min_words=3, max_words=12):
+    words = np.array(COMMENT_WORDS)
+    lengths = rng.integers(min_words, max_words + 1, COMMENT_POOL_SIZE)
+    return np.array([" ".join(rng.choice(words, n)) for n in lengths], dtype=object)
+
+def _comments(rng, pool, count):
+    return pool[rng.integers(0, len(pool), count)]
+
+def _phones(rng, nation_keys):
+    # Country code is the nation key + 10
+    local = rng.integers(100, 1000, (len(nation_keys), 2))
+    last = rng.integers(1000, 10000, len(nation_keys))
+    return [f"{n + 10}-{a}-{b}-{c}" for n, (a, b), c in zip(nation_keys.tolist(), local.tolist(), last.tolist())]
+
+def _addresses(rng, count):
+    alphabet = np.array(list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ,"))
+    lengths = rng.integers(10, 41, count)
+    chars = rng.choice(alphabet, (count, 40))
+    return ["".join(row[:n]) for row, n in zip(chars.tolist(), lengths.tolist())]
+
+def _money(rng, low, high, count):
+    """Uniform amounts with two decimals between low and high."""
+    return np.round(rng.integers(int(low * 100), int(high * 100) + 1, count) / 100, 2)
+
+def _dates(day_offsets):
+    """ISO date strings for day offsets from START_DATE."""
+    epoch = np.datetime64(START_DATE.isoformat())
+    return (epoch + day_offsets.astype("timedelta64[D]")).astype(str).tolist()
+
+def _retail_price(part_keys):
+    return np.round((90000 + (part_keys // 10) % 20001 + 100 * (part_keys % 1000)) / 100, 2)
+
+def _part_supplier(part_keys, i, suppliers):
+    """The i-th (0-3) supplier of each part, as the specification derives PS_SUPPKEY."""
+    return (part_keys + i * (suppliers // 4 + (part_keys - 1) // suppliers)) % suppliers + 1
+
+def _order_keys(indexes):
+    # Sparse keys: only the first 8 of every 32 key values are used
+    return (indexes // 8) * 32 + indexes % 8 + 1
+
+def _insert(connection, table, columns):
+    placeholders = ", ".join("?" * len(TABLES[table]))
+    connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", zip(*columns))
+
+def _generate_parts(connection, rng, rows, pool):
+    count = rows["PART"]
+    keys = np.arange(1, count + 1)
+    colors = np.array(PART_COLORS)
+    names = [" ".join(words) for words in rng.choice(colors, (count, 5)).tolist()]
+    manufacturer = rng.integers(1, 6, count)
+    brand = manufacturer * 10 + rng.integers(1, 6, count)
+    types = [" ".join(t) for t in zip(*(rng.choice(s, count).tolist() for s in TYPE_SYLLABLES))]
+    containers = [" ".join(c) for c in zip(*(rng.choice(s, count).tolist() for s in CONTAINER_SYLLABLES))]
+    _insert(connection, "PART", [
+        keys.tolist(), names, [f"Manufacturer#{m}" for m in manufacturer.tolist()],
+        [f"Brand#{b}" for b in brand.tolist()], types, rng.integers(1, 51, count).tolist(), containers,
+        _retail_price(keys).tolist(), _comments(rng, pool, count).tolist()
+    ])
+
+    suppliers = rows["SUPPLIER"]
+    part_keys = np.repeat(keys, 4)
+    supp_keys = _part_supplier(part_keys, np.tile(np.arange(4), count), suppliers)
+    _insert(connection, "PARTSUPP", [
+        part_keys.tolist(), supp_keys.tolist(), rng.integers(1, 10000, 4 * count).tolist(),
+        _money(rng, 1, 1000, 4 * count).tolist(), _comments(rng, pool, 4 * count).tolist()
+    ])
+
+def _generate_suppliers(connection, rng, rows, pool):
+    count = rows["SUPPLIER"]
+    nations = rng.integers(0, len(NATIONS), count)
+    comments = _comments(rng, pool, count)
+    # 5 in 10,000 suppliers have complaints and as many have recommendations (query 16)
+    flagged = rng.choice(count, max(2, count * 10 // 10_000), replace=False)
+    for position, index in enumerate(flagged.tolist()):
+        remark = "Complaints" if position % 2 == 0 else "Recommends"
+        comments[index] = f"{comments[index]} Customer {remark}"
+    _insert(connection, "SUPPLIER", [
+        np.arange(1, count + 1).tolist(), [f"Supplier#{k:09d}" for k in range(1, count + 1)],
+        _addresses(rng, count), nations.tolist(), _phones(rng, nations),
+        _money(rng, -999.99, 9999.99, count).tolist(), comments.tolist()
+    ])
+
+def _generate_customers(connection, rng, rows, pool):
+    count = rows["CUSTOMER"]
+    nations = rng.integers(0, len(NATIONS), count)
+    _insert(connection, "CUSTOMER", [
+        np.arange(1, count + 1).tolist(), [f"Customer#{k:09d}" for k in range(1, count + 1)],
+        _addresses(rng, count), nations.tolist(), _phones(rng, nations),
+        _money(rng, -999.99, 9999.99, count).tolist(), rng.choice(SEGMENTS, count).tolist(),
+        _comments(rng, pool, count).tolist()
+    ])
+
+def _generate_orders(connection, rng, rows, pool, first, count):
+    """Orders first .. first+count-1 (0-based order indexes) and their line items."""
+    customers, parts, suppliers = rows["CUSTOMER"], rows["PART"], rows["SUPPLIER"]
+    order_keys = _order_keys(np.arange(first, first + count))
+    # A third of the customers (keys divisible by 3) never place orders
+    customer_keys = rng.integers(1, customers + 1, count)
+    customer_keys[customer_keys % 3 == 0] -= 1
+    customer_keys[customer_keys == 0] = 1
+    last_order_day = (END_DATE - START_DATE).days - 151
+    order_days = rng.integers(0, last_order_day + 1, count)
+
+    line_counts = rng.integers(1, 8, count)
+    total_lines = int(line_counts.sum())
+    line_order = np.repeat(np.arange(count), line_counts)
+    line_numbers = np.arange(total_lines) - np.repeat(np.cumsum(line_counts) - line_counts, line_counts) + 1
+    part_keys = rng.integers(1, parts + 1, total_lines)
+    supp_keys = _part_supplier(part_keys, rng.integers(0, 4, total_lines), suppliers)
+    quantity = rng.integers(1, 51, total_lines).astype(float)
+    extended_price = np.round(quantity * _retail_price(part_keys), 2)
+    discount = rng.integers(0, 11, total_lines) / 100
+    tax = rng.integers(0, 9, total_lines) / 100
+    ship_days = order_days[line_order] + rng.integers(1, 122, total_lines)
+    commit_days = order_days[line_order] + rng.integers(30, 91, total_lines)
+    receipt_days = ship_days + rng.integers(1, 31, total_lines)
+    current_day = (CURRENT_DATE - START_DATE).days
+    return_flag = np.where(receipt_days <= current_day, rng.choice(["R", "A"], total_lines), "N")
+    line_status = np.where(ship_days > current_day, "O", "F")
+
+    # Order totals and status follow from their line items
+    charge = extended_price * (1 + tax) * (1 - discount)
+    total_price = np.round(np.bincount(line_order, weights=charge, minlength=count), 2)
+    open_lines = np.bincount(line_order, weights=(line_status == "O"), minlength=count)
+    order_status = np.where(open_lines == 0, "F", np.where(open_lines == line_counts, "O", "P"))
+    clerks = max(1, int(rows["ORDERS"] / 1500))
+
+    _insert(connection, "ORDERS", [
+        order_keys.tolist(), customer_keys.tolist(), order_status.tolist(), total_price.tolist(),
+        _dates(order_days), rng.choice(PRIORITIES, count).tolist(),
+        [f"Clerk#{k:09d}" for k in rng.integers(1, clerks + 1, count).tolist()], [0] * count,
+        _comments(rng, pool, count).tolist()
+    ])
+    _insert(connection, "LINEITEM", [
+        order_keys[line_order].tolist(), part_keys.tolist(), supp_keys.tolist(), line_numbers.tolist(),
+        quantity.tolist(), extended_price.tolist(), discount.tolist(), tax.tolist(), return_flag.tolist(),
+        line_status.tolist(), _dates(ship_days), _dates(commit_days), _dates(receipt_days),
+        rng.choice(INSTRUCTIONS, total_lines).tolist(), rng.choice(SHIP_MODES, total_lines).tolist(),
+        _comments(rng, pool, total_lines).tolist()
+    ])
+    return total_lines
+
+def generate_tpch(output_path, scale_factor=0.01, seed=42, overwrite=False):
+    """
+    Write a TPC-H database at the given scale factor to output_path.
+    With overwrite=True an existing database is replaced only once the new one
+    is complete, so it stays usable during (and after a failed) generation.
+    Returns a report with the row count per table and the seconds taken.
+    """
+    if not MIN_SCALE_FACTOR <= scale_factor <= MAX_SCALE_FACTOR:
+        raise ValueError(f"Scale factor must be between {MIN_SCALE_FACTOR} and {MAX_SCALE_FACTOR}, got {scale_factor}")
+    if os.path.exists(output_path):
+        if not overwrite:
+            raise FileExistsError(f"{output_path} already exists (pass overwrite=True to replace it)")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    started = time.perf_counter()
+    rows = table_rows(scale_factor)
+    rng = np.random.default_rng(seed)
+    pool = _comment_pool(rng)
+    # Written to a temporary file so a half-written database is never picked up
+    temp_path = f"{output_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    try:
+        for table, columns in TABLES.items():
+            connection.execute(f"CREATE TABLE {table} ({', '.join(f'{name} {kind}' for name, kind in columns)})")
+        with connection:
+            _insert(connection, "REGION", [list(range(len(REGIONS))), REGIONS, _comments(rng, pool, len(REGIONS)).tolist()])
+            _insert(connection, "NATION", [
+                list(range(len(NATIONS))), [name for name, _ in NATIONS], [region for _, region in NATIONS],
+                _comments(rng, pool, len(NATIONS)).tolist()
+            ])
+            _generate_suppliers(connection, rng, rows, pool)
+            _generate_parts(connection, rng, rows, pool)
+            _generate_customers(connection, rng, rows, pool)
+            line_items = 0
+            for first in range(0, rows["ORDERS"], ORDER_CHUNK):
+                # Every chunk has its own stream, so output does not depend on ORDER_CHUNK's history
+                chunk_rng = np.random.default_rng([seed, first])
+                line_items += _generate_orders(connection, chunk_rng, rows, pool, first, min(ORDER_CHUNK, rows["ORDERS"] - first))
+        for table, indexes in INDEXES.items():
+            for position, columns in enumerate(indexes):
+                unique = "UNIQUE " if position == 0 else ""
+                connection.execute(f"CREATE {unique}INDEX idx_{table.lower()}_{position} ON {table} ({', '.join(columns)})")
+        connection.execute("ANALYZE")
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, output_path)
+    rows["LINEITEM"] = line_items
+    return {
+        "path": output_path,
+        "scale_factor": scale_factor,
+        "seed": seed,
+        "rows": rows,
+        "seconds": round(time.perf_counter() - started, 2),
+        "size_mb": round(os.path.getsize(output_path) / (1024 * 1024), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a TPC-H SQLite database")
+    parser.add_argument("--sf", type=float, default=0.01, help=f"Scale factor ({MIN_SCALE_FACTOR} to {MAX_SCALE_FACTOR})")
+    parser.add_argument("--output", default="data/tpch.db", help="Database file to write")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing database")
+    args = parser.parse_args()
+    print(f"⏳ Generating TPC-H at scale factor {args.sf} into {args.output}...")
+    report = generate_tpch(args.output, args.sf, seed=args.seed, overwrite=args.overwrite)
+    print(f"✅ Wrote {report['path']} ({report['size_mb']} MB) in {report['seconds']}s")
+    for table, count in report["rows"].items():
+        print(f"   {table:<9} {count:>10,}")
+
+if __name__ == "__main__":
+    main()